@@ -1,7 +1,10 @@
 import sqlite3
 import logging
 import os
-from typing import List, Any, Dict
+import threading
+from typing import List, Any, Dict, Optional
+
+from app.db import migrations
 
 logger = logging.getLogger(__name__)
 
@@ -13,8 +16,17 @@ DATABASE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
 DATABASE_NAME = 'subsidies.db'
 DATABASE_PATH = os.path.join(DATABASE_DIR, DATABASE_NAME)
 
-def get_db_connection() -> sqlite3.Connection:
-    """Establece y devuelve una conexión a la base de datos SQLite."""
+# Expresión de la clave natural única de una subvención. Debe coincidir exactamente
+# con la usada en los ON CONFLICT(...) de los UPSERT.
+SUBSIDY_NATURAL_KEY_SQL = "name, region_code, IFNULL(start_date, '')"
+
+# Ruta de la base de datos cuyo esquema ya se ha verificado/migrado en este proceso.
+# La comprobación se hace de forma perezosa en la primera conexión (o en el evento de
+# arranque de la app), nunca al importar el módulo.
+_schema_ready_path: Optional[str] = None
+_schema_lock = threading.Lock()
+
+def _connect() -> sqlite3.Connection:
     # Asegurarse de que el directorio data/ exista
     os.makedirs(DATABASE_DIR, exist_ok=True)
 
@@ -22,40 +34,40 @@ def get_db_connection() -> sqlite3.Connection:
     conn.row_factory = sqlite3.Row # Permite acceder a las columnas por nombre
     return conn
 
+def ensure_schema(force: bool = False) -> int:
+    """
+    Aplica las migraciones pendientes sobre DATABASE_PATH una sola vez por proceso
+    (o siempre, con force=True) y devuelve la versión del esquema.
+    """
+    global _schema_ready_path
+    if not force and _schema_ready_path == DATABASE_PATH:
+        return migrations.LATEST_SCHEMA_VERSION
+    with _schema_lock:
+        if not force and _schema_ready_path == DATABASE_PATH:
+            return migrations.LATEST_SCHEMA_VERSION
+        conn = _connect()
+        try:
+            version = migrations.migrate(conn)
+        finally:
+            conn.close()
+        _schema_ready_path = DATABASE_PATH
+        logger.info(f"Esquema de la base de datos verificado (versión {version}): {DATABASE_PATH}")
+        return version
+
+def get_db_connection() -> sqlite3.Connection:
+    """Establece y devuelve una conexión a la base de datos SQLite, migrando el esquema en el primer uso."""
+    ensure_schema()
+    return _connect()
+
 def create_tables():
-    """Crea las tablas de la base de datos si no existen."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """
+    Crea/actualiza las tablas de la base de datos aplicando las migraciones pendientes.
+    Se mantiene por compatibilidad con los scripts y tests; equivale a ensure_schema().
+    """
     try:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS subsidies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                region_code TEXT NOT NULL,
-                type TEXT NOT NULL CHECK(type IN ('percentage_cost', 'fixed_amount', 'amount_per_kwp')),
-                value REAL NOT NULL,
-                max_amount_eur REAL,
-                min_kwp_required REAL DEFAULT 0,
-                max_kwp_eligible REAL,
-                conditions_text TEXT,
-                applicable_to_entity_type TEXT DEFAULT 'residential' CHECK(applicable_to_entity_type IN ('residential', 'business', 'community', 'any')),
-                source_url TEXT,
-                start_date TEXT, -- ISO 8601 YYYY-MM-DD
-                end_date TEXT,   -- ISO 8601 YYYY-MM-DD
-                is_active INTEGER NOT NULL DEFAULT 1 -- Boolean (0 or 1)
-            )
-        """)
-        # Se podrían añadir índices aquí para mejorar el rendimiento de las búsquedas
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_subsidies_region_code ON subsidies (region_code);")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_subsidies_is_active ON subsidies (is_active);")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_subsidies_type ON subsidies (type);")
-
-        conn.commit()
-        logger.info(f"Tabla 'subsidies' verificada/creada en la base de datos: {DATABASE_PATH}")
+        ensure_schema()
     except sqlite3.Error as e:
         logger.error(f"Error al crear/verificar tablas en SQLite: {e}", exc_info=True)
-    finally:
-        conn.close()
 
 # --- Funciones CRUD básicas (opcionales para el alcance inicial, pero útiles) ---
 
@@ -82,28 +94,20 @@ def execute_modification(query: str, params: tuple = ()) -> int:
         conn.commit()
         return cursor.lastrowid if cursor.lastrowid else cursor.rowcount # lastrowid para INSERT, rowcount para UPDATE/DELETE
     except sqlite3.Error as e:
+        # Deshacer explícitamente: si el traceback queda referenciado (p. ej. por un handler de logging),
+        # la transacción implícita seguiría abierta y bloquearía la base de datos para otras conexiones.
+        conn.rollback()
         logger.error(f"Error en la modificación SQLite: {query} con params {params} - {e}", exc_info=True)
         # Podríamos querer re-lanzar la excepción o devolver un valor que indique fallo, ej -1
         return -1
     finally:
         conn.close()
 
-# Llamar a create_tables() cuando este módulo se importe por primera vez
-# para asegurar que la tabla exista antes de que cualquier servicio intente usarla.
-# Esto es adecuado para una configuración simple. En aplicaciones más grandes,
-# las migraciones de bases de datos se manejan de forma más explícita (ej. con Alembic).
+# El esquema ya no se crea al importar este módulo: se migra de forma perezosa en la
+# primera conexión, en el evento de arranque de la app, o explícitamente con:
+#     python -m app.db.migrations
 if __name__ == '__main__':
-    # Esto permite ejecutar el script directamente para crear la BD/tabla
+    # Esto permite ejecutar el script directamente para crear/migrar la BD
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     logger.info("Ejecutando database.py directamente para asegurar que la base de datos y las tablas se creen.")
-    create_tables()
-    # Ejemplo de inserción (solo si se ejecuta directamente y para testing)
-    # test_insert_id = execute_modification(
-    #     "INSERT INTO subsidies (name, region_code, type, value, is_active) VALUES (?, ?, ?, ?, ?)",
-    #     ("Test Subvención Nacional", "ES", "percentage_cost", 0.15, 1)
-    # )
-    # logger.info(f"Subvención de prueba insertada con ID: {test_insert_id}")
-    # results = execute_query("SELECT * FROM subsidies WHERE region_code = ? AND is_active = ?", ("ES", 1))
-    # logger.info(f"Subvenciones de prueba encontradas: {results}")
-else:
-    # Si se importa, solo crear las tablas. No ejecutar código de prueba.
-    create_tables()
+    ensure_schema(force=True)
@@ -0,0 +1,118 @@
+import sqlite3
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Migraciones versionadas del esquema SQLite.
+# Cada entrada es (versión, descripción, sentencias). La versión aplicada se guarda en
+# PRAGMA user_version, así que cada migración se ejecuta una única vez por base de datos.
+# Las migraciones nunca se editan una vez publicadas: los cambios van en una migración nueva.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Tabla 'subsidies' e índices de búsqueda", [
+        """
+        CREATE TABLE IF NOT EXISTS subsidies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            region_code TEXT NOT NULL,
+            type TEXT NOT NULL CHECK(type IN ('percentage_cost', 'fixed_amount', 'amount_per_kwp')),
+            value REAL NOT NULL,
+            max_amount_eur REAL,
+            min_kwp_required REAL DEFAULT 0,
+            max_kwp_eligible REAL,
+            conditions_text TEXT,
+            applicable_to_entity_type TEXT DEFAULT 'residential' CHECK(applicable_to_entity_type IN ('residential', 'business', 'community', 'any')),
+            source_url TEXT,
+            start_date TEXT, -- ISO 8601 YYYY-MM-DD
+            end_date TEXT,   -- ISO 8601 YYYY-MM-DD
+            is_active INTEGER NOT NULL DEFAULT 1 -- Boolean (0 or 1)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_subsidies_region_code ON subsidies (region_code);",
+        "CREATE INDEX IF NOT EXISTS idx_subsidies_is_active ON subsidies (is_active);",
+        "CREATE INDEX IF NOT EXISTS idx_subsidies_type ON subsidies (type);",
+    ]),
+    (2, "Clave natural única (name, region_code, start_date) para la importación masiva", [
+        # start_date puede ser NULL y en SQLite los NULL no colisionan en un índice único, por eso se usa IFNULL.
+        # La expresión debe coincidir con database.SUBSIDY_NATURAL_KEY_SQL (usada en los ON CONFLICT).
+        # Antes de crear el índice se eliminan los duplicados, conservando la fila más reciente.
+        """
+        DELETE FROM subsidies WHERE id NOT IN (
+            SELECT MAX(id) FROM subsidies GROUP BY name, region_code, IFNULL(start_date, '')
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_subsidies_natural_key ON subsidies (name, region_code, IFNULL(start_date, ''));",
+    ]),
+    (3, "Tabla 'jobs': cola de análisis asíncronos (app/services/job_service.py)", [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL, -- JSON
+            priority INTEGER NOT NULL DEFAULT 0, -- Mayor primero
+            status TEXT NOT NULL DEFAULT 'queued' CHECK(status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+            webhook_url TEXT,
+            result_ttl_s REAL NOT NULL,
+            created_at REAL NOT NULL, -- Epoch (s)
+            started_at REAL,
+            finished_at REAL,
+            expires_at REAL, -- finished_at + result_ttl_s
+            worker TEXT,
+            result TEXT, -- JSON
+            error TEXT
+        )
+        """,
+        # Orden de extracción de la cola: estado, prioridad descendente y antigüedad
+        "CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, created_at);",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs (expires_at);",
+    ]),
+    (4, "Concesión (lease) de los trabajos en curso: latido del worker e intentos", [
+        # El worker renueva heartbeat_at mientras ejecuta el trabajo; si deja de hacerlo (caída,
+        # terminate()), job_service.reap_stale_jobs lo devuelve a la cola o lo marca como fallido.
+        "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL;", # Epoch (s)
+        "ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0;",
+    ]),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Devuelve la versión de esquema aplicada a la base de datos (0 si nunca se ha migrado)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Aplica las migraciones pendientes y devuelve la versión final del esquema.
+
+    Cada migración se ejecuta en su propia transacción (BEGIN IMMEDIATE), que toma el
+    bloqueo de escritura antes de volver a comprobar la versión. Así, si varios procesos
+    (p. ej. workers de gunicorn) arrancan a la vez, solo uno aplica cada migración.
+    """
+    for version, description, statements in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version: # Otro proceso la aplicó mientras esperábamos el bloqueo
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            logger.info(f"Migración {version} aplicada: {description}")
+        except sqlite3.Error:
+            conn.rollback()
+            logger.error(f"Error aplicando la migración {version} ({description}).", exc_info=True)
+            raise
+    return get_schema_version(conn)
+
+
+if __name__ == '__main__':
+    # Paso explícito de migración (desde backend/): python -m app.db.migrations
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from app.db import database
+    final_version = database.ensure_schema(force=True)
+    logger.info(f"Base de datos {database.DATABASE_PATH} en la versión de esquema {final_version}.")
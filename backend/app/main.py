@@ -4,7 +4,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 # Import routers
-from app.routers import location, consumption # Added consumption router
+from app.routers import location, consumption, layout, production, battery, tariffs, metrics, jobs # Added consumption router
+from app.db import database
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.responses import DefaultJSONResponse
+from app.services import job_service, portfolio_service, profiling_service
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,7 +21,9 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="HotSpot360 Solar Calculator API",
     description="API para la calculadora solar de HotSpot360, parte del proyecto Lovable.",
-    version="0.1.0"
+    version="0.1.0",
+    # orjson (si está instalado) para todas las respuestas JSON; ver app/responses.py
+    default_response_class=DefaultJSONResponse
 )
 
 # CORS (Cross-Origin Resource Sharing)
@@ -39,16 +46,50 @@ app.add_middleware(
     allow_headers=["*"], # Permite todos los headers
 )
 
+# Compresión de respuestas (gzip; brotli/zstd si están instalados) negociada con Accept-Encoding.
+# Se registra antes que MetricsMiddleware para que la latencia medida incluya la compresión.
+app.add_middleware(CompressionMiddleware)
+
+# Métricas de latencia por ruta (expuestas en /metrics en formato Prometheus)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(location.router, prefix="/location", tags=["Location Analysis"])
 app.include_router(consumption.router, prefix="/consumption", tags=["Consumption Prediction"])
+app.include_router(layout.router, prefix="/layout", tags=["Panel Layout"])
+app.include_router(production.router, prefix="/production", tags=["PV Production"])
+app.include_router(battery.router, prefix="/battery", tags=["Battery Storage"])
+app.include_router(tariffs.router, prefix="/tariffs", tags=["Tariffs"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+app.include_router(metrics.router, tags=["Monitoring"])
+
+# Perfilado bajo demanda (cabecera X-Profile + X-Admin-Token): solo si hay un token de administración
+# configurado. Sin él no se registra nada, así que no añade ningún coste a las peticiones.
+if profiling_service.PROFILING_ADMIN_TOKEN:
+    from app.middleware.profiling import ProfilingMiddleware
+    from app.routers import admin
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(admin.router, prefix="/admin", tags=["Admin"])
+
+@app.on_event("startup")
+def init_database():
+    # El esquema de la BD ya no se crea al importar app.db.database: se verifica aquí,
+    # una vez por proceso/worker. Si ya está en la última versión solo cuesta leer PRAGMA user_version.
+    database.ensure_schema()
+
+@app.on_event("shutdown")
+def stop_worker_processes():
+    # Los workers de la cola de trabajos se arrancan con el primer trabajo (ver job_service.ensure_worker_pool)
+    # y los del análisis de carteras con la primera cartera (ver portfolio_service.get_process_pool)
+    job_service.stop_worker_pool()
+    portfolio_service.shutdown_process_pool()
 
 @app.get("/", tags=["Root"])
 async def read_root():
     logger.info("Root endpoint was called.")
     return {"message": "Welcome to the HotSpot360 Solar Calculator API!"}
 
-# Aquí se podrían añadir más configuraciones globales, como event handlers para startup/shutdown, etc.
+# Aquí se podrían añadir más configuraciones globales, como más event handlers para startup/shutdown, etc.
 
 # Para correr la aplicación (desde el directorio backend/):
 # uvicorn app.main:app --reload --port 8000
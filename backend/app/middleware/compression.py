@@ -0,0 +1,189 @@
+import logging
+import os
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli # Optional: pip install brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard # Optional: pip install zstandard
+except ImportError:
+    zstandard = None
+
+
+class CompressionSettings(NamedTuple):
+    """Compression parameters for a route prefix (levels trade CPU for bytes on the wire)."""
+    enabled: bool = True
+    minimum_size: int = 1024 # Bytes; smaller bodies are sent as-is (headers would eat the savings)
+    gzip_level: int = 6 # 1-9
+    brotli_quality: int = 4 # 0-11; above ~6 brotli gets much slower for dynamic responses
+    zstd_level: int = 3 # 1-22
+
+
+def _settings_from_env() -> CompressionSettings:
+    return CompressionSettings(
+        enabled=os.getenv("COMPRESSION_ENABLED", "1").lower() in ("1", "true", "yes"),
+        minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+        gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+        brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+        zstd_level=int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3")),
+    )
+
+
+DEFAULT_SETTINGS = _settings_from_env()
+# Server preference among the encodings the client accepts (and that are installed).
+ENCODING_PREFERENCE = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+# Per-route overrides (longest matching path prefix wins). The consumption responses are ~60 KB of
+# short float literals ("0.2556,"): a measured profile compresses ~3x with gzip and a synthetic one
+# ~50x. Above level 4 gzip barely helps on this data (level 6: -3 % bytes for 4x the CPU, ~4 ms;
+# see benchmarks/bench_compression.py), so those routes use level 4 (~1 ms).
+ROUTE_SETTINGS: Dict[str, CompressionSettings] = {
+    "/consumption/": DEFAULT_SETTINGS._replace(gzip_level=int(os.getenv("COMPRESSION_CONSUMPTION_GZIP_LEVEL", "4"))),
+    "/admin/profiles/": DEFAULT_SETTINGS._replace(enabled=False), # Profile downloads: rare and mostly binary
+}
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/plain", "text/html", "text/csv")
+
+
+def available_encodings() -> List[str]:
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [encoding for encoding in ENCODING_PREFERENCE if installed.get(encoding)]
+
+
+def select_encoding(accept_encoding: Optional[str], encodings: List[str]) -> Optional[str]:
+    """Picks the first of `encodings` (server preference order) accepted with q > 0 by the client."""
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    """Incremental compressor: compress() returns the bytes available so far (flushed for streaming)."""
+
+    def __init__(self, encoding: str, settings: CompressionSettings):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._c = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "br":
+            self._c = brotli.Compressor(mode=brotli.MODE_TEXT, quality=settings.brotli_quality)
+        else:
+            self._c = zstandard.ZstdCompressor(level=settings.zstd_level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "gzip":
+            return self._c.compress(data) + self._c.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._c.process(data) + (self._c.finish() if final else self._c.flush())
+        return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI response compression (gzip always; brotli and zstd when installed), negotiated with
+    Accept-Encoding. Only compressible content types at least `minimum_size` bytes long are
+    compressed; settings can be overridden per route prefix (ROUTE_SETTINGS). Streaming
+    responses (e.g. NDJSON) are compressed chunk by chunk with a flush after each chunk, so
+    clients still receive every chunk immediately; Server-Sent Events are never compressed.
+    """
+
+    def __init__(self, app, default_settings: CompressionSettings = DEFAULT_SETTINGS,
+                 route_settings: Optional[Dict[str, CompressionSettings]] = None, encodings: Optional[List[str]] = None):
+        self.app = app
+        self.default_settings = default_settings
+        self.route_settings = sorted((route_settings if route_settings is not None else ROUTE_SETTINGS).items(),
+                                     key=lambda item: len(item[0]), reverse=True)
+        self.encodings = encodings if encodings is not None else available_encodings()
+
+    def settings_for(self, path: str) -> CompressionSettings:
+        for prefix, settings in self.route_settings:
+            if path.startswith(prefix):
+                return settings
+        return self.default_settings
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        settings = self.settings_for(scope["path"])
+        encoding = select_encoding(_header(scope.get("headers", []), b"accept-encoding"), self.encodings) if settings.enabled else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message # Deferred until the first body chunk tells us the size
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = list(start_message.get("headers", []))
+                content_type = (_header(headers, b"content-type") or "").split(";")[0].strip().lower()
+                eligible = (
+                    content_type in COMPRESSIBLE_TYPES
+                    and _header(headers, b"content-encoding") is None
+                    and (more_body or len(body) >= settings.minimum_size)
+                )
+                if not eligible:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, settings)
+                headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"etag")]
+                etag = _header(start_message.get("headers", []), b"etag")
+                if etag:
+                    # The compressed body is a different representation: strong ETags become weak.
+                    headers.append((b"etag", (etag if etag.startswith("W/") else f"W/{etag}").encode("latin-1")))
+                headers.append((b"content-encoding", encoding.encode("ascii")))
+                vary = _header(headers, b"vary")
+                if vary is None:
+                    headers.append((b"vary", b"Accept-Encoding"))
+                elif "accept-encoding" not in vary.lower():
+                    headers = [(k, v) for k, v in headers if k.lower() != b"vary"] + [(b"vary", f"{vary}, Accept-Encoding".encode("latin-1"))]
+                compressed = compressor.compress(body, final=not more_body)
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode("ascii")))
+                await send(dict(start_message, headers=headers))
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+
+            await send({"type": "http.response.body", "body": compressor.compress(body, final=not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+        if start_message is not None and compressor is None and not passthrough:
+            await send(start_message) # Response without a body message (should not happen with Starlette)
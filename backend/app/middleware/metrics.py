@@ -0,0 +1,53 @@
+import time
+from typing import Callable, Dict
+
+from app.services import metrics_service
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware overhead) that records the latency and status
+    of every HTTP request, labelled by the route template (e.g. "/location/analyze") rather
+    than the raw path, so that the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[Callable, str] = {}
+
+    def _route_label(self, scope) -> str:
+        # The router stores the matched endpoint in the (shared) scope while dispatching.
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            else:
+                path = "unmatched"
+            self._route_paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500 # If the app raises before sending a response
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route_label(scope)
+            metrics_service.HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method=scope["method"], route=route)
+            metrics_service.HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status_code)
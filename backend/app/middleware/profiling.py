@@ -0,0 +1,101 @@
+import json
+import logging
+import time
+from urllib.parse import parse_qs
+
+from app.services import profiling_service
+
+logger = logging.getLogger(__name__)
+
+
+def _header(scope, name: bytes):
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request profiling. A request to one of profiling_service.PROFILED_PATHS with
+    `X-Profile: sample|cprofile` (or `?profile=...`) and a valid `X-Admin-Token` runs under
+    the requested profiler; the response carries an `X-Profile-Id` header to retrieve the
+    profile from GET /admin/profiles/{id}.
+
+    Profiled requests are serialized (409 while another one is running in the worker), and
+    `cprofile` is rejected on routes that do their work in the threadpool (use `sample` there).
+
+    Only registered when PROFILING_ADMIN_TOKEN is configured (see app.main). Requests without
+    the flag only pay a path lookup and a header scan.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in profiling_service.PROFILED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        requested = _header(scope, b"x-profile")
+        if requested is None:
+            requested = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [None])[0]
+        try:
+            mode = profiling_service.parse_profile_mode(requested)
+        except ValueError as e:
+            await self._reject(send, 400, str(e))
+            return
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        if not profiling_service.is_admin_token(_header(scope, b"x-admin-token")):
+            await self._reject(send, 403, "Profiling requires a valid X-Admin-Token.")
+            return
+        if mode == "cprofile" and scope["path"] not in profiling_service.CPROFILE_PATHS:
+            await self._reject(send, 400, f"cprofile only profiles the event-loop thread, and {scope['path']} runs its work "
+                                          "in the threadpool. Use X-Profile: sample instead.")
+            return
+        if not profiling_service.try_begin_profiling():
+            await self._reject(send, 409, "Another profiled request is running; retry when it finishes.")
+            return
+        try:
+            await self._profile(scope, receive, send, mode)
+        finally:
+            profiling_service.end_profiling()
+
+    async def _profile(self, scope, receive, send, mode: str) -> None:
+        profile_id = profiling_service.new_profile_id()
+        started = time.perf_counter()
+        profiler = profiling_service.start_profiler(mode)
+        status_code = 500
+        saved = False
+
+        def save():
+            nonlocal saved
+            saved = True
+            profiling_service.save_profile(profile_id, mode, profiler.stop(), {
+                "method": scope["method"], "path": scope["path"], "status": status_code,
+                "duration_s": round(time.perf_counter() - started, 6),
+            })
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode("ascii"))])
+            elif message["type"] == "http.response.body" and not message.get("more_body", False) and not saved:
+                save() # Stored before the last byte is sent, so the id is retrievable as soon as the client has it
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not saved:
+                save()
+
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({"type": "http.response.start", "status": status_code,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,54 @@
+import json
+from typing import Any, Dict
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError: # Optional: without orjson responses fall back to the standard json module
+    orjson = None
+
+# Respuestas JSON rápidas.
+# FastAPI, con response_model, vuelve a validar el objeto devuelto por el endpoint y lo pasa por
+# jsonable_encoder antes de json.dumps: para ConsumptionOutput eso recorre las 8760 horas dos veces
+# más (~20 ms por petición). Los modelos que construyen los servicios ya están validados, así que
+# los endpoints devuelven ModelResponse(modelo): FastAPI no toca un objeto Response y aquí se
+# serializa directamente con orjson (response_model se mantiene solo para la documentación OpenAPI).
+#
+# Precisión de los floats: ni orjson ni json admiten un número fijo de decimales; ambos escriben la
+# representación más corta que recupera el valor exacto. Por eso los servicios redondean los
+# valores a la precisión que realmente producen (p. ej. 4 decimales en los perfiles horarios) y
+# la respuesta no lleva dígitos de más.
+
+
+def _model_to_dict(model: BaseModel) -> Dict[str, Any]:
+    """Campos de un modelo por alias, sin copiar listas (a diferencia de model.dict()); orjson recorre el resto."""
+    return {field.alias: getattr(model, name) for name, field in model.__fields__.items()}
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return _model_to_dict(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+
+    def dumps(content: Any) -> bytes:
+        """Serializa a JSON compacto (UTF-8); admite modelos pydantic (por alias) y arrays de NumPy."""
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+else:
+    DefaultJSONResponse = JSONResponse
+
+    def dumps(content: Any) -> bytes:
+        """Serializa a JSON compacto (UTF-8); admite modelos pydantic (por alias)."""
+        return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class ModelResponse(JSONResponse):
+    """Respuesta JSON de un modelo pydantic ya validado, sin la segunda validación de response_model."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
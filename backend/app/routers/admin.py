@@ -0,0 +1,44 @@
+import logging
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+
+from app.services import profiling_service
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None, description="Admin token (PROFILING_ADMIN_TOKEN).")):
+    if not profiling_service.is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="A valid X-Admin-Token is required.")
+
+
+@router.get(
+    "/profiles",
+    summary="List Stored Request Profiles",
+    description="Metadata of the stored per-request profiles, newest first.",
+    dependencies=[Depends(require_admin_token)]
+)
+async def list_profiles() -> List[Dict[str, Any]]:
+    return profiling_service.list_profiles()
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    summary="Download a Request Profile",
+    description=(
+        "Returns a profile recorded with the `X-Profile` header: collapsed stacks (text, for "
+        "flamegraph.pl or speedscope) for the sampling profiler, or a pstats file for cProfile."
+    ),
+    dependencies=[Depends(require_admin_token)]
+)
+async def get_profile(profile_id: str):
+    try:
+        profile = profiling_service.get_profile(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found.")
+    metadata, content = profile
+    return Response(content=content, media_type=metadata["media_type"],
+                    headers={"Content-Disposition": f'attachment; filename="{metadata["file"]}"'})
@@ -0,0 +1,62 @@
+import logging
+from fastapi import APIRouter, HTTPException, Body
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.battery import BatterySimulationInput, BatterySimulationOutput, BatteryResultOutput
+from app.services import battery_service
+from app.responses import ModelResponse
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _simulate(input_data: BatterySimulationInput) -> BatterySimulationOutput:
+    simulation = battery_service.simulate_battery(
+        input_data.production_kwh,
+        input_data.consumption_kwh,
+        input_data.capacities_kwh,
+        power_kw=input_data.power_kw,
+        round_trip_efficiency=input_data.round_trip_efficiency,
+        min_soc=input_data.min_soc,
+        import_price_eur_kwh=input_data.import_price_eur_kwh,
+        export_price_eur_kwh=input_data.export_price_eur_kwh,
+        tariff=input_data.tariff,
+        contracted_power_kw=input_data.contracted_power_kw,
+        include_hourly=input_data.include_hourly,
+    )
+    recommended = None
+    if input_data.battery_cost_eur_kwh is not None:
+        recommended = battery_service.best_size(simulation, input_data.battery_cost_eur_kwh)
+    return BatterySimulationOutput(
+        baseline=BatteryResultOutput(**simulation.baseline._asdict()),
+        results=[BatteryResultOutput(**r._asdict()) for r in simulation.results],
+        recommended=recommended,
+        kernel=simulation.kernel,
+        soc_kwh=simulation.soc_kwh[0].round(4).tolist() if simulation.soc_kwh is not None else None,
+        battery_flow_kwh=simulation.battery_flow_kwh[0].round(4).tolist() if simulation.battery_flow_kwh is not None else None,
+    )
+
+
+@router.post(
+    "/simulate",
+    response_model=BatterySimulationOutput,
+    summary="Simulate Battery Storage",
+    description=(
+        "Simulates a year of hourly battery dispatch for self-consumption (surplus PV charges the battery, "
+        "the battery covers the deficit) for one or many battery sizes at once, and returns the energy "
+        "balance, self-consumption and autarky rates and savings of each size against the PV-only baseline."
+    )
+)
+async def simulate_battery(
+    input_data: BatterySimulationInput = Body(..., description="Hourly production and consumption, and the battery sizes to evaluate.")
+):
+    logger.info(f"Received battery simulation request for {len(input_data.capacities_kwh)} sizes over {len(input_data.production_kwh)} hours.")
+    try:
+        # CPU-bound (a pass over the year): in the threadpool, not on the event loop
+        result = await run_in_threadpool(_simulate, input_data)
+        return ModelResponse(result)
+    except ValueError as ve:
+        logger.error(f"Validation error during battery simulation: {ve}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Unexpected error during battery simulation: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected error occurred during the battery simulation.")
@@ -1,8 +1,11 @@
 import logging
-from fastapi import APIRouter, HTTPException, File, UploadFile, Body
+from typing import Optional
+from fastapi import APIRouter, HTTPException, File, UploadFile, Body, Query
+from fastapi.concurrency import run_in_threadpool
 from app.schemas.consumption import ConsumptionManualInput, ConsumptionOutput
 # Import the service when it's created
-from app.services import consumption_service
+from app.services import consumption_service, profile_library
+from app.responses import ModelResponse
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -41,9 +44,10 @@ async def predict_consumption_manual(
 
     try:
         logger.info("Calling consumption service for manual prediction...")
-        result = consumption_service.predict_consumption_manual(input_data)
+        # In the threadpool: with a location and a heat pump, the service queries PVGIS for the temperatures
+        result = await run_in_threadpool(consumption_service.predict_consumption_manual, input_data)
         logger.info("Successfully predicted consumption from manual input.")
-        return result
+        return ModelResponse(result) # Already validated by the service: skip response_model re-validation
     except ValueError as ve: # Catch specific errors from the service if any are defined
         logger.error(f"Validation error during manual prediction: {ve}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(ve))
@@ -52,6 +56,16 @@ async def predict_consumption_manual(
         raise HTTPException(status_code=500, detail="An unexpected error occurred during manual consumption prediction.")
 
 
+@router.get(
+    "/profiles",
+    summary="List Typical-Year Load Profiles",
+    description="Curves of the profile library that `load_profile` of the manual prediction can select, with the default one."
+)
+async def list_load_profiles():
+    library = profile_library.get_library()
+    return {"default": profile_library.DEFAULT_PROFILE, "year": library.year, "profiles": library.describe()}
+
+
 @router.post(
     "/predict/csv",
     response_model=ConsumptionOutput,
@@ -60,7 +74,10 @@ async def predict_consumption_manual(
         "Processes an uploaded CSV file containing 8760 hourly consumption values (kWh) "
         "to generate a detailed consumption profile (annual, monthly, hourly, peak).\n\n"
         "**CSV File Format Requirements:**\n"
-        "- Exactly 8760 rows of numerical data (one for each hour of a standard year).\n"
+        "- Exactly 8760 rows of numerical data (one for each hour of a standard year), or 8784 for a leap year. "
+        "Hours are local time: the DST change days have 23 and 25 rows. Pass `year` to use that year's calendar.\n"
+        "- Quarter-hourly files (35040 or 35136 rows of kWh) are summed into hours; the peak is then the highest quarter-hour average power.\n"
+        "- For a leap year, annual and monthly totals include February 29th but the hourly profile (a typical year) does not.\n"
         "- Each value should represent consumption in kWh for that hour.\n"
         "- Expected: A single column of data. If multiple columns are present, the first numeric one will be used.\n"
         "- No header row is strictly expected by the parser, but it should tolerate one if present and numeric parsing still works.\n"
@@ -69,7 +86,8 @@ async def predict_consumption_manual(
     )
 )
 async def predict_consumption_csv(
-    file: UploadFile = File(..., description="CSV file with 8760 hourly consumption values (kWh).")
+    file: UploadFile = File(..., description="CSV file with 8760 hourly consumption values (kWh), or 8784 for a leap year."),
+    year: Optional[int] = Query(None, ge=1900, le=2100, description="Optional. Year of the data (by default a recent year with as many hours).")
 ):
     """
     Takes a CSV file with 8760 hourly consumption values, validates its format and content,
@@ -92,9 +110,9 @@ async def predict_consumption_csv(
         logger.info(f"Calling consumption service for CSV prediction: {file.filename}")
         # The file object from FastAPI (UploadFile) is passed directly to the service.
         # The service is responsible for reading and processing it.
-        result = await consumption_service.predict_consumption_csv(file) # Now async
+        result = await consumption_service.predict_consumption_csv(file, year=year) # Now async
         logger.info(f"Successfully predicted consumption from CSV: {file.filename}")
-        return result
+        return ModelResponse(result) # Already validated by the service: skip response_model re-validation
     except ValueError as ve: # Catch specific validation errors from the service
         logger.error(f"CSV processing validation error for {file.filename}: {ve}", exc_info=True) # Log full traceback for our debugging
         raise HTTPException(status_code=400, detail=str(ve)) # User sees clean message
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Body, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from app.schemas.battery import BatterySimulationInput
+from app.schemas.consumption import ConsumptionManualInput
+from app.schemas.job import JobCreate, JobStatus
+from app.schemas.layout import LayoutInput
+from app.schemas.location import LocationAnalyzeInput
+from app.schemas.production import ProductionSimulateInput
+from app.services import job_service
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Input schema of each job kind: the params are validated when the job is submitted, not when it runs.
+PARAMS_SCHEMAS = {
+    "location_analysis": LocationAnalyzeInput,
+    "consumption_manual": ConsumptionManualInput,
+    "production_simulate": ProductionSimulateInput,
+    "layout_pack": LayoutInput,
+    "battery_simulate": BatterySimulationInput,
+}
+EVENTS_POLL_INTERVAL_S = 0.5
+EVENTS_KEEPALIVE_S = 15.0
+
+
+def _get_job_or_404(job: Optional[dict]) -> JobStatus:
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (or its result has expired).")
+    return JobStatus(**job)
+
+
+@router.post(
+    "",
+    response_model=JobStatus,
+    status_code=202,
+    summary="Submit an Analysis Job",
+    description=(
+        "Queues an analysis to run in the background and returns the job (status `queued`) right away.\n\n"
+        "Poll `GET /jobs/{id}` or follow `GET /jobs/{id}/events` (Server-Sent Events) to get the result, "
+        "which is the body the synchronous route would have returned."
+    )
+)
+async def submit_job(response: Response, job_input: JobCreate = Body(...)):
+    try:
+        params = PARAMS_SCHEMAS[job_input.kind](**job_input.params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=[dict(err, loc=["body", "params"] + list(err["loc"])) for err in e.errors()])
+    job = await run_in_threadpool(
+        job_service.submit_job, job_input.kind, params.dict(), job_input.priority, job_input.result_ttl_s,
+    )
+    await run_in_threadpool(job_service.ensure_worker_pool)
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return JobStatus(**job)
+
+
+@router.get("/{job_id}", response_model=JobStatus, summary="Get a Job and its Result")
+async def get_job(job_id: str):
+    return _get_job_or_404(await run_in_threadpool(job_service.get_job, job_id))
+
+
+@router.delete(
+    "/{job_id}",
+    response_model=JobStatus,
+    summary="Cancel a Job",
+    description="Cancels a queued job, or discards the result of a running one. Finished jobs are returned unchanged."
+)
+async def cancel_job(job_id: str):
+    return _get_job_or_404(await run_in_threadpool(job_service.cancel_job, job_id))
+
+
+@router.get(
+    "/{job_id}/events",
+    summary="Follow a Job (Server-Sent Events)",
+    description=(
+        "Streams a `status` event with the job every time its status changes, ending with the finished job "
+        "(including its result). A comment line is sent every 15 s while nothing changes."
+    )
+)
+async def job_events(job_id: str):
+    first = _get_job_or_404(await run_in_threadpool(job_service.get_job, job_id))
+
+    async def events():
+        job, last_status, last_sent = first, None, time.monotonic()
+        while True:
+            if job.status != last_status:
+                yield f"event: status\ndata: {job.json()}\n\n"
+                last_status, last_sent = job.status, time.monotonic()
+                if job.status in job_service.FINAL_STATUSES:
+                    return
+            elif time.monotonic() - last_sent >= EVENTS_KEEPALIVE_S:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(EVENTS_POLL_INTERVAL_S)
+            current = await run_in_threadpool(job_service.get_job, job_id)
+            if current is None: # Purged meanwhile
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job not found (or its result has expired).'})}\n\n"
+                return
+            job = JobStatus(**current)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,68 @@
+import logging
+from fastapi import APIRouter, HTTPException, Body
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.layout import LayoutInput, LayoutOutput, SectionLayoutOutput
+from app.services import layout_service
+from app.responses import ModelResponse
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _pack(input_data: LayoutInput) -> LayoutOutput:
+    sections, origins = [], []
+    for section in input_data.sections:
+        origin = None
+        if section.polygon_latlon is not None:
+            polygon, origin = layout_service.to_local_metres(section.polygon_latlon)
+        elif section.polygon_m is not None:
+            polygon = section.polygon_m
+        else:
+            polygon = layout_service.square_polygon(section.area)
+        sections.append({"polygon_m": polygon, "tilt": section.tilt, "azimuth": section.azimuth})
+        origins.append(origin)
+
+    layout = layout_service.layout_roof(sections, module_id=input_data.module_id, orientation=input_data.orientation,
+                                        setback_m=input_data.setback_m, gap_m=input_data.gap_m, row_gap_m=input_data.row_gap_m)
+    outputs = []
+    for section, origin in zip(layout.sections, origins):
+        centers = None
+        if input_data.include_coordinates:
+            # Back to the frame of the input polygon: lat/lon to 1e-7 degrees (~1 cm), metres to mm
+            centers = (layout_service.from_local_metres(section.centers, origin).round(7) if origin is not None
+                       else section.centers.round(3)).tolist()
+        outputs.append(SectionLayoutOutput(
+            panels=section.panels,
+            kwp=round(section.panels * layout.module_power_w / 1000, 3),
+            orientation=section.orientation,
+            rows=section.rows,
+            usable_area_m2=section.usable_area_m2,
+            centers=centers,
+        ))
+    return LayoutOutput(module_id=layout.module_id, panels=layout.panels, kwp=layout.kwp, sections=outputs)
+
+
+@router.post(
+    "/pack",
+    response_model=LayoutOutput,
+    summary="Lay Out PV Modules on Roof Sections",
+    description=(
+        "Packs rectangular catalog modules into each roof section polygon, keeping a fire setback along "
+        "the edges, in portrait or landscape rows across the slope, and returns the number of modules, "
+        "the kWp and the center of every module."
+    )
+)
+async def pack_modules(
+    input_data: LayoutInput = Body(..., description="Roof sections and module.")
+):
+    logger.info(f"Received layout request for {len(input_data.sections)} roof sections.")
+    try:
+        # CPU-bound (rasterization of every section): in the threadpool, not on the event loop
+        result = await run_in_threadpool(_pack, input_data)
+        return ModelResponse(result)
+    except ValueError as ve:
+        logger.error(f"Validation error during layout: {ve}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Unexpected error during layout: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected error occurred during the panel layout.")
@@ -1,14 +1,29 @@
+import itertools
 import logging
-from fastapi import APIRouter, HTTPException, Body
-from app.schemas.location import LocationAnalyzeInput, LocationAnalyzeOutput, RoofSection
-from app.services import overpass_service, pvgis_service, geometry_service
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Body, File, Header, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from app.schemas.location import LocationAnalyzeInput, LocationAnalyzeOutput
+from app.services import location_service, portfolio_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 7232, section 3.2)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
 @router.post(
     "/analyze",
     response_model=LocationAnalyzeOutput,
+    responses={304: {"description": "Not Modified: the `If-None-Match` ETag matches the current analysis."}},
     summary="Analyze Location for Solar Potential",
     description=(
         "Analyzes a given geographic location (latitude and longitude) to determine its solar energy potential.\n\n"
@@ -20,7 +35,8 @@ logger = logging.getLogger(__name__)
     )
 )
 async def analyze_location(
-    input_data: LocationAnalyzeInput = Body(..., description="Latitude and longitude of the location to analyze.")
+    input_data: LocationAnalyzeInput = Body(..., description="Latitude and longitude of the location to analyze."),
+    if_none_match: Optional[str] = Header(None, description="ETag of a previous response; answered with 304 if unchanged.")
 ):
     """
     Detailed endpoint behavior:
@@ -44,99 +60,92 @@ async def analyze_location(
         *(Currently uses mock total area and returns a mock kWp estimation)*
     6.  **Format Output**: Compiles all gathered and calculated data into the
         `LocationAnalyzeOutput` schema.
+
+    The pipeline lives in `location_service.run_location_pipeline`. Concurrent requests for the
+    same (quantized) coordinates are coalesced: only the first one runs the pipeline and the
+    rest await its result (`location_service.analyze_location`). The blocking upstream calls
+    run in the threadpool and are coalesced the same way.
+
+    The serialized result is cached per (quantized) location for `LOCATION_RESPONSE_CACHE_TTL_S`
+    seconds and returned with a strong `ETag` and `Cache-Control`. A request whose `If-None-Match`
+    matches the cached ETag gets a `304 Not Modified` without recomputing or re-sending the body.
     """
     logger.info(f"Received request to analyze location: lat={input_data.lat}, lng={input_data.lng}")
-
-    # 1. Fetch Geospatial Data (Overpass)
     try:
-        logger.info("Calling Overpass service...")
-        overpass_data = overpass_service.get_building_and_obstacle_data(
-            lat=input_data.lat, lng=input_data.lng
-        )
-        if not overpass_data or not overpass_data.get("elements"):
-            logger.warning(f"No elements found from Overpass service for lat={input_data.lat}, lng={input_data.lng}")
-            # Depending on strictness, could raise 404 here or proceed with defaults/empty results
-            # For now, geometry_service mock might handle empty elements.
-    except Exception as e:
-        logger.error(f"Error calling Overpass service: {e}", exc_info=True)
-        raise HTTPException(status_code=503, detail=f"Error contacting Overpass service: {e}")
+        analysis = await location_service.get_analysis_response(lat=input_data.lat, lng=input_data.lng)
+    except location_service.UpstreamServiceError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except location_service.LocationAnalysisError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    # 2. Analyze Roof Geometry
-    try:
-        logger.info("Calling Geometry service for roof analysis...")
-        total_roof_area, roof_sections_data, obstacles = geometry_service.analyze_roof_from_overpass_data(
-            overpass_elements=overpass_data.get("elements", []),
-            target_lat=input_data.lat,
-            target_lng=input_data.lng
-        )
-        # Ensure roof_sections_data are instances of RoofSection if not already
-        # The mock service currently returns them correctly.
-        # If roof_sections_data was a list of dicts:
-        # roof_sections = [RoofSection(**section_data) for section_data in roof_sections_data]
-        roof_sections = roof_sections_data
-    except Exception as e:
-        logger.error(f"Error during roof geometry analysis: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error analyzing roof geometry: {e}")
+    headers = {
+        "ETag": analysis.etag,
+        "Cache-Control": f"private, max-age={int(location_service.LOCATION_RESPONSE_CACHE_TTL_S)}",
+    }
+    if _etag_matches(if_none_match, analysis.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=analysis.body, media_type="application/json", headers=headers)
 
-    # 3. Get PVGIS Data (primarily for optimal tilt, though mock geometry_service might not use it yet)
-    optimal_tilt_from_pvgis = 30.0 # Default
-    try:
-        logger.info("Calling PVGIS service...")
-        pvgis_data = pvgis_service.get_pvgis_data(lat=input_data.lat, lng=input_data.lng, optimal_inclination=True)
-        if pvgis_data and "inputs" in pvgis_data:
-            # Path to optimal tilt might vary based on PVGIS response structure for "optimalinclination=1"
-            # Example path: data['inputs']['mounting_system']['fixed']['slope']['value']
-            optimal_tilt_from_pvgis = pvgis_data.get("inputs", {}).get("mounting_system", {}).get("fixed", {}).get("slope", {}).get("value", 30.0)
-            logger.info(f"Optimal tilt from PVGIS (mock): {optimal_tilt_from_pvgis}")
-        else:
-            logger.warning("Could not retrieve optimal tilt from PVGIS mock data, using default.")
-    except Exception as e:
-        logger.error(f"Error calling PVGIS service: {e}", exc_info=True)
-        # Non-critical for now, can proceed with default tilt. In production, might be a 503.
-        pass
 
+@router.get(
+    "/analyze/stream",
+    summary="Analyze Location, Streaming Partial Results",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}, "description": "One Server-Sent Event per pipeline stage."}},
+    description=(
+        "Same analysis as `POST /location/analyze`, streamed as Server-Sent Events (usable with `EventSource`) "
+        "so the UI can render each part as soon as it is known. Events, in order:\n\n"
+        "- `building`: footprint of the target building (`found`, `geometry`, `tags`).\n"
+        "- `roof`: `roofAreaTotal`, `roofSections` and the number of `obstacles`.\n"
+        "- `pvgis`: `optimalTilt`.\n"
+        "- `shading`: `shadingFactorMonthly`, `shadingFactorAnnual`.\n"
+        "- `max_kwp`: `maxKwp`.\n"
+        "- `result`: the complete `/location/analyze` body (the only event when the analysis is cached).\n\n"
+        "If a step fails the stream ends with an `error` event: `{\"status\": 503|500, \"detail\": ...}`."
+    )
+)
+async def analyze_location_stream(
+    lat: float = Query(..., description="Latitude of the location to analyze."),
+    lng: float = Query(..., description="Longitude of the location to analyze."),
+):
+    async def events():
+        async for name, data in location_service.stream_analysis(lat=lat, lng=lng):
+            yield b"event: " + name.encode("ascii") + b"\ndata: " + data + b"\n\n"
 
-    # 4. Calculate Shading (using geometry from step 2 and obstacles)
-    # The mock geometry_service.calculate_shading_factors currently doesn't use target_building_geometry
-    # or optimal_tilt_from_pvgis extensively, but they are passed for future compatibility.
-    # A mock target_building_geometry would be derived from overpass_data within analyze_roof_from_overpass_data
-    mock_target_building_geometry = next((el for el in overpass_data.get("elements", []) if el.get("type") == "way" and "building" in el.get("tags", {})), None)
+    # X-Accel-Buffering: keeps nginx from buffering the events
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-    try:
-        logger.info("Calling Geometry service for shading calculation...")
-        shading_monthly, shading_annual = geometry_service.calculate_shading_factors(
-            target_building_geometry=mock_target_building_geometry if mock_target_building_geometry else {}, # Pass some geometry
-            roof_sections=roof_sections,
-            obstacles_data=obstacles,
-            lat=input_data.lat
-        )
-    except Exception as e:
-        logger.error(f"Error during shading calculation: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error calculating shading: {e}")
 
-    # 5. Estimate Max kWp
+@router.post(
+    "/portfolio",
+    summary="Analyze a Portfolio of Locations",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}, "description": "Per-address results, streamed as they complete."}},
+    description=(
+        "Analyzes every address of an uploaded CSV (header row with `lat` and `lng` columns, optional `id`) "
+        "and streams the results as they complete, as NDJSON (default) or CSV.\n\n"
+        "- Addresses are grouped in tiles (`PORTFOLIO_TILE_DEG`) that share one Overpass and one PVGIS fetch; "
+        "roof geometry and shading run in a process pool.\n"
+        "- NDJSON lines are `{\"type\": \"result\", ...}` (one per address, `status` `ok` or `error`) and, "
+        "after every tile, `{\"type\": \"progress\", \"done\", \"total\", ...}`.\n"
+        "- To resume an interrupted run, upload the output received so far as `resume`: the addresses already "
+        "analyzed successfully are skipped."
+    )
+)
+def analyze_portfolio(
+    file: UploadFile = File(..., description="CSV file with the addresses (lat, lng and optionally id columns)."),
+    resume: Optional[UploadFile] = File(None, description="Optional. Output (NDJSON or CSV) of a previous interrupted run."),
+    output_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$", description="Output format: ndjson or csv."),
+):
+    # Sync endpoint (threadpool): reading the upload and parsing are blocking
     try:
-        logger.info("Calling Geometry service for max kWp estimation...")
-        max_kwp_calculated = geometry_service.estimate_max_kwp(total_roof_area=total_roof_area)
-    except Exception as e:
-        logger.error(f"Error during max kWp estimation: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error estimating max kWp: {e}")
-
-    # If total_roof_area is 0 or very small, it might indicate no suitable roof was found.
-    if total_roof_area <= 0.1 and not roof_sections: # Using 0.1 as a small threshold
-        logger.warning(f"No significant roof area found for lat={input_data.lat}, lng={input_data.lng}. Total area: {total_roof_area}")
-        # Consider returning 404 or a specific message if no roof area is found.
-        # For now, it will return an output with 0 area and 0 kWp.
-        # raise HTTPException(status_code=404, detail="No usable roof area found for the given coordinates based on mock analysis.")
-
+        points, invalid = portfolio_service.read_points(file.file.read().decode("utf-8-sig", errors="replace"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    skip = portfolio_service.completed_keys(resume.file.read().decode("utf-8", errors="replace").splitlines()) if resume else set()
+    logger.info(f"Received portfolio of {len(points) + len(invalid)} addresses ({len(skip)} already done).")
 
-    logger.info(f"Successfully analyzed location (using mock services): lat={input_data.lat}, lng={input_data.lng}")
-
-    # 6. Format Output
-    return LocationAnalyzeOutput(
-        roof_area_total=total_roof_area,
-        roof_sections=roof_sections,
-        shading_factor_monthly=shading_monthly,
-        shading_factor_annual=shading_annual,
-        max_kwp=max_kwp_calculated
-    )
+    records = itertools.chain(invalid, portfolio_service.analyze_portfolio(points, skip=skip))
+    if output_format == "csv":
+        return StreamingResponse(portfolio_service.to_csv(records), media_type="text/csv")
+    return StreamingResponse(portfolio_service.to_ndjson(records), media_type="application/x-ndjson")
@@ -0,0 +1,79 @@
+import logging
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services import cache_service, consumption_service, job_service, location_service, metrics_service, singleflight, upstream_guard
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _collect_cache_metrics():
+    """Hit/miss counters of the application caches, read from their own statistics at scrape time."""
+    caches = {
+        "upstream": cache_service.get_cache().stats(),
+        "location_response": location_service.get_response_cache_stats(),
+        "consumption_profile": consumption_service.get_profile_cache_stats(),
+    }
+    samples = {"hits": [], "misses": [], "entries": [], "ratio": []}
+    for name, stats in caches.items():
+        labels = {"cache": name}
+        lookups = stats["hits"] + stats["misses"]
+        samples["hits"].append((labels, stats["hits"]))
+        samples["misses"].append((labels, stats["misses"]))
+        samples["entries"].append((labels, stats.get("entries", stats.get("size", 0))))
+        samples["ratio"].append((labels, round(stats["hits"] / lookups, 4) if lookups else 0.0))
+    yield "cache_hits_total", "counter", "Cache lookups that found a value.", samples["hits"]
+    yield "cache_misses_total", "counter", "Cache lookups that found nothing.", samples["misses"]
+    yield "cache_entries", "gauge", "Number of entries currently stored in the cache.", samples["entries"]
+    yield "cache_hit_ratio", "gauge", "Hits / lookups since the process started.", samples["ratio"]
+
+    flights = singleflight.all_stats()
+    yield ("singleflight_executions_total", "counter", "Coalesced calls that ran the work.",
+           [({"flight": f["name"]}, f["executions"]) for f in flights])
+    yield ("singleflight_joins_total", "counter", "Calls that joined an identical call already in flight.",
+           [({"flight": f["name"]}, f["joins"]) for f in flights])
+    yield ("singleflight_in_flight", "gauge", "Distinct calls currently in flight.",
+           [({"flight": f["name"]}, f["in_flight"]) for f in flights])
+
+
+
+
+def _collect_upstream_guard_metrics():
+    """Admission control of the live upstream calls (one guard per host, see upstream_guard)."""
+    guards = upstream_guard.all_stats()
+    yield ("upstream_queue_depth", "gauge", "Calls waiting for a rate-limit token.",
+           [({"host": g["host"]}, g["queue_depth"]) for g in guards])
+    yield ("upstream_admitted_total", "counter", "Calls admitted towards the upstream.",
+           [({"host": g["host"]}, g["admitted"]) for g in guards])
+    yield ("upstream_shed_total", "counter", "Calls shed before reaching the upstream, by reason.",
+           [({"host": g["host"], "reason": reason}, count) for g in guards for reason, count in g["shed"].items()])
+    yield ("upstream_fallback_total", "counter", "Shed or failed calls answered with the last good answer (stale) or nothing (empty).",
+           [({"host": g["host"], "kind": kind}, count) for g in guards for kind, count in g["fallbacks"].items()])
+    yield ("upstream_circuit_open", "gauge", "1 while the circuit breaker is open, 0.5 half-open, 0 closed.",
+           [({"host": g["host"]}, {"open": 1, "half_open": 0.5}.get(g["circuit_state"], 0)) for g in guards])
+    yield ("upstream_circuit_opened_total", "counter", "Times the circuit breaker opened.",
+           [({"host": g["host"]}, g["circuit_opened"]) for g in guards])
+
+
+def _collect_job_metrics():
+    """Jobs of the background queue by status (one COUNT query on the jobs table per scrape)."""
+    yield ("jobs", "gauge", "Jobs in the queue by status (finished jobs are kept until their result expires).",
+           [({"status": status}, count) for status, count in job_service.queue_stats().items()])
+
+
+metrics_service.REGISTRY.register_collector(_collect_cache_metrics)
+metrics_service.REGISTRY.register_collector(_collect_upstream_guard_metrics)
+metrics_service.REGISTRY.register_collector(_collect_job_metrics)
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Prometheus Metrics",
+    description="Request latencies by route, pipeline stage timings, upstream calls and cache hit ratios, in Prometheus text format."
+)
+async def get_metrics():
+    return PlainTextResponse(metrics_service.render_latest(), media_type=PROMETHEUS_CONTENT_TYPE)
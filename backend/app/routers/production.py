@@ -0,0 +1,67 @@
+import logging
+from fastapi import APIRouter, HTTPException, Body
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.production import ProductionSimulateInput, ProductionOutput
+from app.services import hardware_catalog, production_service, pvgis_service
+from app.responses import ModelResponse
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _simulate(input_data: ProductionSimulateInput, pvgis_data: dict) -> ProductionOutput:
+    system = production_service.simulate_system(
+        pvgis_data,
+        input_data.lat,
+        input_data.kwp,
+        module_id=input_data.module_id,
+        inverter_id=input_data.inverter_id,
+        tilt=input_data.tilt,
+        azimuth=input_data.azimuth,
+        shading=input_data.shading_factor_hourly or input_data.shading_factor_monthly,
+        dc_ac_ratio=input_data.dc_ac_ratio,
+        dc_losses=input_data.dc_losses,
+    )
+    max_kwp = None
+    if input_data.roof_area_m2 is not None:
+        max_kwp = production_service.max_kwp_for_module(input_data.roof_area_m2, system.module_id)
+    fields = system._asdict()
+    hourly = fields.pop("hourly_kwh")
+    return ProductionOutput(**fields, max_kwp=max_kwp, hourly_kwh=hourly.tolist() if input_data.include_hourly else None)
+
+
+@router.get(
+    "/catalog",
+    summary="List PV Modules and Inverters",
+    description="Hardware catalog that /production/simulate accepts by id, with the specs used by the production model and list prices."
+)
+async def list_catalog():
+    return dict(hardware_catalog.get_catalog().describe(), default_module=hardware_catalog.DEFAULT_MODULE)
+
+
+@router.post(
+    "/simulate",
+    response_model=ProductionOutput,
+    summary="Simulate Hourly PV Production",
+    description=(
+        "Hourly AC production of a typical year for a system built from catalog hardware: PVGIS monthly "
+        "irradiation and temperatures spread over the hours by the sun's geometry, then shading factors, "
+        "DC losses, module temperature derating and the inverter's efficiency and clipping (DC/AC ratio)."
+    )
+)
+async def simulate_production(
+    input_data: ProductionSimulateInput = Body(..., description="Location, system size and hardware.")
+):
+    logger.info(f"Received production simulation request: lat={input_data.lat}, lng={input_data.lng}, kwp={input_data.kwp}")
+    pvgis_data = await run_in_threadpool(pvgis_service.get_pvgis_data, lat=input_data.lat, lng=input_data.lng, optimal_inclination=True)
+    if production_service.monthly_irradiation(pvgis_data) is None:
+        raise HTTPException(status_code=503, detail="PVGIS service unavailable, please retry later.")
+    try:
+        result = await run_in_threadpool(_simulate, input_data, pvgis_data)
+        return ModelResponse(result)
+    except ValueError as ve:
+        logger.error(f"Validation error during production simulation: {ve}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Unexpected error during production simulation: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected error occurred during the production simulation.")
@@ -0,0 +1,64 @@
+import logging
+from fastapi import APIRouter, HTTPException, Body
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.tariff import TariffCompareInput, TariffCompareOutput, BillOutput
+from app.services import tariff_service
+from app.responses import ModelResponse
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _compare(input_data: TariffCompareInput) -> TariffCompareOutput:
+    import numpy as np
+
+    tariffs = list(input_data.tariffs or tariff_service.BUILTIN_TARIFFS)
+    tariffs += [
+        # Tuples: compiled tariffs are cached by value
+        tariff_service.Tariff(t.name, tuple(t.energy_prices), tuple(t.power_prices), t.export_price,
+                              tuple(tuple(day) for day in t.hours), t.description)
+        for t in input_data.custom_tariffs
+    ]
+    consumption = np.asarray(input_data.consumption_kwh, dtype=np.float64)
+    grid_import, grid_export = consumption, None
+    if input_data.production_kwh is not None:
+        net = np.asarray(input_data.production_kwh, dtype=np.float64) - consumption
+        grid_import, grid_export = np.clip(-net, 0, None), np.clip(net, 0, None)
+    bills = tariff_service.compare_tariffs(grid_import, grid_export, tariffs,
+                                           contracted_power_kw=input_data.contracted_power_kw, year=input_data.year)
+    bills.sort(key=lambda b: b.total_eur)
+    return TariffCompareOutput(bills=[BillOutput(**b._asdict()) for b in bills], cheapest=bills[0].tariff)
+
+
+@router.get(
+    "",
+    summary="List Built-in Tariffs",
+    description="Time-of-use tariffs that /tariffs/compare and /battery/simulate accept by name, with their prices and hourly periods."
+)
+async def list_tariffs():
+    return {"default": tariff_service.DEFAULT_TARIFF, "tariffs": tariff_service.describe_tariffs()}
+
+
+@router.post(
+    "/compare",
+    response_model=TariffCompareOutput,
+    summary="Compare Electricity Bills Across Tariffs",
+    description=(
+        "Computes the annual bill of an hourly consumption series (optionally net of PV production, "
+        "with surplus compensation) under several time-of-use tariffs at once: energy per period, "
+        "power term, compensation capped at each month's energy term, electricity tax and VAT."
+    )
+)
+async def compare_tariffs(
+    input_data: TariffCompareInput = Body(..., description="Hourly consumption (and production) and the tariffs to compare.")
+):
+    logger.info(f"Received tariff comparison request for {len(input_data.tariffs or tariff_service.BUILTIN_TARIFFS) + len(input_data.custom_tariffs)} tariffs.")
+    try:
+        result = await run_in_threadpool(_compare, input_data)
+        return ModelResponse(result)
+    except ValueError as ve:
+        logger.error(f"Validation error during tariff comparison: {ve}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Unexpected error during tariff comparison: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected error occurred during the tariff comparison.")
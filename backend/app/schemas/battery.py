@@ -0,0 +1,65 @@
+from pydantic import BaseModel, Field, root_validator, validator
+from typing import List, Optional
+
+class BatterySimulationInput(BaseModel):
+    """
+    Schema for the input of the /battery/simulate endpoint.
+    """
+    production_kwh: List[float] = Field(..., min_items=8760, max_items=8784, description="Hourly PV production of a year in kWh (8760 values, or 8784 for a leap year).")
+    consumption_kwh: List[float] = Field(..., min_items=8760, max_items=8784, description="Hourly consumption of the same year in kWh (e.g. hourly_profile of /consumption/predict).")
+    capacities_kwh: List[float] = Field(..., min_items=1, example=[5.0, 10.0, 15.0], description="Usable battery capacities to evaluate in kWh; all of them are simulated in one pass.")
+    power_kw: Optional[float] = Field(None, gt=0, example=5.0, description="Optional. Charge/discharge power limit in kW; by default proportional to the capacity (BATTERY_DEFAULT_C_RATE).")
+    round_trip_efficiency: Optional[float] = Field(None, gt=0, le=1, example=0.9, description="Optional. Fraction of the stored energy that is recovered.")
+    min_soc: Optional[float] = Field(None, ge=0, lt=1, example=0.1, description="Optional. Fraction of the capacity that is never discharged.")
+    import_price_eur_kwh: Optional[float] = Field(None, ge=0, example=0.18, description="Optional. Price of imported energy for the savings estimate.")
+    export_price_eur_kwh: Optional[float] = Field(None, ge=0, example=0.06, description="Optional. Compensation of exported energy for the savings estimate.")
+    tariff: Optional[str] = Field(None, example="2.0TD", description="Optional. Tariff of the savings estimate (see GET /tariffs); flat prices if omitted.", max_length=64)
+    contracted_power_kw: Optional[List[float]] = Field(None, min_items=1, max_items=6, example=[4.6], description="Optional. Contracted power of the tariff, one value or one per power period.")
+    battery_cost_eur_kwh: Optional[float] = Field(None, gt=0, example=500.0, description="Optional. Installed cost per kWh; if given, the response recommends the size with the best 10-year net gain.")
+    include_hourly: bool = Field(default=False, description="Return the hourly state of charge and battery flow (only with a single capacity).")
+
+    @validator('capacities_kwh', each_item=True)
+    def capacities_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('battery capacities must be positive.')
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def series_must_match(cls, values):
+        if len(values['production_kwh']) != len(values['consumption_kwh']):
+            raise ValueError('production_kwh and consumption_kwh must have the same number of hours.')
+        if values['include_hourly'] and len(values['capacities_kwh']) != 1:
+            raise ValueError('include_hourly requires a single capacity.')
+        return values
+
+class BatteryResultOutput(BaseModel):
+    """
+    Annual energy balance of one battery size (capacity 0 is the PV-only baseline).
+    """
+    capacity_kwh: float = Field(..., example=10.0)
+    power_kw: float = Field(..., example=5.0)
+    charged_kwh: float = Field(..., description="PV surplus stored in the battery.")
+    discharged_kwh: float = Field(..., description="Energy delivered by the battery to the household.")
+    grid_import_kwh: float
+    grid_export_kwh: float
+    self_consumption_kwh: float = Field(..., description="PV energy used by the household, directly or through the battery.")
+    self_consumption_rate: float = Field(..., description="Self-consumption as % of the production.")
+    autarky_rate: float = Field(..., description="Self-consumption as % of the consumption.")
+    equivalent_full_cycles: float
+    annual_savings_eur: float = Field(..., description="Bill reduction against no installation, at flat prices or under the tariff.")
+
+class BatteryRecommendation(BaseModel):
+    capacity_kwh: float
+    extra_savings_eur: float = Field(..., description="Annual savings on top of the PV-only baseline.")
+    net_gain_eur: float = Field(..., description="10-year extra savings minus the battery cost.")
+
+class BatterySimulationOutput(BaseModel):
+    """
+    Schema for the output of the /battery/simulate endpoint.
+    """
+    baseline: BatteryResultOutput
+    results: List[BatteryResultOutput]
+    recommended: Optional[BatteryRecommendation] = None
+    kernel: str = Field(..., example="numpy", description="Dispatch kernel used: numba or numpy.")
+    soc_kwh: Optional[List[float]] = Field(None, description="Hourly state of charge (with include_hourly).")
+    battery_flow_kwh: Optional[List[float]] = Field(None, description="Hourly battery flow: positive charging, negative discharging (with include_hourly).")
@@ -11,6 +11,9 @@ class ConsumptionManualInput(BaseModel):
     has_heat_pump: bool = Field(default=False, example=False, description="Does the household have a heat pump for heating/cooling?")
     # CLP (Código de Punto de Suministro) is usually a long string, e.g., ES0021000000123456ABCD
     clp: Optional[str] = Field(None, example="ES0021000000123456ABCD", description="Optional. Supply Point Code (CUPS in Spain).", min_length=20, max_length=22)
+    lat: Optional[float] = Field(None, ge=-90, le=90, example=40.416775, description="Optional. Latitude of the household; with a heat pump, its load follows the local temperatures (PVGIS).")
+    lng: Optional[float] = Field(None, ge=-180, le=180, example=-3.703790, description="Optional. Longitude of the household.")
+    load_profile: Optional[str] = Field(None, example="2.0TD", description="Optional. Typical-year load curve of the household (see GET /consumption/profiles); the standard 2.0TD curve by default.", max_length=64)
 
     class Config:
         schema_extra = {
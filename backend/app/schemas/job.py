@@ -0,0 +1,42 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Literal, Optional
+
+
+class JobCreate(BaseModel):
+    """
+    Schema for the input of POST /jobs. `params` is the body the synchronous route takes:
+    LocationAnalyzeInput for "location_analysis", ConsumptionManualInput for "consumption_manual",
+    ProductionSimulateInput for "production_simulate", LayoutInput for "layout_pack" and
+    BatterySimulationInput for "battery_simulate".
+    """
+    kind: Literal["location_analysis", "consumption_manual", "production_simulate", "layout_pack", "battery_simulate"] = Field(..., description="Analysis to run.")
+    params: Dict[str, Any] = Field(..., description="Input of the analysis (same body as the synchronous route).")
+    priority: int = Field(0, ge=0, le=9, description="Higher priorities run first; equal priorities in submission order.")
+    result_ttl_s: Optional[float] = Field(None, gt=0, description="Optional. Seconds the result is kept after the job finishes (capped by the server).")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "kind": "location_analysis",
+                "params": {"lat": 40.416775, "lng": -3.703790},
+                "priority": 5
+            }
+        }
+
+
+class JobStatus(BaseModel):
+    """
+    Schema for a job: its state and, once it has succeeded, its result (the response body
+    of the synchronous route).
+    """
+    id: str = Field(..., description="Job ID.")
+    kind: str = Field(..., description="Analysis run by the job.")
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"] = Field(..., description="Current state of the job.")
+    priority: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = Field(None, description="When the job and its result will be deleted.")
+    result: Optional[Dict[str, Any]] = Field(None, description="Result, once the job has succeeded.")
+    error: Optional[str] = Field(None, description="Error message, if the job failed.")
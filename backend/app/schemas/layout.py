@@ -0,0 +1,49 @@
+from pydantic import BaseModel, Field, conlist, root_validator
+from typing import List, Optional
+
+class LayoutSectionInput(BaseModel):
+    """
+    A roof section to fill with modules: its plan polygon (in metres or lat/lon) or, if only its
+    area is known (as in RoofSection), a square of that area.
+    """
+    polygon_m: Optional[List[conlist(float, min_items=2, max_items=2)]] = Field(None, min_items=3, max_items=1000, example=[[0, 0], [12, 0], [12, 6], [0, 6]], description="Plan polygon as [x, y] metres (x east, y north).")
+    polygon_latlon: Optional[List[conlist(float, min_items=2, max_items=2)]] = Field(None, min_items=3, max_items=1000, description="Plan polygon as [lat, lon] points (e.g. an OSM building outline).")
+    area: Optional[float] = Field(None, gt=0, le=1000000, example=70.25, description="Plan area in m², laid out as a square when no polygon is given.")
+    tilt: float = Field(0.0, ge=0, le=80, example=30.0, description="Slope of the section in degrees (0 = flat roof).")
+    azimuth: float = Field(180.0, ge=-360, le=360, example=180.0, description="Azimuth of the downhill direction in degrees (0=N, 90=E, 180=S, 270=W).")
+
+    @root_validator(skip_on_failure=True)
+    def one_geometry(cls, values):
+        given = [name for name in ('polygon_m', 'polygon_latlon', 'area') if values.get(name) is not None]
+        if len(given) != 1:
+            raise ValueError('Give exactly one of polygon_m, polygon_latlon or area.')
+        return values
+
+class LayoutInput(BaseModel):
+    """
+    Schema for the input of the /layout/pack endpoint.
+    """
+    sections: List[LayoutSectionInput] = Field(..., min_items=1, max_items=50)
+    module_id: Optional[str] = Field(None, max_length=40, example="generic_mono_450", description="Optional. Catalog module (see GET /production/catalog).")
+    orientation: str = Field("auto", regex="^(auto|portrait|landscape)$", description="portrait (long side along the slope), landscape, or auto (whichever fits more modules).")
+    setback_m: Optional[float] = Field(None, ge=0, le=5, example=0.5, description="Optional. Free distance along the edges of every section (fire setback).")
+    gap_m: Optional[float] = Field(None, ge=0, le=0.5, description="Optional. Gap between adjacent modules.")
+    row_gap_m: Optional[float] = Field(None, ge=0, le=10, description="Optional. Spacing between rows (by default only on flat roofs).")
+    include_coordinates: bool = Field(default=True, description="Return the center of every module.")
+
+class SectionLayoutOutput(BaseModel):
+    panels: int
+    kwp: float
+    orientation: str
+    rows: int
+    usable_area_m2: float = Field(..., description="Roof-plane area inside the setbacks.")
+    centers: Optional[List[List[float]]] = Field(None, description="Module centers in the frame of the section's polygon ([x, y] metres or [lat, lon]).")
+
+class LayoutOutput(BaseModel):
+    """
+    Schema for the output of the /layout/pack endpoint.
+    """
+    module_id: str
+    panels: int
+    kwp: float
+    sections: List[SectionLayoutOutput]
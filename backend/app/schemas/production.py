@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field, confloat
+from typing import List, Optional
+
+class ProductionSimulateInput(BaseModel):
+    """
+    Schema for the input of the /production/simulate endpoint.
+    """
+    lat: float = Field(..., ge=-90, le=90, example=40.416775, description="Latitude of the installation.")
+    lng: float = Field(..., ge=-180, le=180, example=-3.703790, description="Longitude of the installation.")
+    kwp: float = Field(..., gt=0, le=120, example=4.0, description="Wanted DC power in kWp (rounded to a whole number of modules); up to 10 x 10 kW inverters at a 1.2 DC/AC ratio with the built-in catalog.")
+    module_id: Optional[str] = Field(None, max_length=40, example="generic_mono_450", description="Optional. Catalog module (see GET /production/catalog).")
+    inverter_id: Optional[str] = Field(None, max_length=40, example="generic_3_6kw", description="Optional. Catalog inverter; by default the smallest one for the target DC/AC ratio.")
+    dc_ac_ratio: Optional[float] = Field(None, gt=0.5, le=2.5, example=1.2, description="Optional. Target DC/AC ratio of the automatic inverter choice.")
+    tilt: Optional[float] = Field(None, ge=0, le=90, example=30.0, description="Optional. Module tilt in degrees; PVGIS' optimal tilt by default.")
+    azimuth: Optional[float] = Field(None, ge=0, le=360, example=180.0, description="Optional. Module azimuth in degrees (0=N, 90=E, 180=S, 270=W); PVGIS' by default.")
+    shading_factor_monthly: Optional[List[confloat(ge=0, le=1)]] = Field(None, min_items=12, max_items=12, description="Optional. Monthly shading factors (1.0 = no shade), e.g. shadingFactorMonthly of /location/analyze.")
+    shading_factor_hourly: Optional[List[confloat(ge=0, le=1)]] = Field(None, min_items=8760, max_items=8760, description="Optional. Hourly shading factors; take precedence over the monthly ones.")
+    dc_losses: Optional[float] = Field(None, ge=0, lt=0.5, example=0.08, description="Optional. DC losses besides shading and temperature (wiring, mismatch, soiling).")
+    roof_area_m2: Optional[float] = Field(None, gt=0, example=80.0, description="Optional. Roof area, to report the maximum kWp of the chosen module.")
+    include_hourly: bool = Field(default=True, description="Return the 8760 hourly production values.")
+
+class ProductionOutput(BaseModel):
+    """
+    Schema for the output of the /production/simulate endpoint.
+    """
+    module_id: str
+    inverter_id: str
+    inverters: int = Field(..., description="Number of identical inverters in parallel.")
+    panels: int
+    dc_kwp: float
+    ac_kw: float
+    dc_ac_ratio: float
+    tilt: float
+    azimuth: float
+    annual_dc_kwh: float = Field(..., description="DC energy after shading, DC losses and temperature.")
+    annual_ac_kwh: float = Field(..., description="AC energy delivered by the inverter.")
+    specific_yield_kwh_kwp: float
+    shading_loss_kwh: float
+    temperature_loss_kwh: float
+    clipping_loss_kwh: float = Field(..., description="Energy lost because the inverter's AC rating was reached.")
+    hardware_cost_eur: float = Field(..., description="List price of the modules and the inverters.")
+    max_kwp: Optional[float] = Field(None, description="kWp of the module that fits in roof_area_m2, if given.")
+    monthly_kwh: List[float] = Field(..., min_items=12, max_items=12)
+    hourly_kwh: Optional[List[float]] = Field(None, description="Hourly AC production of a typical year (8760 values), e.g. production_kwh of /battery/simulate.")
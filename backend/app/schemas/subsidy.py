@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 
 class SubsidyBase(BaseModel):
     name: str = Field(..., description="Nombre de la subvención.")
@@ -43,3 +43,16 @@ class Subsidy(SubsidyBase):
 # Ejemplo para la salida del servicio que podría incluir el monto calculado de la subvención
 class AppliedSubsidy(Subsidy):
     calculated_amount_eur: float = Field(..., description="Monto de la subvención calculado para el escenario específico.")
+
+
+class SubsidyImportReport(BaseModel):
+    """Resumen (diff) de una importación masiva de subvenciones."""
+    total_records: int = Field(..., description="Registros leídos del origen.")
+    inserted: int = Field(0, description="Subvenciones nuevas.")
+    updated: int = Field(0, description="Subvenciones existentes cuyos datos han cambiado.")
+    unchanged: int = Field(0, description="Subvenciones existentes sin cambios.")
+    deactivated: int = Field(0, description="Subvenciones de la BD ausentes en el origen y marcadas como inactivas.")
+    invalid: int = Field(0, description="Registros descartados por no superar la validación.")
+    errors: List[str] = Field(default_factory=list, description="Mensajes de validación (truncados a los primeros).")
+    dry_run: bool = Field(False, description="Si es True, no se ha escrito nada en la base de datos.")
+    duration_s: float = Field(0.0, description="Duración de la importación en segundos.")
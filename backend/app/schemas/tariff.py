@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field, conlist, root_validator
+from typing import List, Optional
+
+class TariffDefinition(BaseModel):
+    """
+    A custom time-of-use tariff (prices without taxes).
+    """
+    name: str = Field(..., max_length=64, example="my_offer")
+    energy_prices: List[float] = Field(..., min_items=1, max_items=6, example=[0.20, 0.14, 0.10], description="EUR/kWh per energy period, P1 first.")
+    power_prices: List[float] = Field(..., min_items=1, max_items=6, example=[30.67, 4.24], description="EUR/kW and year per power period, P1 first.")
+    export_price: float = Field(0.0, ge=0, example=0.06, description="EUR/kWh compensation of surplus (capped at the month's energy term).")
+    hours: conlist(conlist(int, min_items=24, max_items=24), min_items=3, max_items=3) = Field(..., description="0-based energy period of each of the 24 hours for workdays, saturdays and sundays/holidays.")
+    description: str = Field("", max_length=256)
+
+class TariffCompareInput(BaseModel):
+    """
+    Schema for the input of the /tariffs/compare endpoint.
+    """
+    consumption_kwh: List[float] = Field(..., min_items=8760, max_items=8784, description="Hourly consumption of a year in kWh (8760 values, or 8784 for a leap year).")
+    production_kwh: Optional[List[float]] = Field(None, min_items=8760, max_items=8784, description="Optional. Hourly PV production; the bill then covers the net grid import and compensates the surplus.")
+    tariffs: Optional[List[str]] = Field(None, max_items=20, example=["2.0TD", "2.0TD_flat"], description="Optional. Built-in tariffs to compare (all by default).")
+    custom_tariffs: List[TariffDefinition] = Field(default_factory=list, max_items=20, description="Optional. Additional tariffs to compare.")
+    contracted_power_kw: Optional[List[float]] = Field(None, min_items=1, max_items=6, example=[4.6], description="Optional. Contracted power, one value or one per power period.")
+    year: Optional[int] = Field(None, ge=1900, le=2100, description="Optional. Year of the data, for its weekends and holidays (by default a recent year with as many hours).")
+
+    @root_validator(skip_on_failure=True)
+    def series_must_match(cls, values):
+        if values['production_kwh'] is not None and len(values['production_kwh']) != len(values['consumption_kwh']):
+            raise ValueError('production_kwh and consumption_kwh must have the same number of hours.')
+        return values
+
+class BillOutput(BaseModel):
+    """
+    Annual bill under one tariff (EUR, taxes included in total_eur).
+    """
+    tariff: str
+    energy_kwh: List[float] = Field(..., description="Imported energy per energy period.")
+    export_kwh: float
+    energy_eur: float
+    power_eur: float
+    compensation_eur: float
+    taxes_eur: float = Field(..., description="Electricity tax and VAT.")
+    meter_rental_eur: float
+    total_eur: float
+    monthly_total_eur: List[float] = Field(..., min_items=12, max_items=12)
+
+class TariffCompareOutput(BaseModel):
+    """
+    Schema for the output of the /tariffs/compare endpoint.
+    """
+    bills: List[BillOutput] = Field(..., description="One bill per tariff, cheapest first.")
+    cheapest: str
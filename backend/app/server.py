@@ -0,0 +1,111 @@
+"""
+Production server entry point (from backend/):
+
+    python -m app.server --workers 4 --port 8000
+
+Runs gunicorn with uvicorn workers and `preload_app`: the application and its read-only
+data (database schema check, load profile library, hardware catalog and the numpy/pandas
+modules) are loaded once in the master process, and the forked workers
+share those memory pages copy-on-write instead of each building its own copy.
+
+With more than one worker, in-process caches would be duplicated per worker, so the
+PVGIS/Overpass cache defaults to the SQLite backend (one WAL + mmap file shared by every
+worker on the host) unless CACHE_BACKEND is set explicitly (e.g. CACHE_BACKEND=redis).
+
+If gunicorn is not installed (e.g. on Windows), it falls back to `uvicorn --workers`, which
+spawns workers instead of forking them: the shared cache still works, but nothing is
+shared copy-on-write.
+"""
+import argparse
+import gc
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+APP_PATH = "app.main:app"
+
+
+def preload_read_only_data() -> None:
+    """
+    Loads the read-only data the workers need, in the current (master) process.
+    Must run before forking so that the pages are shared copy-on-write.
+    """
+    import numpy  # noqa: F401 - the heavy modules are imported lazily by the services;
+    import pandas  # noqa: F401 - importing them here shares their pages with every worker.
+    from app.db import database
+    from app.services import hardware_catalog, profile_library
+
+    database.ensure_schema()
+    library = profile_library.get_library() # Memory-mapped: its pages are the OS page cache, shared anyway
+    catalog = hardware_catalog.get_catalog()
+    logger.info(
+        f"Datos de solo lectura precargados: biblioteca de {len(library.names)} perfiles de carga, catálogo de "
+        f"{len(catalog.modules)} módulos y {len(catalog.inverters)} inversores."
+    )
+    # Move everything allocated so far to the permanent generation, so the workers' garbage
+    # collector does not touch (and therefore copy) these objects' pages.
+    gc.freeze()
+
+
+def _run_gunicorn(host: str, port: int, workers: int, timeout: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", True)
+            self.cfg.set("timeout", timeout)
+
+        def load(self):
+            # With preload_app=True this runs once, in the master process, before forking.
+            preload_read_only_data()
+            from app.main import app
+            return app
+
+    _Application().run()
+
+
+def _run_uvicorn(host: str, port: int, workers: int) -> None:
+    import uvicorn
+
+    if workers > 1:
+        logger.warning(
+            "gunicorn no está instalado: se usa 'uvicorn --workers', que no comparte memoria "
+            "copy-on-write entre workers (la caché compartida sí funciona)."
+        )
+        uvicorn.run(APP_PATH, host=host, port=port, workers=workers)
+    else:
+        preload_read_only_data()
+        uvicorn.run(APP_PATH, host=host, port=port)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor de producción de la API de HotSpot360.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+                        help="Número de procesos worker (por defecto WEB_CONCURRENCY o el número de CPUs).")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("WORKER_TIMEOUT_S", "60")),
+                        help="Segundos antes de reiniciar un worker bloqueado (solo gunicorn).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Must be decided before any app module is imported: cache_service reads it at import time.
+    if args.workers > 1 and "CACHE_BACKEND" not in os.environ:
+        os.environ["CACHE_BACKEND"] = "sqlite"
+    logger.info(f"Arrancando {args.workers} worker(s) en {args.host}:{args.port} (CACHE_BACKEND={os.getenv('CACHE_BACKEND', 'memory')}).")
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        _run_uvicorn(args.host, args.port, args.workers)
+    else:
+        _run_gunicorn(args.host, args.port, args.workers, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
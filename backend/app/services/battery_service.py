@@ -0,0 +1,212 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Union
+
+from app.services import tariff_service
+
+# numpy (and numba, if installed) are imported lazily (see consumption_service).
+
+logger = logging.getLogger(__name__)
+
+# Hourly battery dispatch for self-consumption: surplus PV charges the battery (up to its power
+# and free capacity) and the battery covers the deficit (down to its minimum state of charge);
+# the rest is exchanged with the grid. The simulation is sequential in time, so it runs in a
+# kernel that loops over the hours: compiled with Numba when it is installed, otherwise a NumPy
+# loop vectorized across battery sizes (one pass over the year for a whole sweep).
+
+# Power (kW) per kWh of capacity when no power is given (0.5C: a 10 kWh battery at 5 kW).
+BATTERY_DEFAULT_C_RATE = float(os.getenv("BATTERY_DEFAULT_C_RATE", "0.5"))
+BATTERY_DEFAULT_ROUND_TRIP_EFFICIENCY = float(os.getenv("BATTERY_ROUND_TRIP_EFFICIENCY", "0.9"))
+BATTERY_DEFAULT_MIN_SOC = float(os.getenv("BATTERY_MIN_SOC", "0.1"))
+# Flat prices (EUR/kWh) of the savings estimate without a tariff: imported energy and compensated surplus.
+BATTERY_IMPORT_PRICE_EUR_KWH = float(os.getenv("BATTERY_IMPORT_PRICE_EUR_KWH", "0.18"))
+BATTERY_EXPORT_PRICE_EUR_KWH = float(os.getenv("BATTERY_EXPORT_PRICE_EUR_KWH", "0.06"))
+# "auto" uses Numba when installed; "numpy" forces the fallback.
+BATTERY_KERNEL = os.getenv("BATTERY_KERNEL", "auto")
+BATTERY_MAX_SIZES = int(os.getenv("BATTERY_MAX_SIZES", "100"))
+
+
+class BatteryResult(NamedTuple):
+    """Annual energy balance (kWh) of one battery size; capacity 0 is PV without battery."""
+    capacity_kwh: float
+    power_kw: float
+    charged_kwh: float # PV surplus stored
+    discharged_kwh: float # Delivered to the household
+    grid_import_kwh: float
+    grid_export_kwh: float
+    self_consumption_kwh: float # PV used by the household, directly or through the battery
+    self_consumption_rate: float # % of the production
+    autarky_rate: float # % of the consumption
+    equivalent_full_cycles: float
+    annual_savings_eur: float # Bill reduction against no installation (flat prices or the tariff)
+
+
+class BatterySimulation(NamedTuple):
+    """Results per size (in input order), the PV-only baseline, and the hourly series if requested."""
+    results: List[BatteryResult]
+    baseline: BatteryResult
+    kernel: str # "numba" or "numpy"
+    soc_kwh: Optional[Any] = None # (sizes, hours) state of charge at the end of each hour
+    battery_flow_kwh: Optional[Any] = None # (sizes, hours): + charging from PV, - discharging to the household
+
+
+def _dispatch_numpy(net, capacity, max_charge, max_discharge, soc_min, eta_charge, eta_discharge, soc, flow):
+    """NumPy kernel: a loop over the hours, each step vectorized across the battery sizes."""
+    import numpy as np
+
+    state = soc_min.copy() # Start of the year at the minimum state of charge
+    for t in range(len(net)):
+        surplus = net[t]
+        if surplus >= 0:
+            step = np.minimum(np.minimum(max_charge, surplus), (capacity - state) / eta_charge)
+            state += step * eta_charge
+        else:
+            step = -np.minimum(np.minimum(max_discharge, -surplus), (state - soc_min) * eta_discharge)
+            state += step / eta_discharge
+        flow[:, t] = step
+        soc[:, t] = state
+
+
+def _dispatch_python(net, capacity, max_charge, max_discharge, soc_min, eta_charge, eta_discharge, soc, flow):
+    """Scalar kernel, compiled by Numba (same dispatch as _dispatch_numpy)."""
+    for s in range(capacity.shape[0]):
+        state = soc_min[s]
+        for t in range(net.shape[0]):
+            surplus = net[t]
+            if surplus >= 0:
+                step = min(max_charge[s], surplus, (capacity[s] - state) / eta_charge)
+                state += step * eta_charge
+            else:
+                step = -min(max_discharge[s], -surplus, (state - soc_min[s]) * eta_discharge)
+                state += step / eta_discharge
+            flow[s, t] = step
+            soc[s, t] = state
+
+
+@lru_cache(maxsize=1)
+def _numba_kernel():
+    """The Numba-compiled kernel, or None if Numba is not installed (or disabled by BATTERY_KERNEL)."""
+    if BATTERY_KERNEL == "numpy":
+        return None
+    try:
+        import numba # Optional: pip install numba
+    except ImportError:
+        logger.info("Numba is not installed; battery dispatch uses the NumPy kernel.")
+        return None
+    return numba.njit(cache=True, nogil=True)(_dispatch_python)
+
+
+def kernel_name() -> str:
+    return "numba" if _numba_kernel() is not None else "numpy"
+
+
+def simulate_battery(production_kwh: Sequence[float], consumption_kwh: Sequence[float], capacities_kwh: Sequence[float],
+                     power_kw: Optional[float] = None, round_trip_efficiency: float = None, min_soc: float = None,
+                     import_price_eur_kwh: float = None, export_price_eur_kwh: float = None,
+                     tariff: Optional[Union[str, tariff_service.Tariff]] = None, contracted_power_kw=None,
+                     include_hourly: bool = False) -> BatterySimulation:
+    """
+    Simulates a year of hourly dispatch for every battery size in capacities_kwh at once.
+
+    Args:
+        production_kwh, consumption_kwh: Hourly PV production and household consumption (same length).
+        capacities_kwh: Usable capacities to evaluate (a sweep), each > 0.
+        power_kw: Charge/discharge power limit of every size; BATTERY_DEFAULT_C_RATE x capacity if None.
+        round_trip_efficiency: Fraction of the stored energy that comes back (split evenly between
+            charge and discharge).
+        min_soc: Fraction of the capacity that is never discharged.
+        import_price_eur_kwh, export_price_eur_kwh: Flat prices of the savings estimate.
+        tariff, contracted_power_kw: If a tariff is given, savings are bill differences under it
+            (time-of-use prices, monthly capped compensation, taxes; see tariff_service) instead.
+        include_hourly: Also return the (sizes, hours) state of charge and battery flows.
+
+    Raises:
+        ValueError: For inconsistent inputs.
+    """
+    import numpy as np
+
+    production = np.asarray(production_kwh, dtype=np.float64)
+    consumption = np.asarray(consumption_kwh, dtype=np.float64)
+    capacity = np.asarray(capacities_kwh, dtype=np.float64).reshape(-1)
+    rte = BATTERY_DEFAULT_ROUND_TRIP_EFFICIENCY if round_trip_efficiency is None else round_trip_efficiency
+    min_soc = BATTERY_DEFAULT_MIN_SOC if min_soc is None else min_soc
+    import_price = BATTERY_IMPORT_PRICE_EUR_KWH if import_price_eur_kwh is None else import_price_eur_kwh
+    export_price = BATTERY_EXPORT_PRICE_EUR_KWH if export_price_eur_kwh is None else export_price_eur_kwh
+
+    if production.ndim != 1 or production.shape != consumption.shape:
+        raise ValueError(f"Production and consumption must be hourly series of the same length ({production.size} != {consumption.size}).")
+    if (production < 0).any() or (consumption < 0).any():
+        raise ValueError("Production and consumption cannot be negative.")
+    if not 0 < len(capacity) <= BATTERY_MAX_SIZES or (capacity <= 0).any():
+        raise ValueError(f"Give between 1 and {BATTERY_MAX_SIZES} battery capacities, all positive.")
+    if not 0 < rte <= 1 or not 0 <= min_soc < 1 or (power_kw is not None and power_kw <= 0):
+        raise ValueError("Efficiency must be in (0, 1], the minimum state of charge in [0, 1) and the power positive.")
+
+    power = np.full_like(capacity, power_kw) if power_kw is not None else capacity * BATTERY_DEFAULT_C_RATE
+    eta = float(np.sqrt(rte))
+    net = production - consumption
+    soc = np.empty((len(capacity), len(net)))
+    flow = np.empty((len(capacity), len(net)))
+    kernel = _numba_kernel()
+    (kernel or _dispatch_numpy)(net, capacity, power, power, capacity * min_soc, eta, eta, soc, flow)
+
+    # Annual balances, vectorized across sizes. The battery only moves PV surplus into hours of deficit.
+    surplus, deficit = np.clip(net, 0, None).sum(), np.clip(-net, 0, None).sum()
+    direct = float(np.minimum(production, consumption).sum())
+    charged = np.clip(flow, 0, None).sum(axis=1)
+    discharged = -np.clip(flow, None, 0).sum(axis=1)
+
+    if tariff is None:
+        savings = (consumption.sum() - (deficit - discharged)) * import_price + (surplus - charged) * export_price
+        baseline_savings = (consumption.sum() - deficit) * import_price + surplus * export_price
+    else:
+        # Hourly grid exchanges of every size (and of the PV-only baseline, row 0), billed in one pass
+        grid_import = np.clip(np.clip(-net, 0, None) + np.minimum(flow, 0), 0, None) # Clip rounding residues
+        grid_export = np.clip(np.clip(net, 0, None) - np.maximum(flow, 0), 0, None)
+        totals = tariff_service.annual_totals(
+            np.vstack([consumption, np.clip(-net, 0, None), grid_import]),
+            np.vstack([np.zeros_like(net), np.clip(net, 0, None), grid_export]),
+            [tariff], contracted_power_kw=contracted_power_kw)[:, 0]
+        savings, baseline_savings = totals[0] - totals[2:], totals[0] - totals[1]
+
+    def result(capacity_kwh, power_kw, charged_kwh, discharged_kwh, savings_eur) -> BatteryResult:
+        grid_import = deficit - discharged_kwh
+        grid_export = surplus - charged_kwh
+        self_consumption = direct + discharged_kwh
+        return BatteryResult(
+            capacity_kwh=float(capacity_kwh),
+            power_kw=round(float(power_kw), 3),
+            charged_kwh=round(float(charged_kwh), 2),
+            discharged_kwh=round(float(discharged_kwh), 2),
+            grid_import_kwh=round(float(grid_import), 2),
+            grid_export_kwh=round(float(grid_export), 2),
+            self_consumption_kwh=round(float(self_consumption), 2),
+            self_consumption_rate=round(float(100 * self_consumption / production.sum()), 2) if production.sum() > 0 else 0.0,
+            autarky_rate=round(float(100 * self_consumption / consumption.sum()), 2) if consumption.sum() > 0 else 0.0,
+            equivalent_full_cycles=round(float(discharged_kwh / (capacity_kwh * (1 - min_soc))), 1) if capacity_kwh else 0.0,
+            annual_savings_eur=round(float(savings_eur), 2),
+        )
+
+    results = [result(*values) for values in zip(capacity, power, charged, discharged, savings)]
+    return BatterySimulation(
+        results=results,
+        baseline=result(0.0, 0.0, 0.0, 0.0, baseline_savings),
+        kernel="numba" if kernel is not None else "numpy",
+        soc_kwh=soc if include_hourly else None,
+        battery_flow_kwh=flow if include_hourly else None,
+    )
+
+
+def best_size(simulation: BatterySimulation, cost_eur_per_kwh: float, years: int = 10) -> Optional[Dict[str, Any]]:
+    """
+    The size with the largest net gain over `years` (extra savings against the PV-only baseline
+    minus the battery cost at cost_eur_per_kwh), or None if no size pays for itself.
+    """
+    best = None
+    for r in simulation.results:
+        extra = r.annual_savings_eur - simulation.baseline.annual_savings_eur
+        gain = extra * years - r.capacity_kwh * cost_eur_per_kwh
+        if gain > 0 and (best is None or gain > best["net_gain_eur"]):
+            best = {"capacity_kwh": r.capacity_kwh, "extra_savings_eur": round(extra, 2), "net_gain_eur": round(gain, 2)}
+    return best
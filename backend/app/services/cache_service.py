@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# --- Configuration (environment variables) ---
+# CACHE_BACKEND: "memory" (per-process, default), "sqlite" (file shared by every worker on
+# the host) or "redis" (Redis or any Redis-compatible server, e.g. a local KeyDB/Valkey).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'cache.db'))
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+# Prefix of every key this app writes to Redis, which may be shared with other applications:
+# clear() only deletes keys with this prefix.
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "hotspot-solar-insight:")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_DEFAULT_TTL_S = float(os.getenv("CACHE_DEFAULT_TTL_S", "86400"))
+# Decimal places used to quantize coordinates in cache keys (5 decimals ~ 1.1 m).
+CACHE_COORD_DECIMALS = int(os.getenv("CACHE_COORD_DECIMALS", "5"))
+
+
+def coord_key(lat: float, lng: float, decimals: int = CACHE_COORD_DECIMALS) -> str:
+    """Quantized "lat,lng" string, so that requests for the same building share cache entries."""
+    return f"{round(lat, decimals):.{decimals}f},{round(lng, decimals):.{decimals}f}"
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """Builds a cache key such as "pvgis:40.41678,-3.70379:1.0"."""
+    return ":".join([namespace] + [str(p) for p in parts])
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with per-entry TTL.
+    Fast, but every worker process holds its own copy.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, default_ttl_s: float = CACHE_DEFAULT_TTL_S):
+        self.max_entries = max_entries
+        self.default_ttl_s = default_ttl_s
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any, ttl_s: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.default_ttl_s if ttl_s is None else ttl_s)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False) # Evict least recently used
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class SQLiteCache:
+    """
+    Cache stored in a SQLite file (WAL mode, memory-mapped reads) shared by every worker
+    process on the same host. Values must be JSON-serializable.
+
+    Connections are opened lazily per thread and per process, so an instance created in the
+    master process before forking is safe to use from the workers.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 default_ttl_s: float = CACHE_DEFAULT_TTL_S, mmap_size_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl_s = default_ttl_s
+        self.mmap_size_bytes = mmap_size_bytes
+        self._local = threading.local()
+        self._sets_since_eviction = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None) # autocommit
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size_bytes)}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache (expires_at)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_s: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.default_ttl_s if ttl_s is None else ttl_s)
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, json.dumps(value, separators=(",", ":")), expires_at)
+        )
+        # Evicting on every write would cost a COUNT(*); do it every 100 writes instead.
+        self._sets_since_eviction += 1
+        if self._sets_since_eviction >= 100:
+            self._sets_since_eviction = 0
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if excess > 0: # Drop the entries closest to expiring first
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at LIMIT ?)", (excess,)
+            )
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"backend": "sqlite", "entries": entries, "hits": self.hits, "misses": self.misses, "path": self.path}
+
+
+class RedisCache:
+    """
+    Cache backed by Redis or a Redis-compatible server. Requires the optional `redis` package.
+    Keys are namespaced with `prefix` (CACHE_KEY_PREFIX), so the database can be shared.
+    """
+
+    def __init__(self, url: str = CACHE_URL, default_ttl_s: float = CACHE_DEFAULT_TTL_S, prefix: str = CACHE_KEY_PREFIX):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis).") from e
+        self.url = url
+        self.default_ttl_s = default_ttl_s
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl_s: Optional[float] = None) -> None:
+        ttl_ms = int((self.default_ttl_s if ttl_s is None else ttl_s) * 1000)
+        self._client.set(self.prefix + key, json.dumps(value, separators=(",", ":")), px=max(ttl_ms, 1))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self.prefix + key)
+
+    def _keys(self):
+        # Glob-escape the prefix so that only keys starting with it literally match
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", self.prefix) + "*"
+        return self._client.scan_iter(match=pattern, count=1000)
+
+    def clear(self) -> None:
+        """Deletes this app's keys only (SCAN + DEL in batches; never FLUSHDB)."""
+        batch = []
+        for key in self._keys():
+            batch.append(key)
+            if len(batch) >= 1000:
+                self._client.delete(*batch)
+                batch = []
+        if batch:
+            self._client.delete(*batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "entries": sum(1 for _ in self._keys()), "hits": self.hits, "misses": self.misses,
+                "prefix": self.prefix}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def create_cache(backend: str = CACHE_BACKEND):
+    """Instantiates the cache backend named by `backend` ("memory", "sqlite" or "redis")."""
+    if backend == "memory":
+        return MemoryCache()
+    if backend == "sqlite":
+        return SQLiteCache()
+    if backend == "redis":
+        return RedisCache()
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}'. Use 'memory', 'sqlite' or 'redis'.")
+
+
+def get_cache():
+    """Returns the process-wide cache configured by CACHE_BACKEND, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_cache()
+                logger.info(f"Cache backend initialized: {CACHE_BACKEND}")
+    return _cache
+
+
+def cached(key: str, compute: Callable[[], Any], ttl_s: Optional[float] = None) -> Any:
+    """
+    Returns the cached value for `key`, calling `compute()` and storing its result on a miss.
+    Falsy results (e.g. an empty dict from a failed upstream call) are not cached.
+
+    The cache is an optimization: if its backend fails (Redis down, SQLite locked beyond its
+    timeout...), the error is logged and the value is computed and returned without storing it.
+    Errors raised by compute() itself propagate as usual.
+    """
+    cache = get_cache()
+    try:
+        value = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Cache read failed for '{key}', computing the value instead: {e}")
+        return compute()
+    if value is not None:
+        return value
+    value = compute()
+    if value:
+        try:
+            cache.set(key, value, ttl_s)
+        except Exception as e:
+            logger.warning(f"Cache write failed for '{key}'; value returned without caching: {e}")
+    return value
@@ -1,8 +1,17 @@
+import io
 import logging
+import os
 import random
-from typing import List, Tuple
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from fastapi import UploadFile
 from app.schemas.consumption import ConsumptionManualInput, ConsumptionOutput
-import numpy as np # For more advanced profile generation if needed
+from app.services import load_synthesis, metrics_service, profile_library, time_index
+
+# numpy and pandas are imported lazily inside the functions that need them: importing them
+# at module level adds hundreds of ms to every worker's cold start, even for routes that
+# never touch consumption data.
 
 logger = logging.getLogger(__name__)
 
@@ -16,234 +25,359 @@ KWH_FOR_EV = 2000
 # Additional kWh per year if Heat Pump is present (can vary wildly)
 KWH_FOR_HEAT_PUMP = 3000 # This is a rough average, depends on climate, house insulation etc.
 
+# Random +/-5 % applied to the annual estimate. In deterministic mode (default) it is seeded
+# from the household archetype, so the same inputs always give the same prediction
+# (and the result can be cached); set CONSUMPTION_DETERMINISTIC_JITTER=0 for per-request randomness.
+ANNUAL_JITTER_RANGE = (0.95, 1.05)
+DETERMINISTIC_JITTER = os.getenv("CONSUMPTION_DETERMINISTIC_JITTER", "1") == "1"
+# Maximum number of household archetypes whose normalized profile is kept in memory (LRU).
+PROFILE_CACHE_SIZE = int(os.getenv("CONSUMPTION_PROFILE_CACHE_SIZE", "256"))
+
 # Typical peak factors (multiplier of average hourly consumption)
 PEAK_FACTOR_RESIDENTIAL = 4.0 # Can be higher, e.g. 4-6x
 
-# Define a very simple standard hourly profile (sum should be 1.0 over 24 hours)
-# This represents the fraction of daily energy used each hour.
-# Hour: 0  1  2  3  4  5  6  7  8  9 10 11 12 13 14 15 16 17 18 19 20 21 22 23
-HOURLY_DISTRIBUTION_FLAT = [1/24] * 24 # Flat for now, will make it more realistic
-STANDARD_HOURLY_PROFILE_FRACTIONS_24H = [
-    0.025, 0.020, 0.018, 0.015, 0.015, 0.020, 0.035, 0.050, # 0-7h (night, morning prep)
-    0.045, 0.040, 0.038, 0.035, 0.035, 0.038, 0.040, 0.045, # 8-15h (daytime)
-    0.055, 0.065, 0.075, 0.080, 0.070, 0.060, 0.045, 0.035  # 16-23h (evening peak, night fall)
-]
-# Ensure it sums to 1 (or close enough for this mock)
-profile_sum = sum(STANDARD_HOURLY_PROFILE_FRACTIONS_24H)
-if not (0.99 < profile_sum < 1.01):
-    logger.warning(f"Standard hourly profile sum is {profile_sum}, not 1.0. Normalizing...")
-    STANDARD_HOURLY_PROFILE_FRACTIONS_24H = [x / profile_sum for x in STANDARD_HOURLY_PROFILE_FRACTIONS_24H]
-
-
-# Simple monthly distribution (fraction of annual energy per month)
-# More in winter/summer depending on heating/cooling. For now, slightly higher in winter.
-# Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec
-STANDARD_MONTHLY_PROFILE_FRACTIONS = [
-    0.10, 0.09, 0.08, 0.07, 0.07, 0.06, # Winter, Spring, Early Summer
-    0.07, 0.08, 0.08, 0.09, 0.10, 0.11  # Late Summer, Autumn, Winter
-]
-monthly_sum = sum(STANDARD_MONTHLY_PROFILE_FRACTIONS)
-if not (0.99 < monthly_sum < 1.01):
-    logger.warning(f"Standard monthly profile sum is {monthly_sum}, not 1.0. Normalizing...")
-    STANDARD_MONTHLY_PROFILE_FRACTIONS = [x / monthly_sum for x in STANDARD_MONTHLY_PROFILE_FRACTIONS]
-
-
-DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31] # Non-leap year
+# The hourly and monthly shape of the prediction comes from a typical-year curve of the
+# profile library (weekday/weekend and seasonal variation); see profile_library.
+
+
+Archetype = Tuple[int, int, bool, bool] # (occupants, area_m2, has_ev, has_heat_pump)
+
+
+def _archetype(data: ConsumptionManualInput) -> Archetype:
+    """The inputs the manual prediction depends on (the CUPS code is not used)."""
+    return (data.occupants, data.area_m2, data.has_ev, data.has_heat_pump)
+
+
+def _archetype_seed(archetype: Archetype) -> int:
+    return zlib.crc32(repr(archetype).encode("utf-8")) # Stable across processes, unlike hash()
+
+
+def _jitter_factor(archetype: Archetype) -> float:
+    """Annual jitter factor, seeded from the archetype in deterministic mode."""
+    if not DETERMINISTIC_JITTER:
+        return random.uniform(*ANNUAL_JITTER_RANGE)
+    return random.Random(_archetype_seed(archetype)).uniform(*ANNUAL_JITTER_RANGE)
+
+
+def _component_kwh(occupants: int, area_m2: int, has_ev: bool) -> Tuple[float, float]:
+    """Annual kWh (before jitter) of the household's general uses and EV charging."""
+    household_kwh = (occupants * BASE_KWH_PER_PERSON) + (area_m2 * KWH_PER_M2)
+    ev_kwh = KWH_FOR_EV if has_ev else 0.0
+    return float(household_kwh), float(ev_kwh)
+
+
+@lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def _archetype_profile(occupants: int, area_m2: int, has_ev: bool, has_heat_pump: bool, load_profile: str = None):
+    """
+    Base annual consumption (kWh, before jitter) and normalized hourly profile of a household
+    archetype, without its heat pump: that one depends on the climate (see _heat_pump_load), so
+    it is added per request and this cache is keyed on the archetype only.
+
+    Users cluster on a small number of combinations, so the results are memoized (bounded LRU).
+    The general uses follow the archetype's curve of the profile library, selected by index
+    (a row of the memory-mapped matrix); EV charging is added as its own component (see load_synthesis).
+
+    Returns:
+        A tuple (base_annual_kwh, hourly_shape), where hourly_shape is a read-only numpy array
+        of 8760 values summing to 1.
+    """
+    household_kwh, ev_kwh = _component_kwh(occupants, area_m2, has_ev)
+    curve = profile_library.get_library().curve(load_profile or profile_library.DEFAULT_PROFILE)
+    if not ev_kwh:
+        return household_kwh, curve
+
+    start_hour = load_synthesis.ev_start_hour_for(_archetype_seed((occupants, area_m2, has_ev, has_heat_pump)))
+    load = load_synthesis.synthesize_households(curve, household_kwh, ev_kwh, ev_start_hour=start_hour)[0]
+    total_kwh = household_kwh + ev_kwh
+    hourly_shape = load / total_kwh
+    hourly_shape.setflags(write=False)
+    return total_kwh, hourly_shape
+
+
+@lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def _heat_pump_load(monthly_t2m: Tuple[int, ...] = None):
+    """
+    Annual kWh and hourly load (read-only array of 8760 values) of the heat pump for a climate
+    (the reference climate if None). Keyed on temperatures quantized to 1 °C (see _household_profile),
+    so nearby locations share an entry.
+    """
+    hp_kwh = load_synthesis.heat_pump_annual_kwh(KWH_FOR_HEAT_PUMP, monthly_t2m)
+    load = load_synthesis.heat_pump_profiles(hp_kwh, monthly_t2m)[0]
+    load.setflags(write=False)
+    return float(hp_kwh[0]), load
+
+
+def _household_profile(archetype: Archetype, load_profile: str, monthly_t2m=None):
+    """Base annual kWh and normalized hourly shape of a household: its archetype plus, if any, its heat pump."""
+    base_kwh, hourly_shape = _archetype_profile(*archetype, load_profile) # ValueError if the profile is unknown
+    if not archetype[3]:
+        return base_kwh, hourly_shape
+    climate = None if monthly_t2m is None else tuple(int(round(t)) for t in monthly_t2m)
+    hp_kwh, hp_load = _heat_pump_load(climate)
+    total_kwh = base_kwh + hp_kwh
+    return total_kwh, (hourly_shape * base_kwh + hp_load) / total_kwh
+
+
+def _monthly_temperatures(data: ConsumptionManualInput):
+    """
+    Monthly mean temperatures at the household's location, which drive the heat pump component:
+    PVGIS T2m, or a climatology for the location if PVGIS has none. None (reference climate)
+    without a heat pump or without a location.
+    """
+    if not data.has_heat_pump or data.lat is None or data.lng is None:
+        return None
+    from app.services import pvgis_service
+
+    pvgis_data = pvgis_service.get_pvgis_data(data.lat, data.lng)
+    if not pvgis_data:
+        logger.warning(f"PVGIS unavailable for lat={data.lat}, lng={data.lng}; using the climatology of the location for the heat pump.")
+        return load_synthesis.climatology_temperatures(data.lat)
+    return load_synthesis.monthly_temperatures(pvgis_data)
+
+
+def get_profile_cache_stats() -> Dict[str, Any]:
+    """Size and hit statistics of the per-archetype profile cache."""
+    info = _archetype_profile.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hit_ratio": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
+
 
 def predict_consumption_manual(data: ConsumptionManualInput) -> ConsumptionOutput:
     """
     Predicts energy consumption based on manual user inputs using heuristics.
     """
     logger.info(f"Predicting consumption manually for: {data.dict()}")
+    timer = metrics_service.StageTimer("consumption_manual")
 
-    # 1. Calculate Annual kWh
-    annual_kwh = (data.occupants * BASE_KWH_PER_PERSON) + \
-                 (data.area_m2 * KWH_PER_M2)
-    if data.has_ev:
-        annual_kwh += KWH_FOR_EV
-    if data.has_heat_pump:
-        annual_kwh += KWH_FOR_HEAT_PUMP
+    # 1. Calculate Annual kWh (the base value and the hourly shape are memoized per archetype)
+    archetype = _archetype(data)
+    load_profile = data.load_profile or profile_library.DEFAULT_PROFILE
+    monthly_t2m = _monthly_temperatures(data)
+    timer.mark("temperatures")
+    base_annual_kwh, hourly_shape = _household_profile(archetype, load_profile, monthly_t2m)
 
     # Add some randomness to make it seem more "estimated"
-    annual_kwh *= random.uniform(0.95, 1.05)
-    annual_kwh = round(annual_kwh, 2)
+    annual_kwh = round(base_annual_kwh * _jitter_factor(archetype), 2)
+    timer.mark("archetype_profile")
 
-    # 2. Calculate Monthly kWh
-    monthly_kwh = [round(annual_kwh * fraction, 2) for fraction in STANDARD_MONTHLY_PROFILE_FRACTIONS]
+    # 2. Calculate Monthly kWh (each month's share of the hourly shape)
+    import numpy as np
+
+    monthly_fractions = time_index.monthly_sums(np.asarray(hourly_shape, dtype=np.float64), time_index.get_time_index(profile_library.get_library().year))
+    monthly_kwh = [round(annual_kwh * fraction, 2) for fraction in monthly_fractions.tolist()]
     # Adjust sum of monthly to match annual due to rounding
     current_monthly_sum = sum(monthly_kwh)
     if current_monthly_sum != annual_kwh:
         diff = annual_kwh - current_monthly_sum
-        monthly_kwh[0] += round(diff, 2) # Add difference to the first month
-
-    # 3. Generate Hourly Profile (8760 values)
-    hourly_profile: List[float] = []
-    for month_idx, monthly_consumption_for_month in enumerate(monthly_kwh):
-        days = DAYS_IN_MONTH[month_idx]
-        daily_consumption = monthly_consumption_for_month / days
-        for _ in range(days): # For each day in the month
-            for hourly_fraction in STANDARD_HOURLY_PROFILE_FRACTIONS_24H:
-                hourly_kwh_value = daily_consumption * hourly_fraction
-                hourly_profile.append(round(hourly_kwh_value, 4)) # Round to Wh or 0.1Wh
+        monthly_kwh[0] = round(monthly_kwh[0] + diff, 2) # Add difference to the first month
+
+    # 3. Generate Hourly Profile (8760 values): the normalized curve scaled to the annual kWh
+    # (in float64: the library stores float32). Checked and adjusted as an array; converted to a list once.
+    hourly = np.round(np.multiply(hourly_shape, annual_kwh, dtype=np.float64), 4) # Round to Wh or 0.1Wh
 
     # Ensure hourly profile has 8760 values (it should by calculation)
-    # And adjust sum of hourly to match annual_kwh due to cumulative rounding
-    current_hourly_sum = sum(hourly_profile)
-    if len(hourly_profile) != 8760:
+    if len(hourly) != 8760:
         # This case should ideally not happen with current logic.
         # If it does, it's a bug in day/month/profile generation.
-        # Fallback: Distribute the annual_kwh flatly or based on a simplified pattern.
-        logger.error(f"Generated hourly profile has {len(hourly_profile)} values, expected 8760. Re-generating flat.")
-        flat_hourly_value = annual_kwh / 8760.0
-        hourly_profile = [round(flat_hourly_value, 4)] * 8760
-        # Recalculate sum after flattening
-        current_hourly_sum = sum(hourly_profile)
-
+        # Fallback: Distribute the annual_kwh flatly.
+        logger.error(f"Generated hourly profile has {len(hourly)} values, expected 8760. Re-generating flat.")
+        hourly = np.full(8760, round(annual_kwh / 8760.0, 4))
 
+    # And adjust sum of hourly to match annual_kwh due to cumulative rounding
+    current_hourly_sum = float(hourly.sum())
     if abs(current_hourly_sum - annual_kwh) > 0.1: # Allow small tolerance for float precision
         logger.warning(f"Sum of generated hourly profile ({current_hourly_sum:.2f} kWh) does not match annual_kwh ({annual_kwh:.2f} kWh). Adjusting...")
         # Simple adjustment: scale all hourly values
         if current_hourly_sum != 0:
-            scaling_factor = annual_kwh / current_hourly_sum
-            hourly_profile = [round(h * scaling_factor, 4) for h in hourly_profile]
+            hourly = np.round(hourly * (annual_kwh / current_hourly_sum), 4)
         else: # Avoid division by zero if somehow sum is 0
-            flat_hourly_value = annual_kwh / 8760.0
-            hourly_profile = [round(flat_hourly_value, 4)] * 8760
-
+            hourly = np.full(8760, round(annual_kwh / 8760.0, 4))
 
     # 4. Calculate Peak Power (kW)
-    # Peak power is the max value in the hourly_profile (which is in kWh per hour, so it's already kW)
-    peak_power_kw = 0.0
-    if hourly_profile:
-        peak_power_kw = round(max(hourly_profile), 2)
+    # Peak power is the max value in the hourly profile (which is in kWh per hour, so it's already kW)
+    if len(hourly):
+        peak_power_kw = round(float(hourly.max()), 2)
     else: # Should not happen if profile is generated
         logger.warning("Hourly profile is empty, cannot determine peak power. Defaulting to a value.")
         peak_power_kw = round((annual_kwh / 8760) * PEAK_FACTOR_RESIDENTIAL, 2)
+    hourly_profile: List[float] = hourly.tolist()
 
+    timer.mark("hourly_profile")
 
     logger.info(f"Manual prediction results: Annual kWh={annual_kwh}, Peak kW={peak_power_kw}")
 
-    return ConsumptionOutput(
+    output = ConsumptionOutput(
         annual_kwh=annual_kwh,
         monthly_kwh=monthly_kwh,
         hourly_profile=hourly_profile,
         peak_power_kw=peak_power_kw
     )
+    timer.mark("build_output")
+    return output
+
+def predict_hourly_profiles(inputs: Sequence[ConsumptionManualInput], monthly_t2m=None, dtype=None):
+    """
+    Hourly profiles of the manual prediction for many households at once (e.g. a portfolio):
+    the components of all the households are synthesized in vectorized passes (one per load
+    profile in use) instead of one prediction each.
+
+    Args:
+        inputs: The households.
+        monthly_t2m: Monthly mean temperatures driving the heat pumps, (12,) for all households
+            or (N, 12); the reference climate if None (the inputs' locations are not looked up).
+        dtype: Dtype of the profiles; float32 by default (35 KB per household).
+
+    Returns:
+        A tuple (annual_kwh, hourly) of numpy arrays with shapes (N,) and (N, 8760); the annual
+        totals (jitter included) match predict_consumption_manual's for the same climate.
+    """
+    import numpy as np
+
+    dtype = dtype or np.float32
+    library = profile_library.get_library()
+    rows = np.array([library.index(d.load_profile or profile_library.DEFAULT_PROFILE) for d in inputs], dtype=np.int64)
+    archetypes = [_archetype(d) for d in inputs]
+    occupants, area_m2, has_ev, has_heat_pump = (np.array(column) for column in zip(*archetypes)) if archetypes else ([],) * 4
+    household_kwh = np.asarray(occupants, dtype=np.float64) * BASE_KWH_PER_PERSON + np.asarray(area_m2, dtype=np.float64) * KWH_PER_M2
+    ev_kwh = np.where(has_ev, float(KWH_FOR_EV), 0.0)
+    hp_kwh = np.where(has_heat_pump, load_synthesis.heat_pump_annual_kwh(KWH_FOR_HEAT_PUMP, monthly_t2m), 0.0)
+    start_hours = np.array([load_synthesis.ev_start_hour_for(_archetype_seed(a)) for a in archetypes], dtype=np.int64)
+    jitter = np.array([_jitter_factor(a) for a in archetypes], dtype=np.float64)
+
+    temps = None if monthly_t2m is None else np.asarray(monthly_t2m, dtype=np.float64)
+    hourly = np.empty((len(rows), profile_library.HOURS_PER_YEAR), dtype=dtype)
+    for row in np.unique(rows):
+        members = np.flatnonzero(rows == row)
+        hourly[members] = load_synthesis.synthesize_households(
+            library.matrix[row], household_kwh[members], ev_kwh[members], hp_kwh[members],
+            temps[members] if temps is not None and temps.ndim == 2 else temps,
+            ev_start_hour=start_hours[members], dtype=dtype,
+        )
+    hourly *= jitter[:, None].astype(dtype)
+    annual_kwh = np.round((household_kwh + ev_kwh + hp_kwh) * jitter, 2)
+    return annual_kwh, hourly
 
-import pandas as pd
-from fastapi import UploadFile
-import io
 
-# Placeholder for CSV prediction logic
-async def predict_consumption_csv(file: UploadFile) -> ConsumptionOutput: # Changed to async
+def _read_hourly_values(text: str, filename: str):
     """
-    Predicts energy consumption based on an uploaded CSV file containing 8760 hourly values.
+    The hourly values of a consumption CSV as a float64 array: the first numeric column,
+    tolerating one header row. Columns are split on ';', tab or '|' when the first line has
+    one of them, and otherwise on ',' only if the file does not parse as a single column
+    (so that a single column with decimal commas is not split in two). Decimal points and
+    decimal commas are both accepted. Raises ValueError if no column is numeric.
+    """
+    import pandas as pd # Lazy import: only the CSV route needs pandas
+
+    lines = (line for line in text.splitlines() if line.strip())
+    first_line = next(lines, None)
+    if first_line is None:
+        raise ValueError("CSV file does not appear to contain any parsable data columns (no columns to parse).")
+    separator = next((sep for sep in (";", "\t", "|") if sep in first_line), None)
+    # (separator, decimal) combinations, in order; ";" on a file without it reads a single column.
+    attempts = [(separator, "."), (separator, ",")] if separator else [(";", "."), (";", ","), (",", ".")]
+
+    best_bad = None # (number of non-numeric rows, first one) of the most numeric column seen
+    for sep, decimal in attempts:
+        try:
+            df = pd.read_csv(io.StringIO(text), header=None, sep=sep, dtype=str, keep_default_na=False, skip_blank_lines=True)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError):
+            continue
+        for column in df.columns:
+            raw = df[column].str.strip()
+            if decimal == ",":
+                raw = raw.str.replace(",", ".", regex=False)
+            values = pd.to_numeric(raw, errors="coerce")
+            bad = values.isna().to_numpy()
+            if not bad[1:].any() and len(values) > int(bad[0]):
+                return values.to_numpy(dtype="float64")[int(bad[0]):] # Without the header row, if any
+            n_bad, first_bad = int(bad[1:].sum()), df[column].iloc[1:][bad[1:]].iloc[0]
+            if best_bad is None or n_bad < best_bad[0]:
+                best_bad = (n_bad, first_bad)
+    if best_bad is None:
+        raise ValueError(f"Could not parse CSV file '{filename}'. Ensure it's a valid CSV.")
+    raise ValueError(f"Error processing CSV file '{filename}': could not convert string to float: '{best_bad[1]}'.")
+
+
+async def predict_consumption_csv(file: UploadFile, year: Optional[int] = None) -> ConsumptionOutput: # Changed to async
+    """
+    Predicts energy consumption based on an uploaded CSV file with one year of hourly values:
+    8760, or 8784 for a leap year, in local time (TIME_INDEX_TIMEZONE; the DST days have 23 and
+    25 rows). `year` is the year of the data, if known; it decides the calendar (month
+    boundaries shift by an hour after the March DST change). Annual and monthly totals cover
+    every value; the hourly profile is a typical year, so it leaves out February 29th.
+    Quarter-hourly files (4 times as many rows, as distributors export them) are summed into
+    hours; their peak power is then the highest quarter-hour average instead of the hourly one.
     """
     logger.info(f"Predicting consumption from CSV file: {file.filename}, content type: {file.content_type}")
+    import numpy as np
+    timer = metrics_service.StageTimer("consumption_csv")
 
     try:
         # Read the file content
         # file.file is a SpooledTemporaryFile, which acts like a file object
         contents = await file.read() # Changed to await
-        # file.file.seek(0) # Reset pointer in case it's needed again, though pandas reads from buffer fine
-                          # For UploadFile, after read(), the stream might be at the end.
-                          # Pandas needs a readable stream from the beginning.
-                          # It's better to pass contents to StringIO or BytesIO.
+        metrics_service.CSV_UPLOAD_BYTES.observe(len(contents))
+        timer.mark("read")
 
         # Attempt to decode contents, assuming UTF-8, but be flexible for common CSV encodings
         try:
-            csv_data_io = io.StringIO(contents.decode('utf-8'))
+            text = contents.decode('utf-8-sig')
         except UnicodeDecodeError:
             logger.warning(f"UTF-8 decoding failed for {file.filename}, trying latin-1.")
-            try:
-                csv_data_io = io.StringIO(contents.decode('latin-1')) # Common alternative
-            except UnicodeDecodeError as ude:
-                logger.error(f"Could not decode CSV {file.filename} with UTF-8 or latin-1: {ude}")
-                raise ValueError(f"File encoding not supported. Please use UTF-8 or Latin-1 for {file.filename}.")
-
-
-        # Use pandas to read the CSV.
-        # We expect a single column of 8760 values.
-        # Try to be robust against common separators and decimal formats.
-        # Pass the 'contents' (bytes) directly to BytesIO for pandas
-        try:
-            # Attempt with common separators and standard decimal format
-            # We need to wrap 'contents' (bytes) in a BytesIO object for pandas
-            df = pd.read_csv(io.BytesIO(contents), header=None, sep=None, engine='python', decimal='.')
-
-            if df.shape[1] == 1 and pd.api.types.is_numeric_dtype(df.iloc[:, 0]):
-                 hourly_profile_kw = df.iloc[:, 0].astype(float).tolist()
-            # If not a single numeric column, try with comma as decimal
-            elif df.shape[1] > 0 : # Check if there's at least one column
-                logger.info(f"Initial parse of {file.filename} (decimal='.') resulted in {df.shape[1]} cols or non-numeric first col. Trying decimal=',', or taking first numeric column.")
-                try:
-                    df_alt = pd.read_csv(io.BytesIO(contents), header=None, sep=None, engine='python', decimal=',')
-                    if df_alt.shape[1] == 1 and pd.api.types.is_numeric_dtype(df_alt.iloc[:, 0]):
-                        hourly_profile_kw = df_alt.iloc[:, 0].astype(float).tolist()
-                    elif df_alt.shape[1] > 0 and pd.api.types.is_numeric_dtype(df_alt.iloc[:, 0]): # Take first col if numeric
-                        logger.info(f"Using first column of {df_alt.shape[1]} columns from {file.filename} (parsed with decimal ',').")
-                        hourly_profile_kw = df_alt.iloc[:, 0].astype(float).tolist()
-                    # Fallback to first df if its first column is numeric
-                    elif df.shape[1] > 0 and pd.api.types.is_numeric_dtype(df.iloc[:, 0]):
-                        logger.info(f"Using first column of {df.shape[1]} columns from {file.filename} (original parse with decimal '.').")
-                        hourly_profile_kw = df.iloc[:, 0].astype(float).tolist()
-                    else:
-                        raise ValueError("Could not identify a single numeric column for hourly data after trying common decimal separators.")
-                except Exception as e_alt_parse:
-                    # If alternative parsing also fails, and original first column was not numeric
-                    if not (df.shape[1] > 0 and pd.api.types.is_numeric_dtype(df.iloc[:, 0])):
-                         logger.error(f"Alternative parsing for {file.filename} also failed: {e_alt_parse}")
-                         raise ValueError("Could not parse CSV into a usable numeric column.")
-                    # Otherwise, stick with the original df's first column if it was numeric
-                    logger.info(f"Using first column of {df.shape[1]} columns from {file.filename} (original parse with decimal '.').")
-                    hourly_profile_kw = df.iloc[:, 0].astype(float).tolist()
-            else: # df.shape[1] is 0 or first column not numeric
-                 raise ValueError("CSV file does not appear to contain any parsable data columns.")
-
-
-        except pd.errors.ParserError as pe:
-            logger.error(f"Pandas ParserError for {file.filename}: {pe}")
-            raise ValueError(f"Could not parse CSV file '{file.filename}'. Ensure it's a valid CSV. Error: {pe}")
-        except Exception as e:
-            logger.error(f"Error processing CSV {file.filename} with pandas: {e}", exc_info=True)
-            raise ValueError(f"Error processing CSV file '{file.filename}'. Details: {e}")
-
+            text = contents.decode('latin-1') # Any byte sequence is valid latin-1
 
-        # Validate number of values
-        if len(hourly_profile_kw) != 8760:
-            logger.error(f"CSV file '{file.filename}' contains {len(hourly_profile_kw)} rows, expected 8760.")
-            raise ValueError(f"CSV file must contain exactly 8760 hourly values. Found {len(hourly_profile_kw)}.")
+        values = _read_hourly_values(text, file.filename)
+        metrics_service.CSV_UPLOAD_ROWS.observe(len(values))
+        timer.mark("parse")
 
         # Ensure all values are non-negative
-        if any(val < 0 for val in hourly_profile_kw):
+        if (values < 0).any():
             logger.error(f"CSV file '{file.filename}' contains negative consumption values.")
             raise ValueError("Consumption values in CSV cannot be negative.")
 
-        # 1. Hourly Profile (is directly from CSV)
-        # Ensure values are rounded appropriately if needed, though usually they are direct measurements
-        hourly_profile = [round(val, 4) for val in hourly_profile_kw]
+        # Quarter-hourly data: kWh per quarter hour, summed 4 by 4 into hourly kWh
+        peak_power_kw = None
+        if len(values) in (4 * time_index.HOURS_PER_YEAR, 4 * time_index.HOURS_PER_LEAP_YEAR):
+            peak_power_kw = round(float(values.max()) * 4, 2)
+            values = values.reshape(-1, 4).sum(axis=1)
+
+        # Validate number of values
+        try:
+            index = time_index.index_for_hours(len(values), year)
+        except ValueError as e:
+            logger.error(f"CSV file '{file.filename}' contains {len(values)} rows: {e}")
+            raise ValueError(
+                f"CSV file must contain exactly {time_index.HOURS_PER_YEAR} hourly values "
+                f"({time_index.HOURS_PER_LEAP_YEAR} for a leap year), or 4 times as many quarter-hourly ones. "
+                f"Found {len(values)}."
+                + (f" {e}" if year is not None else "")
+            )
+
+        # 1. Hourly Profile (is directly from CSV, as a typical year)
+        hourly_profile: List[float] = np.round(time_index.to_typical_year(values, index), 4).tolist()
 
         # 2. Annual kWh
-        annual_kwh = round(sum(hourly_profile), 2)
+        annual_kwh = round(float(values.sum()), 2)
 
-        # 3. Monthly kWh
-        monthly_kwh: List[float] = []
-        hour_counter = 0
-        for days_in_month_count in DAYS_IN_MONTH:
-            hours_in_month = days_in_month_count * 24
-            month_sum = sum(hourly_profile[hour_counter : hour_counter + hours_in_month])
-            monthly_kwh.append(round(month_sum, 2))
-            hour_counter += hours_in_month
+        # 3. Monthly kWh (calendar months of the data's year, in local time)
+        monthly_kwh: List[float] = np.round(time_index.monthly_sums(values, index), 2).tolist()
 
         # Adjust sum of monthly to match annual due to potential rounding differences
         current_monthly_sum = sum(monthly_kwh)
         if abs(current_monthly_sum - annual_kwh) > 0.01 * len(monthly_kwh): # Tolerate small diffs
             diff = annual_kwh - current_monthly_sum
-            monthly_kwh[0] += round(diff, 2) # Add difference to the first month
-
+            monthly_kwh[0] = round(monthly_kwh[0] + diff, 2) # Add difference to the first month
 
         # 4. Peak Power (kW)
-        peak_power_kw = round(max(hourly_profile), 2) if hourly_profile else 0.0
+        if peak_power_kw is None:
+            peak_power_kw = round(float(values.max()), 2) if len(values) else 0.0
+        timer.mark("aggregate")
 
         logger.info(f"Successfully processed CSV '{file.filename}': Annual kWh={annual_kwh}, Peak kW={peak_power_kw}")
 
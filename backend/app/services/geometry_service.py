@@ -1,10 +1,15 @@
 import logging
-import numpy as np
+import os
 from typing import List, Tuple, Dict, Any
 from app.schemas.location import RoofSection # For type hinting and structure
 
 logger = logging.getLogger(__name__)
 
+# Roof area per kWp when no module is given (see estimate_max_kwp).
+DEFAULT_M2_PER_KWP = 6.5
+# Share of a roof's area that modules can cover (setbacks, walkways, gaps between rows).
+ROOF_PACKING_FACTOR = float(os.getenv("ROOF_PACKING_FACTOR", "0.75"))
+
 # Placeholder for potential future libraries like shapely for geometric operations
 # from shapely.geometry import Polygon, Point
 # from shapely.ops import transform
@@ -182,7 +187,7 @@ def calculate_shading_factors(
     return mock_monthly_shading, annual_shading
 
 
-def estimate_max_kwp(total_roof_area: float, panel_efficiency_factor: float = 0.180) -> float:
+def estimate_max_kwp(total_roof_area: float, panel_efficiency_factor: float = 0.180, m2_per_kwp: float = None) -> float:
     """
     Estimates the maximum kWp that can be installed on a given roof area.
 
@@ -191,6 +196,8 @@ def estimate_max_kwp(total_roof_area: float, panel_efficiency_factor: float = 0.
         panel_efficiency_factor: A factor combining panel Wp/m^2 and usable area percentage.
                                  E.g., 180 Wp/m^2 = 0.180 kWp/m^2.
                                  Alternatively, typical panel area (e.g. 1.7m x 1.0m = 1.7m^2 for a 330Wp panel -> ~5.15 m^2/kWp)
+        m2_per_kwp: Roof area needed per kWp, e.g. from a catalog module (see
+                    production_service.max_kwp_for_module); DEFAULT_M2_PER_KWP if not given.
 
     Returns:
         Estimated maximum kWp.
@@ -202,7 +209,7 @@ def estimate_max_kwp(total_roof_area: float, panel_efficiency_factor: float = 0.
     # 2.5 panels * 1.925 m^2/panel = ~4.8 m^2 per kWp.
     # Let's use a slightly more conservative value like 6.0 to 6.5 m^2/kWp to account for spacing, etc.
 
-    m2_per_kwp = 6.5
+    m2_per_kwp = m2_per_kwp or DEFAULT_M2_PER_KWP
     if total_roof_area <= 0 or m2_per_kwp <=0:
         return 0.0
 
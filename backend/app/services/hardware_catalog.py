@@ -0,0 +1,168 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# numpy (and pandas, to import a catalog CSV) are imported lazily (see consumption_service).
+
+logger = logging.getLogger(__name__)
+
+# Catalog of PV modules and inverters. The specs are kept as two structured NumPy arrays, built
+# once per process, so that choosing hardware for many systems is a vectorized lookup
+# (np.searchsorted over the inverter powers) rather than a loop over dicts.
+
+# Optional CSV adding (or replacing, by id) entries: header with a "kind" column (module or
+# inverter) and the fields of MODULE_FIELDS / INVERTER_FIELDS.
+HARDWARE_CATALOG_PATH = os.getenv("HARDWARE_CATALOG_PATH", "")
+DEFAULT_MODULE = os.getenv("HARDWARE_DEFAULT_MODULE", "generic_mono_450")
+
+MODULE_FIELDS = [
+    ("id", "U40"),
+    ("description", "U80"),
+    ("power_w", "f8"), # Nominal power at STC
+    ("length_m", "f8"),
+    ("width_m", "f8"),
+    ("gamma_pmax", "f8"), # Power temperature coefficient, 1/°C (e.g. -0.0034 = -0.34 %/°C)
+    ("noct_c", "f8"), # Nominal operating cell temperature
+    ("price_eur", "f8"),
+]
+INVERTER_FIELDS = [
+    ("id", "U40"),
+    ("description", "U80"),
+    ("ac_kw", "f8"), # Rated AC output: production above it is clipped
+    ("max_dc_kw", "f8"), # Maximum PV power it accepts
+    ("efficiency", "f8"), # Weighted (European) efficiency
+    ("phases", "i8"),
+    ("price_eur", "f8"),
+]
+
+# Representative generic hardware; real product data can be loaded with HARDWARE_CATALOG_PATH.
+BUILTIN_MODULES = [
+    ("generic_mono_410", "Monocrystalline PERC 410 W, 108 half-cells", 410, 1.722, 1.134, -0.0035, 45, 95),
+    ("generic_mono_450", "Monocrystalline PERC 450 W, 120 half-cells", 450, 1.903, 1.134, -0.0034, 45, 105),
+    ("generic_ntype_435", "N-type TOPCon 435 W, 108 half-cells", 435, 1.762, 1.134, -0.0029, 43, 115),
+    ("generic_poly_330", "Polycrystalline 330 W, 60 cells", 330, 1.684, 1.002, -0.0040, 46, 70),
+]
+BUILTIN_INVERTERS = [
+    ("generic_3kw", "Single-phase string inverter 3 kW", 3.0, 4.5, 0.965, 1, 650),
+    ("generic_3_6kw", "Single-phase string inverter 3.68 kW", 3.68, 5.5, 0.970, 1, 750),
+    ("generic_5kw", "Single-phase string inverter 5 kW", 5.0, 7.5, 0.972, 1, 900),
+    ("generic_6kw", "Single-phase string inverter 6 kW", 6.0, 9.0, 0.973, 1, 1000),
+    ("generic_8kw_3ph", "Three-phase string inverter 8 kW", 8.0, 12.0, 0.975, 3, 1350),
+    ("generic_10kw_3ph", "Three-phase string inverter 10 kW", 10.0, 15.0, 0.977, 3, 1550),
+]
+
+
+class HardwareCatalog(NamedTuple):
+    """Modules and inverters as read-only structured arrays; inverters sorted by ac_kw."""
+    modules: Any
+    inverters: Any
+
+    def module(self, module_id: str):
+        """The record of a module (fields of MODULE_FIELDS). Raises ValueError if unknown."""
+        return self._find(self.modules, module_id, "module")
+
+    def inverter(self, inverter_id: str):
+        """The record of an inverter (fields of INVERTER_FIELDS). Raises ValueError if unknown."""
+        return self._find(self.inverters, inverter_id, "inverter")
+
+    def select_inverters(self, dc_kw, dc_ac_ratio: float):
+        """
+        For each DC power, the index (into inverters) and number of identical inverters in parallel:
+        the smallest single inverter with ac_kw >= dc_kw / dc_ac_ratio and max_dc_kw >= dc_kw or,
+        above the largest one, as many of the largest as are needed for both limits.
+        """
+        import numpy as np
+
+        dc = np.asarray(dc_kw, dtype=np.float64)
+        wanted = dc / dc_ac_ratio
+        # (powers x inverters) mask of the inverters that meet both limits; inverters are sorted by
+        # ac_kw, so the first one that fits is the smallest
+        fits = ((self.inverters["ac_kw"] >= wanted[..., np.newaxis] - 1e-9)
+                & (self.inverters["max_dc_kw"] >= dc[..., np.newaxis] - 1e-9))
+        index = np.where(fits.any(axis=-1), fits.argmax(axis=-1), len(self.inverters) - 1)
+        return index, self.parallel_count(dc, index, dc_ac_ratio)
+
+    def parallel_count(self, dc_kw, index, dc_ac_ratio: Optional[float] = None):
+        """Number of inverters `index` needed for dc_kw: within max_dc_kw (and ac_kw >= dc_kw / ratio, if given)."""
+        import numpy as np
+
+        dc = np.asarray(dc_kw, dtype=np.float64)
+        inverters = self.inverters[index]
+        count = np.ceil(dc / inverters["max_dc_kw"] - 1e-9)
+        if dc_ac_ratio is not None:
+            count = np.maximum(count, np.ceil(dc / dc_ac_ratio / inverters["ac_kw"] - 1e-9))
+        return np.maximum(count, 1).astype(np.int64)
+
+    def describe(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            "modules": [_record_dict(m) for m in self.modules],
+            "inverters": [_record_dict(i) for i in self.inverters],
+        }
+
+    @staticmethod
+    def _find(array, item_id: str, kind: str):
+        import numpy as np
+
+        found = np.flatnonzero(array["id"] == item_id)
+        if not len(found):
+            raise ValueError(f"Unknown {kind} '{item_id}'. Available: {', '.join(array['id'])}.")
+        return array[found[0]]
+
+
+def _record_dict(record) -> Dict[str, Any]:
+    return {name: record[name].item() for name in record.dtype.names}
+
+
+def read_catalog_csv(path: str) -> Dict[str, List[tuple]]:
+    """Module and inverter rows of a catalog CSV (see HARDWARE_CATALOG_PATH). Raises ValueError for missing columns."""
+    import pandas as pd # Lazy import: only needed for custom catalogs
+
+    df = pd.read_csv(path, sep=None, engine="python")
+    df.columns = [str(c).strip() for c in df.columns]
+    rows: Dict[str, List[tuple]] = {"module": [], "inverter": []}
+    for kind, fields in (("module", MODULE_FIELDS), ("inverter", INVERTER_FIELDS)):
+        part = df[df["kind"].astype(str).str.strip().str.lower() == kind] if "kind" in df.columns else df.iloc[0:0]
+        if part.empty:
+            continue
+        missing = [name for name, _ in fields if name not in part.columns and name != "description"]
+        if missing:
+            raise ValueError(f"{path} has {kind} rows without column(s) {', '.join(missing)}.")
+        part = part.assign(description=part["description"] if "description" in part.columns else "").fillna({"description": ""})
+        rows[kind] = list(part[[name for name, _ in fields]].itertuples(index=False, name=None))
+    return rows
+
+
+def build_catalog(extra: Optional[Dict[str, List[tuple]]] = None) -> HardwareCatalog:
+    """The built-in catalog plus `extra` rows (kind -> tuples in field order; same ids replace built-ins)."""
+    import numpy as np
+
+    arrays = []
+    for kind, builtin, fields in (("module", BUILTIN_MODULES, MODULE_FIELDS), ("inverter", BUILTIN_INVERTERS, INVERTER_FIELDS)):
+        by_id = {row[0]: tuple(row) for row in builtin}
+        by_id.update({str(row[0]): tuple(row) for row in (extra or {}).get(kind, [])})
+        array = np.array(list(by_id.values()), dtype=fields)
+        if kind == "module" and ((array["power_w"] <= 0) | (array["length_m"] <= 0) | (array["width_m"] <= 0)).any():
+            raise ValueError("Module power and dimensions must be positive.")
+        if kind == "inverter":
+            if ((array["ac_kw"] <= 0) | (array["efficiency"] <= 0) | (array["efficiency"] > 1)).any():
+                raise ValueError("Inverter power must be positive and its efficiency in (0, 1].")
+            array = array[np.argsort(array["ac_kw"], kind="stable")]
+        array.setflags(write=False)
+        arrays.append(array)
+    return HardwareCatalog(*arrays)
+
+
+@lru_cache(maxsize=1)
+def get_catalog() -> HardwareCatalog:
+    """The process-wide catalog: built-ins plus HARDWARE_CATALOG_PATH if set (loaded once)."""
+    extra = None
+    if HARDWARE_CATALOG_PATH:
+        extra = read_catalog_csv(HARDWARE_CATALOG_PATH)
+        logger.info(f"Loaded {len(extra['module'])} modules and {len(extra['inverter'])} inverters from {HARDWARE_CATALOG_PATH}.")
+    return build_catalog(extra)
+
+
+def m2_per_kwp(module) -> float:
+    """Module area per kWp of a catalog module record."""
+    return float(module["length_m"] * module["width_m"] / (module["power_w"] / 1000.0))
@@ -0,0 +1,422 @@
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+from app.db import database
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# --- Configuration (environment variables) ---
+# Worker processes started by the API on the first submitted job (0: the API only enqueues, and
+# the jobs are run by a separate worker: python -m app.services.job_service --workers N). With
+# several API processes (gunicorn), each one starts its own pool: set 0 and run one worker instead.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL_S = float(os.getenv("JOB_POLL_INTERVAL_S", "0.5"))
+# How long finished jobs (and their results) are kept; a job may ask for less or more, up to the max.
+JOB_RESULT_TTL_S = float(os.getenv("JOB_RESULT_TTL_S", "86400"))
+JOB_MAX_RESULT_TTL_S = float(os.getenv("JOB_MAX_RESULT_TTL_S", str(7 * 86400)))
+# Expired jobs are purged (and stale ones reaped) by the workers at most this often.
+JOB_PURGE_INTERVAL_S = float(os.getenv("JOB_PURGE_INTERVAL_S", "60"))
+# A running job holds a lease that its worker renews every JOB_HEARTBEAT_INTERVAL_S. If the
+# lease lapses for JOB_LEASE_S (the worker crashed or was terminated), the job is requeued, or
+# failed once it has been claimed JOB_MAX_ATTEMPTS times.
+JOB_HEARTBEAT_INTERVAL_S = float(os.getenv("JOB_HEARTBEAT_INTERVAL_S", "10"))
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINAL_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobError(Exception):
+    """The job failed in a way worth reporting to the client (invalid parameters, upstream down...)."""
+
+
+# --- Job kinds ---
+# Each kind runs the same service function as the synchronous route and returns a JSON-able dict
+# (the response body of that route). Services are imported inside the runners: they are only
+# needed in the worker processes, and keep heavy imports (pandas) off the API cold start.
+
+def _run_location_analysis(params: Dict[str, Any]) -> Dict[str, Any]:
+    import asyncio
+    from app.responses import dumps
+    from app.services import location_service
+    try:
+        output = asyncio.run(location_service.analyze_location(lat=params["lat"], lng=params["lng"]))
+    except (location_service.UpstreamServiceError, location_service.LocationAnalysisError) as e:
+        raise JobError(str(e)) from e
+    return json.loads(dumps(output))
+
+
+def _run_consumption_manual(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.responses import dumps
+    from app.schemas.consumption import ConsumptionManualInput
+    from app.services import consumption_service
+    try:
+        output = consumption_service.predict_consumption_manual(ConsumptionManualInput(**params))
+    except ValueError as e:
+        raise JobError(str(e)) from e
+    return json.loads(dumps(output))
+
+
+def _run_production_simulate(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.responses import dumps
+    from app.routers import production # Same helper as the synchronous route
+    from app.schemas.production import ProductionSimulateInput
+    from app.services import production_service, pvgis_service
+    input_data = ProductionSimulateInput(**params)
+    pvgis_data = pvgis_service.get_pvgis_data(lat=input_data.lat, lng=input_data.lng, optimal_inclination=True)
+    if production_service.monthly_irradiation(pvgis_data) is None:
+        raise JobError("PVGIS service unavailable, please retry later.")
+    try:
+        output = production._simulate(input_data, pvgis_data)
+    except ValueError as e:
+        raise JobError(str(e)) from e
+    return json.loads(dumps(output))
+
+def _run_layout_pack(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.responses import dumps
+    from app.routers import layout # Same helper as the synchronous route
+    from app.schemas.layout import LayoutInput
+    try:
+        output = layout._pack(LayoutInput(**params))
+    except ValueError as e:
+        raise JobError(str(e)) from e
+    return json.loads(dumps(output))
+
+def _run_battery_simulate(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.responses import dumps
+    from app.routers import battery # Same helper as the synchronous route
+    from app.schemas.battery import BatterySimulationInput
+    try:
+        output = battery._simulate(BatterySimulationInput(**params))
+    except ValueError as e:
+        raise JobError(str(e)) from e
+    return json.loads(dumps(output))
+
+JOB_KINDS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "location_analysis": _run_location_analysis,
+    "consumption_manual": _run_consumption_manual,
+    "production_simulate": _run_production_simulate,
+    "layout_pack": _run_layout_pack,
+    "battery_simulate": _run_battery_simulate,
+}
+
+
+# --- Queue operations (SQLite, table 'jobs': see app/db/migrations.py) ---
+# (Its webhook_url column is no longer used: jobs are followed with GET /jobs/{id} or its SSE stream.)
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+def submit_job(kind: str, params: Dict[str, Any], priority: int = 0, result_ttl_s: Optional[float] = None) -> Dict[str, Any]:
+    """Enqueues a job (params must already be validated for its kind) and returns it."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    ttl_s = min(JOB_RESULT_TTL_S if result_ttl_s is None else result_ttl_s, JOB_MAX_RESULT_TTL_S)
+    job_id = uuid.uuid4().hex
+    conn = database.get_db_connection()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, params, priority, result_ttl_s, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params), priority, ttl_s, time.time()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"Job {job_id} ({kind}) queued with priority {priority}.")
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """The job, or None if it does not exist or its result has expired."""
+    conn = database.get_db_connection()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                           (job_id, time.time())).fetchone()
+    finally:
+        conn.close()
+    return _row_to_job(row) if row else None
+
+
+def cancel_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Cancels a queued or running job (a running job is not interrupted: its result is discarded
+    when it finishes). Finished jobs are left as they are. Returns the job, or None if not found.
+    """
+    now = time.time()
+    conn = database.get_db_connection()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ? + result_ttl_s WHERE id = ? AND status IN (?, ?)",
+            (CANCELLED, now, now, job_id, QUEUED, RUNNING),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return get_job(job_id)
+
+
+def claim_next_job(worker: str) -> Optional[Dict[str, Any]]:
+    """Atomically moves the highest-priority, oldest queued job to 'running' and returns it."""
+    conn = database.get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE") # Write lock first: two workers never claim the same job
+        row = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1", (QUEUED,)).fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        started_at = time.time()
+        conn.execute("UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, worker = ?, attempts = attempts + 1 WHERE id = ?",
+                     (RUNNING, started_at, started_at, worker, row["id"]))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return dict(_row_to_job(row), status=RUNNING, started_at=started_at, heartbeat_at=started_at, worker=worker,
+                attempts=row["attempts"] + 1)
+
+
+def heartbeat_job(job_id: str, worker: str) -> bool:
+    """Renews the lease of a running job; False if the job is no longer running on this worker."""
+    conn = database.get_db_connection()
+    try:
+        cursor = conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ? AND worker = ?",
+                              (time.time(), job_id, RUNNING, worker))
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def reap_stale_jobs(lease_s: Optional[float] = None, worker_prefix: Optional[str] = None) -> int:
+    """
+    Releases running jobs whose lease has lapsed (no heartbeat for lease_s, JOB_LEASE_S by default),
+    or, with worker_prefix, every running job of those workers (known to be dead). They are requeued,
+    or failed once claimed JOB_MAX_ATTEMPTS times. Returns how many jobs were released.
+    """
+    now = time.time()
+    if worker_prefix is not None:
+        stale_sql, stale_args = "worker LIKE ?", (f"{worker_prefix}%",)
+    else:
+        stale_sql, stale_args = "IFNULL(heartbeat_at, started_at) <= ?", (now - (JOB_LEASE_S if lease_s is None else lease_s),)
+    conn = database.get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        failed = conn.execute(
+            f"UPDATE jobs SET status = ?, finished_at = ?, expires_at = ? + result_ttl_s, error = ? "
+            f"WHERE status = ? AND attempts >= ? AND {stale_sql}",
+            (FAILED, now, now, "The worker running the job stopped responding.", RUNNING, JOB_MAX_ATTEMPTS) + stale_args,
+        ).rowcount
+        requeued = conn.execute(
+            f"UPDATE jobs SET status = ?, started_at = NULL, heartbeat_at = NULL, worker = NULL WHERE status = ? AND {stale_sql}",
+            (QUEUED, RUNNING) + stale_args,
+        ).rowcount
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    if failed or requeued:
+        logger.warning(f"Released stale running jobs: {requeued} requeued, {failed} failed.")
+    return failed + requeued
+
+
+def _finish_job(job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+                worker: Optional[str] = None) -> bool:
+    """
+    Stores the outcome of a job running on worker; False if it was cancelled, or reaped from this
+    worker, meanwhile (outcome discarded).
+    """
+    now = time.time()
+    conn = database.get_db_connection()
+    try:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ? + result_ttl_s, result = ?, error = ? WHERE id = ? AND status = ? AND worker IS ?",
+            (status, now, now, json.dumps(result) if result is not None else None, error, job_id, RUNNING, worker),
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def purge_expired_jobs() -> int:
+    """Deletes the finished jobs whose result TTL has elapsed; returns how many."""
+    conn = database.get_db_connection()
+    try:
+        cursor = conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def queue_stats() -> Dict[str, int]:
+    """Number of unexpired jobs (those get_job still returns) in each status."""
+    rows = database.execute_query("SELECT status, COUNT(*) AS count FROM jobs WHERE expires_at IS NULL OR expires_at > ? GROUP BY status",
+                                  (time.time(),))
+    return dict({status: 0 for status in (QUEUED, RUNNING) + FINAL_STATUSES}, **{r["status"]: r["count"] for r in rows})
+
+
+# --- Execution ---
+
+def _renew_lease(job: Dict[str, Any], done: threading.Event) -> None:
+    while not done.wait(JOB_HEARTBEAT_INTERVAL_S):
+        try:
+            if not heartbeat_job(job["id"], job["worker"]):
+                return # Cancelled or reaped: nothing left to renew
+        except sqlite3.Error as e:
+            logger.warning(f"Heartbeat of job {job['id']} failed: {e}")
+
+
+def run_job(job: Dict[str, Any]) -> None:
+    """Runs a claimed job, renewing its lease meanwhile, and stores its result or error."""
+    start = time.perf_counter()
+    done = threading.Event()
+    if job.get("worker"):
+        threading.Thread(target=_renew_lease, args=(job, done), name=f"job-heartbeat-{job['id']}", daemon=True).start()
+    try:
+        result = JOB_KINDS[job["kind"]](job["params"])
+        status, error = SUCCEEDED, None
+    except JobError as e:
+        result, status, error = None, FAILED, str(e)
+    except Exception as e:
+        logger.error(f"Job {job['id']} ({job['kind']}) crashed: {e}", exc_info=True)
+        result, status, error = None, FAILED, f"Unexpected error: {e}"
+    finally:
+        done.set()
+    if not _finish_job(job["id"], status, result, error, job.get("worker")):
+        logger.info(f"Job {job['id']} was cancelled or reaped while running; result discarded.")
+        return
+    logger.info(f"Job {job['id']} ({job['kind']}) {status} in {time.perf_counter() - start:.2f}s.")
+
+
+def run_worker(database_path: Optional[str] = None, stop_event=None, max_jobs: Optional[int] = None) -> int:
+    """
+    Worker loop: claims and runs jobs until stop_event is set (or max_jobs have run, or, with
+    max_jobs, the queue is empty). Returns the number of jobs run. database_path is passed
+    explicitly to worker processes, which do not inherit the parent's runtime configuration.
+    """
+    if database_path is not None:
+        database.DATABASE_PATH = database_path
+        database.DATABASE_DIR = os.path.dirname(database_path)
+    worker = f"{os.getpid()}-{threading.get_ident()}"
+    jobs_run = 0
+    last_purge = 0.0
+    while stop_event is None or not stop_event.is_set():
+        if time.monotonic() - last_purge >= JOB_PURGE_INTERVAL_S:
+            reap_stale_jobs()
+            purge_expired_jobs()
+            last_purge = time.monotonic()
+        job = claim_next_job(worker)
+        if job is None:
+            if max_jobs is not None:
+                break
+            if stop_event is not None:
+                stop_event.wait(JOB_POLL_INTERVAL_S)
+            else:
+                time.sleep(JOB_POLL_INTERVAL_S)
+            continue
+        run_job(job)
+        jobs_run += 1
+        if max_jobs is not None and jobs_run >= max_jobs:
+            break
+    return jobs_run
+
+
+class JobWorkerPool:
+    """Worker processes running run_worker() against the current database."""
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        # spawn, not fork: the API process runs threads (event loop, threadpool) that fork would not copy
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self._processes: List[Any] = []
+
+    def start(self) -> None:
+        reap_stale_jobs() # Jobs left running by workers of a previous run
+        for i in range(self.workers):
+            process = self._context.Process(target=run_worker, args=(database.DATABASE_PATH, self._stop_event),
+                                            name=f"job-worker-{i}", daemon=True)
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Started {self.workers} job worker processes.")
+
+    def stop(self, timeout_s: float = 10.0) -> None:
+        """
+        Stops the workers once their current job finishes. Workers still busy after timeout_s are
+        terminated and their jobs released (requeued) at once rather than when the lease lapses.
+        """
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout_s
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+                reap_stale_jobs(worker_prefix=f"{process.pid}-")
+        self._processes = []
+
+    def alive(self) -> int:
+        return sum(process.is_alive() for process in self._processes)
+
+
+_pool: Optional[JobWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def ensure_worker_pool() -> Optional[JobWorkerPool]:
+    """Starts the embedded worker pool on first use (no-op with JOB_WORKERS=0)."""
+    global _pool
+    if JOB_WORKERS <= 0 or _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = JobWorkerPool(JOB_WORKERS)
+            pool.start()
+            _pool = pool
+    return _pool
+
+
+def stop_worker_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.stop()
+            _pool = None
+
+
+if __name__ == '__main__':
+    # Worker independiente (desde backend/): python -m app.services.job_service --workers 4
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Runs the job worker pool in the foreground.")
+    parser.add_argument("--workers", type=int, default=max(1, JOB_WORKERS))
+    args = parser.parse_args()
+    database.ensure_schema()
+    foreground_pool = JobWorkerPool(args.workers)
+    foreground_pool.start()
+    try:
+        while foreground_pool.alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        foreground_pool.stop()
@@ -0,0 +1,263 @@
+import logging
+import math
+import os
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.services import hardware_catalog
+
+# numpy is imported lazily (see consumption_service).
+
+logger = logging.getLogger(__name__)
+
+# Panel layout by grid rasterization. Each roof section's plan polygon is rotated so that its
+# slope runs along the y axis and stretched by 1/cos(tilt) (distances on the roof plane), then
+# rasterized into cells: inside the polygon (scanline fill) and not within the fire setback of
+# an edge. Modules are laid in rows across the slope: a row fits wherever every cell of its band
+# is usable, found for all rows at once from a cumulative sum of the grid, and each free run
+# of a row takes as many modules as fit at their exact pitch. A few row offsets (and both
+# orientations) are tried and the layout with most modules kept. Cost is linear in the number of
+# cells, so it does not depend on how many panels fit.
+
+# Distance (m) kept free along every edge of a section (access and fire safety).
+LAYOUT_SETBACK_M = float(os.getenv("LAYOUT_SETBACK_M", "0.5"))
+# Gap between adjacent modules (clamps), m.
+LAYOUT_MODULE_GAP_M = float(os.getenv("LAYOUT_MODULE_GAP_M", "0.02"))
+# Extra spacing between rows on flat roofs (tilt below LAYOUT_FLAT_TILT_DEG), where modules sit
+# on racks that would shade the next row.
+LAYOUT_FLAT_TILT_DEG = float(os.getenv("LAYOUT_FLAT_TILT_DEG", "5"))
+LAYOUT_FLAT_ROW_GAP_M = float(os.getenv("LAYOUT_FLAT_ROW_GAP_M", "0.8"))
+# Grid resolution (m); coarsened for large roofs so a section has at most LAYOUT_MAX_CELLS cells.
+LAYOUT_CELL_M = float(os.getenv("LAYOUT_CELL_M", "0.05"))
+LAYOUT_MAX_CELLS = int(os.getenv("LAYOUT_MAX_CELLS", "4000000"))
+# Row offsets tried per orientation.
+LAYOUT_ROW_PHASES = int(os.getenv("LAYOUT_ROW_PHASES", "6"))
+
+ORIENTATIONS = ("portrait", "landscape")
+EARTH_RADIUS_M = 6371008.8
+
+
+class SectionLayout(NamedTuple):
+    """Modules placed on one roof section. centers are (n, 2) in the section polygon's frame."""
+    panels: int
+    orientation: str # portrait: long side along the slope
+    rows: int
+    centers: Any
+    usable_area_m2: float # Roof-plane area inside the setbacks
+    cell_m: float
+
+
+class RoofLayout(NamedTuple):
+    module_id: str
+    module_power_w: float
+    panels: int
+    kwp: float
+    sections: List[SectionLayout]
+
+
+def to_local_metres(points_latlon: Sequence[Tuple[float, float]]):
+    """
+    (lat, lon) points projected to metres (x east, y north) around their mean (equirectangular,
+    accurate at building scale). Returns (xy array, origin) for from_local_metres.
+    """
+    import numpy as np
+
+    points = np.asarray(points_latlon, dtype=np.float64)
+    origin = points.mean(axis=0)
+    scale = np.radians(1) * EARTH_RADIUS_M
+    xy = np.column_stack([(points[:, 1] - origin[1]) * scale * np.cos(np.radians(origin[0])), (points[:, 0] - origin[0]) * scale])
+    return xy, (float(origin[0]), float(origin[1]))
+
+
+def from_local_metres(xy, origin: Tuple[float, float]):
+    """Inverse of to_local_metres: (n, 2) metres to (n, 2) (lat, lon)."""
+    import numpy as np
+
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    scale = np.radians(1) * EARTH_RADIUS_M
+    return np.column_stack([origin[0] + xy[:, 1] / scale, origin[1] + xy[:, 0] / (scale * np.cos(np.radians(origin[0])))])
+
+
+def _roof_frame(azimuth: float, tilt: float):
+    """Plan -> roof-plane transform: rotation putting the downhill direction on -y, then the slope stretch."""
+    import numpy as np
+
+    rho = np.radians(azimuth - 180.0)
+    rotation = np.array([[np.cos(rho), -np.sin(rho)], [np.sin(rho), np.cos(rho)]])
+    stretch = 1.0 / math.cos(math.radians(min(tilt, 80.0)))
+    return rotation, stretch
+
+
+def _rasterize(polygon, cell: float, setback: float):
+    """
+    Usable cells of a polygon (roof-plane metres): centers inside (even-odd scanline fill) and
+    farther than the setback (plus half a cell diagonal, so modules stay out of it) from every edge.
+    Returns (mask (rows, cols), origin (x, y)).
+    """
+    import numpy as np
+
+    lo, hi = polygon.min(axis=0), polygon.max(axis=0)
+    cols, rows = int(math.ceil((hi[0] - lo[0]) / cell)), int(math.ceil((hi[1] - lo[1]) / cell))
+    a, b = polygon, np.roll(polygon, -1, axis=0)
+
+    # Scanline: crossings of each row's center line with every edge, filled pairwise
+    y = lo[1] + (np.arange(rows) + 0.5) * cell
+    ya, yb = a[:, 1][np.newaxis], b[:, 1][np.newaxis]
+    crosses = (ya <= y[:, np.newaxis]) != (yb <= y[:, np.newaxis])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = a[:, 0] + (y[:, np.newaxis] - ya) * (b[:, 0] - a[:, 0]) / (yb - ya)
+    x = np.sort(np.where(crosses, x, np.inf), axis=1)
+    pairs = x.shape[1] // 2
+    first, last = x[:, 0:2 * pairs:2], x[:, 1:2 * pairs:2]
+    valid = np.isfinite(first) & np.isfinite(last)
+    start = np.clip(np.ceil((first - lo[0]) / cell - 0.5), 0, cols).astype(np.int64)
+    stop = np.clip(np.floor((last - lo[0]) / cell - 0.5) + 1, 0, cols).astype(np.int64)
+    row = np.broadcast_to(np.arange(rows)[:, np.newaxis], valid.shape)
+    change = np.zeros((rows, cols + 1), dtype=np.int32)
+    np.add.at(change, (row[valid], start[valid]), 1)
+    np.add.at(change, (row[valid], stop[valid]), -1)
+    mask = np.cumsum(change[:, :cols], axis=1) > 0
+
+    # Setback: clear the cells near each edge, within the edge's bounding box only
+    reach = setback + cell * 0.71
+    for (x0, y0), (x1, y1) in zip(a, b):
+        c0 = max(int((min(x0, x1) - reach - lo[0]) / cell), 0)
+        c1 = min(int((max(x0, x1) + reach - lo[0]) / cell) + 1, cols)
+        r0 = max(int((min(y0, y1) - reach - lo[1]) / cell), 0)
+        r1 = min(int((max(y0, y1) + reach - lo[1]) / cell) + 1, rows)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        px = lo[0] + (np.arange(c0, c1) + 0.5) * cell
+        py = lo[1] + (np.arange(r0, r1) + 0.5) * cell
+        dx, dy = x1 - x0, y1 - y0
+        t = np.clip(((px[np.newaxis] - x0) * dx + (py[:, np.newaxis] - y0) * dy) / max(dx * dx + dy * dy, 1e-12), 0, 1)
+        near = (px[np.newaxis] - x0 - t * dx) ** 2 + (py[:, np.newaxis] - y0 - t * dy) ** 2 < reach ** 2
+        mask[r0:r1, c0:c1] &= ~near
+    return mask, lo
+
+
+def _pack_rows(free_rows, origin, cell: float, width: float, height: float, gap: float, row_pitch: float, phase: float):
+    """
+    Module centers (roof-plane metres) of rows starting `phase` metres above the grid origin and every row_pitch:
+    in each row, every run of columns free over the whole band takes floor((run + gap) / (width + gap))
+    modules, centred in the run. free_rows is the cumulative count of usable cells down each column.
+    """
+    import numpy as np
+
+    n_rows, cols = free_rows.shape[0] - 1, free_rows.shape[1]
+    starts = phase + np.arange(0, max(n_rows * cell - phase - height, -1) + 1e-9, row_pitch)
+    if not len(starts):
+        return np.empty((0, 2)), 0
+    r0 = np.floor(starts / cell).astype(np.int64)
+    r1 = np.minimum(np.ceil((starts + height) / cell).astype(np.int64), n_rows)
+    band_free = (free_rows[r1] - free_rows[r0]) == (r1 - r0)[:, np.newaxis] # (bands, cols)
+
+    padded = np.zeros((len(starts), cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = band_free
+    edges = np.diff(padded, axis=1)
+    band, run_start = np.nonzero(edges == 1)
+    _, run_stop = np.nonzero(edges == -1) # Same order: row-major, one stop per start
+    length = (run_stop - run_start) * cell
+    count = np.floor((length + gap) / (width + gap) + 1e-9).astype(np.int64)
+    keep = count > 0
+    band, run_start, length, count = band[keep], run_start[keep], length[keep], count[keep]
+    if not count.sum():
+        return np.empty((0, 2)), 0
+
+    # Repeat each run once per module and number the modules within their run
+    first = origin[0] + run_start * cell + (length - (count * (width + gap) - gap)) / 2
+    k = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    x = np.repeat(first, count) + k * (width + gap) + width / 2
+    y = origin[1] + np.repeat(starts[band], count) + height / 2
+    return np.column_stack([x, y]), int(len(np.unique(band)))
+
+
+def pack_section(polygon_m, module_length_m: float, module_width_m: float, tilt: float = 0.0, azimuth: float = 180.0,
+                 orientation: str = "auto", setback_m: Optional[float] = None, gap_m: Optional[float] = None,
+                 row_gap_m: Optional[float] = None) -> SectionLayout:
+    """
+    Packs rectangular modules into one roof section.
+
+    Args:
+        polygon_m: Plan (horizontal projection) polygon of the section, (n, 2) metres (x east, y north).
+        module_length_m, module_width_m: Module dimensions.
+        tilt, azimuth: Slope of the section (degrees; azimuth of the downhill direction, 0=N, 180=S).
+        orientation: "portrait", "landscape" or "auto" (whichever fits more modules).
+        setback_m, gap_m: Free distance along the edges and between modules (LAYOUT_SETBACK_M, LAYOUT_MODULE_GAP_M).
+        row_gap_m: Extra spacing between rows; LAYOUT_FLAT_ROW_GAP_M on flat roofs, 0 otherwise.
+
+    Returns the layout with module centers in the plan frame of polygon_m. Raises ValueError
+    for degenerate polygons or an unknown orientation.
+    """
+    import numpy as np
+
+    polygon = np.asarray(polygon_m, dtype=np.float64).reshape(-1, 2)
+    if len(polygon) > 3 and np.allclose(polygon[0], polygon[-1]):
+        polygon = polygon[:-1] # Closed rings (GeoJSON/OSM) repeat the first vertex
+    if len(polygon) < 3 or not np.isfinite(polygon).all():
+        raise ValueError("A roof section polygon needs at least 3 finite vertices.")
+    if orientation not in ORIENTATIONS + ("auto",):
+        raise ValueError(f"Orientation must be one of {', '.join(ORIENTATIONS)} or auto.")
+    setback = LAYOUT_SETBACK_M if setback_m is None else setback_m
+    gap = LAYOUT_MODULE_GAP_M if gap_m is None else gap_m
+    flat = tilt < LAYOUT_FLAT_TILT_DEG
+    row_gap = (LAYOUT_FLAT_ROW_GAP_M if flat else 0.0) if row_gap_m is None else row_gap_m
+
+    rotation, stretch = _roof_frame(azimuth, tilt)
+    center = polygon.mean(axis=0)
+    plane = (polygon - center) @ rotation.T * [1.0, stretch]
+    extent = plane.max(axis=0) - plane.min(axis=0)
+    cell = max(LAYOUT_CELL_M, math.sqrt(extent[0] * extent[1] / LAYOUT_MAX_CELLS))
+    mask, origin = _rasterize(plane, cell, setback)
+    free_rows = np.zeros((mask.shape[0] + 1, mask.shape[1]), dtype=np.int32)
+    np.cumsum(mask, axis=0, out=free_rows[1:])
+    used_rows = np.flatnonzero(mask.any(axis=1))
+    first_row = used_rows[0] if len(used_rows) else 0 # Rows are laid from the first usable one
+
+    best = (np.empty((0, 2)), 0, "portrait")
+    for name in (ORIENTATIONS if orientation == "auto" else (orientation,)):
+        width, height = (module_width_m, module_length_m) if name == "portrait" else (module_length_m, module_width_m)
+        pitch = height + max(gap, row_gap)
+        for phase in first_row * cell + np.linspace(0, pitch, LAYOUT_ROW_PHASES, endpoint=False):
+            centers, rows = _pack_rows(free_rows, origin, cell, width, height, gap, pitch, phase)
+            if len(centers) > len(best[0]):
+                best = (centers, rows, name)
+
+    centers, rows, name = best
+    plan = (centers / [1.0, stretch]) @ rotation + center # Back to the plan frame
+    return SectionLayout(
+        panels=len(centers),
+        orientation=name,
+        rows=rows,
+        centers=plan,
+        usable_area_m2=round(float(mask.sum()) * cell * cell, 2),
+        cell_m=round(cell, 4),
+    )
+
+
+def square_polygon(area_m2: float):
+    """Plan polygon of a square section of the given area, for sections known only by their area."""
+    side = math.sqrt(max(area_m2, 0.0))
+    return [(0.0, 0.0), (side, 0.0), (side, side), (0.0, side)]
+
+
+def layout_roof(sections: Sequence[dict], module_id: Optional[str] = None, orientation: str = "auto",
+                setback_m: Optional[float] = None, gap_m: Optional[float] = None, row_gap_m: Optional[float] = None) -> RoofLayout:
+    """
+    Layout of catalog modules on several sections, each a dict with polygon_m ((n, 2) plan
+    metres), tilt and azimuth.
+    """
+    module = hardware_catalog.get_catalog().module(module_id or hardware_catalog.DEFAULT_MODULE)
+    layouts = [
+        pack_section(s["polygon_m"], float(module["length_m"]), float(module["width_m"]), s.get("tilt", 0.0),
+                     s.get("azimuth", 180.0), orientation=orientation, setback_m=setback_m, gap_m=gap_m, row_gap_m=row_gap_m)
+        for s in sections
+    ]
+    panels = sum(layout.panels for layout in layouts)
+    logger.info(f"Laid out {panels} modules of {module['id']} on {len(layouts)} roof sections.")
+    return RoofLayout(
+        module_id=str(module["id"]),
+        module_power_w=float(module["power_w"]),
+        panels=panels,
+        kwp=round(panels * float(module["power_w"]) / 1000, 3),
+        sections=layouts,
+    )
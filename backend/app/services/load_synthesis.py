@@ -0,0 +1,267 @@
+import logging
+import math
+import os
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from app.services import profile_library
+
+# numpy is imported lazily (see consumption_service).
+
+logger = logging.getLogger(__name__)
+
+# Additive synthesis of appliance loads: each component (EV charging, heat pump) is generated as
+# an (households x 8760) array with vectorized operations over households and days, and the
+# household load is the sum of the components. Every function takes arrays of N households
+# (scalars broadcast), so a whole portfolio of households is synthesized in one call.
+
+HOURS_PER_YEAR = profile_library.HOURS_PER_YEAR
+
+# --- EV charging ---
+# Home charger power (kW). Each day's energy is charged at this power from the start hour on,
+# so the load is a block of full-power hours ending in a partial one.
+EV_CHARGER_KW = float(os.getenv("EV_CHARGER_KW", "7.4"))
+# Hours at which charging starts (plug-in when arriving home), spread across households.
+EV_START_HOURS = tuple(int(h) for h in os.getenv("EV_START_HOURS", "19,20,21,22").split(","))
+# Daily charging energy of (workday, saturday, holiday), relative: fewer kilometres at weekends.
+EV_DAY_WEIGHTS = (1.0, 0.7, 0.6)
+
+# --- Heat pump ---
+# Monthly mean outdoor temperatures (°C, Jan-Dec) of the climate KWH_FOR_HEAT_PUMP refers to
+# (central Spain); with other temperatures the heat pump's annual kWh scales with its demand.
+REFERENCE_MONTHLY_T2M = (5.0, 6.0, 9.0, 12.0, 16.0, 20.0, 23.0, 22.0, 18.0, 14.0, 9.0, 6.0)
+# Latitude and elevation of that reference climate, and the corrections that move it elsewhere
+# when PVGIS gives no temperatures (its PVcalc monthly output usually has no T2m).
+REFERENCE_LATITUDE = 40.4
+REFERENCE_ELEVATION_M = 650.0
+LATITUDE_GRADIENT_C_PER_DEG = 0.6
+LAPSE_RATE_C_PER_M = 0.0065
+HP_HEATING_BASE_C = float(os.getenv("HP_HEATING_BASE_C", "15"))
+HP_COOLING_BASE_C = float(os.getenv("HP_COOLING_BASE_C", "24"))
+# Daily swing of the outdoor temperature around the monthly mean (°C): warmest at 15h, coldest at 3h.
+DIURNAL_AMPLITUDE_C = 5.0
+# Share of the heat pump's energy used for domestic hot water, which does not depend on the weather.
+HP_DHW_FRACTION = float(os.getenv("HP_DHW_FRACTION", "0.2"))
+# Thermostat schedule: heating/cooling demand multiplier per hour (night setback 23-6h).
+HP_SCHEDULE_24H = [0.6] * 6 + [1.0] * 17 + [0.6]
+# Hot water draws (showers in the morning and evening), relative per hour.
+DHW_SHAPE_24H = [0.2, 0.2, 0.2, 0.2, 0.2, 0.4, 1.5, 2.0, 1.5, 0.8, 0.6, 0.6,
+                 0.8, 0.8, 0.6, 0.6, 0.6, 0.8, 1.0, 1.5, 2.0, 1.5, 0.8, 0.4]
+
+
+def _hour_grid():
+    """Per-hour day index, hour of day and day type (0 workday, 1 saturday, 2 sunday/holiday) of the reference year."""
+    import numpy as np
+
+    _, day_type = profile_library.day_calendar()
+    hour_of_day = np.tile(np.arange(24), len(day_type))
+    return np.arange(len(day_type)), hour_of_day, day_type
+
+
+def ev_charging_profiles(annual_kwh, start_hour=None, charger_kw=None, dtype=None):
+    """
+    Hourly EV charging load (kWh) of N households: (N, 8760) array.
+
+    Args:
+        annual_kwh: Annual charging energy per household, shape (N,) or scalar.
+        start_hour: Hour (0-23) charging starts each day, shape (N,) or scalar (default EV_START_HOURS[1]).
+        charger_kw: Charger power, shape (N,) or scalar (default EV_CHARGER_KW).
+        dtype: Output dtype (float64 by default; float32 halves the memory of large batches).
+
+    Charging past midnight continues into the next day (the last night wraps to January 1st),
+    so every row sums to its annual_kwh.
+    """
+    import numpy as np
+
+    dtype = dtype or np.float64
+    annual_kwh = np.atleast_1d(np.asarray(annual_kwh, dtype=np.float64))
+    n = len(annual_kwh)
+    start_hour = np.broadcast_to(np.asarray(EV_START_HOURS[1] if start_hour is None else start_hour, dtype=np.int64), (n,))
+    charger_kw = np.broadcast_to(np.asarray(EV_CHARGER_KW if charger_kw is None else charger_kw, dtype=np.float64), (n,))
+    if (charger_kw <= 0).any() or ((start_hour < 0) | (start_hour > 23)).any():
+        raise ValueError("Charger power must be positive and the start hour between 0 and 23.")
+
+    days, _, day_type = _hour_grid()
+    day_weights = np.asarray(EV_DAY_WEIGHTS)[day_type]
+    daily_kwh = annual_kwh[:, None] * (day_weights / day_weights.sum())[None, :] # (N, 365)
+    max_hours = int(np.ceil((daily_kwh / charger_kw[:, None]).max(initial=0)))
+    if max_hours > 24:
+        raise ValueError(f"Daily charging energy needs {max_hours} h at the charger power; at most 24 h fit in a day.")
+
+    # One vectorized step per charging hour: hour k of each session charges what is left, capped at full power.
+    load = np.zeros((n, HOURS_PER_YEAR + 24), dtype=dtype)
+    rows = np.arange(n)[:, None]
+    first_hour = days[None, :] * 24 + start_hour[:, None]
+    for k in range(max_hours):
+        load[rows, first_hour + k] += np.clip(daily_kwh - charger_kw[:, None] * k, 0, charger_kw[:, None])
+    load[:, :24] += load[:, HOURS_PER_YEAR:]
+    return load[:, :HOURS_PER_YEAR]
+
+
+def hourly_temperatures(monthly_t2m):
+    """
+    Typical hourly outdoor temperatures (°C) from monthly means: the means interpolated
+    linearly between mid-month days plus a daily cosine swing. monthly_t2m has shape (12,)
+    or (N, 12); the result is (N, 8760).
+    """
+    import numpy as np
+
+    monthly_t2m = np.atleast_2d(np.asarray(monthly_t2m, dtype=np.float64))
+    if monthly_t2m.shape[-1] != 12:
+        raise ValueError("Monthly temperatures must have 12 values (January to December).")
+    left, right, frac = _mid_month_interpolation()
+    daily = monthly_t2m[:, left] * (1 - frac) + monthly_t2m[:, right] * frac # (N, 365)
+    _, hour_of_day, _ = _hour_grid()
+    swing = DIURNAL_AMPLITUDE_C * np.cos(2 * np.pi * (hour_of_day - 15) / 24)
+    return np.repeat(daily, 24, axis=1) + swing[None, :]
+
+
+@lru_cache(maxsize=1)
+def _mid_month_interpolation():
+    """For each day: the two mid-month anchors around it (month indices) and its weight towards the second."""
+    import numpy as np
+
+    days_in_month = np.asarray(profile_library.DAYS_IN_MONTH)
+    mid = np.cumsum(days_in_month) - days_in_month / 2 # Day of year (0-based) of each month's middle
+    day = np.arange(days_in_month.sum()) + 0.5
+    right = np.searchsorted(mid, day) % 12
+    left = (right - 1) % 12
+    span = (mid[right] - mid[left]) % 365
+    frac = ((day - mid[left]) % 365) / span
+    return left, right, frac
+
+
+def _heat_pump_demand(temperatures):
+    """Electricity per hour (relative) for space heating/cooling at the given temperatures: thermal demand / COP."""
+    import numpy as np
+
+    heating = np.clip(HP_HEATING_BASE_C - temperatures, 0, None)
+    cooling = np.clip(temperatures - HP_COOLING_BASE_C, 0, None)
+    # Efficiency drops as the temperature lift grows (colder winter hours, hotter summer hours).
+    cop = np.clip(3.2 + 0.08 * (temperatures - 7), 1.8, 5.0)
+    eer = np.clip(3.8 - 0.1 * (temperatures - 27), 2.0, 5.0)
+    schedule = np.tile(np.asarray(HP_SCHEDULE_24H), HOURS_PER_YEAR // 24)
+    return (heating / cop + cooling / eer) * schedule
+
+
+@lru_cache(maxsize=1)
+def _reference_demand() -> float:
+    return float(_heat_pump_demand(hourly_temperatures(REFERENCE_MONTHLY_T2M)).sum())
+
+
+def heat_pump_annual_kwh(reference_kwh, monthly_t2m=None):
+    """
+    Annual heat pump consumption for a climate: the hot water share of reference_kwh as is,
+    and the space heating/cooling share scaled by the climate's demand relative to
+    REFERENCE_MONTHLY_T2M. Shapes as in heat_pump_profiles; returns an (N,) array.
+    """
+    import numpy as np
+
+    reference_kwh = np.atleast_1d(np.asarray(reference_kwh, dtype=np.float64))
+    if monthly_t2m is None:
+        return reference_kwh
+    demand = _heat_pump_demand(hourly_temperatures(monthly_t2m)).sum(axis=1) / _reference_demand()
+    return reference_kwh * (HP_DHW_FRACTION + (1 - HP_DHW_FRACTION) * demand)
+
+
+def heat_pump_profiles(annual_kwh, monthly_t2m=None, dtype=None):
+    """
+    Hourly heat pump load (kWh) of N households: (N, 8760) array whose rows sum to annual_kwh.
+
+    The space heating/cooling share follows degree-hours below HP_HEATING_BASE_C and above
+    HP_COOLING_BASE_C of the hourly temperatures synthesized from monthly_t2m ((12,) or (N, 12),
+    e.g. PVGIS T2m; REFERENCE_MONTHLY_T2M by default), divided by a temperature-dependent COP.
+    The hot water share (HP_DHW_FRACTION) follows DHW_SHAPE_24H every day. If the climate
+    needs no heating or cooling at all, everything is hot water.
+    """
+    import numpy as np
+
+    dtype = dtype or np.float64
+    annual_kwh = np.atleast_1d(np.asarray(annual_kwh, dtype=np.float64))
+    demand = _heat_pump_demand(hourly_temperatures(REFERENCE_MONTHLY_T2M if monthly_t2m is None else monthly_t2m))
+    totals = demand.sum(axis=1, keepdims=True)
+    space_shape = np.divide(demand, totals, out=np.zeros_like(demand), where=totals > 0)
+
+    dhw_shape = np.tile(np.asarray(DHW_SHAPE_24H), HOURS_PER_YEAR // 24)
+    dhw_shape = dhw_shape / dhw_shape.sum()
+    dhw_fraction = np.where(totals[:, 0] > 0, HP_DHW_FRACTION, 1.0)
+
+    load = np.empty((len(annual_kwh), HOURS_PER_YEAR), dtype=dtype)
+    np.multiply(space_shape, (annual_kwh * (1 - dhw_fraction))[:, None], out=load, casting="unsafe")
+    load += ((annual_kwh * dhw_fraction)[:, None] * dhw_shape[None, :]).astype(dtype, copy=False)
+    return load
+
+
+def synthesize_households(base_shape, base_kwh, ev_kwh=0.0, hp_kwh=0.0, monthly_t2m=None, ev_start_hour=None,
+                          charger_kw=None, dtype=None):
+    """
+    Hourly load (kWh) of N households as the sum of their components: (N, 8760) array.
+
+    Args:
+        base_shape: Normalized 8760-hour curve of the household's other uses, shape (8760,)
+            shared by all households or (N, 8760) (e.g. rows of the profile library).
+        base_kwh: Annual kWh of the other uses, (N,) or scalar.
+        ev_kwh: Annual EV charging kWh, (N,) or scalar (0 = no EV).
+        hp_kwh: Annual heat pump kWh, (N,) or scalar (0 = no heat pump), already adjusted to
+            the climate (see heat_pump_annual_kwh).
+        monthly_t2m, ev_start_hour, charger_kw: See heat_pump_profiles and ev_charging_profiles.
+        dtype: Output dtype (float64 by default).
+    """
+    import numpy as np
+
+    dtype = dtype or np.float64
+    base_kwh, ev_kwh, hp_kwh = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (base_kwh, ev_kwh, hp_kwh)))
+    load = np.empty((len(base_kwh), HOURS_PER_YEAR), dtype=dtype)
+    np.multiply(np.asarray(base_shape), base_kwh[:, None], out=load, casting="unsafe")
+
+    # Components are only generated for the households that have them.
+    with_ev = np.flatnonzero(ev_kwh > 0)
+    if len(with_ev):
+        start = None if ev_start_hour is None else np.broadcast_to(ev_start_hour, base_kwh.shape)[with_ev]
+        power = None if charger_kw is None else np.broadcast_to(charger_kw, base_kwh.shape)[with_ev]
+        load[with_ev] += ev_charging_profiles(ev_kwh[with_ev], start, power, dtype=dtype)
+    with_hp = np.flatnonzero(hp_kwh > 0)
+    if len(with_hp):
+        temps = None
+        if monthly_t2m is not None:
+            temps = np.asarray(monthly_t2m, dtype=np.float64)
+            temps = temps[with_hp] if temps.ndim == 2 else temps
+        load[with_hp] += heat_pump_profiles(hp_kwh[with_hp], temps, dtype=dtype)
+    return load
+
+
+def climatology_temperatures(lat: Optional[float] = None, elevation_m: Optional[float] = None) -> Tuple[float, ...]:
+    """
+    Approximate monthly mean temperatures (Jan-Dec): REFERENCE_MONTHLY_T2M, colder away from the
+    equator and with altitude, and with the seasons swapped in the southern hemisphere.
+    """
+    offset = 0.0
+    if lat is not None:
+        offset -= LATITUDE_GRADIENT_C_PER_DEG * (abs(lat) - REFERENCE_LATITUDE)
+    if elevation_m is not None:
+        offset -= LAPSE_RATE_C_PER_M * (elevation_m - REFERENCE_ELEVATION_M)
+    temps = REFERENCE_MONTHLY_T2M if lat is None or lat >= 0 else REFERENCE_MONTHLY_T2M[6:] + REFERENCE_MONTHLY_T2M[:6]
+    return tuple(round(t + offset, 1) for t in temps)
+
+
+def monthly_temperatures(pvgis_data: Optional[Dict[str, Any]]) -> Tuple[float, ...]:
+    """
+    Monthly mean temperatures (Jan-Dec) for a PVGIS PVcalc response: its T2m if every month has a
+    finite one, otherwise climatology_temperatures() at its location (the reference climate if
+    the response has no location either).
+    """
+    months = ((pvgis_data or {}).get("outputs") or {}).get("monthly", {}).get("fixed", [])
+    temps = {m.get("month"): m.get("T2m") for m in months if isinstance(m, dict)}
+    valid = sorted(k for k, v in temps.items() if isinstance(v, (int, float)) and math.isfinite(v))
+    if valid == list(range(1, 13)):
+        return tuple(round(float(temps[month]), 1) for month in range(1, 13))
+    location = ((pvgis_data or {}).get("inputs") or {}).get("location") or {}
+    lat, elevation = location.get("latitude"), location.get("elevation")
+    logger.info(f"PVGIS response has no monthly T2m; using the climatology for lat={lat}, elevation={elevation} m.")
+    return climatology_temperatures(lat, elevation)
+
+
+def ev_start_hour_for(seed: int) -> int:
+    """Deterministic choice among EV_START_HOURS, so synthetic households do not all plug in at once."""
+    return EV_START_HOURS[seed % len(EV_START_HOURS)]
+
@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import os
+from typing import Any, AsyncIterator, Callable, Dict, NamedTuple, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.responses import dumps
+from app.schemas.location import LocationAnalyzeOutput
+from app.services import cache_service, geometry_service, metrics_service, overpass_service, pvgis_service
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Full-response cache of /location/analyze (in-process LRU with TTL). The wizard re-sends the
+# same analysis on every step back/forward; with the ETag, repeated requests get a 304.
+LOCATION_RESPONSE_CACHE_TTL_S = float(os.getenv("LOCATION_RESPONSE_CACHE_TTL_S", "3600"))
+LOCATION_RESPONSE_CACHE_SIZE = int(os.getenv("LOCATION_RESPONSE_CACHE_SIZE", "1024"))
+
+
+class UpstreamServiceError(Exception):
+    """An external data source (Overpass) could not be queried. Mapped to 503 by the router."""
+
+
+class LocationAnalysisError(Exception):
+    """A step of the roof/shading analysis failed. Mapped to 500 by the router."""
+
+
+# Concurrent identical requests (e.g. a campaign link sending hundreds of users to the same
+# building) share one execution: one flight for the whole analysis and one for each upstream call.
+# Keys use the coordinates quantized with cache_service.coord_key, so requests for the same
+# building that differ only below CACHE_COORD_DECIMALS share the result of the first one.
+analysis_flight = SingleFlight("location_analysis")
+upstream_flight = SingleFlight("location_upstream")
+response_cache = cache_service.MemoryCache(max_entries=LOCATION_RESPONSE_CACHE_SIZE, default_ttl_s=LOCATION_RESPONSE_CACHE_TTL_S)
+
+
+class AnalysisResponse(NamedTuple):
+    """Serialized /location/analyze response body and its strong ETag."""
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_output(cls, output: LocationAnalyzeOutput) -> "AnalysisResponse":
+        body = dumps(output) # By alias, like response_model
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+async def _coalesced_upstream_call(namespace: str, fn: Callable[..., Dict[str, Any]], lat: float, lng: float, **params) -> Dict[str, Any]:
+    """Runs a blocking upstream call in the threadpool, coalescing identical concurrent calls."""
+    key = cache_service.make_key(namespace, cache_service.coord_key(lat, lng), *(f"{k}={v}" for k, v in sorted(params.items())))
+    return await upstream_flight.do(key, lambda: run_in_threadpool(fn, lat=lat, lng=lng, **params))
+
+
+class PipelineStage(NamedTuple):
+    """Partial result of the location pipeline: stage name and its JSON-able data (keys by alias)."""
+    name: str
+    data: Any
+
+
+async def run_location_pipeline(lat: float, lng: float) -> LocationAnalyzeOutput:
+    """
+    Runs the full analysis pipeline for one location (see the /location/analyze endpoint).
+    Raises UpstreamServiceError or LocationAnalysisError if a critical step fails.
+    """
+    async for stage in iter_location_pipeline(lat, lng):
+        pass
+    return stage.data
+
+
+async def iter_location_pipeline(lat: float, lng: float) -> AsyncIterator[PipelineStage]:
+    """
+    The analysis pipeline, yielding each stage's result as soon as it is known: "building"
+    (footprint), "roof" (area and sections), "pvgis" (optimal tilt), "shading", "max_kwp"
+    and finally "result", whose data is the LocationAnalyzeOutput.
+    Raises UpstreamServiceError or LocationAnalysisError if a critical step fails.
+    """
+    timer = metrics_service.StageTimer("location_analysis")
+
+    # 1. Fetch Geospatial Data (Overpass)
+    try:
+        logger.info("Calling Overpass service...")
+        overpass_data = await _coalesced_upstream_call("overpass", overpass_service.get_building_and_obstacle_data, lat, lng)
+    except Exception as e:
+        logger.error(f"Error calling Overpass service: {e}", exc_info=True)
+        raise UpstreamServiceError(f"Error contacting Overpass service: {e}") from e
+    if not overpass_data:
+        # {} means the call failed or was shed (see upstream_http.request_json) and there was no
+        # previous answer to fall back to. Without buildings the analysis would be meaningless,
+        # and a 503 is not cached, unlike an analysis of an empty roof.
+        raise UpstreamServiceError("Overpass service unavailable, please retry later.")
+    if not overpass_data.get("elements"):
+        logger.warning(f"No elements found from Overpass service for lat={lat}, lng={lng}")
+        # Depending on strictness, could raise 404 here or proceed with defaults/empty results
+        # For now, geometry_service mock might handle empty elements.
+    timer.mark("overpass")
+    target_building = next((el for el in overpass_data.get("elements", []) if el.get("type") == "way" and "building" in el.get("tags", {})), None)
+    yield PipelineStage("building", {
+        "found": target_building is not None,
+        "geometry": target_building.get("geometry") if target_building else None,
+        "tags": target_building.get("tags") if target_building else None,
+    })
+
+    # 2. Analyze Roof Geometry
+    try:
+        logger.info("Calling Geometry service for roof analysis...")
+        total_roof_area, roof_sections, obstacles = geometry_service.analyze_roof_from_overpass_data(
+            overpass_elements=overpass_data.get("elements", []),
+            target_lat=lat,
+            target_lng=lng
+        )
+    except Exception as e:
+        logger.error(f"Error during roof geometry analysis: {e}", exc_info=True)
+        raise LocationAnalysisError(f"Error analyzing roof geometry: {e}") from e
+    timer.mark("roof_geometry")
+    yield PipelineStage("roof", {
+        "roofAreaTotal": total_roof_area,
+        "roofSections": [{"area": rs.area, "azimuth": rs.azimuth, "tilt": rs.tilt} for rs in roof_sections],
+        "obstacles": len(obstacles),
+    })
+
+    # 3. Get PVGIS Data (primarily for optimal tilt, though mock geometry_service might not use it yet)
+    optimal_tilt_from_pvgis = 30.0 # Default
+    try:
+        logger.info("Calling PVGIS service...")
+        pvgis_data = await _coalesced_upstream_call("pvgis", pvgis_service.get_pvgis_data, lat, lng, optimal_inclination=True)
+        if pvgis_data and "inputs" in pvgis_data:
+            # Example path: data['inputs']['mounting_system']['fixed']['slope']['value']
+            optimal_tilt_from_pvgis = pvgis_data.get("inputs", {}).get("mounting_system", {}).get("fixed", {}).get("slope", {}).get("value", 30.0)
+            logger.info(f"Optimal tilt from PVGIS (mock): {optimal_tilt_from_pvgis}")
+        else:
+            logger.warning("Could not retrieve optimal tilt from PVGIS mock data, using default.")
+    except Exception as e:
+        logger.error(f"Error calling PVGIS service: {e}", exc_info=True)
+        # Non-critical for now, can proceed with default tilt. In production, might be a 503.
+    timer.mark("pvgis")
+    yield PipelineStage("pvgis", {"optimalTilt": optimal_tilt_from_pvgis})
+
+    # 4. Calculate Shading (using geometry from step 2 and obstacles)
+    # The mock geometry_service.calculate_shading_factors currently doesn't use target_building_geometry
+    # or optimal_tilt_from_pvgis extensively, but they are passed for future compatibility.
+    try:
+        logger.info("Calling Geometry service for shading calculation...")
+        shading_monthly, shading_annual = geometry_service.calculate_shading_factors(
+            target_building_geometry=target_building if target_building else {},
+            roof_sections=roof_sections,
+            obstacles_data=obstacles,
+            lat=lat
+        )
+    except Exception as e:
+        logger.error(f"Error during shading calculation: {e}", exc_info=True)
+        raise LocationAnalysisError(f"Error calculating shading: {e}") from e
+    timer.mark("shading")
+    yield PipelineStage("shading", {"shadingFactorMonthly": shading_monthly, "shadingFactorAnnual": shading_annual})
+
+    # 5. Estimate Max kWp
+    try:
+        logger.info("Calling Geometry service for max kWp estimation...")
+        max_kwp_calculated = geometry_service.estimate_max_kwp(total_roof_area=total_roof_area)
+    except Exception as e:
+        logger.error(f"Error during max kWp estimation: {e}", exc_info=True)
+        raise LocationAnalysisError(f"Error estimating max kWp: {e}") from e
+    timer.mark("max_kwp")
+    yield PipelineStage("max_kwp", {"maxKwp": max_kwp_calculated})
+
+    # If total_roof_area is 0 or very small, it might indicate no suitable roof was found.
+    if total_roof_area <= 0.1 and not roof_sections: # Using 0.1 as a small threshold
+        logger.warning(f"No significant roof area found for lat={lat}, lng={lng}. Total area: {total_roof_area}")
+        # For now, it will return an output with 0 area and 0 kWp.
+
+    logger.info(f"Successfully analyzed location (using mock services): lat={lat}, lng={lng}")
+
+    # 6. Format Output
+    yield PipelineStage("result", LocationAnalyzeOutput(
+        roof_area_total=total_roof_area,
+        roof_sections=roof_sections,
+        shading_factor_monthly=shading_monthly,
+        shading_factor_annual=shading_annual,
+        max_kwp=max_kwp_calculated
+    ))
+
+
+async def analyze_location(lat: float, lng: float) -> LocationAnalyzeOutput:
+    """
+    Analyzes a location, coalescing concurrent requests for the same (quantized) coordinates
+    into a single pipeline execution whose result is shared by all of them.
+    """
+    key = cache_service.make_key("analyze", cache_service.coord_key(lat, lng))
+    return await analysis_flight.do(key, lambda: run_location_pipeline(lat, lng))
+
+
+async def get_analysis_response(lat: float, lng: float) -> AnalysisResponse:
+    """
+    Serialized analysis for a location, served from the response cache when possible
+    (keyed like analyze_location). On a miss the pipeline runs (coalesced) and the
+    serialized result is cached for LOCATION_RESPONSE_CACHE_TTL_S seconds.
+    """
+    key = cache_service.make_key("analyze", cache_service.coord_key(lat, lng))
+    response = response_cache.get(key)
+    if response is None:
+        response = AnalysisResponse.from_output(await analyze_location(lat, lng))
+        response_cache.set(key, response)
+    return response
+
+
+async def stream_analysis(lat: float, lng: float) -> AsyncIterator[Tuple[str, bytes]]:
+    """
+    (stage name, serialized data) pairs of iter_location_pipeline, for progressive rendering.
+    The final "result" is the /location/analyze body and is stored in the response cache; on a
+    cache hit only "result" is sent. A failure ends the stream with an "error" stage carrying
+    the HTTP status /location/analyze would have answered with.
+    Streams are not coalesced: each one runs its own pipeline (upstream calls are still coalesced).
+    """
+    key = cache_service.make_key("analyze", cache_service.coord_key(lat, lng))
+    response = response_cache.get(key)
+    if response is not None:
+        yield "result", response.body
+        return
+    try:
+        async for stage in iter_location_pipeline(lat, lng):
+            if stage.name == "result":
+                response = AnalysisResponse.from_output(stage.data)
+                response_cache.set(key, response)
+                yield "result", response.body
+            else:
+                yield stage.name, dumps(stage.data)
+    except UpstreamServiceError as e:
+        yield "error", dumps({"status": 503, "detail": str(e)})
+    except LocationAnalysisError as e:
+        yield "error", dumps({"status": 500, "detail": str(e)})
+
+
+def get_coalescing_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit (join) statistics of the location single-flight layers."""
+    return {flight.name: flight.stats() for flight in (analysis_flight, upstream_flight)}
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    """Size and hit statistics of the /location/analyze response cache."""
+    return dict(response_cache.stats(), max_entries=response_cache.max_entries, ttl_s=response_cache.default_ttl_s)
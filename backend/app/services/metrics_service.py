@@ -0,0 +1,223 @@
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Minimal Prometheus-compatible metrics (text exposition format 0.0.4), without external
+# dependencies. Recording a sample costs a lock and a dict lookup (~1 µs).
+# Metrics are per process: with several workers, each scrape of /metrics reflects the worker
+# that served it (Prometheus aggregates them with sum()/rate() across scrapes).
+
+# Latency buckets (seconds): finer than the Prometheus defaults, since most stages take < 10 ms.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Size buckets (bytes) for uploads: 1 KB ... 50 MB.
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Dict[str, str] = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.label_names}, got {tuple(labels)}.")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value, optionally split by labels."""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, plus their sum and count."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (the last one is +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._label_values(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(self._label_values(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, {'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Set of metrics rendered together, plus collectors that produce samples at scrape time."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Callable) -> None:
+        """
+        Adds a function called on every render that returns (name, type, help, samples) tuples,
+        where samples is a list of (labels dict, value). Used for values that already live
+        elsewhere (e.g. cache statistics) so the hot path records nothing extra.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in list(self._collectors):
+            try:
+                families = list(collector())
+            except Exception as e: # A failing collector (e.g. Redis down) must not break /metrics
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by method, route template and status code.", ("method", "route", "status")))
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route template.", ("method", "route")))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "pipeline_stage_duration_seconds", "Duration of each stage of the location and consumption pipelines.", ("pipeline", "stage")))
+UPSTREAM_REQUESTS = REGISTRY.register(Counter(
+    "upstream_requests_total", "Calls to external services (cache misses) by outcome (ok/error).", ("service", "outcome")))
+UPSTREAM_DURATION = REGISTRY.register(Histogram(
+    "upstream_request_duration_seconds", "Latency of calls to external services.", ("service",)))
+CSV_UPLOAD_BYTES = REGISTRY.register(Histogram(
+    "consumption_csv_upload_bytes", "Size of the CSV files uploaded to /consumption/predict/csv.", buckets=SIZE_BUCKETS))
+CSV_UPLOAD_ROWS = REGISTRY.register(Histogram(
+    "consumption_csv_upload_rows", "Number of values parsed from uploaded consumption CSV files.",
+    buckets=(100, 1000, 8760, 8784, 17520, 35040, 100000)))
+
+
+class StageTimer:
+    """
+    Times consecutive stages of a pipeline: each mark(stage) records the time elapsed
+    since the previous mark (or since the timer was created) under that stage name.
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        STAGE_DURATION.observe(now - self._last, pipeline=self.pipeline, stage=stage)
+        self._last = now
+
+
+def instrument_upstream(service: str) -> Callable:
+    """
+    Decorator for functions that call an external service: counts calls by outcome and
+    records their latency. An exception or an empty result (the services return {} on
+    error) counts as an error.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = fn(*args, **kwargs)
+                if result:
+                    outcome = "ok"
+                return result
+            finally:
+                UPSTREAM_DURATION.observe(time.perf_counter() - started, service=service)
+                UPSTREAM_REQUESTS.inc(service=service, outcome=outcome)
+        return wrapper
+    return decorator
+
+
+def render_latest() -> str:
+    """All metrics in Prometheus text exposition format."""
+    return REGISTRY.render()
@@ -1,12 +1,17 @@
-import requests
+import math
 import os
 import logging
+from typing import List, Tuple
 from dotenv import load_dotenv
 
+from app.services import cache_service, metrics_service, upstream_http
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 OVERPASS_API_URL = os.getenv("OVERPASS_API_URL", "https://overpass-api.de/api/interpreter")
+# OpenStreetMap geometry changes slowly; a week-long TTL avoids hammering the public Overpass instances.
+OVERPASS_CACHE_TTL_S = float(os.getenv("OVERPASS_CACHE_TTL_S", str(7 * 24 * 3600)))
 
 def get_building_and_obstacle_data(lat: float, lng: float, building_radius_m: int = 30, obstacles_radius_m: int = 150) -> dict:
     """
@@ -23,7 +28,21 @@ def get_building_and_obstacle_data(lat: float, lng: float, building_radius_m: in
         A dictionary containing GeoJSON-like elements from Overpass,
         or an empty dictionary if an error occurs or no data is found.
         The result will distinguish between 'building' and 'obstacles'.
+        Responses are cached (shared by all workers when CACHE_BACKEND is sqlite/redis),
+        keyed by the coordinates rounded to CACHE_COORD_DECIMALS and the search radii.
     """
+    cache_key = cache_service.make_key(
+        "overpass", cache_service.coord_key(lat, lng), building_radius_m, obstacles_radius_m
+    )
+    return cache_service.cached(
+        cache_key,
+        lambda: _fetch_building_and_obstacle_data(lat, lng, building_radius_m, obstacles_radius_m),
+        ttl_s=OVERPASS_CACHE_TTL_S
+    )
+
+@metrics_service.instrument_upstream("overpass")
+def _fetch_building_and_obstacle_data(lat: float, lng: float, building_radius_m: int, obstacles_radius_m: int) -> dict:
+    """Uncached Overpass request (see get_building_and_obstacle_data)."""
     # Overpass QL query
     # It looks for:
     # 1. Buildings within building_radius_m (target building)
@@ -47,26 +66,21 @@ def get_building_and_obstacle_data(lat: float, lng: float, building_radius_m: in
     """
     logger.info(f"Querying Overpass API for lat={lat}, lng={lng} with building_radius={building_radius_m}m, obstacle_radius={obstacles_radius_m}m")
 
-    # For now, returning mock data as per the plan for initial service implementation
-    # In a real scenario, we would make the HTTP request here.
-    # try:
-    #     response = requests.post(OVERPASS_API_URL, data=query, headers={'Content-Type': 'application/x-www-form-urlencoded'})
-    #     response.raise_for_status() # Raises an exception for HTTP errors
-    #     data = response.json()
-    #     logger.info(f"Successfully received data from Overpass API. Elements found: {len(data.get('elements', []))}")
-
-    #     # Basic processing to distinguish target building from obstacles could happen here or in geometry_service
-    #     # For instance, one might assume the closest/largest building in building_radius_m is the target.
-    #     return data
-    # except requests.exceptions.RequestException as e:
-    #     logger.error(f"Error querying Overpass API: {e}")
-    #     return {"elements": []} # Return empty elements list on error
-    # except ValueError as e: # Handles JSON decoding errors
-    #     logger.error(f"Error decoding JSON from Overpass API: {e}")
-    #     return {"elements": []}
+    if upstream_http.UPSTREAM_LIVE:
+        # Errors return {} (not {"elements": []}) so that failures are never cached.
+        data = upstream_http.request_json("POST", OVERPASS_API_URL, data={"data": query})
+        if data:
+            logger.info(f"Successfully received data from Overpass API. Elements found: {len(data.get('elements', []))}")
+        return data
 
     # --- MOCK DATA ---
-    mock_data = {
+    logger.info("Overpass service returning mock data.")
+    return _mock_data(lat, lng)
+
+
+def _mock_data(lat: float, lng: float) -> dict:
+    """Mock Overpass answer: a target building centred on (lat, lng), a garage and a tree."""
+    return {
         "version": 0.6,
         "generator": "Overpass API 0.7.62.1 a1a91737",
         "osm3s": {
@@ -109,5 +123,61 @@ def get_building_and_obstacle_data(lat: float, lng: float, building_radius_m: in
             }
         ]
     }
-    logger.info("Overpass service returning mock data.")
-    return mock_data
+
+
+
+def get_area_data(points: List[Tuple[float, float]], margin_m: int = 150) -> dict:
+    """
+    Fetches every building and tree in the bounding box of `points` (lat, lng), extended by
+    margin_m, with a single Overpass query. Used by the portfolio analysis to share one fetch
+    among all the addresses of a tile instead of one query per address. Cached like
+    get_building_and_obstacle_data, keyed by the (quantized) bounding box.
+    """
+    south, west, north, east = _bounding_box(points, margin_m)
+    cache_key = cache_service.make_key(
+        "overpass_area", cache_service.coord_key(south, west), cache_service.coord_key(north, east)
+    )
+    return cache_service.cached(
+        cache_key,
+        lambda: _fetch_area_data(points, (south, west, north, east)),
+        ttl_s=OVERPASS_CACHE_TTL_S
+    )
+
+
+def _bounding_box(points: List[Tuple[float, float]], margin_m: int) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of the points, extended by margin_m on every side."""
+    lats = [lat for lat, _ in points]
+    lngs = [lng for _, lng in points]
+    margin_lat = margin_m / 111320.0
+    margin_lng = margin_m / (111320.0 * max(0.01, math.cos(math.radians(max(abs(min(lats)), abs(max(lats)))))))
+    return min(lats) - margin_lat, min(lngs) - margin_lng, max(lats) + margin_lat, max(lngs) + margin_lng
+
+
+@metrics_service.instrument_upstream("overpass")
+def _fetch_area_data(points: List[Tuple[float, float]], bbox: Tuple[float, float, float, float]) -> dict:
+    """Uncached Overpass bounding-box request (see get_area_data)."""
+    south, west, north, east = bbox
+    query = f"""
+    [out:json][timeout:90][bbox:{south},{west},{north},{east}];
+    (
+      way["building"];
+      relation["building"];
+      node["natural"="tree"];
+      way["natural"="tree"];
+    );
+    out geom;
+    """
+    logger.info(f"Querying Overpass API for the area {south:.5f},{west:.5f},{north:.5f},{east:.5f} ({len(points)} addresses)")
+
+    if upstream_http.UPSTREAM_LIVE:
+        data = upstream_http.request_json("POST", OVERPASS_API_URL, data={"data": query})
+        if data:
+            logger.info(f"Successfully received data from Overpass API. Elements found: {len(data.get('elements', []))}")
+        return data
+
+    # --- MOCK DATA --- The mock answer of every point, with unique element ids
+    elements = []
+    for i, (lat, lng) in enumerate(points):
+        for el in _mock_data(lat, lng)["elements"]:
+            elements.append(dict(el, id=el["id"] * 10000 + i))
+    return dict(_mock_data(south, west), elements=elements)
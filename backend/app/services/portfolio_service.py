@@ -0,0 +1,343 @@
+import csv
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from dotenv import load_dotenv
+
+from app.responses import dumps
+from app.services import geometry_service, overpass_service, pvgis_service
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# --- Configuration (environment variables) ---
+# Addresses are grouped in square tiles of PORTFOLIO_TILE_DEG degrees (0.005 ~ 550 m): each tile
+# needs one Overpass query (its bounding box) and one PVGIS call (the optimal tilt barely changes
+# within a few hundred metres) instead of one of each per address.
+PORTFOLIO_TILE_DEG = float(os.getenv("PORTFOLIO_TILE_DEG", "0.005"))
+PORTFOLIO_MAX_ROWS = int(os.getenv("PORTFOLIO_MAX_ROWS", "10000"))
+# Geometry and shading run in this many worker processes (<= 1: in a thread of the caller).
+PORTFOLIO_PROCESSES = int(os.getenv("PORTFOLIO_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# Tiles whose upstream data is fetched at the same time (the upstream guard still applies its rate limits).
+PORTFOLIO_FETCH_CONCURRENCY = int(os.getenv("PORTFOLIO_FETCH_CONCURRENCY", "4"))
+
+BUILDING_RADIUS_M = 30 # Same radii as the single-address analysis (overpass_service defaults)
+OBSTACLES_RADIUS_M = 150
+DEFAULT_TILT = 30.0
+
+LAT_COLUMNS = ("lat", "latitude", "latitud")
+LNG_COLUMNS = ("lng", "lon", "long", "longitude", "longitud")
+ID_COLUMNS = ("id", "ref", "reference", "referencia")
+CSV_COLUMNS = ["row", "id", "lat", "lng", "status", "roofAreaTotal", "shadingFactorAnnual", "maxKwp", "error"]
+
+
+class PortfolioPoint(NamedTuple):
+    """One address of the portfolio: its (1-based) data row, optional client id and coordinates."""
+    row: int
+    id: Optional[str]
+    lat: float
+    lng: float
+
+    @property
+    def key(self) -> str:
+        """Identifies the address across runs (for resuming): the client id, or else the row."""
+        return self.id if self.id else f"row:{self.row}"
+
+
+def _column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    lowered = [h.strip().lower() for h in header]
+    return next((lowered.index(name) for name in names if name in lowered), None)
+
+
+def read_points(content: str) -> Tuple[List[PortfolioPoint], List[Dict[str, Any]]]:
+    """
+    Parses a CSV with a header row naming the latitude and longitude columns (lat/lng,
+    latitude/longitude...) and optionally an id column; ',' and ';' separators are detected.
+    Returns the valid points and an error record for every invalid row.
+    Raises ValueError if the file cannot be used at all.
+    """
+    lines = content.lstrip("\ufeff").splitlines()
+    if not lines:
+        raise ValueError("The CSV file is empty.")
+    delimiter = ";" if lines[0].count(";") > lines[0].count(",") else ","
+    reader = csv.reader(lines, delimiter=delimiter)
+    header = next(reader)
+    lat_col, lng_col, id_col = _column(header, LAT_COLUMNS), _column(header, LNG_COLUMNS), _column(header, ID_COLUMNS)
+    if lat_col is None or lng_col is None:
+        raise ValueError("The CSV file needs a header row with 'lat' and 'lng' (or 'latitude' and 'longitude') columns.")
+
+    points, errors = [], []
+    for row_number, row in enumerate(reader, start=1):
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(points) + len(errors) >= PORTFOLIO_MAX_ROWS:
+            raise ValueError(f"The CSV file has more than {PORTFOLIO_MAX_ROWS} addresses.")
+        point_id = row[id_col].strip() if id_col is not None and id_col < len(row) and row[id_col].strip() else None
+        try:
+            lat = float(row[lat_col].replace(",", ".") if delimiter == ";" else row[lat_col])
+            lng = float(row[lng_col].replace(",", ".") if delimiter == ";" else row[lng_col])
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValueError
+        except (ValueError, IndexError):
+            errors.append({"type": "result", "row": row_number, "id": point_id, "lat": None, "lng": None,
+                           "status": "error", "error": "Invalid or missing coordinates."})
+            continue
+        points.append(PortfolioPoint(row_number, point_id, lat, lng))
+    return points, errors
+
+
+def completed_keys(previous_output: Iterable[str]) -> Set[str]:
+    """
+    Keys of the addresses analyzed successfully in a previous (interrupted) NDJSON or CSV
+    output, which a resumed run skips. Failed addresses are retried.
+    """
+    lines = iter(previous_output)
+    first = next(lines, "").strip()
+    keys = set()
+    if first.startswith("{"): # NDJSON
+        for line in [first, *lines]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # Last line cut by the interruption
+            if record.get("type") == "result" and record.get("status") == "ok":
+                keys.add(record["id"] if record.get("id") else f"row:{record['row']}")
+    elif first:
+        for record in csv.DictReader([first, *lines]):
+            if record.get("status") == "ok":
+                keys.add(record["id"] if record.get("id") else f"row:{record['row']}")
+    return keys
+
+
+def trim_incomplete_tail(path: str) -> int:
+    """
+    Truncates an interrupted NDJSON or CSV output after its last complete line, so that a resumed
+    run appends whole records rather than onto a half-written one. Returns the bytes removed.
+    """
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+    return size - end
+
+
+def tile_key(lat: float, lng: float, tile_deg: float = PORTFOLIO_TILE_DEG) -> Tuple[int, int]:
+    return math.floor(lat / tile_deg), math.floor(lng / tile_deg)
+
+
+def group_by_tile(points: List[PortfolioPoint], tile_deg: float = PORTFOLIO_TILE_DEG) -> "OrderedDict[Tuple[int, int], List[PortfolioPoint]]":
+    """Points grouped by tile, tiles in order of first appearance (so results follow the file roughly)."""
+    tiles: "OrderedDict[Tuple[int, int], List[PortfolioPoint]]" = OrderedDict()
+    for point in points:
+        tiles.setdefault(tile_key(point.lat, point.lng, tile_deg), []).append(point)
+    return tiles
+
+
+def _distance_m(lat: float, lng: float, element: Dict[str, Any]) -> float:
+    """Distance from (lat, lng) to the closest vertex (or the node) of an Overpass element."""
+    vertices = element.get("geometry") or ([{"lat": element["lat"], "lon": element["lon"]}] if "lat" in element else [])
+    cos_lat = math.cos(math.radians(lat))
+    return min((math.hypot((v["lat"] - lat) * 111320.0, (v["lon"] - lng) * 111320.0 * cos_lat) for v in vertices), default=math.inf)
+
+
+def elements_near(elements: List[Dict[str, Any]], lat: float, lng: float,
+                  building_radius_m: int = BUILDING_RADIUS_M, obstacles_radius_m: int = OBSTACLES_RADIUS_M) -> List[Dict[str, Any]]:
+    """
+    The elements of a shared area answer that the single-address Overpass query would have
+    returned for (lat, lng), with the buildings within building_radius_m first, nearest first
+    (geometry_service takes the first building as the target).
+    """
+    near = []
+    for el in elements:
+        distance = _distance_m(lat, lng, el)
+        if distance <= obstacles_radius_m:
+            is_candidate = distance <= building_radius_m and el.get("type") == "way" and "building" in el.get("tags", {})
+            near.append((0 if is_candidate else 1, distance, el))
+    near.sort(key=lambda item: (item[0], item[1]))
+    return [dict(el) for _, _, el in near] # Copies: geometry_service annotates the obstacles
+
+
+def _optimal_tilt(pvgis_data: Dict[str, Any]) -> float:
+    return pvgis_data.get("inputs", {}).get("mounting_system", {}).get("fixed", {}).get("slope", {}).get("value", DEFAULT_TILT) if pvgis_data else DEFAULT_TILT
+
+
+def analyze_tile(points: List[PortfolioPoint], elements: List[Dict[str, Any]], optimal_tilt: float) -> List[Dict[str, Any]]:
+    """
+    Roof geometry, shading and max kWp of every address of a tile, from the tile's shared
+    Overpass elements (same steps and services as location_service.run_location_pipeline).
+    Runs in the worker processes, so it only takes and returns plain data.
+    """
+    results = []
+    for point in points:
+        record = {"type": "result", "row": point.row, "id": point.id, "lat": point.lat, "lng": point.lng}
+        try:
+            point_elements = elements_near(elements, point.lat, point.lng)
+            total_roof_area, roof_sections, obstacles = geometry_service.analyze_roof_from_overpass_data(
+                overpass_elements=point_elements, target_lat=point.lat, target_lng=point.lng
+            )
+            target = next((el for el in point_elements if el.get("type") == "way" and "building" in el.get("tags", {})), None)
+            shading_monthly, shading_annual = geometry_service.calculate_shading_factors(
+                target_building_geometry=target or {}, roof_sections=roof_sections, obstacles_data=obstacles, lat=point.lat
+            )
+            record.update({
+                "status": "ok",
+                "roofAreaTotal": total_roof_area,
+                "roofSections": [{"area": rs.area, "azimuth": rs.azimuth, "tilt": rs.tilt} for rs in roof_sections],
+                "shadingFactorMonthly": shading_monthly,
+                "shadingFactorAnnual": shading_annual,
+                "maxKwp": geometry_service.estimate_max_kwp(total_roof_area=total_roof_area),
+                "optimalTilt": optimal_tilt,
+            })
+        except Exception as e:
+            logger.error(f"Portfolio analysis failed for row {point.row}: {e}", exc_info=True)
+            record.update({"status": "error", "error": f"Error analyzing the roof: {e}"})
+        results.append(record)
+    return results
+
+
+def _fetch_tile(points: List[PortfolioPoint]) -> Tuple[List[Dict[str, Any]], float]:
+    """Shared upstream data of a tile: Overpass elements of its area and the PVGIS optimal tilt at its centre."""
+    area = overpass_service.get_area_data([(p.lat, p.lng) for p in points], margin_m=OBSTACLES_RADIUS_M)
+    if not area:
+        raise ConnectionError("Overpass service unavailable, please retry later.")
+    centre_lat = sum(p.lat for p in points) / len(points)
+    centre_lng = sum(p.lng for p in points) / len(points)
+    try:
+        optimal_tilt = _optimal_tilt(pvgis_service.get_pvgis_data(centre_lat, centre_lng, optimal_inclination=True))
+    except Exception as e: # Non-critical, as in the single-address analysis
+        logger.warning(f"PVGIS failed for a portfolio tile, using the default tilt: {e}")
+        optimal_tilt = DEFAULT_TILT
+    return area.get("elements", []), optimal_tilt
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> Executor:
+    """Shared pool for analyze_tile (a single-thread executor with PORTFOLIO_PROCESSES <= 1)."""
+    global _process_pool
+    if PORTFOLIO_PROCESSES <= 1:
+        return ThreadPoolExecutor(max_workers=1)
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: the API process runs threads that fork would not copy
+            _process_pool = ProcessPoolExecutor(PORTFOLIO_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def _replace_broken_pool(pool: Executor) -> Executor:
+    """Discards a pool whose worker died (BrokenProcessPool: unusable from then on) and returns a new one."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+    return get_process_pool()
+
+
+def _error_results(points: List[PortfolioPoint], error: str) -> List[Dict[str, Any]]:
+    return [{"type": "result", "row": p.row, "id": p.id, "lat": p.lat, "lng": p.lng, "status": "error", "error": error}
+            for p in points]
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+def analyze_portfolio(points: List[PortfolioPoint], skip: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Analyzes the addresses tile by tile and yields records as soon as they are available:
+    {"type": "result", ...} for every address (in completion order) and, after every tile,
+    {"type": "progress", "done", "total", "tiles_done", "tiles", "elapsed_s"}.
+    Addresses whose key is in `skip` (see completed_keys) are not analyzed again.
+    """
+    pending_points = [p for p in points if not skip or p.key not in skip]
+    tiles = group_by_tile(pending_points)
+    total, done, tiles_done = len(pending_points), 0, 0
+    started = time.perf_counter()
+    logger.info(f"Portfolio analysis: {total} addresses in {len(tiles)} tiles ({len(points) - total} skipped).")
+
+    analysis_pool = get_process_pool()
+    with ThreadPoolExecutor(max_workers=PORTFOLIO_FETCH_CONCURRENCY) as fetchers:
+        fetches = {fetchers.submit(_fetch_tile, tile_points): tile_points for tile_points in tiles.values()}
+        analyses = {}
+        pending = set(fetches)
+        try:
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future in fetches:
+                        tile_points = fetches[future]
+                        try:
+                            elements, optimal_tilt = future.result()
+                        except Exception as e:
+                            logger.error(f"Upstream data unavailable for a portfolio tile: {e}")
+                            results = _error_results(tile_points, str(e))
+                        else:
+                            try:
+                                analysis = analysis_pool.submit(analyze_tile, tile_points, elements, optimal_tilt)
+                            except BrokenProcessPool:
+                                analysis_pool = _replace_broken_pool(analysis_pool)
+                                analysis = analysis_pool.submit(analyze_tile, tile_points, elements, optimal_tilt)
+                            analyses[analysis] = tile_points
+                            pending.add(analysis)
+                            continue
+                    else:
+                        try:
+                            results = future.result()
+                        except BrokenProcessPool as e:
+                            # A worker process died (e.g. killed for memory): its tiles fail (a resumed
+                            # run retries them) and the rest go to a new pool
+                            logger.error(f"Portfolio analysis process died: {e}")
+                            analysis_pool = _replace_broken_pool(analysis_pool)
+                            results = _error_results(analyses[future], "Analysis process terminated unexpectedly.")
+                    yield from results
+                    done += len(results)
+                    tiles_done += 1
+                    yield {"type": "progress", "done": done, "total": total, "tiles_done": tiles_done, "tiles": len(tiles),
+                           "elapsed_s": round(time.perf_counter() - started, 3)}
+        finally:
+            for future in pending: # Client gone (generator closed): drop the work not started yet
+                future.cancel()
+            if isinstance(analysis_pool, ThreadPoolExecutor):
+                analysis_pool.shutdown(wait=False)
+
+
+def to_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for record in records:
+        yield dumps(record) + b"\n"
+
+
+def to_csv(records: Iterable[Dict[str, Any]], header: bool = True) -> Iterator[bytes]:
+    """Result records as CSV rows (CSV_COLUMNS; progress records are left out)."""
+    if header:
+        yield (",".join(CSV_COLUMNS) + "\r\n").encode("utf-8")
+    for record in records:
+        if record.get("type") != "result":
+            continue
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(["" if record.get(col) is None else record.get(col) for col in CSV_COLUMNS])
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,270 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.services import hardware_catalog, load_synthesis, time_index
+
+# numpy is imported lazily (see consumption_service).
+
+logger = logging.getLogger(__name__)
+
+# Hourly PV production of a typical year (8760 hours, the grid of PVGIS and the load profiles)
+# in two stages:
+#   1. Plane-of-array irradiance: PVGIS monthly in-plane irradiation (H(i)_m) spread over the
+#      hours of each month following the sun's geometry on the plane (cached per plane).
+#   2. Post-processing, vectorized over the 8760 hours (and over N systems at once): shading
+#      factors, DC losses, module temperature derating from T2m and the inverter's efficiency
+#      and clipping at its AC rating (DC/AC ratio).
+
+# DC losses other than temperature and shading: wiring, mismatch, soiling, degradation.
+PRODUCTION_DC_LOSSES = float(os.getenv("PRODUCTION_DC_LOSSES", "0.08"))
+# DC/AC ratio targeted when the inverter is chosen automatically (the smallest inverter with
+# ac_kw >= dc_kwp / ratio): some clipping at midday in exchange for a cheaper inverter.
+PRODUCTION_TARGET_DC_AC_RATIO = float(os.getenv("PRODUCTION_TARGET_DC_AC_RATIO", "1.2"))
+# Systems beyond one inverter get several identical ones in parallel, up to this many; larger
+# systems are rejected (10 x generic_10kw_3ph: 120 kWp at the target DC/AC ratio with the built-in catalog).
+PRODUCTION_MAX_INVERTERS = int(os.getenv("PRODUCTION_MAX_INVERTERS", "10"))
+# Share of the irradiance shape that follows the sky (diffuse) rather than the direct beam.
+DIFFUSE_FRACTION = 0.3
+PRODUCTION_DEFAULT_TILT = 30.0
+PRODUCTION_DEFAULT_AZIMUTH = 180.0 # Degrees, 0=N, 90=E, 180=S, 270=W (as RoofSection)
+
+
+class ProductionResult(NamedTuple):
+    """Hourly AC production (N, hours) of N systems and their annual energy flows (N,), in kWh."""
+    hourly_ac_kwh: Any
+    dc_kwh: Any # After shading, DC losses and temperature
+    ac_kwh: Any
+    shading_loss_kwh: Any
+    temperature_loss_kwh: Any # Negative when cold modules produce above their rating
+    clipping_loss_kwh: Any
+
+
+class SystemProduction(NamedTuple):
+    """Production of one system with catalog hardware (see simulate_system)."""
+    module_id: str
+    inverter_id: str
+    inverters: int # Identical inverters in parallel
+    panels: int
+    dc_kwp: float
+    ac_kw: float
+    dc_ac_ratio: float
+    tilt: float
+    azimuth: float
+    annual_dc_kwh: float
+    annual_ac_kwh: float
+    specific_yield_kwh_kwp: float
+    shading_loss_kwh: float
+    temperature_loss_kwh: float
+    clipping_loss_kwh: float
+    hardware_cost_eur: float
+    monthly_kwh: List[float]
+    hourly_kwh: Any # (8760,) array
+
+
+@lru_cache(maxsize=256)
+def _plane_weights(lat: float, tilt: float, azimuth: float):
+    """
+    Relative irradiance (read-only, 8760 values, solar time) on a plane: direct beam on the
+    plane attenuated by the air mass, plus an isotropic diffuse share. Cached per plane
+    (callers round the latitude).
+    """
+    import numpy as np
+
+    index = time_index.get_time_index(time_index.TYPICAL_YEAR)
+    phi, beta = np.radians(lat), np.radians(tilt)
+    gamma = np.radians(azimuth - 180.0) # From south, west positive
+    delta = np.radians(23.45) * np.sin(2 * np.pi * (284 + index.day + 1) / 365)
+    omega = np.radians(15.0 * (index.hour + 0.5 - 12))
+
+    cos_zenith = np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.cos(omega)
+    cos_incidence = (
+        np.sin(delta) * np.sin(phi) * np.cos(beta)
+        - np.sin(delta) * np.cos(phi) * np.sin(beta) * np.cos(gamma)
+        + np.cos(delta) * np.cos(phi) * np.cos(beta) * np.cos(omega)
+        + np.cos(delta) * np.sin(phi) * np.sin(beta) * np.cos(gamma) * np.cos(omega)
+        + np.cos(delta) * np.sin(beta) * np.sin(gamma) * np.sin(omega)
+    )
+    up = cos_zenith > 0.01
+    air_mass = np.where(up, 1 / np.where(up, cos_zenith, 1), np.inf)
+    beam = np.where(up, np.clip(cos_incidence, 0, None) * 0.7 ** (air_mass ** 0.678), 0.0)
+    diffuse = np.where(up, DIFFUSE_FRACTION * cos_zenith * (1 + np.cos(beta)) / 2, 0.0)
+    weights = beam + diffuse
+    weights.setflags(write=False)
+    return weights
+
+
+def poa_irradiance(monthly_kwh_m2, lat: float, tilt: float, azimuth: float, reference_plane: Optional[Tuple[float, float]] = None):
+    """
+    Hourly plane-of-array irradiance (W/m², 8760 values) whose monthly sums are monthly_kwh_m2.
+    If the monthly values were measured on another plane (reference_plane = (tilt, azimuth), e.g.
+    PVGIS' optimal one), they are first scaled by the ratio of the two planes' geometric sums.
+    """
+    import numpy as np
+
+    monthly = np.asarray(monthly_kwh_m2, dtype=np.float64)
+    if monthly.shape != (12,) or (monthly < 0).any():
+        raise ValueError("Monthly irradiation must have 12 non-negative values (January to December).")
+    index = time_index.get_time_index(time_index.TYPICAL_YEAR)
+    lat = round(lat, 1)
+    weights = _plane_weights(lat, round(tilt, 1), round(azimuth, 1))
+    sums = time_index.monthly_sums(weights, index)
+    if reference_plane is not None:
+        reference = time_index.monthly_sums(_plane_weights(lat, round(reference_plane[0], 1), round(reference_plane[1], 1)), index)
+        monthly = monthly * np.divide(sums, reference, out=np.ones_like(sums), where=reference > 0)
+    scale = np.divide(monthly * 1000.0, sums, out=np.zeros_like(sums), where=sums > 0)
+    return weights * scale[index.month]
+
+
+def _hourly_shading(shading):
+    """Shading factors (1.0 = no shade) per hour: None, 12 monthly values or 8760 hourly ones."""
+    import numpy as np
+
+    if shading is None:
+        return 1.0
+    shading = np.asarray(shading, dtype=np.float64)
+    if shading.shape[-1] == 12:
+        shading = shading[..., time_index.get_time_index(time_index.TYPICAL_YEAR).month]
+    if shading.shape[-1] != time_index.HOURS_PER_YEAR or (shading < 0).any() or (shading > 1).any():
+        raise ValueError(f"Shading factors must be 12 monthly or {time_index.HOURS_PER_YEAR} hourly values between 0 and 1.")
+    return shading
+
+
+def simulate_production(poa_w_m2, air_temp_c, dc_kwp, ac_kw, inverter_efficiency=0.97, gamma_pmax=-0.0035,
+                        noct_c=45.0, shading=None, dc_losses: Optional[float] = None) -> ProductionResult:
+    """
+    Post-processes plane-of-array irradiance into AC production for N systems at once.
+
+    Args:
+        poa_w_m2: Hourly irradiance (W/m²), (8760,) or (N, 8760).
+        air_temp_c: Hourly air temperature (°C), broadcastable to the irradiance.
+        dc_kwp, ac_kw, inverter_efficiency, gamma_pmax, noct_c: Per system, scalars or (N,).
+        shading: Factors (1.0 = no shade): 12 monthly or 8760 hourly values, or (N, ...) per system.
+        dc_losses: Fraction lost on the DC side besides shading and temperature (PRODUCTION_DC_LOSSES).
+
+    Each hour's energy is its mean power over the hour; the module temperature is the NOCT
+    model (air + (NOCT - 20) / 800 W/m² x irradiance).
+    """
+    import numpy as np
+
+    dc_losses = PRODUCTION_DC_LOSSES if dc_losses is None else dc_losses
+    column = lambda x: np.asarray(x, dtype=np.float64).reshape(-1, 1) # Per-system parameters against the hours
+    poa = np.atleast_2d(np.asarray(poa_w_m2, dtype=np.float64))
+    dc_kwp, ac_kw, efficiency = column(dc_kwp), column(ac_kw), column(inverter_efficiency)
+    if (dc_kwp <= 0).any() or (ac_kw <= 0).any() or not 0 <= dc_losses < 1:
+        raise ValueError("DC and AC power must be positive and DC losses in [0, 1).")
+
+    ideal = dc_kwp * poa / 1000.0 * (1 - dc_losses)
+    shaded = ideal * _hourly_shading(shading)
+    cell_temp = air_temp_c + (column(noct_c) - 20.0) / 800.0 * poa
+    dc = shaded * (1 + column(gamma_pmax) * (cell_temp - 25.0))
+    unclipped = np.clip(dc, 0, None) * efficiency
+    ac = np.minimum(unclipped, ac_kw)
+    return ProductionResult(
+        hourly_ac_kwh=ac,
+        dc_kwh=dc.sum(axis=1),
+        ac_kwh=ac.sum(axis=1),
+        shading_loss_kwh=(ideal - shaded).sum(axis=1),
+        temperature_loss_kwh=(shaded - dc).sum(axis=1),
+        clipping_loss_kwh=(unclipped - ac).sum(axis=1),
+    )
+
+
+def monthly_irradiation(pvgis_data: Dict[str, Any]) -> Optional[Tuple[float, ...]]:
+    """Monthly in-plane irradiation (H(i)_m, kWh/m², Jan-Dec) of a PVGIS PVcalc response, or None if it has none."""
+    months = pvgis_data.get("outputs", {}).get("monthly", {}).get("fixed", []) if pvgis_data else []
+    values = {m.get("month"): m.get("H(i)_m") for m in months if isinstance(m, dict)}
+    if sorted(k for k, v in values.items() if isinstance(v, (int, float))) != list(range(1, 13)):
+        return None
+    return tuple(float(values[month]) for month in range(1, 13))
+
+
+def pvgis_plane(pvgis_data: Dict[str, Any]) -> Tuple[float, float]:
+    """(tilt, azimuth 0=N/180=S) of a PVGIS response's plane (PVGIS azimuths are 0=S, 90=W)."""
+    fixed = pvgis_data.get("inputs", {}).get("mounting_system", {}).get("fixed", {}) if pvgis_data else {}
+    tilt = fixed.get("slope", {}).get("value", PRODUCTION_DEFAULT_TILT)
+    aspect = fixed.get("azimuth", {}).get("value", PRODUCTION_DEFAULT_AZIMUTH - 180.0)
+    return float(tilt), float(aspect) + 180.0
+
+
+def simulate_system(pvgis_data: Dict[str, Any], lat: float, kwp: float, module_id: Optional[str] = None,
+                    inverter_id: Optional[str] = None, tilt: Optional[float] = None, azimuth: Optional[float] = None,
+                    shading=None, dc_ac_ratio: Optional[float] = None, dc_losses: Optional[float] = None) -> SystemProduction:
+    """
+    Hourly production of a system built from catalog hardware at a location.
+
+    Args:
+        pvgis_data: PVGIS PVcalc response of the location (monthly H(i)_m and T2m on its plane).
+        kwp: Wanted DC power, rounded to a whole number of modules.
+        module_id, inverter_id: Catalog entries; the default module, and the inverter chosen for
+            dc_ac_ratio (PRODUCTION_TARGET_DC_AC_RATIO) if not given. Above one inverter's limits,
+            several identical ones are used in parallel (up to PRODUCTION_MAX_INVERTERS).
+        tilt, azimuth: Plane of the modules (azimuth 0=N, 180=S); PVGIS' plane if not given.
+        shading: 12 monthly or 8760 hourly shading factors (1.0 = no shade).
+
+    Raises:
+        ValueError: For unknown hardware, missing PVGIS data, invalid parameters or a system
+            needing more than PRODUCTION_MAX_INVERTERS inverters.
+    """
+    import numpy as np
+
+    irradiation = monthly_irradiation(pvgis_data)
+    if irradiation is None:
+        raise ValueError("PVGIS data has no monthly in-plane irradiation (H(i)_m).")
+    if kwp <= 0:
+        raise ValueError("System power must be positive.")
+    catalog = hardware_catalog.get_catalog()
+    module = catalog.module(module_id or hardware_catalog.DEFAULT_MODULE)
+    panels = max(1, int(round(kwp * 1000 / module["power_w"])))
+    dc_kwp = panels * float(module["power_w"]) / 1000
+    if inverter_id:
+        inverter = catalog.inverter(inverter_id)
+        count = int(catalog.parallel_count(dc_kwp, np.flatnonzero(catalog.inverters["id"] == inverter_id)[0]))
+    else:
+        index, count = catalog.select_inverters(dc_kwp, dc_ac_ratio or PRODUCTION_TARGET_DC_AC_RATIO)
+        inverter, count = catalog.inverters[int(index)], int(count)
+    if count > PRODUCTION_MAX_INVERTERS:
+        raise ValueError(f"{dc_kwp:g} kWp needs {count} x {inverter['id']} (max DC input {inverter['max_dc_kw']:g} kW each); "
+                         f"at most {PRODUCTION_MAX_INVERTERS} inverters are supported.")
+    ac_kw = count * float(inverter["ac_kw"])
+
+    reference_plane = pvgis_plane(pvgis_data)
+    tilt = reference_plane[0] if tilt is None else tilt
+    azimuth = reference_plane[1] if azimuth is None else azimuth
+    poa = poa_irradiance(irradiation, lat, tilt, azimuth, reference_plane=reference_plane)
+    temps = load_synthesis.hourly_temperatures(load_synthesis.monthly_temperatures(pvgis_data))
+    result = simulate_production(poa, temps, dc_kwp, ac_kw, inverter["efficiency"], module["gamma_pmax"],
+                                 module["noct_c"], shading=shading, dc_losses=dc_losses)
+
+    hourly = result.hourly_ac_kwh[0]
+    monthly = time_index.monthly_sums(hourly, time_index.get_time_index(time_index.TYPICAL_YEAR))
+    return SystemProduction(
+        module_id=str(module["id"]),
+        inverter_id=str(inverter["id"]),
+        inverters=count,
+        panels=panels,
+        dc_kwp=round(dc_kwp, 3),
+        ac_kw=round(ac_kw, 3),
+        dc_ac_ratio=round(dc_kwp / ac_kw, 2),
+        tilt=round(float(tilt), 1),
+        azimuth=round(float(azimuth), 1),
+        annual_dc_kwh=round(float(result.dc_kwh[0]), 1),
+        annual_ac_kwh=round(float(result.ac_kwh[0]), 1),
+        specific_yield_kwh_kwp=round(float(result.ac_kwh[0]) / dc_kwp, 1),
+        shading_loss_kwh=round(float(result.shading_loss_kwh[0]), 1),
+        temperature_loss_kwh=round(float(result.temperature_loss_kwh[0]), 1),
+        clipping_loss_kwh=round(float(result.clipping_loss_kwh[0]), 1),
+        hardware_cost_eur=round(panels * float(module["price_eur"]) + count * float(inverter["price_eur"]), 2),
+        monthly_kwh=[round(float(v), 2) for v in monthly],
+        hourly_kwh=np.round(hourly, 4),
+    )
+
+
+def max_kwp_for_module(total_roof_area: float, module_id: Optional[str] = None, packing_factor: float = None) -> float:
+    """kWp of catalog modules fitting in a roof area (see geometry_service.estimate_max_kwp)."""
+    from app.services import geometry_service
+
+    module = hardware_catalog.get_catalog().module(module_id or hardware_catalog.DEFAULT_MODULE)
+    factor = packing_factor or geometry_service.ROOF_PACKING_FACTOR
+    return geometry_service.estimate_max_kwp(total_roof_area, m2_per_kwp=hardware_catalog.m2_per_kwp(module) / factor)
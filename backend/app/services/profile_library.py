@@ -0,0 +1,341 @@
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.services import time_index
+
+# numpy is imported lazily (see consumption_service): the library is only loaded by the
+# routes that generate hourly profiles.
+
+logger = logging.getLogger(__name__)
+
+# Typical-year library of normalized 8760-hour load curves (each row sums to 1), stored as a
+# float32 .npy matrix (one row per curve, ~35 KB each) and opened memory-mapped: the workers
+# share the OS page cache instead of each holding a copy, and selecting a curve is a row view.
+# The index (names, descriptions, calendar year) is a JSON file next to it.
+# Deployments build it ahead of time (scripts/build_profile_library.py) and point
+# PROFILE_LIBRARY_PATH at it. Otherwise the built-in library is generated on first use in
+# PROFILE_CACHE_DIR (a per-user cache directory, never the source tree), or kept in memory if
+# that directory is not writable.
+PROFILE_CACHE_DIR = os.getenv(
+    "PROFILE_CACHE_DIR",
+    os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "hotspot-solar-insight"),
+)
+PROFILE_LIBRARY_PATH = os.getenv("PROFILE_LIBRARY_PATH", os.path.join(PROFILE_CACHE_DIR, "load_profiles.npy"))
+# Curve used when a request does not choose one.
+DEFAULT_PROFILE = os.getenv("PROFILE_LIBRARY_DEFAULT", "2.0TD")
+# Non-leap year whose calendar (weekdays, national holidays) the built-in curves follow.
+REFERENCE_YEAR = int(os.getenv("PROFILE_LIBRARY_REFERENCE_YEAR", "2025"))
+# Bumped whenever the built-in curves change, so that a library generated from them is rebuilt.
+BUILTIN_VERSION = 2
+
+HOURS_PER_YEAR = 8760
+DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31] # Non-leap year
+
+# Fraction of the daily energy used each hour on a working day of the standard residential
+# curve (2.0TD). Hour: 0-23.
+STANDARD_HOURLY_PROFILE_FRACTIONS_24H = [
+    0.025, 0.020, 0.018, 0.015, 0.015, 0.020, 0.035, 0.050, # 0-7h (night, morning prep)
+    0.045, 0.040, 0.038, 0.035, 0.035, 0.038, 0.040, 0.045, # 8-15h (daytime)
+    0.055, 0.065, 0.075, 0.080, 0.070, 0.060, 0.045, 0.035  # 16-23h (evening peak, night fall)
+]
+# Residential weekends and holidays: later start of the day and more consumption around lunch.
+RESIDENTIAL_WEEKEND_FRACTIONS_24H = [
+    0.030, 0.024, 0.020, 0.017, 0.016, 0.017, 0.020, 0.028,
+    0.040, 0.048, 0.050, 0.050, 0.052, 0.056, 0.052, 0.045,
+    0.046, 0.050, 0.058, 0.064, 0.066, 0.058, 0.048, 0.037
+]
+# Fraction of the annual energy per month (Jan-Dec) of the residential curves: more in winter.
+STANDARD_MONTHLY_PROFILE_FRACTIONS = [
+    0.10, 0.09, 0.08, 0.07, 0.07, 0.06, # Winter, Spring, Early Summer
+    0.07, 0.08, 0.08, 0.09, 0.10, 0.11  # Late Summer, Autumn, Winter
+]
+
+# Hourly multipliers of the residential curves by season (lighting and heating on winter
+# mornings and evenings, air conditioning on summer afternoons, later sunsets).
+SEASON_MID, SEASON_WINTER, SEASON_SUMMER = 0, 1, 2
+MONTH_SEASON = [SEASON_WINTER, SEASON_WINTER, SEASON_WINTER, SEASON_MID, SEASON_MID, SEASON_SUMMER,
+                SEASON_SUMMER, SEASON_SUMMER, SEASON_SUMMER, SEASON_MID, SEASON_WINTER, SEASON_WINTER]
+
+
+def _hour_factors(factors: Dict[Tuple[int, int], float]) -> List[float]:
+    """24 hourly multipliers: `factors` maps half-open hour ranges (start, end) to a multiplier, 1 elsewhere."""
+    hours = [1.0] * 24
+    for (start, end), factor in factors.items():
+        for hour in range(start, end):
+            hours[hour] = factor
+    return hours
+
+
+SEASONAL_HOURLY_FACTORS = [
+    _hour_factors({}),
+    _hour_factors({(7, 10): 1.15, (18, 23): 1.2}),
+    _hour_factors({(14, 19): 1.25, (19, 21): 0.9, (21, 24): 1.1}),
+]
+
+
+class ProfileSpec(NamedTuple):
+    """Definition of a built-in curve: daily shapes per day type, their relative weight and the monthly split."""
+    name: str
+    description: str
+    workday: Sequence[float] # 24 hourly weights of each day type
+    saturday: Sequence[float]
+    holiday: Sequence[float] # Sundays and national holidays
+    day_weights: Tuple[float, float, float] # Daily energy of (workday, saturday, holiday), relative
+    monthly_fractions: Sequence[float]
+    seasonal: bool # Apply SEASONAL_HOURLY_FACTORS
+
+
+BUILTIN_PROFILES = [
+    ProfileSpec(
+        name="2.0TD",
+        description="Standard household (2.0TD tariff, the most common residential supply).",
+        workday=STANDARD_HOURLY_PROFILE_FRACTIONS_24H,
+        saturday=RESIDENTIAL_WEEKEND_FRACTIONS_24H,
+        holiday=RESIDENTIAL_WEEKEND_FRACTIONS_24H,
+        day_weights=(1.0, 1.08, 1.12),
+        monthly_fractions=STANDARD_MONTHLY_PROFILE_FRACTIONS,
+        seasonal=True,
+    ),
+    ProfileSpec(
+        name="2.0TD_away_workday",
+        description="2.0TD household empty during working hours on weekdays (commuters).",
+        workday=[0.028, 0.022, 0.019, 0.016, 0.016, 0.022, 0.045, 0.060,
+                 0.035, 0.022, 0.020, 0.020, 0.021, 0.024, 0.024, 0.026,
+                 0.040, 0.058, 0.075, 0.088, 0.085, 0.073, 0.054, 0.037],
+        saturday=RESIDENTIAL_WEEKEND_FRACTIONS_24H,
+        holiday=RESIDENTIAL_WEEKEND_FRACTIONS_24H,
+        day_weights=(0.95, 1.15, 1.2),
+        monthly_fractions=STANDARD_MONTHLY_PROFILE_FRACTIONS,
+        seasonal=True,
+    ),
+    ProfileSpec(
+        name="2.0TD_home_all_day",
+        description="2.0TD household occupied all day (remote work, retirees).",
+        workday=[0.026, 0.021, 0.018, 0.016, 0.015, 0.017, 0.027, 0.040,
+                 0.048, 0.050, 0.050, 0.049, 0.052, 0.056, 0.050, 0.046,
+                 0.048, 0.054, 0.062, 0.066, 0.062, 0.054, 0.043, 0.033],
+        saturday=RESIDENTIAL_WEEKEND_FRACTIONS_24H,
+        holiday=RESIDENTIAL_WEEKEND_FRACTIONS_24H,
+        day_weights=(1.0, 1.02, 1.05),
+        monthly_fractions=STANDARD_MONTHLY_PROFILE_FRACTIONS,
+        seasonal=True,
+    ),
+    ProfileSpec(
+        name="3.0TD_business",
+        description="Small business (3.0TD tariff): open 9-20h on weekdays and Saturday mornings.",
+        workday=[0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.4, 0.8,
+                 1.6, 2.0, 2.1, 2.1, 2.1, 2.0, 1.9, 2.0,
+                 2.1, 2.1, 2.0, 1.8, 1.0, 0.5, 0.3, 0.3],
+        saturday=[0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.6,
+                  1.6, 2.0, 2.0, 2.0, 1.9, 1.4, 0.5, 0.3,
+                  0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.3, 0.3],
+        holiday=[1.0] * 24, # Base load only (refrigeration, standby)
+        day_weights=(1.0, 0.55, 0.3),
+        monthly_fractions=[0.080, 0.075, 0.080, 0.078, 0.082, 0.090, 0.100, 0.085, 0.088, 0.082, 0.078, 0.082],
+        seasonal=False,
+    ),
+]
+
+# Columns of an imported CSV that hold the date/hour rather than a curve (REE files include them).
+CALENDAR_COLUMNS = {"mes", "month", "dia", "día", "day", "hora", "hour", "año", "ano", "year", "fecha", "date", "datetime"}
+
+
+class ProfileLibrary:
+    """
+    Normalized typical-year load curves, by name. `matrix` is the (curves x 8760) float32
+    matrix, usually a read-only memory map; curve() returns a row of it without copying.
+    """
+
+    def __init__(self, matrix, names: Sequence[str], descriptions: Optional[Sequence[str]] = None, year: int = REFERENCE_YEAR):
+        if matrix.ndim != 2 or matrix.shape != (len(names), HOURS_PER_YEAR):
+            raise ValueError(f"Profile matrix has shape {matrix.shape}, expected ({len(names)}, {HOURS_PER_YEAR}).")
+        self.matrix = matrix
+        self.names = list(names)
+        self.descriptions = list(descriptions) if descriptions is not None else [""] * len(self.names)
+        self.year = year
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._monthly: Dict[int, Any] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def index(self, name: str) -> int:
+        """Row of a curve. Raises ValueError for an unknown name."""
+        try:
+            return self._index[name]
+        except KeyError:
+            raise ValueError(f"Unknown load profile '{name}'. Available: {', '.join(self.names)}.") from None
+
+    def curve(self, name: str):
+        """The normalized 8760-hour curve (read-only float32 array summing to 1)."""
+        return self.matrix[self.index(name)]
+
+    def monthly_fractions(self, name: str):
+        """Fraction of the annual energy of each month (12 float64 values), computed once per curve."""
+        import numpy as np
+
+        row = self.index(name)
+        fractions = self._monthly.get(row)
+        if fractions is None:
+            fractions = time_index.monthly_sums(self.matrix[row].astype(np.float64), time_index.get_time_index(self.year))
+            fractions.setflags(write=False)
+            self._monthly[row] = fractions
+        return fractions
+
+    def describe(self) -> List[Dict[str, str]]:
+        """Name and description of every curve, in library order."""
+        return [{"name": name, "description": description} for name, description in zip(self.names, self.descriptions)]
+
+
+@lru_cache(maxsize=4)
+def day_calendar(year: int = REFERENCE_YEAR):
+    """
+    Read-only per-day arrays of a non-leap year: month (0-11) and day type (0 workday,
+    1 saturday, 2 sunday/holiday). Raises ValueError for a leap year.
+    """
+    index = time_index.get_time_index(year) # Typical-year grid: no DST
+    if index.hours != HOURS_PER_YEAR:
+        raise ValueError(f"Reference year {year} is a leap year; the library holds {HOURS_PER_YEAR}-hour curves.")
+    month = index.month[index.day_starts]
+    day_type = index.day_type[index.day_starts]
+    for array in (month, day_type):
+        array.setflags(write=False)
+    return month, day_type
+
+
+def build_curve(spec: ProfileSpec, year: int = REFERENCE_YEAR):
+    """The normalized 8760-hour float64 curve of a ProfileSpec on the calendar of `year`."""
+    import numpy as np
+
+    month, day_type = day_calendar(year)
+    shapes = np.array([spec.workday, spec.saturday, spec.holiday], dtype=np.float64)
+    shapes /= shapes.sum(axis=1, keepdims=True)
+    daily = shapes[day_type] * np.asarray(spec.day_weights)[day_type][:, None] # (365, 24)
+    if spec.seasonal:
+        daily *= np.asarray(SEASONAL_HOURLY_FACTORS)[np.asarray(MONTH_SEASON)[month]]
+
+    # Scale each month to its share of the year.
+    curve = daily.ravel()
+    month_of_hour = np.repeat(month, 24)
+    month_totals = np.bincount(month_of_hour, weights=curve, minlength=12)
+    monthly = np.asarray(spec.monthly_fractions, dtype=np.float64)
+    curve *= (monthly / monthly.sum())[month_of_hour] / month_totals[month_of_hour]
+    return curve
+
+
+def read_curves_csv(path: str, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Reads hourly curves (for example the REE coefficient files) from a CSV with a header row:
+    one column per curve and one row per hour (8760). Separators and decimal commas are
+    detected. `columns` selects the curves; by default every numeric column that is not a
+    date/hour column (CALENDAR_COLUMNS). Raises ValueError if a curve has the wrong length.
+    """
+    import numpy as np
+    import pandas as pd # Lazy import: only the library build reads CSVs
+
+    df = pd.read_csv(path, sep=None, engine="python")
+    if not any(pd.api.types.is_float_dtype(df[c]) for c in df.columns if str(c).strip().lower() not in CALENDAR_COLUMNS):
+        df = pd.read_csv(path, sep=None, engine="python", decimal=",")
+    df.columns = [str(c).strip() for c in df.columns]
+    if columns is None:
+        columns = [c for c in df.columns if c.lower() not in CALENDAR_COLUMNS and pd.api.types.is_numeric_dtype(df[c])]
+    if len(df) != HOURS_PER_YEAR:
+        raise ValueError(f"{path} has {len(df)} rows, expected {HOURS_PER_YEAR} (one per hour of a non-leap year).")
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"{path} has no column(s) {', '.join(missing)}.")
+    return {c: df[c].to_numpy(dtype=np.float64) for c in columns}
+
+
+def build_library(path: str = None, curves: Optional[Dict[str, Any]] = None, descriptions: Optional[Dict[str, str]] = None,
+                  include_builtin: bool = True, year: int = REFERENCE_YEAR) -> str:
+    """
+    Writes a library with the built-in curves (unless include_builtin is False) plus `curves`
+    (name -> 8760 values, e.g. from read_curves_csv), each normalized to sum 1. The files are
+    written atomically, so processes with the previous library open keep reading a consistent one.
+    Returns the path of the matrix.
+    """
+    import numpy as np
+
+    path = path or PROFILE_LIBRARY_PATH
+    matrix, index = _compose(curves, descriptions, include_builtin, year)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    suffix = f".{os.getpid()}.tmp"
+    with open(path + suffix, "wb") as f:
+        np.save(f, matrix)
+    with open(_index_path(path) + suffix, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(path + suffix, path)
+    os.replace(_index_path(path) + suffix, _index_path(path))
+    logger.info(f"Profile library written to {path}: {len(index['names'])} curves ({matrix.nbytes / 1024:.0f} KB).")
+    return path
+
+
+def _compose(curves: Optional[Dict[str, Any]], descriptions: Optional[Dict[str, str]], include_builtin: bool, year: int):
+    """The normalized float32 matrix and the JSON index of a library (see build_library)."""
+    import numpy as np
+
+    rows: Dict[str, Any] = {}
+    notes: Dict[str, str] = {}
+    if include_builtin:
+        for spec in BUILTIN_PROFILES:
+            rows[spec.name], notes[spec.name] = build_curve(spec, year), spec.description
+    for name, values in (curves or {}).items():
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != (HOURS_PER_YEAR,) or not np.isfinite(values).all() or (values < 0).any() or values.sum() <= 0:
+            raise ValueError(f"Curve '{name}' must have {HOURS_PER_YEAR} finite, non-negative values with a positive sum.")
+        rows[name], notes[name] = values, (descriptions or {}).get(name, "")
+    if not rows:
+        raise ValueError("A profile library needs at least one curve.")
+
+    matrix = np.stack([values / values.sum() for values in rows.values()]).astype(np.float32)
+    index = {
+        "names": list(rows),
+        "descriptions": [notes[name] for name in rows],
+        "year": year,
+        "builtin_version": BUILTIN_VERSION if include_builtin and not curves else None,
+    }
+    return matrix, index
+
+
+def _index_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def load_library(path: str = None) -> ProfileLibrary:
+    """
+    Opens a library (memory-mapped, read-only). A missing library, or one generated from an
+    older version of the built-in curves, is (re)built first; if it cannot be written there,
+    the built-in curves are served from memory instead.
+    """
+    import numpy as np
+
+    path = path or PROFILE_LIBRARY_PATH
+    index = None
+    if os.path.exists(path) and os.path.exists(_index_path(path)):
+        with open(_index_path(path), encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("builtin_version") not in (None, BUILTIN_VERSION):
+            logger.info(f"Profile library {path} was built from older built-in curves; rebuilding.")
+            index = None
+    if index is None:
+        try:
+            build_library(path)
+        except OSError as e:
+            logger.warning(f"Cannot write the profile library to {path} ({e}); using the built-in curves in memory.")
+            matrix, index = _compose(None, None, True, REFERENCE_YEAR)
+            matrix.setflags(write=False)
+            return ProfileLibrary(matrix, index["names"], index["descriptions"], index["year"])
+        with open(_index_path(path), encoding="utf-8") as f:
+            index = json.load(f)
+    matrix = np.load(path, mmap_mode="r")
+    return ProfileLibrary(matrix, index["names"], index.get("descriptions"), index.get("year", REFERENCE_YEAR))
+
+
+@lru_cache(maxsize=1)
+def get_library() -> ProfileLibrary:
+    """The process-wide library at PROFILE_LIBRARY_PATH, opened on first use."""
+    return load_library()
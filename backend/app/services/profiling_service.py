@@ -0,0 +1,196 @@
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# --- Configuration (environment variables) ---
+# Profiling is only available when PROFILING_ADMIN_TOKEN is set: without it, neither the
+# middleware nor the /admin routes are registered, so there is no overhead at all.
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "")
+# Profiles are stored as files so that any worker can serve a profile recorded by another one.
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'profiles'))
+PROFILING_MAX_STORED = int(os.getenv("PROFILING_MAX_STORED", "50"))
+PROFILING_SAMPLE_INTERVAL_S = float(os.getenv("PROFILING_SAMPLE_INTERVAL_S", "0.001"))
+
+# Routes that can be profiled.
+PROFILED_PATHS = {"/location/analyze", "/consumption/predict/manual", "/consumption/predict/csv"}
+# cProfile only sees the event-loop thread, so it is only offered on routes that do their work
+# there; the others run it in the threadpool, where only the "sample" profiler sees it.
+CPROFILE_PATHS = {"/consumption/predict/csv"}
+# Profiler modes: "sample" (default; collapsed stacks for flamegraph.pl / speedscope) or
+# "cprofile" (deterministic; pstats file for snakeviz / `python -m pstats`).
+PROFILER_MODES = {"sample", "cprofile"}
+_PROFILE_FILES = {"sample": ("collapsed", "text/plain; charset=utf-8"), "cprofile": ("prof", "application/octet-stream")}
+_PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+# One profiled request at a time per process: the profilers are process-wide (the sampler walks
+# every thread, cProfile hooks the event-loop thread), so overlapping profiles would mix up.
+_profiling_lock = threading.Lock()
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Constant-time check of an admin token. Always False when no token is configured."""
+    if not PROFILING_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), PROFILING_ADMIN_TOKEN.encode("utf-8"))
+
+
+def parse_profile_mode(value: Optional[str]) -> Optional[str]:
+    """Maps the X-Profile header / ?profile= value to a profiler mode (None = don't profile)."""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return None
+    if value in ("1", "true", "yes", "on"):
+        return "sample"
+    if value not in PROFILER_MODES:
+        raise ValueError(f"Unknown profiler '{value}'. Use one of: {', '.join(sorted(PROFILER_MODES))}.")
+    return value
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread snapshots the stacks of every other thread
+    (sys._current_frames) every `interval_s` and counts identical stacks. This includes the
+    threadpool threads that run the blocking upstream calls, which cProfile would miss.
+    The result is in "collapsed stacks" format: one "thread;frame;frame;... count" line per stack.
+    """
+
+    def __init__(self, interval_s: float = PROFILING_SAMPLE_INTERVAL_S):
+        self.interval_s = interval_s
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)).replace(";", ":"))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> bytes:
+        self._stopped.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common()).encode("utf-8")
+
+
+class _CProfileProfiler:
+    """Deterministic profiler (cProfile) of the event-loop thread."""
+
+    def __init__(self):
+        import cProfile
+        self._profile = cProfile.Profile()
+
+    def start(self) -> "_CProfileProfiler":
+        self._profile.enable()
+        return self
+
+    def stop(self) -> bytes:
+        import marshal
+        self._profile.disable()
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats) # Same format as Profile.dump_stats()
+
+
+def start_profiler(mode: str):
+    """Starts a profiler for `mode`; its stop() method returns the profile file contents."""
+    if mode == "cprofile":
+        return _CProfileProfiler().start()
+    return SamplingProfiler().start()
+
+
+def try_begin_profiling() -> bool:
+    """Reserves the profiler for one request; False if another profiled request is running."""
+    return _profiling_lock.acquire(blocking=False)
+
+
+def end_profiling() -> None:
+    _profiling_lock.release()
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _profile_paths(profile_id: str) -> Tuple[str, str]:
+    if not _PROFILE_ID_PATTERN.match(profile_id): # Also prevents path traversal
+        raise ValueError(f"Invalid profile id '{profile_id}'.")
+    return os.path.join(PROFILING_DIR, f"{profile_id}.json"), os.path.join(PROFILING_DIR, profile_id)
+
+
+def save_profile(profile_id: str, mode: str, content: bytes, metadata: Dict[str, Any]) -> None:
+    """Stores a profile and its metadata, then prunes the oldest beyond PROFILING_MAX_STORED."""
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    meta_path, base_path = _profile_paths(profile_id)
+    extension, media_type = _PROFILE_FILES[mode]
+    with open(f"{base_path}.{extension}", "wb") as f:
+        f.write(content)
+    metadata = dict(metadata, id=profile_id, mode=mode, file=f"{profile_id}.{extension}",
+                    media_type=media_type, created_at=time.time())
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    logger.info(f"Perfil {profile_id} ({mode}) guardado para {metadata.get('method')} {metadata.get('path')}.")
+    _prune_profiles()
+
+
+def _prune_profiles() -> None:
+    profiles = list_profiles()
+    for stale in profiles[PROFILING_MAX_STORED:]:
+        for name in (f"{stale['id']}.json", stale["file"]):
+            try:
+                os.remove(os.path.join(PROFILING_DIR, name))
+            except FileNotFoundError:
+                pass # Pruned concurrently by another worker
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Metadata of the stored profiles, newest first."""
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILING_DIR):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILING_DIR, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda p: p.get("created_at", 0), reverse=True)
+
+
+def get_profile(profile_id: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """Metadata and contents of a stored profile, or None if it does not exist."""
+    meta_path, _ = _profile_paths(profile_id)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            metadata = json.load(f)
+        with open(os.path.join(PROFILING_DIR, metadata["file"]), "rb") as f:
+            return metadata, f.read()
+    except FileNotFoundError:
+        return None
@@ -1,14 +1,17 @@
-import requests
 import os
 import logging
 from dotenv import load_dotenv
 
+from app.services import cache_service, metrics_service, upstream_http
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 # PVGIS API base URL for version 5.2, PV calculation endpoint
 PVGIS_API_URL = os.getenv("PVGIS_API_URL_CALC", "https://re.jrc.ec.europa.eu/api/v5_2/PVcalc")
 PVGIS_API_HORIZON_URL = os.getenv("PVGIS_API_URL_HORIZON", "https://re.jrc.ec.europa.eu/api/v5_2/SHcalc")
+# PVGIS data is climatological (multi-year averages), so responses can be cached for a long time.
+PVGIS_CACHE_TTL_S = float(os.getenv("PVGIS_CACHE_TTL_S", str(30 * 24 * 3600)))
 
 
 def get_pvgis_data(lat: float, lng: float, peak_power_kwp: float = 1.0, system_loss: float = 14.0, optimal_inclination: bool = True, optimal_azimuth: bool = True) -> dict:
@@ -27,7 +30,22 @@ def get_pvgis_data(lat: float, lng: float, peak_power_kwp: float = 1.0, system_l
     Returns:
         A dictionary containing the parsed JSON response from PVGIS,
         or an empty dictionary if an error occurs.
+        Responses are cached (shared by all workers when CACHE_BACKEND is sqlite/redis),
+        keyed by the coordinates rounded to CACHE_COORD_DECIMALS and the system parameters.
     """
+    cache_key = cache_service.make_key(
+        "pvgis:pvcalc", cache_service.coord_key(lat, lng), peak_power_kwp, system_loss,
+        int(optimal_inclination), int(optimal_azimuth)
+    )
+    return cache_service.cached(
+        cache_key,
+        lambda: _fetch_pvgis_data(lat, lng, peak_power_kwp, system_loss, optimal_inclination, optimal_azimuth),
+        ttl_s=PVGIS_CACHE_TTL_S
+    )
+
+@metrics_service.instrument_upstream("pvgis_pvcalc")
+def _fetch_pvgis_data(lat: float, lng: float, peak_power_kwp: float, system_loss: float, optimal_inclination: bool, optimal_azimuth: bool) -> dict:
+    """Uncached PVcalc request (see get_pvgis_data)."""
     params = {
         'lat': lat,
         'lon': lng,
@@ -44,19 +62,11 @@ def get_pvgis_data(lat: float, lng: float, peak_power_kwp: float = 1.0, system_l
 
     logger.info(f"Querying PVGIS PVcalc API for lat={lat}, lng={lng} with params: {params}")
 
-    # For now, returning mock data as per the plan for initial service implementation
-    # try:
-    #     response = requests.get(PVGIS_API_URL, params=params)
-    #     response.raise_for_status() # Raises HTTPError for bad responses (4XX or 5XX)
-    #     data = response.json()
-    #     logger.info(f"Successfully received data from PVGIS PVcalc API for lat={lat}, lng={lng}")
-    #     return data
-    # except requests.exceptions.RequestException as e:
-    #     logger.error(f"Error querying PVGIS PVcalc API: {e}")
-    #     return {}
-    # except ValueError as e: # Handles JSON decoding errors
-    #     logger.error(f"Error decoding JSON from PVGIS PVcalc API: {e}")
-    #     return {}
+    if upstream_http.UPSTREAM_LIVE:
+        data = upstream_http.request_json("GET", PVGIS_API_URL, params=params)
+        if data:
+            logger.info(f"Successfully received data from PVGIS PVcalc API for lat={lat}, lng={lng}")
+        return data
 
     # --- MOCK DATA ---
     # This mock data simulates a response for a location, requesting optimal angles.
@@ -124,8 +134,14 @@ def get_pvgis_terrain_horizon(lat: float, lng: float) -> dict:
 
     Returns:
         A dictionary containing the parsed JSON response from PVGIS for horizon data,
-        or an empty dictionary if an error occurs.
+        or an empty dictionary if an error occurs. Responses are cached like get_pvgis_data.
     """
+    cache_key = cache_service.make_key("pvgis:shcalc", cache_service.coord_key(lat, lng))
+    return cache_service.cached(cache_key, lambda: _fetch_pvgis_terrain_horizon(lat, lng), ttl_s=PVGIS_CACHE_TTL_S)
+
+@metrics_service.instrument_upstream("pvgis_shcalc")
+def _fetch_pvgis_terrain_horizon(lat: float, lng: float) -> dict:
+    """Uncached SHcalc request (see get_pvgis_terrain_horizon)."""
     params = {
         'lat': lat,
         'lon': lng,
@@ -134,19 +150,11 @@ def get_pvgis_terrain_horizon(lat: float, lng: float) -> dict:
     }
     logger.info(f"Querying PVGIS SHcalc (horizon) API for lat={lat}, lng={lng}")
 
-    # For now, returning mock data
-    # try:
-    #     response = requests.get(PVGIS_API_HORIZON_URL, params=params)
-    #     response.raise_for_status()
-    #     data = response.json()
-    #     logger.info(f"Successfully received data from PVGIS SHcalc API for lat={lat}, lng={lng}")
-    #     return data
-    # except requests.exceptions.RequestException as e:
-    #     logger.error(f"Error querying PVGIS SHcalc API: {e}")
-    #     return {}
-    # except ValueError as e: # Handles JSON decoding errors
-    #     logger.error(f"Error decoding JSON from PVGIS SHcalc API: {e}")
-    #     return {}
+    if upstream_http.UPSTREAM_LIVE:
+        data = upstream_http.request_json("GET", PVGIS_API_HORIZON_URL, params=params)
+        if data:
+            logger.info(f"Successfully received data from PVGIS SHcalc API for lat={lat}, lng={lng}")
+        return data
 
     # --- MOCK DATA for Horizon ---
     mock_horizon_data = {
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_registry: List["SingleFlight"] = []
+_registry_lock = threading.Lock()
+
+
+class SingleFlight:
+    """
+    Request coalescing ("single-flight") for coroutines.
+
+    While a call for `key` is in flight, further calls with the same key do not start new
+    work: they await the same shared task and receive its result (or exception).
+    The work runs in its own task and callers await it through `asyncio.shield`, so a
+    caller that disconnects (is cancelled) does not cancel the work for the others.
+
+    Coalescing is per process (per worker); across workers, the shared cache
+    (cache_service) deduplicates repeated work once a result is available.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[str, "asyncio.Task"] = {}
+        self.executions = 0 # Calls that started the work
+        self.joins = 0      # Calls that joined a call already in flight
+        with _registry_lock:
+            _registry.append(self)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs `fn()` for `key`, or joins the call already in flight for that key."""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.joins += 1
+            logger.debug(f"Single-flight '{self.name}': joining in-flight call for {key}")
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: "asyncio.Task") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception() # Marks the exception as retrieved even if every caller went away
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.executions + self.joins
+        return {
+            "name": self.name,
+            "calls": calls,
+            "executions": self.executions,
+            "joins": self.joins,
+            "join_ratio": round(self.joins / calls, 4) if calls else 0.0,
+            "in_flight": len(self._in_flight),
+        }
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    """Statistics of every SingleFlight created in this process."""
+    with _registry_lock:
+        return [flight.stats() for flight in _registry]
@@ -0,0 +1,214 @@
+import csv
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from pydantic import ValidationError
+
+from app.db.database import get_db_connection, SUBSIDY_NATURAL_KEY_SQL
+from app.schemas.subsidy import SubsidyCreate, SubsidyImportReport
+
+logger = logging.getLogger(__name__)
+
+# Columnas de la tabla 'subsidies' que se importan (todas salvo el id autoincremental).
+SUBSIDY_COLUMNS = [
+    "name", "region_code", "type", "value", "max_amount_eur", "min_kwp_required",
+    "max_kwp_eligible", "conditions_text", "applicable_to_entity_type", "source_url",
+    "start_date", "end_date", "is_active"
+]
+# Columnas que se actualizan cuando la clave natural (name, region_code, start_date) ya existe.
+_UPDATABLE_COLUMNS = [c for c in SUBSIDY_COLUMNS if c not in ("name", "region_code", "start_date")]
+
+_UPSERT_QUERY = f"""
+    INSERT INTO subsidies ({', '.join(SUBSIDY_COLUMNS)})
+    VALUES ({', '.join('?' for _ in SUBSIDY_COLUMNS)})
+    ON CONFLICT({SUBSIDY_NATURAL_KEY_SQL}) DO UPDATE SET
+        {', '.join(f'{c} = excluded.{c}' for c in _UPDATABLE_COLUMNS)}
+"""
+
+# Número máximo de errores de validación que se guardan en el informe (el resto solo se cuentan).
+MAX_REPORTED_ERRORS = 100
+
+NaturalKey = Tuple[str, str, str]
+
+
+def _natural_key(record: Dict[str, Any]) -> NaturalKey:
+    """Clave natural de una subvención, con start_date NULL normalizado a '' (igual que el índice único)."""
+    return (record["name"], record["region_code"], record.get("start_date") or "")
+
+
+def _clean_raw_record(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Elimina celdas vacías (típicas de CSV) para que se apliquen los valores por defecto del schema."""
+    cleaned = {}
+    for key, value in raw.items():
+        if key is None:  # Columnas sobrantes en una fila CSV
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                continue
+        if value is None:
+            continue
+        cleaned[key.strip()] = value
+    return cleaned
+
+
+def iter_subsidy_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lee reglas de subvención desde un archivo CSV, JSON o JSON Lines (.jsonl / .ndjson) en streaming.
+
+    - CSV: primera fila con los nombres de columna (los de la tabla 'subsidies').
+    - JSON: una lista de objetos, o un objeto con la clave "subsidies".
+    - JSON Lines: un objeto por línea; es el formato recomendado para ficheros muy grandes.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("subsidies", [])
+        yield from data
+    else:
+        raise ValueError(f"Formato de archivo no soportado para importar subvenciones: '{path}' (use .csv, .json o .jsonl).")
+
+
+def validate_subsidy_records(
+    records: Iterable[Dict[str, Any]]
+) -> Tuple[Dict[NaturalKey, Dict[str, Any]], List[str], int, int]:
+    """
+    Valida en lote un flujo de registros con el schema SubsidyCreate.
+
+    Returns:
+        Una tupla con:
+            - valid (Dict[NaturalKey, Dict]): registros válidos indexados por clave natural.
+              Si la clave se repite en el origen, gana la última aparición.
+            - errors (List[str]): mensajes de error (como máximo MAX_REPORTED_ERRORS).
+            - total (int): número de registros leídos.
+            - invalid (int): número de registros inválidos.
+    """
+    valid: Dict[NaturalKey, Dict[str, Any]] = {}
+    errors: List[str] = []
+    total = 0
+    invalid = 0
+    for position, raw in enumerate(records, start=1):
+        total += 1
+        try:
+            subsidy = SubsidyCreate(**_clean_raw_record(raw))
+        except (ValidationError, TypeError) as e:
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"Registro {position}: {e}".replace("\n", " "))
+            continue
+        record = subsidy.dict()
+        valid[_natural_key(record)] = record
+    return valid, errors, total, invalid
+
+
+def _record_to_row(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(
+        (1 if record[c] else 0) if c == "is_active" else record[c]
+        for c in SUBSIDY_COLUMNS
+    )
+
+
+def import_subsidies(
+    records: Iterable[Dict[str, Any]],
+    dry_run: bool = False,
+    deactivate_missing: bool = False
+) -> SubsidyImportReport:
+    """
+    Importa (UPSERT) un lote de reglas de subvención de forma idempotente.
+
+    Todo el lote se valida primero; después, en una única transacción, se lee el estado
+    actual de la tabla con un solo SELECT, se calcula el diff (nuevas / modificadas / sin cambios)
+    y se aplican los cambios con `executemany` sobre la clave natural (name, region_code, start_date).
+    Volver a importar el mismo archivo no produce cambios.
+
+    Args:
+        records: Registros en bruto (dicts), por ejemplo de `iter_subsidy_records`.
+        dry_run: Si es True, calcula y devuelve el diff sin escribir en la base de datos.
+        deactivate_missing: Si es True, marca como inactivas las subvenciones de la BD que
+                            no aparecen en el lote importado (sincronización completa).
+
+    Returns:
+        SubsidyImportReport con el resumen del diff.
+    """
+    started = time.perf_counter()
+    valid, errors, total, invalid = validate_subsidy_records(records)
+    if invalid:
+        logger.warning(f"Importación de subvenciones: {invalid} de {total} registros no son válidos.")
+
+    conn = get_db_connection()
+    try:
+        with conn:  # Una única transacción: commit al final o rollback si algo falla
+            existing = {
+                _natural_key(dict(row)): dict(row)
+                for row in conn.execute(f"SELECT id, {', '.join(SUBSIDY_COLUMNS)} FROM subsidies")
+            }
+
+            to_write = []
+            inserted = updated = unchanged = 0
+            for key, record in valid.items():
+                current = existing.get(key)
+                if current is None:
+                    inserted += 1
+                elif _record_to_row(record) != tuple(current[c] for c in SUBSIDY_COLUMNS):
+                    updated += 1
+                else:
+                    unchanged += 1
+                    continue
+                to_write.append(_record_to_row(record))
+
+            missing_ids = [
+                (row["id"],) for key, row in existing.items()
+                if key not in valid and row["is_active"]
+            ] if deactivate_missing else []
+
+            if not dry_run:
+                conn.executemany(_UPSERT_QUERY, to_write)
+                if missing_ids:
+                    conn.executemany("UPDATE subsidies SET is_active = 0 WHERE id = ?", missing_ids)
+    finally:
+        conn.close()
+
+    report = SubsidyImportReport(
+        total_records=total,
+        inserted=inserted,
+        updated=updated,
+        unchanged=unchanged,
+        deactivated=len(missing_ids),
+        invalid=invalid,
+        errors=errors,
+        dry_run=dry_run,
+        duration_s=round(time.perf_counter() - started, 3)
+    )
+    logger.info(
+        f"Importación de subvenciones {'(dry-run) ' if dry_run else ''}completada: "
+        f"{report.inserted} nuevas, {report.updated} actualizadas, {report.unchanged} sin cambios, "
+        f"{report.deactivated} desactivadas, {report.invalid} inválidas en {report.duration_s}s."
+    )
+    return report
+
+
+def import_subsidies_from_files(
+    paths: List[str],
+    dry_run: bool = False,
+    deactivate_missing: bool = False
+) -> SubsidyImportReport:
+    """Importa las reglas de uno o varios archivos (CSV/JSON/JSONL) como un único lote."""
+    def _all_records() -> Iterator[Dict[str, Any]]:
+        for path in paths:
+            logger.info(f"Leyendo reglas de subvención desde {path}")
+            yield from iter_subsidy_records(path)
+
+    return import_subsidies(_all_records(), dry_run=dry_run, deactivate_missing=deactivate_missing)
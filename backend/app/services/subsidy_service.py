@@ -1,9 +1,12 @@
 import logging
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Tuple, Union, TYPE_CHECKING
 from app.db.database import execute_query, execute_modification # Usaremos estas funciones helper
 from app.schemas.subsidy import Subsidy, SubsidyCreate, AppliedSubsidy # Importamos los schemas Pydantic
 from datetime import date
 
+if TYPE_CHECKING: # numpy se importa de forma perezosa en las funciones vectorizadas
+    import numpy as np
+
 logger = logging.getLogger(__name__)
 
 def _map_row_to_subsidy_schema(row: Dict[str, Any]) -> Subsidy:
@@ -203,3 +206,79 @@ def calculate_subsidy_amount(subsidy: Subsidy, system_kwp: float, total_investme
         calculated_amount = subsidy.max_amount_eur
 
     return round(calculated_amount, 2)
+
+
+# Códigos numéricos de los tipos de subvención para el cálculo vectorizado.
+SUBSIDY_TYPE_CODES = {'percentage_cost': 0, 'fixed_amount': 1, 'amount_per_kwp': 2}
+
+
+def calculate_subsidy_amounts_batch(
+    subsidies: List[Subsidy],
+    system_kwp: Union[float, Sequence[float], "np.ndarray"],
+    total_investment_cost: Union[float, Sequence[float], "np.ndarray"]
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Versión vectorizada de `calculate_subsidy_amount` para N sistemas x M subvenciones.
+
+    Aplica las mismas fórmulas (percentage_cost, fixed_amount, amount_per_kwp) y los mismos
+    límites (min_kwp_required, max_kwp_eligible, max_amount_eur) que la versión escalar,
+    pero como máscaras de NumPy sobre todo el barrido de tamaños de sistema a la vez.
+
+    Args:
+        subsidies: Conjunto de reglas (normalmente el resultado de `get_eligible_subsidies`).
+        system_kwp: Tamaños de sistema en kWp (escalar o array de N valores).
+        total_investment_cost: Coste de inversión por sistema (escalar o array de N valores).
+
+    Returns:
+        Una tupla con:
+            - amounts (np.ndarray): Matriz (N, M) con el monto de cada subvención para cada sistema.
+            - stacked_totals (np.ndarray): Suma por sistema de todas las subvenciones (N,),
+              limitada al coste de inversión (las ayudas apiladas no pueden superar el coste).
+    """
+    import numpy as np
+
+    kwp = np.atleast_1d(np.asarray(system_kwp, dtype=float))
+    try:
+        cost = np.broadcast_to(np.asarray(total_investment_cost, dtype=float), kwp.shape)
+    except ValueError:
+        raise ValueError(
+            f"total_investment_cost debe ser un escalar o tener la misma longitud que system_kwp ({kwp.shape[0]})."
+        )
+
+    if not subsidies:
+        return np.zeros((kwp.shape[0], 0)), np.zeros(kwp.shape[0])
+
+    # Parámetros de las reglas como vectores fila (1, M). None se traduce a "sin límite".
+    # Un tipo desconocido da 0, como en calculate_subsidy_amount (código -1: el default de np.select).
+    type_codes = np.array([SUBSIDY_TYPE_CODES.get(s.type, -1) for s in subsidies])[None, :]
+    values = np.array([s.value for s in subsidies], dtype=float)[None, :]
+    is_active = np.array([s.is_active for s in subsidies], dtype=bool)[None, :]
+    min_kwp = np.array([s.min_kwp_required if s.min_kwp_required is not None else -np.inf for s in subsidies])[None, :]
+    max_kwp = np.array([s.max_kwp_eligible if s.max_kwp_eligible is not None else np.inf for s in subsidies])[None, :]
+    max_amount = np.array([s.max_amount_eur if s.max_amount_eur is not None else np.inf for s in subsidies])[None, :]
+
+    # Sistemas como vectores columna (N, 1) para que el broadcasting produzca (N, M).
+    kwp_col = kwp[:, None]
+    cost_col = cost[:, None]
+
+    eligible = is_active & (kwp_col >= min_kwp)
+    exceeds_max_kwp = kwp_col > max_kwp
+    kwp_to_calculate_on = np.where(exceeds_max_kwp, max_kwp, kwp_col)
+
+    # percentage_cost: si se supera max_kwp_eligible, el coste base es proporcional a los kWp elegibles.
+    # Solo se multiplica donde se supera el límite: sin límite (inf) y kWp = 0 darían 0 * inf = NaN.
+    cost_per_kwp = np.divide(cost_col, kwp_col, out=np.zeros_like(cost_col), where=kwp_col > 0)
+    proportional = exceeds_max_kwp & (kwp_col > 0)
+    cost_eligible_for_percentage = np.multiply(cost_per_kwp, max_kwp, out=np.broadcast_to(cost_col, proportional.shape).copy(),
+                                               where=proportional)
+
+    amounts = np.select(
+        [type_codes == 0, type_codes == 1, type_codes == 2],
+        [cost_eligible_for_percentage * values, np.broadcast_to(values, eligible.shape), kwp_to_calculate_on * values],
+        default=0.0
+    )
+    amounts = np.minimum(amounts, max_amount)
+    amounts = np.round(np.where(eligible, amounts, 0.0), 2)
+
+    stacked_totals = np.round(np.minimum(amounts.sum(axis=1), cost), 2)
+    return amounts, stacked_totals
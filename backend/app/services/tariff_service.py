@@ -0,0 +1,215 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from app.services import time_index
+
+# numpy is imported lazily (see consumption_service).
+
+logger = logging.getLogger(__name__)
+
+# Electricity bills under time-of-use tariffs. A tariff's hourly schedule (energy period of each
+# hour of workdays, saturdays and sundays/holidays) is compiled once per (tariff, year, timezone)
+# into a read-only array with the period of every hour of the year; a bill is then one
+# np.bincount over (month, period) keys, and many tariffs and many series (e.g. one per battery
+# size) are billed with a single bincount over stacked keys.
+
+# Taxes on the bill: Impuesto Especial sobre la Electricidad (on energy + power - compensation)
+# and VAT (on everything, including the meter rental).
+TARIFF_ELECTRICITY_TAX = float(os.getenv("TARIFF_ELECTRICITY_TAX", "0.0511269632"))
+TARIFF_VAT = float(os.getenv("TARIFF_VAT", "0.21"))
+TARIFF_METER_RENTAL_EUR_MONTH = float(os.getenv("TARIFF_METER_RENTAL_EUR_MONTH", "0.81"))
+TARIFF_DEFAULT_CONTRACTED_POWER_KW = float(os.getenv("TARIFF_DEFAULT_CONTRACTED_POWER_KW", "4.6"))
+DEFAULT_TARIFF = os.getenv("TARIFF_DEFAULT", "2.0TD")
+
+
+class Tariff(NamedTuple):
+    """
+    A time-of-use tariff (prices without taxes). hours holds the 0-based energy period of each
+    hour (24 values) for workdays, saturdays and sundays/national holidays, in that order.
+    Surplus is compensated at export_price up to the energy term of each month (simplified
+    net billing of Real Decreto 244/2019).
+    """
+    name: str
+    energy_prices: Tuple[float, ...] # EUR/kWh per energy period, P1 first
+    power_prices: Tuple[float, ...] # EUR/kW and year per power period, P1 first
+    export_price: float # EUR/kWh
+    hours: Tuple[Tuple[int, ...], ...]
+    description: str = ""
+
+
+# 2.0TD periods (peninsula): P1 punta 10-14 and 18-22, P2 llano 8-10, 14-18 and 22-24, P3 valle
+# 0-8 on workdays; valle all day on weekends and national holidays.
+_2_0TD_WORKDAY = (2,) * 8 + (1,) * 2 + (0,) * 4 + (1,) * 4 + (0,) * 4 + (1,) * 2
+_2_0TD_HOURS = (_2_0TD_WORKDAY, (2,) * 24, (2,) * 24)
+_SINGLE_PERIOD_HOURS = ((0,) * 24,) * 3
+
+# Representative free-market prices; custom tariffs can be passed to every function.
+BUILTIN_TARIFFS: Dict[str, Tariff] = {t.name: t for t in [
+    Tariff("2.0TD", (0.2210, 0.1480, 0.1120), (30.67, 4.24), 0.06, _2_0TD_HOURS,
+           "Three energy periods (punta, llano, valle) with the 2.0TD schedule."),
+    Tariff("2.0TD_flat", (0.1590,), (30.67, 4.24), 0.06, _SINGLE_PERIOD_HOURS,
+           "Single energy price at every hour."),
+    Tariff("2.0TD_night", (0.2590, 0.1690, 0.0790), (30.67, 4.24), 0.05, _2_0TD_HOURS,
+           "2.0TD schedule with a cheap valle, for EV charging and heat pumps at night."),
+]}
+
+
+class Bill(NamedTuple):
+    """Annual bill (EUR) of a series of hourly grid exchanges under one tariff."""
+    tariff: str
+    energy_kwh: List[float] # Imported energy per energy period
+    export_kwh: float
+    energy_eur: float
+    power_eur: float
+    compensation_eur: float
+    taxes_eur: float
+    meter_rental_eur: float
+    total_eur: float
+    monthly_total_eur: List[float] # Jan-Dec
+
+
+def get_tariff(tariff: Union[str, Tariff]) -> Tariff:
+    """A built-in tariff by name (a Tariff is validated and returned). Raises ValueError."""
+    if isinstance(tariff, Tariff):
+        validate_tariff(tariff)
+        return tariff
+    try:
+        return BUILTIN_TARIFFS[tariff]
+    except KeyError:
+        raise ValueError(f"Unknown tariff '{tariff}'. Available: {', '.join(BUILTIN_TARIFFS)}.") from None
+
+
+def validate_tariff(tariff: Tariff) -> None:
+    if not tariff.energy_prices or len(tariff.hours) != 3 or any(len(day) != 24 for day in tariff.hours):
+        raise ValueError(f"Tariff '{tariff.name}' needs energy prices and 3 x 24 hourly periods (workday, saturday, sunday/holiday).")
+    if any(not 0 <= p < len(tariff.energy_prices) for day in tariff.hours for p in day):
+        raise ValueError(f"Tariff '{tariff.name}' uses an energy period without price.")
+    if min(tariff.energy_prices + tariff.power_prices + (tariff.export_price,)) < 0:
+        raise ValueError(f"Tariff '{tariff.name}' has negative prices.")
+
+
+@lru_cache(maxsize=64)
+def compile_periods(tariff: Tariff, year: int, timezone: Optional[str] = None):
+    """The energy period (int8, read-only) of every hour of `year` under `tariff` (see time_index.get_time_index)."""
+    import numpy as np
+
+    index = time_index.get_time_index(year, timezone)
+    periods = np.asarray(tariff.hours, dtype=np.int8)[index.day_type, index.hour]
+    periods.setflags(write=False)
+    return periods
+
+
+def _grouped_sums(values, keys, bins: int):
+    """(N, T, bins) sums of values (N, hours) by keys (T, hours) in [0, bins): one bincount for all pairs."""
+    import numpy as np
+
+    n, t = values.shape[0], keys.shape[0]
+    offsets = (np.arange(n * t, dtype=np.int64) * bins).reshape(n, t, 1)
+    flat = (offsets + keys[np.newaxis]).ravel()
+    weights = np.broadcast_to(values[:, np.newaxis, :], (n, t, values.shape[1])).ravel()
+    return np.bincount(flat, weights=weights, minlength=n * t * bins).reshape(n, t, bins)
+
+
+def _contracted_powers(tariff: Tariff, contracted_power_kw):
+    powers = [TARIFF_DEFAULT_CONTRACTED_POWER_KW] if contracted_power_kw is None else contracted_power_kw
+    powers = [powers] if isinstance(powers, (int, float)) else list(powers)
+    if len(powers) == 1:
+        powers = powers * len(tariff.power_prices)
+    if len(powers) != len(tariff.power_prices) or min(powers, default=0) < 0:
+        raise ValueError(f"Tariff '{tariff.name}' needs 1 or {len(tariff.power_prices)} non-negative contracted powers.")
+    return powers
+
+
+def _monthly_bills(grid_import, grid_export, tariffs: Sequence[Tariff], contracted_power_kw, year: Optional[int], timezone: Optional[str]) -> Dict[str, Any]:
+    """
+    Monthly bill components, shape (N, T, 12) (energy_kwh: (N, T, 12, periods)), of N hourly
+    series under T tariffs.
+    """
+    import numpy as np
+
+    imports = np.atleast_2d(np.asarray(grid_import, dtype=np.float64))
+    exports = np.zeros_like(imports) if grid_export is None else np.atleast_2d(np.asarray(grid_export, dtype=np.float64))
+    if imports.shape != exports.shape:
+        raise ValueError("Grid import and export must have the same shape.")
+    if (imports < 0).any() or (exports < 0).any():
+        raise ValueError("Grid import and export cannot be negative.")
+    if not tariffs:
+        raise ValueError("Give at least one tariff.")
+    index = time_index.index_for_hours(imports.shape[1], year, timezone=timezone)
+
+    n_periods = max(len(t.energy_prices) for t in tariffs)
+    keys = np.stack([index.month * n_periods + compile_periods(t, index.year, index.timezone) for t in tariffs])
+    energy_kwh = _grouped_sums(imports, keys, 12 * n_periods).reshape(len(imports), len(tariffs), 12, n_periods)
+    export_kwh = _grouped_sums(exports, index.month[np.newaxis], 12) # (N, 1, 12): the same for every tariff
+
+    prices = np.zeros((len(tariffs), n_periods))
+    for i, t in enumerate(tariffs):
+        prices[i, :len(t.energy_prices)] = t.energy_prices
+    energy_eur = (energy_kwh * prices[:, np.newaxis, :]).sum(axis=-1)
+    export_prices = np.array([t.export_price for t in tariffs])[:, np.newaxis]
+    compensation_eur = np.minimum(export_kwh * export_prices, energy_eur) # Capped at the month's energy term
+
+    # Fixed terms, prorated by the month's share of the year's hours
+    month_share = np.bincount(index.month, minlength=12) / index.hours
+    power_eur = np.array([np.dot(_contracted_powers(t, contracted_power_kw), t.power_prices) for t in tariffs])
+    power_eur = np.broadcast_to(power_eur[:, np.newaxis] * month_share, energy_eur.shape)
+    meter_rental_eur = np.full(energy_eur.shape, TARIFF_METER_RENTAL_EUR_MONTH)
+
+    electricity_tax = (energy_eur + power_eur - compensation_eur) * TARIFF_ELECTRICITY_TAX
+    vat = (energy_eur + power_eur - compensation_eur + electricity_tax + meter_rental_eur) * TARIFF_VAT
+    total = energy_eur + power_eur - compensation_eur + electricity_tax + meter_rental_eur + vat
+    return {
+        "energy_kwh": energy_kwh, "export_kwh": np.broadcast_to(export_kwh, energy_eur.shape),
+        "energy_eur": energy_eur, "power_eur": power_eur, "compensation_eur": compensation_eur,
+        "taxes_eur": electricity_tax + vat, "meter_rental_eur": meter_rental_eur, "total_eur": total,
+    }
+
+
+def annual_totals(grid_import, grid_export=None, tariffs: Sequence[Union[str, Tariff]] = (DEFAULT_TARIFF,),
+                  contracted_power_kw=None, year: Optional[int] = None, timezone: Optional[str] = None):
+    """Annual bill totals (EUR), shape (N, T), of N hourly series ((N, hours) arrays) under T tariffs."""
+    tariffs = [get_tariff(t) for t in tariffs]
+    return _monthly_bills(grid_import, grid_export, tariffs, contracted_power_kw, year, timezone)["total_eur"].sum(axis=-1)
+
+
+def compare_tariffs(grid_import, grid_export=None, tariffs: Optional[Sequence[Union[str, Tariff]]] = None,
+                    contracted_power_kw=None, year: Optional[int] = None, timezone: Optional[str] = None) -> List[Bill]:
+    """
+    Annual bill of one hourly series of grid import (and export) under each tariff (all
+    built-in tariffs by default), in the given order.
+
+    Args:
+        grid_import, grid_export: Hourly kWh (8760 values, or 8784 for a leap year).
+        contracted_power_kw: One power for every power period, or one per period (TARIFF_DEFAULT_CONTRACTED_POWER_KW by default).
+        year, timezone: Calendar of the series (see time_index.index_for_hours); typical-year grid by default.
+
+    Raises:
+        ValueError: For unknown tariffs or inconsistent inputs.
+    """
+    tariffs = [get_tariff(t) for t in (tariffs or list(BUILTIN_TARIFFS))]
+    monthly = _monthly_bills(grid_import, grid_export, tariffs, contracted_power_kw, year, timezone)
+    if monthly["total_eur"].shape[0] != 1:
+        raise ValueError("compare_tariffs bills a single series; use annual_totals for several.")
+    bills = []
+    for i, t in enumerate(tariffs):
+        annual = {name: float(values[0, i].sum()) for name, values in monthly.items() if name != "energy_kwh"}
+        bills.append(Bill(
+            tariff=t.name,
+            energy_kwh=[round(float(v), 2) for v in monthly["energy_kwh"][0, i].sum(axis=0)[:len(t.energy_prices)]],
+            export_kwh=round(annual["export_kwh"], 2),
+            energy_eur=round(annual["energy_eur"], 2),
+            power_eur=round(annual["power_eur"], 2),
+            compensation_eur=round(annual["compensation_eur"], 2),
+            taxes_eur=round(annual["taxes_eur"], 2),
+            meter_rental_eur=round(annual["meter_rental_eur"], 2),
+            total_eur=round(annual["total_eur"], 2),
+            monthly_total_eur=[round(float(v), 2) for v in monthly["total_eur"][0, i]],
+        ))
+    return bills
+
+
+def describe_tariffs() -> List[Dict[str, Any]]:
+    """The built-in tariffs, for the API."""
+    return [dict(t._asdict(), energy_periods=len(t.energy_prices), power_periods=len(t.power_prices)) for t in BUILTIN_TARIFFS.values()]
@@ -0,0 +1,159 @@
+import datetime
+import os
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional
+
+# numpy is imported lazily (see consumption_service).
+
+# Calendar of the hourly series: which month, day, local hour, weekday and holiday each row of
+# an 8760/8784-value year falls on. Built once per (year, timezone) and shared, so that grouping
+# by month or day is a single np.add.reduceat over precomputed boundaries.
+
+# Timezone of meter data (local clock time, with the 23-hour day in March and the 25-hour day
+# in October). Typical-year data (PVGIS, the profile library) uses timezone=None: 365 x 24 hours.
+TIME_INDEX_TIMEZONE = os.getenv("TIME_INDEX_TIMEZONE", "Europe/Madrid")
+# Years assumed for a series of 8760 or 8784 hours when its year is not known.
+TYPICAL_YEAR = int(os.getenv("TIME_INDEX_TYPICAL_YEAR", "2025"))
+LEAP_YEAR = int(os.getenv("TIME_INDEX_LEAP_YEAR", "2024"))
+
+HOURS_PER_YEAR = 8760
+HOURS_PER_LEAP_YEAR = 8784
+
+# National holidays on fixed dates (month, day), plus Good Friday (see _holidays). Regional
+# holidays are not included.
+NATIONAL_HOLIDAYS = [(1, 1), (1, 6), (5, 1), (8, 15), (10, 12), (11, 1), (12, 6), (12, 8), (12, 25)]
+
+
+class TimeIndex(NamedTuple):
+    """
+    Read-only per-hour arrays of one year (hours = 8760 or 8784 rows), in local time when the
+    index has a timezone. month_starts and day_starts are the first row of each month/day, for
+    np.add.reduceat.
+    """
+    year: int
+    timezone: Optional[str]
+    month: Any # 0-11
+    day: Any # Day of the year, 0-based
+    hour: Any # Local clock hour, 0-23 (repeated/missing on DST days)
+    weekday: Any # Monday = 0
+    holiday: Any # bool: national holiday
+    month_starts: Any
+    day_starts: Any
+
+    @property
+    def hours(self) -> int:
+        return len(self.month)
+
+    @property
+    def day_type(self):
+        """Per hour: 0 workday, 1 saturday, 2 sunday/holiday (the REE profile day types)."""
+        import numpy as np
+
+        return np.where(self.holiday | (self.weekday == 6), 2, np.where(self.weekday == 5, 1, 0))
+
+
+def _easter(year: int) -> datetime.date:
+    """Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return datetime.date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def _holidays(year: int):
+    import numpy as np
+
+    dates = [datetime.date(year, month, day) for month, day in NATIONAL_HOLIDAYS]
+    dates.append(_easter(year) - datetime.timedelta(days=2)) # Good Friday
+    return np.array(dates, dtype="datetime64[D]")
+
+
+def _utc_offsets_h(start_utc: datetime.datetime, hours: int, timezone: Optional[str]):
+    """UTC offset (whole hours) of each hour from start_utc on."""
+    import numpy as np
+
+    if timezone is None:
+        return np.zeros(hours, dtype=np.int64)
+    from zoneinfo import ZoneInfo
+
+    tz = ZoneInfo(timezone)
+    step = datetime.timedelta(hours=1)
+    return np.array([(start_utc + step * h).astimezone(tz).utcoffset() // step for h in range(hours)], dtype=np.int64)
+
+
+@lru_cache(maxsize=16)
+def get_time_index(year: int = TYPICAL_YEAR, timezone: Optional[str] = None) -> TimeIndex:
+    """
+    The index of a year: one row per elapsed hour from local January 1st 00:00 to the next
+    (8760 or 8784 rows; the DST shifts cancel out over the year). timezone=None gives the
+    plain 365/366 x 24 grid of typical-year data.
+    """
+    import numpy as np
+
+    tz = None
+    if timezone is not None:
+        from zoneinfo import ZoneInfo
+        tz = ZoneInfo(timezone)
+    start = datetime.datetime(year, 1, 1, tzinfo=tz or datetime.timezone.utc).astimezone(datetime.timezone.utc)
+    end = datetime.datetime(year + 1, 1, 1, tzinfo=tz or datetime.timezone.utc).astimezone(datetime.timezone.utc)
+    hours = int((end - start) // datetime.timedelta(hours=1))
+
+    utc = np.datetime64(start.replace(tzinfo=None), "h") + np.arange(hours)
+    local = utc + _utc_offsets_h(start, hours, timezone).astype("timedelta64[h]")
+    days = local.astype("datetime64[D]")
+    month = days.astype("datetime64[M]").astype(np.int64) % 12
+    day = (days - np.datetime64(f"{year}-01-01", "D")).astype(np.int64)
+    hour = (local - days).astype(np.int64)
+    weekday = (days.astype(np.int64) + 3) % 7 # 1970-01-01 was a Thursday
+    holiday = np.isin(days, _holidays(year))
+    month_starts = np.flatnonzero(np.diff(month, prepend=-1))
+    day_starts = np.flatnonzero(np.diff(day, prepend=-1))
+
+    arrays = (month, day, hour, weekday, holiday, month_starts, day_starts)
+    for array in arrays:
+        array.setflags(write=False)
+    return TimeIndex(year, timezone, *arrays)
+
+
+def index_for_hours(hours: int, year: Optional[int] = None, timezone: Optional[str] = TIME_INDEX_TIMEZONE) -> TimeIndex:
+    """
+    The index of a series of `hours` values: its year's if given (which must have that many
+    hours), otherwise TYPICAL_YEAR or LEAP_YEAR. Raises ValueError for any other length.
+    """
+    if year is None:
+        if hours not in (HOURS_PER_YEAR, HOURS_PER_LEAP_YEAR):
+            raise ValueError(f"A year has {HOURS_PER_YEAR} hourly values ({HOURS_PER_LEAP_YEAR} in a leap year), not {hours}.")
+        year = LEAP_YEAR if hours == HOURS_PER_LEAP_YEAR else TYPICAL_YEAR
+    index = get_time_index(year, timezone)
+    if index.hours != hours:
+        raise ValueError(f"{year} has {index.hours} hourly values, not {hours}.")
+    return index
+
+
+def monthly_sums(values, index: TimeIndex):
+    """Sum of each month (last axis), for an (hours,) or (N, hours) array."""
+    import numpy as np
+
+    return np.add.reduceat(np.asarray(values), index.month_starts, axis=-1)
+
+
+def daily_sums(values, index: TimeIndex):
+    """Sum of each day (last axis), for an (hours,) or (N, hours) array."""
+    import numpy as np
+
+    return np.add.reduceat(np.asarray(values), index.day_starts, axis=-1)
+
+
+def to_typical_year(values, index: TimeIndex):
+    """A leap-year series without February 29th (8760 values, aligned with typical-year data); others unchanged."""
+    import numpy as np
+
+    values = np.asarray(values)
+    if index.hours == HOURS_PER_YEAR:
+        return values
+    return values[..., index.day != 59] # Day 59 of a leap year is February 29th
@@ -0,0 +1,224 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+from app.services.cache_service import MemoryCache
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# --- Configuration (environment variables) ---
+# Admission control for the live upstream calls (see upstream_http.request_json). All limits are
+# per process: with N workers, the effective rate towards a host is N times the configured one.
+# Per-host rate limits as "host=rate_per_s[:burst]" pairs separated by commas. PVGIS allows 30
+# calls/s per IP; Overpass answers bursts with 429 and is best kept at ~1 call/s.
+UPSTREAM_RATE_LIMITS = os.getenv("UPSTREAM_RATE_LIMITS", "re.jrc.ec.europa.eu=20:20,overpass-api.de=1:2")
+UPSTREAM_DEFAULT_RATE_PER_S = float(os.getenv("UPSTREAM_DEFAULT_RATE_PER_S", "10"))
+# Callers waiting for a token (per host) beyond which new calls are shed immediately.
+UPSTREAM_MAX_QUEUE = int(os.getenv("UPSTREAM_MAX_QUEUE", "50"))
+# Longest a call may wait for a token. Calls whose turn would come later are shed right away
+# (there is no point in queueing a call that will time out anyway).
+UPSTREAM_QUEUE_TIMEOUT_S = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT_S", "5"))
+# Circuit breaker: opens after N consecutive failures (errors, timeouts, 429, 5xx) and lets one
+# probe call through after the cooldown.
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_COOLDOWN_S = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN_S", "30"))
+# Last good answer of every call, served when a call is shed or fails (PVGIS irradiation and
+# OSM buildings change slowly, so a weeks-old answer beats no answer).
+UPSTREAM_STALE_TTL_S = float(os.getenv("UPSTREAM_STALE_TTL_S", str(30 * 86400)))
+UPSTREAM_STALE_MAX_ENTRIES = int(os.getenv("UPSTREAM_STALE_MAX_ENTRIES", "2000"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class UpstreamUnavailableError(Exception):
+    """A call was not admitted: reason is "queue_full", "deadline" or "circuit_open"."""
+
+    def __init__(self, host: str, reason: str):
+        super().__init__(f"Upstream {host} unavailable ({reason})")
+        self.host = host
+        self.reason = reason
+
+
+class TokenBucket:
+    """
+    Token bucket with virtual scheduling: reserve() books the next token and returns how long
+    the caller must wait for it, so waiting callers are served in order at `rate_per_s`.
+    """
+
+    def __init__(self, rate_per_s: float, burst: float):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait_s: float) -> Optional[float]:
+        """Seconds to wait for a token, or None (nothing booked) if that would exceed max_wait_s."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_s)
+            self._updated = now
+            wait_s = max(0.0, (1 - self._tokens) / self.rate_per_s)
+            if wait_s > max_wait_s:
+                return None
+            self._tokens -= 1 # May go negative: the debt is the queue of booked callers
+            return wait_s
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures -> half-open after `cooldown_s`."""
+
+    def __init__(self, failure_threshold: int, cooldown_s: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown_s:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True # Only one probe at a time
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Circuit breaker closed after a successful probe.")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """The admitted probe was never sent: let the next call probe instead."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class UpstreamGuard:
+    """Rate limiter + bounded deadline-aware queue + circuit breaker for one upstream host."""
+
+    def __init__(self, host: str, rate_per_s: float, burst: float, max_queue: int = UPSTREAM_MAX_QUEUE,
+                 queue_timeout_s: float = UPSTREAM_QUEUE_TIMEOUT_S, breaker_failures: int = UPSTREAM_BREAKER_FAILURES,
+                 breaker_cooldown_s: float = UPSTREAM_BREAKER_COOLDOWN_S):
+        self.host = host
+        self.bucket = TokenBucket(rate_per_s, burst)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown_s)
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.queue_depth = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "deadline": 0, "circuit_open": 0}
+        self.fallbacks: Dict[str, int] = {"stale": 0, "empty": 0}
+        self.stale = MemoryCache(UPSTREAM_STALE_MAX_ENTRIES, UPSTREAM_STALE_TTL_S)
+        self._lock = threading.Lock()
+
+    def _shed(self, reason: str) -> UpstreamUnavailableError:
+        with self._lock:
+            self.shed[reason] += 1
+        logger.warning(f"Shedding call to {self.host}: {reason}")
+        return UpstreamUnavailableError(self.host, reason)
+
+    def acquire(self, timeout_s: Optional[float] = None) -> None:
+        """
+        Blocks until the call may be sent (runs in the threadpool, like the call itself) or
+        raises UpstreamUnavailableError right away if it would be shed.
+        """
+        with self._lock:
+            full = self.queue_depth >= self.max_queue
+            if not full:
+                self.queue_depth += 1
+        if full:
+            raise self._shed("queue_full")
+        if not self.breaker.allow():
+            with self._lock:
+                self.queue_depth -= 1
+            raise self._shed("circuit_open")
+        try:
+            wait_s = self.bucket.reserve(self.queue_timeout_s if timeout_s is None else timeout_s)
+            if wait_s is None:
+                self.breaker.release_probe()
+                raise self._shed("deadline")
+            if wait_s > 0:
+                time.sleep(wait_s)
+        finally:
+            with self._lock:
+                self.queue_depth -= 1
+        with self._lock:
+            self.admitted += 1
+
+    def record_fallback(self, kind: str) -> None:
+        with self._lock:
+            self.fallbacks[kind] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "host": self.host, "rate_per_s": self.bucket.rate_per_s, "burst": self.bucket.burst,
+            "queue_depth": self.queue_depth, "max_queue": self.max_queue, "admitted": self.admitted,
+            "shed": dict(self.shed), "fallbacks": dict(self.fallbacks), "stale_entries": len(self.stale._entries),
+            "circuit_state": self.breaker.state, "circuit_opened": self.breaker.times_opened,
+        }
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parses "host=rate[:burst],..." into {host: (rate_per_s, burst)} (burst defaults to the rate)."""
+    limits = {}
+    for item in spec.split(","):
+        host, sep, value = item.strip().partition("=")
+        if not sep:
+            continue
+        rate, _, burst = value.partition(":")
+        limits[host.strip().lower()] = (float(rate), float(burst) if burst else max(1.0, float(rate)))
+    return limits
+
+
+_guards: Dict[str, UpstreamGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(url: str) -> UpstreamGuard:
+    """Guard of the host of `url` (one per host and process, created on first use)."""
+    host = (urlparse(url).hostname or url).lower()
+    guard = _guards.get(host)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(host)
+            if guard is None:
+                rate, burst = parse_rate_limits(UPSTREAM_RATE_LIMITS).get(
+                    host, (UPSTREAM_DEFAULT_RATE_PER_S, max(1.0, UPSTREAM_DEFAULT_RATE_PER_S)))
+                guard = _guards[host] = UpstreamGuard(host, rate, burst, UPSTREAM_MAX_QUEUE, UPSTREAM_QUEUE_TIMEOUT_S,
+                                                      UPSTREAM_BREAKER_FAILURES, UPSTREAM_BREAKER_COOLDOWN_S)
+    return guard
+
+
+def reset_guards() -> None:
+    """Discards every guard (they are recreated with the current configuration on next use)."""
+    with _guards_lock:
+        _guards.clear()
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    return [guard.stats() for guard in list(_guards.values())]
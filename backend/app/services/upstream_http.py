@@ -0,0 +1,88 @@
+import logging
+import os
+import threading
+from typing import Any, Dict
+from dotenv import load_dotenv
+
+from app.services import upstream_guard
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# By default the PVGIS and Overpass services return built-in mock data. With UPSTREAM_LIVE=1 they
+# query the URLs configured in PVGIS_API_URL_* / OVERPASS_API_URL: the public APIs, or a local
+# stand-in such as scripts/stub_upstreams.py for load testing.
+UPSTREAM_LIVE = os.getenv("UPSTREAM_LIVE", "0").lower() in ("1", "true", "yes")
+UPSTREAM_TIMEOUT_S = float(os.getenv("UPSTREAM_TIMEOUT_S", "30"))
+
+# One requests.Session per thread (the calls run in the threadpool), so keep-alive connections
+# are reused across requests without sharing a Session between threads.
+_local = threading.local()
+
+
+def _get_session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        import requests # Lazy import: requests is only needed for live calls, keep it off the cold-start path
+        session = _local.session = requests.Session()
+    return session
+
+
+def _stale_key(method: str, url: str, kwargs: Dict[str, Any]) -> str:
+    return repr((method.upper(), url, sorted((kwargs.get("params") or {}).items()), sorted((kwargs.get("data") or {}).items())))
+
+
+def _fallback(guard: upstream_guard.UpstreamGuard, key: str, url: str) -> Dict[str, Any]:
+    stale = guard.stale.get(key)
+    if stale is not None:
+        logger.warning(f"Serving the last good answer of {url}.")
+        guard.record_fallback("stale")
+        return stale
+    guard.record_fallback("empty")
+    return {}
+
+
+def request_json(method: str, url: str, **kwargs) -> Dict[str, Any]:
+    """
+    Performs an HTTP request and returns the decoded JSON body. Calls go through the admission
+    control of the host (upstream_guard: rate limit, bounded queue, circuit breaker); when a call
+    is shed or fails, the last good answer to the same call is returned if there is one, and {}
+    otherwise (logged), which the callers treat as "no data" and never cache.
+    """
+    import requests
+    guard = upstream_guard.get_guard(url)
+    key = _stale_key(method, url, kwargs)
+    try:
+        guard.acquire()
+    except upstream_guard.UpstreamUnavailableError:
+        return _fallback(guard, key, url)
+    answered = False
+    try:
+        try:
+            response = _get_session().request(method, url, timeout=kwargs.pop("timeout", UPSTREAM_TIMEOUT_S), **kwargs)
+        except requests.exceptions.RequestException as e: # Network error or timeout
+            answered = True
+            guard.breaker.record_failure()
+            logger.error(f"Error querying {url}: {e}")
+            return _fallback(guard, key, url)
+        answered = True
+        if response.status_code == 429 or response.status_code >= 500:
+            guard.breaker.record_failure() # Overloaded or failing: back off
+        else:
+            guard.breaker.record_success() # The upstream answered (a 4XX is the caller's fault)
+        try:
+            response.raise_for_status() # Raises HTTPError for bad responses (4XX or 5XX)
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Error querying {url}: {e}")
+            return _fallback(guard, key, url)
+        try:
+            data = response.json()
+        except ValueError as e: # JSON decoding errors (requests.JSONDecodeError is also a RequestException)
+            logger.error(f"Error decoding JSON from {url}: {e}")
+            return _fallback(guard, key, url)
+    finally:
+        if not answered:
+            guard.breaker.release_probe() # Failed before the call was sent: don't leave a half-open probe hanging
+    if data:
+        guard.stale.set(key, data)
+    return data
@@ -0,0 +1,83 @@
+"""
+Throughput de los endpoints completos a través de la app ASGI (httpx.ASGITransport, sin red
+ni servidor), con Overpass y PVGIS sustituidos por respuestas fijas. Cada ronda lanza
+BURST_SIZE peticiones concurrentes; extra_info["requests_per_s"] resume la ronda media.
+"""
+import asyncio
+import itertools
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services import location_service, overpass_service, pvgis_service
+
+from conftest import overpass_neighbourhood
+
+BURST_SIZE = 50
+PVGIS_RESPONSE = {"inputs": {"mounting_system": {"fixed": {"slope": {"value": 35.0}}}}, "outputs": {}}
+
+# Coordenadas únicas por petición para el caso "cold" (sin cachés ni coalescencia entre peticiones).
+_unique_coords = itertools.count()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def stub_upstreams():
+    neighbourhood = overpass_neighbourhood(40.416775, -3.703790)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(overpass_service, "get_building_and_obstacle_data", lambda lat, lng, **kwargs: neighbourhood)
+        mp.setattr(pvgis_service, "get_pvgis_data", lambda lat, lng, **kwargs: PVGIS_RESPONSE)
+        yield
+
+
+def _run_burst(requests):
+    """Envía una ráfaga de peticiones concurrentes (lista de (método, url, kwargs)) y devuelve los status."""
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            responses = await asyncio.gather(*(client.request(method, url, **kwargs) for method, url, kwargs in requests))
+        return [response.status_code for response in responses]
+    return asyncio.run(burst())
+
+
+def _bench_burst(benchmark, make_requests, expected_status: int):
+    statuses = benchmark.pedantic(lambda requests: _run_burst(requests), setup=lambda: ((make_requests(),), {}),
+                                  rounds=15, warmup_rounds=1)
+    assert set(statuses) == {expected_status}
+    benchmark.extra_info["burst_size"] = BURST_SIZE
+    if benchmark.stats is not None: # None con --benchmark-disable (una sola pasada, sin medir)
+        benchmark.extra_info["requests_per_s"] = round(BURST_SIZE / benchmark.stats.stats.mean, 1)
+
+
+def bench_location_analyze_cold(benchmark):
+    """Cada petición es una ubicación distinta: pipeline completo por petición."""
+    def make_requests():
+        return [("POST", "/location/analyze", {"json": {"lat": 40.0 + next(_unique_coords) * 1e-4, "lng": -3.7}})
+                for _ in range(BURST_SIZE)]
+    _bench_burst(benchmark, make_requests, 200)
+
+
+def bench_location_analyze_warm(benchmark):
+    """Misma ubicación repetida: respuesta servida desde la caché de respuestas."""
+    payload = {"lat": 40.416775, "lng": -3.703790}
+    _run_burst([("POST", "/location/analyze", {"json": payload})])
+    _bench_burst(benchmark, lambda: [("POST", "/location/analyze", {"json": payload})] * BURST_SIZE, 200)
+
+
+def bench_location_analyze_not_modified(benchmark):
+    """Peticiones condicionales (If-None-Match) del asistente al navegar entre pasos: 304."""
+    payload = {"lat": 40.416775, "lng": -3.703790}
+    location_service.response_cache.clear()
+    etag = asyncio.run(location_service.get_analysis_response(payload["lat"], payload["lng"])).etag
+    request = ("POST", "/location/analyze", {"json": payload, "headers": {"If-None-Match": etag}})
+    _bench_burst(benchmark, lambda: [request] * BURST_SIZE, 304)
+
+
+def bench_consumption_predict_manual(benchmark):
+    payload = {"occupants": 3, "area_m2": 120, "has_ev": True, "has_heat_pump": False}
+    _bench_burst(benchmark, lambda: [("POST", "/consumption/predict/manual", {"json": payload})] * BURST_SIZE, 200)
+
+
+def bench_consumption_predict_csv(benchmark, hourly_csv):
+    files = {"file": ("consumo.csv", hourly_csv, "text/csv")}
+    _bench_burst(benchmark, lambda: [("POST", "/consumption/predict/csv", {"files": files})] * BURST_SIZE, 200)
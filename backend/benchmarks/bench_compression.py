@@ -0,0 +1,63 @@
+"""
+Bytes en la red y latencia añadida por CompressionMiddleware en las rutas /consumption/*.
+extra_info["wire_bytes"] es el tamaño del cuerpo enviado y "ratio" la compresión obtenida.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.main import app
+from app.middleware import compression
+
+MANUAL_PAYLOAD = {"occupants": 3, "area_m2": 120, "has_ev": True, "has_heat_pump": False}
+ENCODINGS = ["identity", "gzip", "br", "zstd"]
+
+
+def _skip_unavailable(encoding):
+    if encoding != "identity" and encoding not in compression.available_encodings():
+        pytest.skip(f"'{encoding}' no está instalado")
+
+
+def _post(path, accept_encoding, **kwargs):
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"Accept-Encoding": accept_encoding}) as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(request())
+
+
+def _bench_route(benchmark, path, encoding, **kwargs):
+    response = benchmark(_post, path, encoding, **kwargs)
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding", "identity") == encoding
+    wire_bytes = len(response.content) if encoding == "identity" else int(response.headers["content-length"])
+    benchmark.extra_info["wire_bytes"] = wire_bytes
+    benchmark.extra_info["ratio"] = round(len(response.content) / wire_bytes, 1) if encoding != "identity" else 1.0
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def bench_predict_manual(benchmark, encoding):
+    _skip_unavailable(encoding)
+    _bench_route(benchmark, "/consumption/predict/manual", encoding, json=MANUAL_PAYLOAD)
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def bench_predict_csv(benchmark, encoding, hourly_csv):
+    _skip_unavailable(encoding)
+    _bench_route(benchmark, "/consumption/predict/csv", encoding, files={"file": ("consumo.csv", hourly_csv, "text/csv")})
+
+
+@pytest.fixture(scope="module")
+def csv_response_body(hourly_csv):
+    return _post("/consumption/predict/csv", "identity", files={"file": ("consumo.csv", hourly_csv, "text/csv")}).content
+
+
+@pytest.mark.parametrize("level", [1, 4, 6, 9])
+def bench_gzip_level(benchmark, level, csv_response_body):
+    """Coste de CPU frente a tamaño por nivel de gzip, sobre el cuerpo de /consumption/predict/csv (perfil medido, menos repetitivo)."""
+    settings = compression.CompressionSettings(gzip_level=level)
+    compressed = benchmark(lambda: compression._Compressor("gzip", settings).compress(csv_response_body, final=True))
+    benchmark.extra_info["raw_bytes"] = len(csv_response_body)
+    benchmark.extra_info["wire_bytes"] = len(compressed)
+    benchmark.extra_info["ratio"] = round(len(csv_response_body) / len(compressed), 1)
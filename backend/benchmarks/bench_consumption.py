@@ -0,0 +1,36 @@
+from app.schemas.consumption import ConsumptionManualInput
+from app.services import consumption_service
+
+from conftest import run_csv_prediction
+
+MANUAL_INPUT = ConsumptionManualInput(occupants=4, area_m2=110, has_ev=True, has_heat_pump=False)
+
+
+def bench_manual_profile_warm(benchmark):
+    """Caso habitual: el perfil del arquetipo ya está en la caché (lru_cache)."""
+    consumption_service.predict_consumption_manual(MANUAL_INPUT)
+    result = benchmark(consumption_service.predict_consumption_manual, MANUAL_INPUT)
+    assert len(result.hourly_profile) == 8760
+
+
+def bench_manual_profile_cold(benchmark):
+    """Primer uso de un arquetipo: incluye la síntesis del perfil horario normalizado."""
+    result = benchmark.pedantic(
+        consumption_service.predict_consumption_manual, args=(MANUAL_INPUT,),
+        setup=consumption_service._archetype_profile.cache_clear, rounds=30, iterations=1
+    )
+    assert len(result.hourly_profile) == 8760
+
+
+def bench_csv_hourly_8760(benchmark, hourly_csv):
+    """Archivo horario de un año (8760 filas): lectura, parseo y agregación."""
+    result = benchmark(run_csv_prediction, hourly_csv)
+    assert not isinstance(result, ValueError), result
+
+
+def bench_csv_quarter_hourly_35040(benchmark, quarter_hourly_csv):
+    """Archivo cuartohorario de un año (35040 filas, formato de las distribuidoras): lectura, parseo, suma en horas y agregación."""
+    benchmark.extra_info["rows"] = 35040
+    result = benchmark(run_csv_prediction, quarter_hourly_csv)
+    assert not isinstance(result, ValueError), result
+    assert len(result.hourly_profile) == 8760
@@ -0,0 +1,24 @@
+from app.services import geometry_service
+
+TARGET_LAT, TARGET_LNG = 40.416775, -3.703790
+
+
+def bench_analyze_roof(benchmark, overpass_elements):
+    benchmark(geometry_service.analyze_roof_from_overpass_data,
+              overpass_elements=overpass_elements, target_lat=TARGET_LAT, target_lng=TARGET_LNG)
+
+
+def bench_shading_factors(benchmark, overpass_elements):
+    _, roof_sections, obstacles = geometry_service.analyze_roof_from_overpass_data(
+        overpass_elements=overpass_elements, target_lat=TARGET_LAT, target_lng=TARGET_LNG)
+    building = next((el for el in overpass_elements if el.get("type") == "way" and "building" in el.get("tags", {})), {})
+    benchmark(geometry_service.calculate_shading_factors,
+              target_building_geometry=building, roof_sections=roof_sections, obstacles_data=obstacles, lat=TARGET_LAT)
+
+
+def bench_estimate_max_kwp(benchmark):
+    benchmark(geometry_service.estimate_max_kwp, total_roof_area=120.0)
+
+
+def bench_polygon_area_and_centroid(benchmark, overpass_elements):
+    benchmark(geometry_service.get_polygon_area_and_centroid, overpass_elements[0]["geometry"])
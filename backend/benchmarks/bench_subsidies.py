@@ -0,0 +1,37 @@
+import numpy as np
+
+from app.services import subsidy_service
+
+SYSTEM_KWP_SWEEP = np.round(np.arange(1.0, 20.01, 0.25), 2)
+COST_PER_KWP_EUR = 1400.0
+
+
+def bench_get_eligible_subsidies(benchmark, large_subsidy_table):
+    """Consulta de elegibilidad contra una tabla de LARGE_SUBSIDY_TABLE_SIZE reglas."""
+    benchmark.extra_info["table_size"] = large_subsidy_table
+    result = benchmark(subsidy_service.get_eligible_subsidies, "ES-MD", 5.0, "residential", "2025-06-01")
+    benchmark.extra_info["eligible"] = len(result)
+    assert result
+
+
+def _eligible(large_subsidy_table):
+    return subsidy_service.get_eligible_subsidies("ES-MD", 5.0, "residential", "2025-06-01")
+
+
+def bench_calculate_subsidy_amount_sweep(benchmark, large_subsidy_table):
+    """Barrido de tamaños de sistema con la versión escalar (una llamada por subvención y tamaño)."""
+    subsidies = _eligible(large_subsidy_table)
+
+    def sweep():
+        return [[subsidy_service.calculate_subsidy_amount(s, float(kwp), float(kwp) * COST_PER_KWP_EUR) for s in subsidies]
+                for kwp in SYSTEM_KWP_SWEEP]
+
+    benchmark.extra_info["evaluations"] = len(subsidies) * len(SYSTEM_KWP_SWEEP)
+    benchmark(sweep)
+
+
+def bench_calculate_subsidy_amounts_batch_sweep(benchmark, large_subsidy_table):
+    """El mismo barrido con la versión vectorizada."""
+    subsidies = _eligible(large_subsidy_table)
+    benchmark.extra_info["evaluations"] = len(subsidies) * len(SYSTEM_KWP_SWEEP)
+    benchmark(subsidy_service.calculate_subsidy_amounts_batch, subsidies, SYSTEM_KWP_SWEEP, SYSTEM_KWP_SWEEP * COST_PER_KWP_EUR)
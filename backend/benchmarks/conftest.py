@@ -0,0 +1,115 @@
+import asyncio
+import datetime
+import io
+import random
+
+import pytest
+from starlette.datastructures import UploadFile
+
+# Datos sintéticos deterministas (semilla fija) para que los resultados sean comparables entre commits.
+
+REGION_CODES = ["ES-AN", "ES-AR", "ES-AS", "ES-CB", "ES-CL", "ES-CM", "ES-CN", "ES-CT", "ES-EX",
+                "ES-GA", "ES-IB", "ES-MC", "ES-MD", "ES-NC", "ES-PV", "ES-RI", "ES-VC"]
+SUBSIDY_TYPES = ["percentage_cost", "fixed_amount", "amount_per_kwp"]
+LARGE_SUBSIDY_TABLE_SIZE = 20000
+
+
+def consumption_csv(rows: int, hours_per_row: float, seed: int = 8760) -> bytes:
+    """
+    CSV con un perfil residencial realista (base + picos de mañana y tarde + ruido), en el
+    formato de las exportaciones de las distribuidoras: 'kWh;fecha hora' separado por ';',
+    con el consumo en la primera columna.
+    """
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+    lines = []
+    for i in range(rows):
+        moment = start + datetime.timedelta(hours=i * hours_per_row)
+        kw = 0.15 + (0.35 if 18 <= moment.hour <= 22 else 0.0) + (0.1 if 7 <= moment.hour <= 9 else 0.0) + rng.random() * 0.2
+        lines.append(f"{kw * hours_per_row:.4f};{moment:%Y-%m-%d %H:%M}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def run_csv_prediction(content: bytes, filename: str = "consumo.csv"):
+    """Ejecuta predict_consumption_csv sobre un archivo en memoria; devuelve el resultado o el ValueError de validación."""
+    from app.services import consumption_service
+
+    upload = UploadFile(filename=filename, file=io.BytesIO(content))
+    try:
+        return asyncio.run(consumption_service.predict_consumption_csv(upload))
+    except ValueError as e:
+        return e
+
+
+def subsidy_records(count: int, seed: int = 2024):
+    """Reglas de subvención sintéticas repartidas entre nacional, autonómicas y municipales."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        region = rng.choice(["ES"] + REGION_CODES + [f"{rng.choice(REGION_CODES)}-{rng.randint(1, 300):03d}"] * 3)
+        subsidy_type = rng.choice(SUBSIDY_TYPES)
+        value = {"percentage_cost": round(rng.uniform(0.1, 0.5), 2),
+                 "fixed_amount": float(rng.randint(200, 3000)),
+                 "amount_per_kwp": float(rng.randint(100, 600))}[subsidy_type]
+        year = rng.choice([2023, 2024, 2025, 2026])
+        records.append({
+            "name": f"Ayuda {i}", "region_code": region, "type": subsidy_type, "value": value,
+            "max_amount_eur": rng.choice([None, 1500.0, 3000.0, 6000.0]),
+            "min_kwp_required": rng.choice([0.0, 1.0, 2.0]),
+            "max_kwp_eligible": rng.choice([None, 10.0, 15.0, 100.0]),
+            "applicable_to_entity_type": rng.choice(["residential", "business", "any"]),
+            "start_date": f"{year}-01-01", "end_date": f"{year + 1}-12-31",
+            "is_active": rng.random() > 0.1,
+        })
+    return records
+
+
+@pytest.fixture(scope="session")
+def hourly_csv() -> bytes:
+    return consumption_csv(8760, 1.0)
+
+
+@pytest.fixture(scope="session")
+def quarter_hourly_csv() -> bytes:
+    return consumption_csv(35040, 0.25)
+
+
+@pytest.fixture(scope="session")
+def large_subsidy_table(tmp_path_factory):
+    """Base de datos temporal con LARGE_SUBSIDY_TABLE_SIZE reglas, cargada con la importación masiva."""
+    from app.db import database
+    from app.services import subsidy_import_service
+
+    db_dir = tmp_path_factory.mktemp("subsidies")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(database, "DATABASE_DIR", str(db_dir))
+        mp.setattr(database, "DATABASE_PATH", str(db_dir / "bench_subsidies.db"))
+        subsidy_import_service.import_subsidies(subsidy_records(LARGE_SUBSIDY_TABLE_SIZE))
+        yield LARGE_SUBSIDY_TABLE_SIZE
+
+
+def overpass_neighbourhood(lat: float, lng: float, buildings: int = 150, trees: int = 300, seed: int = 42):
+    """Respuesta de Overpass sintética: edificio objetivo + edificios y árboles cercanos (formato `out geom`)."""
+    rng = random.Random(seed)
+
+    def footprint(clat, clng, size):
+        return [{"lat": clat + dy * size, "lon": clng + dx * size}
+                for dx, dy in ((-1, -1), (1, -1), (1, 1), (-1, 1), (-1, -1))]
+
+    elements = [{"type": "way", "id": 1, "tags": {"building": "residential"}, "geometry": footprint(lat, lng, 0.0001)}]
+    for i in range(buildings):
+        elements.append({
+            "type": "way", "id": 100 + i, "tags": {"building": "yes", "height": str(rng.randint(3, 30))},
+            "geometry": footprint(lat + rng.uniform(-0.0013, 0.0013), lng + rng.uniform(-0.0017, 0.0017), 0.00008),
+        })
+    for i in range(trees):
+        elements.append({
+            "type": "node", "id": 10000 + i, "tags": {"natural": "tree"},
+            "lat": lat + rng.uniform(-0.0013, 0.0013), "lon": lng + rng.uniform(-0.0017, 0.0017),
+        })
+    return {"elements": elements}
+
+
+@pytest.fixture(scope="session")
+def overpass_elements():
+    return overpass_neighbourhood(40.416775, -3.703790)["elements"]
@@ -0,0 +1,59 @@
+"""
+Ejecuta la suite de benchmarks (pytest-benchmark) y guarda el resultado en JSON para
+comparar entre commits. Uso (desde backend/):
+
+    python benchmarks/run_benchmarks.py                      # ejecuta y guarda en benchmarks/.results/
+    python benchmarks/run_benchmarks.py --compare            # compara con la última ejecución guardada
+    python benchmarks/run_benchmarks.py --compare 0003 --fail-threshold 10 -k subsidies
+
+Cada ejecución se guarda como <máquina>/<número>_<commit>_<fecha>.json dentro de --storage;
+`pytest-benchmark compare --storage file://benchmarks/.results` las lista y compara.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_STORAGE = os.path.join(BENCHMARKS_DIR, ".results")
+
+
+def build_pytest_args(args) -> list:
+    pytest_args = [
+        sys.executable, "-m", "pytest", "-c", os.path.join(BENCHMARKS_DIR, "pytest.ini"), BENCHMARKS_DIR,
+        "-p", "no:cacheprovider",
+        f"--benchmark-storage=file://{os.path.abspath(args.storage)}",
+        "--benchmark-autosave",
+    ]
+    if args.compare is not None:
+        pytest_args.append("--benchmark-compare" if args.compare == "last" else f"--benchmark-compare={args.compare}")
+        if args.fail_threshold is not None:
+            # Falla si la media de algún benchmark empeora más de un X % respecto a la referencia
+            pytest_args.append(f"--benchmark-compare-fail=mean:{args.fail_threshold}%")
+    if args.json_path:
+        pytest_args.append(f"--benchmark-json={os.path.abspath(args.json_path)}")
+    if args.keyword:
+        pytest_args += ["-k", args.keyword]
+    return pytest_args
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta los benchmarks del backend y guarda los resultados en JSON.")
+    parser.add_argument("--storage", default=DEFAULT_STORAGE, help="Directorio donde se guardan las ejecuciones (JSON).")
+    parser.add_argument("--compare", nargs="?", const="last", help="Compara con una ejecución guardada (por defecto, la última).")
+    parser.add_argument("--fail-threshold", type=int, help="Con --compare: falla si la media empeora más de este porcentaje.")
+    parser.add_argument("--json", dest="json_path", help="Escribe además el resultado de esta ejecución en este archivo.")
+    parser.add_argument("-k", dest="keyword", help="Ejecuta solo los benchmarks que coincidan (expresión -k de pytest).")
+    args = parser.parse_args(argv)
+
+    pytest_args = build_pytest_args(args)
+    logger.info(f"Ejecutando: {' '.join(pytest_args)}")
+    return subprocess.run(pytest_args, cwd=os.path.dirname(BENCHMARKS_DIR)).returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Análisis de una cartera de direcciones desde la línea de comandos (mismo servicio que
+POST /location/portfolio), escribiendo los resultados a medida que se completan.
+
+Si el archivo de salida ya existe, el análisis se reanuda: las direcciones ya analizadas
+con éxito se omiten y los nuevos resultados se añaden al final (--restart para empezar de cero).
+
+Uso (desde backend/):
+    python scripts/analyze_portfolio.py direcciones.csv -o resultados.ndjson
+    python scripts/analyze_portfolio.py direcciones.csv -o resultados.csv --processes 8
+"""
+import argparse
+import itertools
+import logging
+import os
+import sys
+
+backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from app.services import portfolio_service
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Analiza una cartera de direcciones (CSV con columnas lat y lng).")
+    parser.add_argument("input", help="CSV de entrada (cabecera con lat, lng y opcionalmente id)")
+    parser.add_argument("-o", "--output", required=True, help="Archivo de salida (.ndjson o .csv)")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Formato de salida (por defecto, según la extensión)")
+    parser.add_argument("--processes", type=int, default=portfolio_service.PORTFOLIO_PROCESSES,
+                        help="Procesos para geometría y sombras (por defecto PORTFOLIO_PROCESSES)")
+    parser.add_argument("--restart", action="store_true", help="Ignora la salida existente y empieza de cero")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    output_format = args.format or ("csv" if args.output.endswith(".csv") else "ndjson")
+    portfolio_service.PORTFOLIO_PROCESSES = args.processes
+
+    with open(args.input, encoding="utf-8-sig", errors="replace") as f:
+        try:
+            points, invalid = portfolio_service.read_points(f.read())
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    skip = set()
+    resuming = not args.restart and os.path.exists(args.output) and os.path.getsize(args.output) > 0
+    if resuming:
+        # Si la ejecución anterior se cortó a mitad de un registro, se descarta esa línea incompleta
+        # antes de añadir: si no, el primer registro nuevo quedaría pegado a ella
+        portfolio_service.trim_incomplete_tail(args.output)
+        with open(args.output, encoding="utf-8") as f:
+            skip = portfolio_service.completed_keys(f)
+        print(f"Reanudando: {len(skip)} direcciones ya analizadas en {args.output}", file=sys.stderr)
+        invalid = [] # Ya están en la salida anterior
+
+    records = _report_progress(itertools.chain(invalid, portfolio_service.analyze_portfolio(points, skip=skip)))
+    if output_format == "csv":
+        chunks = portfolio_service.to_csv(records, header=not resuming)
+    else:
+        chunks = portfolio_service.to_ndjson(records)
+
+    try:
+        with open(args.output, "ab" if resuming else "wb") as out:
+            for chunk in chunks:
+                out.write(chunk)
+                out.flush() # Cada resultado queda en disco: una interrupción no pierde lo ya analizado
+    finally:
+        portfolio_service.shutdown_process_pool()
+    print(file=sys.stderr)
+    return 0
+
+
+def _report_progress(records):
+    """Muestra los registros de progreso en stderr y deja pasar solo los resultados."""
+    for record in records:
+        if record["type"] == "progress":
+            print(f"\r{record['done']}/{record['total']} direcciones, {record['tiles_done']}/{record['tiles']} teselas, "
+                  f"{record['elapsed_s']:.1f} s", end="", file=sys.stderr)
+        else:
+            yield record
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Benchmark de arranque en frío: mide cuánto tarda un proceso nuevo de Python en importar `app.main`.
+
+Cada muestra se toma en un subproceso limpio (sin módulos en caché), igual que un worker
+recién lanzado por uvicorn/gunicorn o una instancia serverless. Uso (desde backend/):
+
+    python scripts/benchmark_startup.py --runs 15
+    python scripts/benchmark_startup.py --json benchmarks/startup_history.json  # añade el resultado al histórico
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Código ejecutado en cada subproceso: imprime los segundos que tarda el import.
+_IMPORT_SNIPPET = (
+    "import time; t0 = time.perf_counter(); "
+    "import {module}; "
+    "print(time.perf_counter() - t0)"
+)
+
+
+def measure_cold_import(module: str = "app.main", runs: int = 10) -> list:
+    """Devuelve una lista con la duración (s) de importar `module` en `runs` procesos nuevos."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return samples
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(ordered[0] * 1000, 1),
+        "median_ms": round(statistics.median(ordered) * 1000, 1),
+        "p90_ms": round(ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide la latencia de importación en frío de app.main.")
+    parser.add_argument("--module", default="app.main", help="Módulo a importar (por defecto app.main).")
+    parser.add_argument("--runs", type=int, default=10, help="Número de procesos a lanzar.")
+    parser.add_argument("--json", dest="json_path", help="Archivo JSON donde añadir el resultado (histórico entre commits).")
+    args = parser.parse_args(argv)
+
+    summary = summarize(measure_cold_import(args.module, args.runs))
+    summary.update({
+        "module": args.module,
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    })
+    logger.info(
+        f"Importación en frío de {args.module}: mediana {summary['median_ms']} ms, "
+        f"p90 {summary['p90_ms']} ms, mín {summary['min_ms']} ms ({args.runs} procesos)."
+    )
+
+    if args.json_path:
+        history = []
+        if os.path.exists(args.json_path):
+            with open(args.json_path) as f:
+                history = json.load(f)
+        history.append(summary)
+        os.makedirs(os.path.dirname(os.path.abspath(args.json_path)), exist_ok=True)
+        with open(args.json_path, "w") as f:
+            json.dump(history, f, indent=2)
+        logger.info(f"Resultado añadido a {args.json_path}")
+    else:
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+(Re)genera la biblioteca de perfiles de carga de año tipo (PROFILE_LIBRARY_PATH): las curvas
+integradas más las que se importen de CSV, por ejemplo los coeficientes de perfilado de REE.
+
+Cada CSV tiene cabecera y 8760 filas (una por hora); cada columna numérica que no sea de
+fecha/hora (Mes, Dia, Hora, Año...) es una curva con ese nombre. Se admiten ';' y coma decimal.
+
+Uso (desde backend/):
+    python scripts/build_profile_library.py
+    python scripts/build_profile_library.py perfiles_ree_2025.csv --columns P2.0TD
+    python scripts/build_profile_library.py curvas.csv --no-builtin -o /srv/datos/perfiles.npy
+
+Tras regenerarla, recarga los workers (`kill -HUP <pid del maestro>`) o reinicia el servidor.
+"""
+import argparse
+import logging
+import os
+import sys
+
+backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from app.services import profile_library
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Genera la biblioteca de perfiles de carga de año tipo.")
+    parser.add_argument("csv", nargs="*", help="CSV con curvas horarias a importar (cabecera, 8760 filas)")
+    parser.add_argument("--columns", nargs="+", help="Columnas a importar de cada CSV (por defecto, todas las numéricas)")
+    parser.add_argument("--no-builtin", action="store_true", help="No incluir las curvas integradas")
+    parser.add_argument("-o", "--output", default=profile_library.PROFILE_LIBRARY_PATH, help="Ruta de la matriz .npy (por defecto PROFILE_LIBRARY_PATH)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    curves = {}
+    try:
+        for path in args.csv:
+            curves.update(profile_library.read_curves_csv(path, args.columns))
+        path = profile_library.build_library(args.output, curves=curves, include_builtin=not args.no_builtin)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    library = profile_library.load_library(path)
+    for profile in library.describe():
+        print(f"{profile['name']}\t{profile['description']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Prueba de carga de la API: lanza peticiones con N clientes concurrentes (asyncio + httpx) durante
+un tiempo fijo por nivel de concurrencia y mide el throughput y la latencia p50/p95/p99.
+Sirve para dimensionar el número de workers. Uso (desde backend/, con la API en marcha, por
+ejemplo contra scripts/stub_upstreams.py; ver el README):
+
+    python scripts/load_test.py --endpoint location --concurrency 1,8,32,64 --duration 20
+    python scripts/load_test.py --endpoint mixed --unique-ratio 0.3 --json benchmarks/load_history.json
+
+--unique-ratio es la fracción de peticiones a /location/analyze con coordenadas nuevas (pipeline
+completo y llamadas a PVGIS/Overpass); el resto repite un conjunto pequeño de ubicaciones "calientes"
+(cachés y coalescencia), como ocurre con una campaña que envía a muchos usuarios al mismo edificio.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING) # Una línea por petición satura la salida
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ENDPOINTS = ("location", "manual", "mixed")
+# Ubicaciones repetidas (cache hit tras la primera petición) del caso --unique-ratio < 1.
+HOT_LOCATIONS = [(40.416775, -3.703790), (41.387400, 2.168600), (37.389100, -5.984500), (39.469900, -0.376300)]
+MANUAL_PAYLOADS = [
+    {"occupants": occupants, "area_m2": area, "has_ev": has_ev, "has_heat_pump": has_hp}
+    for occupants, area, has_ev, has_hp in itertools.product((1, 2, 4), (60, 110), (False, True), (False, True))
+]
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Percentil q (0-100) por el método del rango más cercano sobre valores ya ordenados."""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(-(-q * len(ordered) // 100))) # ceil(q/100 * n)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies_s: List[float], statuses: Counter, elapsed_s: float, concurrency: int) -> Dict[str, Any]:
+    ordered = sorted(latencies_s)
+    errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400))
+    return {
+        "concurrency": concurrency,
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed_s, 1) if elapsed_s else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=lambda item: str(item[0]))},
+    }
+
+
+class RequestFactory:
+    """Genera las peticiones (método, ruta, json) del escenario elegido."""
+
+    def __init__(self, endpoint: str, unique_ratio: float, seed: Optional[int] = None):
+        self.endpoint = endpoint
+        self.unique_ratio = unique_ratio
+        self.rng = random.Random(seed)
+        self._unique = itertools.count()
+
+    def _location(self):
+        if self.rng.random() < self.unique_ratio:
+            # Rejilla de ~100 m dentro de la península: cada petición es una ubicación nueva.
+            n = next(self._unique)
+            lat, lng = 37.0 + (n // 1000) * 0.001, -6.0 + (n % 1000) * 0.001
+        else:
+            lat, lng = self.rng.choice(HOT_LOCATIONS)
+        return "POST", "/location/analyze", {"lat": lat, "lng": lng}
+
+    def next(self):
+        endpoint = self.endpoint
+        if endpoint == "mixed": # Un análisis de ubicación por cada 3 predicciones de consumo (asistente completo)
+            endpoint = "location" if self.rng.random() < 0.25 else "manual"
+        if endpoint == "location":
+            return self._location()
+        return "POST", "/consumption/predict/manual", self.rng.choice(MANUAL_PAYLOADS)
+
+
+async def run_level(client: httpx.AsyncClient, factory: RequestFactory, concurrency: int, duration_s: float) -> Dict[str, Any]:
+    """Mantiene `concurrency` clientes enviando peticiones en bucle durante `duration_s` segundos."""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration_s
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            method, path, payload = factory.next()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=payload)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started, concurrency)
+
+
+async def run_load_test(base_url: str, endpoint: str, concurrency_levels: Sequence[int], duration_s: float,
+                        unique_ratio: float = 1.0, warmup_s: float = 2.0, timeout_s: float = 60.0, seed: Optional[int] = None,
+                        transport: Optional[httpx.AsyncBaseTransport] = None) -> List[Dict[str, Any]]:
+    """Ejecuta un nivel por cada concurrencia (tras un calentamiento) y devuelve sus resúmenes."""
+    factory = RequestFactory(endpoint, unique_ratio, seed)
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout_s, limits=limits, transport=transport) as client:
+        if warmup_s > 0:
+            await run_level(client, factory, min(concurrency_levels), warmup_s)
+        results = []
+        for concurrency in concurrency_levels:
+            result = await run_level(client, factory, concurrency, duration_s)
+            logger.info(
+                f"c={concurrency:>4}: {result['throughput_rps']:>8.1f} req/s | p50 {result['p50_ms']} ms | "
+                f"p95 {result['p95_ms']} ms | p99 {result['p99_ms']} ms | {result['errors']} errores de {result['requests']}"
+            )
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API: throughput y p50/p95/p99 por nivel de concurrencia.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="URL de la API.")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="location", help="Escenario de peticiones.")
+    parser.add_argument("--concurrency", default="1,8,32,64", help="Niveles de concurrencia separados por comas.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos por nivel de concurrencia.")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos de calentamiento (no se miden).")
+    parser.add_argument("--unique-ratio", type=float, default=1.0, help="Fracción de análisis de ubicación con coordenadas nuevas.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout por petición (s).")
+    parser.add_argument("--seed", type=int, help="Semilla del generador de peticiones.")
+    parser.add_argument("--json", dest="json_path", help="Archivo JSON donde añadir el resultado (histórico entre commits).")
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    results = asyncio.run(run_load_test(args.base_url, args.endpoint, levels, args.duration, args.unique_ratio,
+                                        args.warmup, args.timeout, args.seed))
+    summary = {
+        "endpoint": args.endpoint,
+        "unique_ratio": args.unique_ratio,
+        "duration_s": args.duration,
+        "levels": results,
+        "revision": _git_revision(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+    if args.json_path:
+        history = []
+        if os.path.exists(args.json_path):
+            with open(args.json_path) as f:
+                history = json.load(f)
+        history.append(summary)
+        os.makedirs(os.path.dirname(os.path.abspath(args.json_path)), exist_ok=True)
+        with open(args.json_path, "w") as f:
+            json.dump(history, f, indent=2)
+        logger.info(f"Resultado añadido a {args.json_path}")
+    else:
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Servidor local que imita PVGIS (PVcalc, SHcalc, seriescalc) y el intérprete de Overpass para
+pruebas de carga de /location/analyze sin depender de (ni saturar) las APIs públicas.
+
+Solo usa la biblioteca estándar. La latencia, la tasa de errores y el tamaño de las respuestas
+son configurables. Uso (desde backend/):
+
+    python scripts/stub_upstreams.py --port 8081 --latency-ms 300 --jitter-ms 100 --error-rate 0.02
+
+y arrancar la API apuntando a él:
+
+    UPSTREAM_LIVE=1 \\
+    PVGIS_API_URL_CALC=http://127.0.0.1:8081/api/v5_2/PVcalc \\
+    PVGIS_API_URL_HORIZON=http://127.0.0.1:8081/api/v5_2/SHcalc \\
+    OVERPASS_API_URL=http://127.0.0.1:8081/api/interpreter \\
+    python -m app.server --workers 4
+
+GET /__stats devuelve el número de peticiones y errores servidos por ruta (útil para comprobar
+el efecto de las cachés y de la coalescencia de peticiones).
+"""
+import argparse
+import datetime
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Códigos con los que fallan las APIs reales bajo carga (límite de peticiones, caída, timeout del proxy).
+ERROR_STATUSES = (429, 503, 504)
+_AROUND_PATTERN = re.compile(r"around:\d+(?:\.\d+)?,(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)")
+# Producción mensual típica por kWp (kWh/día) en la península, de enero a diciembre.
+_MONTHLY_E_D = (2.5, 3.0, 4.0, 4.5, 5.0, 5.2, 5.1, 4.8, 4.2, 3.5, 2.8, 2.3)
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+class StubConfig:
+    """Parámetros del servidor de pruebas (ver main() para su significado)."""
+
+    def __init__(self, latency_ms: float = 200.0, jitter_ms: float = 50.0, error_rate: float = 0.0,
+                 overpass_elements: int = 60, series_years: int = 1, horizon_step_deg: float = 7.5, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.overpass_elements = overpass_elements
+        self.series_years = series_years
+        self.horizon_step_deg = horizon_step_deg
+        self.rng = random.Random(seed)
+
+
+def _float_param(query: Dict[str, List[str]], name: str, default: float) -> float:
+    try:
+        return float(query[name][0])
+    except (KeyError, IndexError, ValueError):
+        return default
+
+
+def pvcalc_payload(lat: float, lng: float, peak_power_kwp: float = 1.0, loss: float = 14.0) -> Dict[str, Any]:
+    """Respuesta con la misma estructura que PVGIS PVcalc (outputformat=json)."""
+    # Menos producción cuanto más al norte (muy aproximado, solo para variar los datos).
+    factor = peak_power_kwp * (1 - loss / 100) / 0.86 * max(0.5, 1 - (lat - 40.0) * 0.01)
+    monthly = []
+    for month, (e_d, days) in enumerate(zip(_MONTHLY_E_D, _DAYS_IN_MONTH), start=1):
+        monthly.append({"month": month, "E_d": round(e_d * factor, 2), "E_m": round(e_d * days * factor, 1),
+                        "H(i)_d": round(e_d * 1.2, 2), "H(i)_m": round(e_d * 1.2 * days, 1), "SD_m": 5.0})
+    e_y = round(sum(m["E_m"] for m in monthly), 1)
+    return {
+        "inputs": {
+            "location": {"latitude": lat, "longitude": lng, "elevation": 650.0},
+            "meteo_data": {"radiation_db": "PVGIS-SARAH2", "meteo_db": "ERA5"},
+            "mounting_system": {"fixed": {"slope": {"value": round(20 + abs(lat) * 0.35, 1), "optimal": True},
+                                          "azimuth": {"value": -2.0, "optimal": True}}},
+            "pv_module": {"technology": "c-Si", "peak_power": peak_power_kwp, "system_loss": loss},
+        },
+        "outputs": {
+            "monthly": {"fixed": monthly},
+            "totals": {"fixed": {"E_d": round(e_y / 365, 2), "E_m": round(e_y / 12, 1), "E_y": e_y,
+                                 "SD_y": 60.0, "l_aoi": -2.8, "l_tg": -7.5, "l_total": -21.9}},
+        },
+        "meta": {"source": "stub_upstreams"},
+    }
+
+
+def shcalc_payload(lat: float, lng: float, step_deg: float) -> Dict[str, Any]:
+    """Perfil del horizonte con la estructura de PVGIS SHcalc (un punto cada `step_deg` grados)."""
+    points = int(round(360 / step_deg)) + 1
+    return {
+        "inputs": {"location": {"latitude": lat, "longitude": lng}},
+        "outputs": {
+            "horizon_profile": [{"A": round(-180 + i * step_deg, 1), "H_hor": round(2.5 + 2 * math.sin(i / 3), 1)} for i in range(points)],
+            "winter_solstice": [{"A_sun(w)": round(-60 + i * 5, 1), "H_sun(w)": round(max(0.0, 26 * math.cos(math.radians(-60 + i * 5))), 1)} for i in range(25)],
+            "summer_solstice": [{"A_sun(s)": round(-120 + i * 10, 1), "H_sun(s)": round(max(0.0, 73 * math.cos(math.radians(-120 + i * 10) / 1.35)), 1)} for i in range(25)],
+        },
+        "meta": {"source": "stub_upstreams"},
+    }
+
+
+def seriescalc_payload(lat: float, lng: float, start_year: int, end_year: int, peak_power_kwp: float = 1.0) -> Dict[str, Any]:
+    """Serie horaria con la estructura de PVGIS seriescalc (pvcalculation=1): una fila por hora y año."""
+    hourly = []
+    moment = datetime.datetime(start_year, 1, 1, 0, 10)
+    end = datetime.datetime(end_year + 1, 1, 1)
+    while moment < end:
+        elevation = max(0.0, math.sin(math.pi * (moment.hour - 6) / 12)) * (0.6 + 0.4 * math.sin(math.pi * moment.timetuple().tm_yday / 365))
+        irradiance = round(950 * elevation, 2)
+        hourly.append({"time": moment.strftime("%Y%m%d:%H%M"), "P": round(irradiance * peak_power_kwp * 0.8, 2),
+                       "G(i)": irradiance, "H_sun": round(elevation * 70, 2), "T2m": 12.5, "WS10m": 2.1, "Int": 0.0})
+        moment += datetime.timedelta(hours=1)
+    return {"inputs": {"location": {"latitude": lat, "longitude": lng}, "pv_module": {"peak_power": peak_power_kwp}},
+            "outputs": {"hourly": hourly}, "meta": {"source": "stub_upstreams"}}
+
+
+def overpass_payload(lat: float, lng: float, elements: int, rng: random.Random) -> Dict[str, Any]:
+    """Respuesta `out geom` de Overpass: el edificio objetivo más `elements - 1` edificios y árboles cercanos."""
+    def footprint(clat, clng, half):
+        return [{"lat": round(clat + dy * half, 7), "lon": round(clng + dx * half, 7)}
+                for dx, dy in ((-1, 1), (1, 1), (1, -1), (-1, -1), (-1, 1))]
+
+    result = [{"type": "way", "id": 1, "nodes": [1, 2, 3, 4, 1], "tags": {"building": "residential"},
+               "geometry": footprint(lat, lng, 0.00005)}]
+    for i in range(1, elements):
+        olat, olng = lat + rng.uniform(-0.0013, 0.0013), lng + rng.uniform(-0.0017, 0.0017)
+        if i % 3:
+            result.append({"type": "way", "id": 1000 + i, "nodes": [1, 2, 3, 4, 1],
+                           "tags": {"building": "yes", "height": str(rng.randint(3, 30))}, "geometry": footprint(olat, olng, 0.00004)})
+        else:
+            result.append({"type": "node", "id": 1000 + i, "lat": round(olat, 7), "lon": round(olng, 7),
+                           "tags": {"natural": "tree", "height": str(rng.randint(4, 18))}})
+    return {"version": 0.6, "generator": "stub_upstreams",
+            "osm3s": {"timestamp_osm_base": "2025-01-01T00:00:00Z"}, "elements": result}
+
+
+class StubUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, como las APIs reales
+    # Cabeceras y cuerpo en un solo envío (handle_one_request hace flush) y sin Nagle: si no, el
+    # retardo de ACK de TCP añade ~40 ms por respuesta a la latencia configurada.
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+    server: "StubUpstreamServer"
+
+    def log_message(self, format, *args): # El log por petición de http.server satura la consola bajo carga
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        self._handle(self.path.split("?", 1)[1] if "?" in self.path else "")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._handle(self.rfile.read(length).decode("utf-8") if length else "")
+
+    def _handle(self, raw_query: str):
+        config = self.server.config
+        route = urlparse(self.path).path.rstrip("/").rsplit("/", 1)[-1]
+        if route == "__stats":
+            self._send_json(200, self.server.stats())
+            return
+
+        with self.server.lock:
+            delay = max(0.0, config.rng.gauss(config.latency_ms, config.jitter_ms)) / 1000 if config.jitter_ms else config.latency_ms / 1000
+            failed = config.rng.random() < config.error_rate
+            error_status = config.rng.choice(ERROR_STATUSES)
+        time.sleep(delay)
+
+        query = parse_qs(raw_query)
+        lat, lng = _float_param(query, "lat", 40.0), _float_param(query, "lon", -3.7)
+        if route == "PVcalc":
+            payload = lambda: pvcalc_payload(lat, lng, _float_param(query, "peakpower", 1.0), _float_param(query, "loss", 14.0))
+        elif route == "SHcalc":
+            payload = lambda: shcalc_payload(lat, lng, config.horizon_step_deg)
+        elif route == "seriescalc":
+            start_year = int(_float_param(query, "startyear", 2020))
+            end_year = int(_float_param(query, "endyear", start_year + config.series_years - 1))
+            payload = lambda: seriescalc_payload(lat, lng, start_year, end_year, _float_param(query, "peakpower", 1.0))
+        elif route == "interpreter":
+            match = _AROUND_PATTERN.search(query.get("data", [raw_query])[0])
+            lat, lng = (float(match.group(1)), float(match.group(2))) if match else (lat, lng)
+            with self.server.lock:
+                rng = random.Random(config.rng.random())
+            payload = lambda: overpass_payload(lat, lng, config.overpass_elements, rng)
+        else:
+            self._send_json(404, {"message": f"Unknown endpoint {self.path}"})
+            return
+
+        self.server.record(route, failed)
+        if failed:
+            self._send_json(error_status, {"message": "Stub upstream error (simulated)", "status": error_status})
+        else:
+            self._send_json(200, payload())
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class StubUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: StubConfig):
+        super().__init__(address, StubUpstreamHandler)
+        self.config = config
+        self.lock = threading.Lock()
+        self._requests: Counter = Counter()
+        self._errors: Counter = Counter()
+
+    def record(self, route: str, failed: bool) -> None:
+        with self.lock:
+            self._requests[route] += 1
+            if failed:
+                self._errors[route] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"requests": dict(self._requests), "errors": dict(self._errors)}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def make_server(config: StubConfig, host: str = "127.0.0.1", port: int = 8081) -> StubUpstreamServer:
+    """Crea el servidor (port=0 elige un puerto libre); llamar a serve_forever() para atender peticiones."""
+    return StubUpstreamServer((host, port), config)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita PVGIS y Overpass para pruebas de carga.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Latencia media de cada respuesta.")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Desviación típica de la latencia (distribución normal).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de peticiones que fallan con 429/503/504.")
+    parser.add_argument("--overpass-elements", type=int, default=60, help="Elementos por respuesta de Overpass (edificios y árboles).")
+    parser.add_argument("--series-years", type=int, default=1, help="Años de datos horarios en seriescalc si no se indica endyear.")
+    parser.add_argument("--horizon-step-deg", type=float, default=7.5, help="Resolución angular del perfil de horizonte (SHcalc).")
+    parser.add_argument("--seed", type=int, help="Semilla para latencias, errores y geometrías reproducibles.")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                        overpass_elements=args.overpass_elements, series_years=args.series_years,
+                        horizon_step_deg=args.horizon_step_deg, seed=args.seed)
+    server = make_server(config, args.host, args.port)
+    logger.info(f"Stub de PVGIS/Overpass escuchando en {server.base_url} (latencia {args.latency_ms}±{args.jitter_ms} ms, "
+                f"errores {args.error_rate:.1%}, {args.overpass_elements} elementos de Overpass).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
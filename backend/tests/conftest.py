@@ -1,47 +1,45 @@
 import pytest
 import sqlite3
 import os
+import tempfile
+
+# La biblioteca de perfiles de carga se genera en el primer uso: en los tests, en un directorio
+# temporal y no en la caché del usuario (antes de importar la app, que lee la variable al importarse).
+os.environ.setdefault("PROFILE_CACHE_DIR", tempfile.mkdtemp(prefix="profile-cache-"))
 
 # Importar el módulo database y subsidy_service para monkeypatching si es necesario
 from backend.app.db import database as app_database # Renombrar para evitar conflicto con variable 'database'
 from backend.app.services import subsidy_service
+from app.db import database as services_database # El mismo módulo tal y como lo importan los servicios
 
 
 @pytest.fixture(scope="function") # "function" scope para que se ejecute para cada test
-def memory_db(monkeypatch):
+def memory_db(monkeypatch, tmp_path):
     """
-    Fixture para usar una base de datos SQLite en memoria para los tests.
+    Fixture para usar una base de datos SQLite aislada para los tests.
     Esto asegura que los tests no afecten la base de datos de desarrollo/producción
     y que cada test (o módulo de test) comience con una base de datos limpia.
-    """
-    # Guardar la ruta original de la base de datos
-    original_db_path = app_database.DATABASE_PATH
-    original_db_dir = app_database.DATABASE_DIR
 
-    # Definir la ruta a la base de datos en memoria
-    # Usar un archivo temporal con nombre único también es una opción si :memory: da problemas con múltiples conexiones
-    # o si se necesita inspeccionar la BD después. Pero :memory: es más rápido.
-    memory_path = ":memory:"
-
-    # Monkeypatch DATABASE_PATH en el módulo database.py
-    monkeypatch.setattr(app_database, 'DATABASE_PATH', memory_path)
-    # No necesitamos monkeypatch DATABASE_DIR si usamos :memory:
-    # monkeypatch.setattr(app_database, 'DATABASE_DIR', '') # O un dir temporal
+    Se usa un archivo temporal en lugar de ":memory:" porque cada llamada a
+    get_db_connection() abre una conexión nueva, y cada conexión ":memory:" es una
+    base de datos distinta (las tablas creadas en una no existirían en la siguiente).
+    """
+    test_db_path = str(tmp_path / "test_subsidies.db")
 
-    # Crear las tablas en la base de datos en memoria
-    # La función get_db_connection ahora usará memory_path debido al monkeypatch
-    app_database.create_tables()
+    # Los servicios importan el módulo como 'app.db.database' (pythonpath de pytest.ini),
+    # mientras que los tests lo importan como 'backend.app.db.database'. Son dos objetos
+    # módulo distintos, así que hay que parchear ambos.
+    for module in (app_database, services_database):
+        monkeypatch.setattr(module, 'DATABASE_PATH', test_db_path)
+        monkeypatch.setattr(module, 'DATABASE_DIR', str(tmp_path))
 
-    # logger.info(f"Usando base de datos en memoria: {memory_path} para el test.")
+    # Crear las tablas en la base de datos temporal
+    services_database.create_tables()
 
     yield # Aquí es donde se ejecuta el test
 
-    # Cleanup: No es estrictamente necesario para :memory: ya que se descarta,
-    # pero si se usara un archivo temporal, aquí se borraría.
-    # Restaurar la ruta original de la base de datos para evitar efectos secundarios
-    monkeypatch.setattr(app_database, 'DATABASE_PATH', original_db_path)
-    monkeypatch.setattr(app_database, 'DATABASE_DIR', original_db_dir)
-    # logger.info(f"Restaurada la ruta de la base de datos a: {original_db_path}")
+    # Cleanup: monkeypatch restaura las rutas originales al terminar el test
+    # y tmp_path es eliminado por pytest.
 
 
 @pytest.fixture
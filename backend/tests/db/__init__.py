@@ -0,0 +1 @@
+# This file makes 'tests/db' a Python package.
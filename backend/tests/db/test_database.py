@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from backend.app.db import migrations
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def test_migrate_fresh_database_is_versioned_and_idempotent(tmp_path):
+    """Una BD nueva queda en la última versión y volver a migrar no hace nada."""
+    conn = sqlite3.connect(tmp_path / "fresh.db")
+    try:
+        assert migrations.get_schema_version(conn) == 0
+        assert migrations.migrate(conn) == migrations.LATEST_SCHEMA_VERSION
+        assert migrations.migrate(conn) == migrations.LATEST_SCHEMA_VERSION
+
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "idx_subsidies_natural_key" in indexes
+    finally:
+        conn.close()
+
+
+def test_migrate_legacy_database_collapses_duplicates(tmp_path):
+    """Una BD creada antes de las migraciones (user_version 0, con duplicados) se migra sin perder datos únicos."""
+    conn = sqlite3.connect(tmp_path / "legacy.db")
+    try:
+        # Esquema v1 aplicado "a mano", como lo hacía el antiguo create_tables() al importar el módulo.
+        for statement in migrations.MIGRATIONS[0][2]:
+            conn.execute(statement)
+        conn.executemany(
+            "INSERT INTO subsidies (name, region_code, type, value) VALUES (?, ?, ?, ?)",
+            [("Ayuda", "ES", "fixed_amount", 100), ("Ayuda", "ES", "fixed_amount", 200), ("Otra", "ES", "fixed_amount", 50)]
+        )
+        conn.commit()
+
+        assert migrations.migrate(conn) == migrations.LATEST_SCHEMA_VERSION
+        rows = conn.execute("SELECT name, value FROM subsidies ORDER BY name").fetchall()
+        assert rows == [("Ayuda", 200.0), ("Otra", 50.0)] # Se conserva la fila más reciente
+    finally:
+        conn.close()
+
+
+def test_importing_app_does_not_touch_the_database():
+    """Importar app.main (y con ello app.db.database) no debe abrir la BD ni ejecutar DDL."""
+    snippet = (
+        "import sqlite3\n"
+        "calls = []\n"
+        "original_connect = sqlite3.connect\n"
+        "sqlite3.connect = lambda *a, **k: calls.append(a) or original_connect(*a, **k)\n"
+        "import app.main\n"
+        "import app.db.database\n"
+        "print(len(calls))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == "0"
@@ -0,0 +1,93 @@
+import marshal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.profiling import ProfilingMiddleware
+from app.routers import admin, consumption
+from app.services import profiling_service
+
+ADMIN = {"X-Admin-Token": "secret"}
+MANUAL_PAYLOAD = {"occupants": 3, "area_m2": 100}
+CSV_CONTENT = "\n".join(["0.5"] * 8760).encode("utf-8")
+
+
+@pytest.fixture
+def profiling_client(monkeypatch, tmp_path):
+    """App con el perfilado activado (como app.main cuando PROFILING_ADMIN_TOKEN está configurado)."""
+    monkeypatch.setattr(profiling_service, "PROFILING_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling_service, "PROFILING_DIR", str(tmp_path))
+    app = FastAPI()
+    app.include_router(consumption.router, prefix="/consumption")
+    app.include_router(admin.router, prefix="/admin")
+    app.add_middleware(ProfilingMiddleware)
+    with TestClient(app) as c:
+        yield c
+
+
+def test_profiled_request_is_stored_and_retrievable(profiling_client: TestClient):
+    response = profiling_client.post("/consumption/predict/csv", files={"file": ("consumo.csv", CSV_CONTENT, "text/csv")},
+                                     headers={"X-Profile": "cprofile", **ADMIN})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    listing = profiling_client.get("/admin/profiles", headers=ADMIN).json()
+    assert listing[0]["id"] == profile_id
+    assert listing[0]["path"] == "/consumption/predict/csv" and listing[0]["status"] == 200
+
+    download = profiling_client.get(f"/admin/profiles/{profile_id}", headers=ADMIN)
+    assert download.status_code == 200
+    stats = marshal.loads(download.content)  # Formato pstats (python -m pstats / snakeviz)
+    assert any(func[2] == "_read_hourly_values" for func in stats)
+
+
+def test_cprofile_is_rejected_on_threadpool_routes(profiling_client: TestClient):
+    """cProfile no ve el threadpool, donde /consumption/predict/manual hace su trabajo: se pide usar sample."""
+    response = profiling_client.post("/consumption/predict/manual", json=MANUAL_PAYLOAD, headers={"X-Profile": "cprofile", **ADMIN})
+    assert response.status_code == 400
+    assert "sample" in response.json()["detail"]
+
+
+def test_overlapping_profiled_requests_are_rejected(profiling_client: TestClient):
+    """Los perfiladores son globales al proceso: mientras se perfila una petición, las demás reciben 409."""
+    assert profiling_service.try_begin_profiling()
+    try:
+        response = profiling_client.post("/consumption/predict/manual", json=MANUAL_PAYLOAD, headers={"X-Profile": "sample", **ADMIN})
+        assert response.status_code == 409
+        assert profiling_client.post("/consumption/predict/manual", json=MANUAL_PAYLOAD, headers=ADMIN).status_code == 200
+    finally:
+        profiling_service.end_profiling()
+    response = profiling_client.post("/consumption/predict/manual", json=MANUAL_PAYLOAD, headers={"X-Profile": "sample", **ADMIN})
+    assert response.status_code == 200
+
+
+def test_sampling_profile_via_query_flag(profiling_client: TestClient):
+    response = profiling_client.post("/consumption/predict/manual?profile=sample", json=MANUAL_PAYLOAD, headers=ADMIN)
+    profile_id = response.headers["x-profile-id"]
+
+    download = profiling_client.get(f"/admin/profiles/{profile_id}", headers=ADMIN)
+    assert download.headers["content-type"].startswith("text/plain")
+
+
+def test_profiling_requires_admin_token_and_valid_mode(profiling_client: TestClient):
+    assert profiling_client.post("/consumption/predict/manual", json=MANUAL_PAYLOAD, headers={"X-Profile": "1"}).status_code == 403
+    assert profiling_client.post("/consumption/predict/manual", json=MANUAL_PAYLOAD,
+                                 headers={"X-Profile": "1", "X-Admin-Token": "wrong"}).status_code == 403
+    assert profiling_client.post("/consumption/predict/manual", json=MANUAL_PAYLOAD, headers={"X-Profile": "perf", **ADMIN}).status_code == 400
+
+    unprofiled = profiling_client.post("/consumption/predict/manual", json=MANUAL_PAYLOAD, headers=ADMIN)
+    assert unprofiled.status_code == 200
+    assert "x-profile-id" not in unprofiled.headers
+
+
+def test_admin_profile_routes_require_token_and_valid_id(profiling_client: TestClient):
+    assert profiling_client.get("/admin/profiles").status_code == 403
+    assert profiling_client.get("/admin/profiles/../../etc", headers=ADMIN).status_code == 404
+    assert profiling_client.get("/admin/profiles/not-an-id", headers=ADMIN).status_code == 400
+    assert profiling_client.get(f"/admin/profiles/{'0' * 32}", headers=ADMIN).status_code == 404
+
+
+def test_profiling_routes_are_not_registered_without_token(client: TestClient):
+    """Sin PROFILING_ADMIN_TOKEN (como en los tests), la app principal no expone /admin."""
+    assert client.get("/admin/profiles", headers=ADMIN).status_code == 404
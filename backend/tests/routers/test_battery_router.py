@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+def _payload(**overrides):
+    hours = 8760
+    payload = {
+        "production_kwh": [3.0 if 10 <= h % 24 < 16 else 0.0 for h in range(hours)],
+        "consumption_kwh": [1.0 if h % 24 in (8, 20, 21) else 0.2 for h in range(hours)],
+        "capacities_kwh": [2.5, 5.0],
+    }
+    payload.update(overrides)
+    return payload
+
+
+def test_simulate_battery_sweep(client: TestClient):
+    """POST /battery/simulate con varias capacidades devuelve un balance por capacidad y el de referencia."""
+    response = client.post("/battery/simulate", json=_payload(battery_cost_eur_kwh=50))
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["capacity_kwh"] for r in data["results"]] == [2.5, 5.0]
+    assert data["baseline"]["capacity_kwh"] == 0
+    assert data["results"][1]["autarky_rate"] > data["baseline"]["autarky_rate"]
+    assert data["kernel"] in ("numba", "numpy")
+    assert data["recommended"]["capacity_kwh"] in (2.5, 5.0)
+    assert data["soc_kwh"] is None
+
+
+def test_simulate_battery_hourly(client: TestClient):
+    response = client.post("/battery/simulate", json=_payload(capacities_kwh=[5.0], include_hourly=True))
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["soc_kwh"]) == 8760 and len(data["battery_flow_kwh"]) == 8760
+    assert max(data["soc_kwh"]) == pytest.approx(5.0)
+
+
+@pytest.mark.parametrize("overrides", [
+    {"capacities_kwh": [-1.0]},
+    {"consumption_kwh": [0.2] * 8784},
+    {"include_hourly": True},
+    {"round_trip_efficiency": 0},
+])
+def test_simulate_battery_invalid(client: TestClient, overrides):
+    response = client.post("/battery/simulate", json=_payload(**overrides))
+    assert response.status_code == 422
@@ -0,0 +1,101 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.compression import CompressionMiddleware, CompressionSettings, select_encoding
+
+# CompressionMiddleware se prueba sobre una app mínima (rutas con tamaños y tipos controlados)
+# y sobre la app real para /consumption/*.
+
+BIG_JSON = b'{"values":[' + b",".join(b"0.%04d" % (i % 1000) for i in range(5000)) + b"]}"
+
+
+def _make_app(route_settings=None):
+    test_app = FastAPI()
+
+    @test_app.get("/big")
+    def big():
+        return Response(BIG_JSON, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @test_app.get("/small")
+    def small():
+        return Response(b'{"ok":true}', media_type="application/json")
+
+    @test_app.get("/binary")
+    def binary():
+        return Response(b"\x00" * 5000, media_type="application/octet-stream")
+
+    @test_app.get("/stream")
+    def stream():
+        return StreamingResponse((b'{"n":%d}\n' % i for i in range(3)), media_type="application/x-ndjson")
+
+    @test_app.get("/events")
+    def events():
+        return StreamingResponse((b"data: %d\n\n" % i for i in range(3)), media_type="text/event-stream")
+
+    @test_app.get("/plain/big")
+    def plain_big():
+        return PlainTextResponse("x" * 5000)
+
+    test_app.add_middleware(CompressionMiddleware, encodings=["gzip"],
+                            route_settings=route_settings if route_settings is not None else {})
+    return TestClient(test_app)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, deflate, br", "gzip"),
+    ("br;q=1.0, gzip;q=0.8", "gzip"), # br no instalado en esta lista
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_select_encoding(accept, expected):
+    assert select_encoding(accept, ["gzip"]) == expected
+
+
+def test_large_json_is_gzipped_with_weak_etag():
+    response = _make_app().get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert int(response.headers["content-length"]) < len(BIG_JSON) / 3
+    assert response.content == BIG_JSON # TestClient descomprime
+
+
+def test_not_compressed_when_small_binary_or_not_accepted():
+    client = _make_app()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/binary", headers={"Accept-Encoding": "gzip"}).headers
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+
+def test_streaming_responses_are_compressed_per_chunk_except_sse():
+    client = _make_app()
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text.splitlines() == ['{"n":0}', '{"n":1}', '{"n":2}']
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_route_settings_override_defaults():
+    client = _make_app({"/plain/": CompressionSettings(enabled=False), "/big": CompressionSettings(gzip_level=1)})
+    assert "content-encoding" not in client.get("/plain/big", headers={"Accept-Encoding": "gzip"}).headers
+    fast = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    default = _make_app().get("/big", headers={"Accept-Encoding": "gzip"}) # Nivel 6
+    assert fast.headers["content-encoding"] == default.headers["content-encoding"] == "gzip"
+    assert int(fast.headers["content-length"]) > int(default.headers["content-length"])
+    assert fast.content == default.content == BIG_JSON
+
+
+def test_consumption_response_is_compressed(client: TestClient):
+    payload = {"occupants": 3, "area_m2": 120}
+    response = client.post("/consumption/predict/manual", json=payload, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(response.content) / 3
+    assert len(response.json()["hourly_profile"]) == 8760
@@ -32,6 +32,37 @@ def test_predict_manual_valid_input(client: TestClient):
     assert data["peak_power_kw"] == pytest.approx(max(data["hourly_profile"]), rel=1e-2) if data["hourly_profile"] else True
 
 
+def test_predict_manual_response_matches_service_output(client: TestClient):
+    """La respuesta (serializada sin re-validar, ver app/responses.py) es el modelo del servicio, en JSON compacto."""
+    from app.schemas.consumption import ConsumptionManualInput
+    from app.services import consumption_service
+
+    payload = {"occupants": 2, "area_m2": 80, "has_ev": False, "has_heat_pump": True}
+    response = client.post("/consumption/predict/manual", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert b", " not in response.content[:200] # Sin espacios entre elementos
+
+    expected = consumption_service.predict_consumption_manual(ConsumptionManualInput(**payload))
+    assert response.json() == expected.dict()
+    # Solo la precisión que produce el servicio: 4 decimales por hora, 2 en los totales
+    assert all(round(v, 4) == v for v in response.json()["hourly_profile"])
+    assert all(round(v, 2) == v for v in response.json()["monthly_kwh"])
+
+
+def test_list_load_profiles_and_unknown_profile(client: TestClient):
+    """GET /consumption/profiles lista la biblioteca; un perfil desconocido en la predicción es un 400."""
+    response = client.get("/consumption/profiles")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["default"] == "2.0TD"
+    assert "2.0TD" in [p["name"] for p in data["profiles"]]
+
+    response = client.post("/consumption/predict/manual", json={"occupants": 2, "area_m2": 80, "load_profile": "nope"})
+    assert response.status_code == 400
+    assert "Unknown load profile" in response.json()["detail"]
+
+
 def test_predict_manual_invalid_input_missing_field(client: TestClient):
     """Test con campo 'occupants' faltante."""
     payload = {
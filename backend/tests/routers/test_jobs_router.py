@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import job_service
+
+LOCATION_JOB = {"kind": "location_analysis", "params": {"lat": 40.416775, "lng": -3.70379}, "priority": 3}
+
+
+@pytest.fixture
+def jobs_client(client: TestClient, memory_db, monkeypatch):
+    """Sin workers embebidos: los tests ejecutan la cola en proceso con run_worker()."""
+    monkeypatch.setattr(job_service, "JOB_WORKERS", 0)
+    return client
+
+
+def test_submit_poll_and_fetch_result(jobs_client: TestClient):
+    response = jobs_client.post("/jobs", json=LOCATION_JOB)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued" and job["priority"] == 3 and job["result"] is None
+    assert response.headers["location"] == f"/jobs/{job['id']}"
+
+    job_service.run_worker(max_jobs=1)
+    finished = jobs_client.get(f"/jobs/{job['id']}").json()
+    assert finished["status"] == "succeeded"
+    # El resultado es el cuerpo que devuelve la ruta síncrona
+    assert finished["result"] == jobs_client.post("/location/analyze", json=LOCATION_JOB["params"]).json()
+
+
+def test_submit_validates_params_for_the_kind(jobs_client: TestClient):
+    response = jobs_client.post("/jobs", json={"kind": "consumption_manual", "params": {"occupants": 0, "area_m2": 100}})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "params", "occupants"]
+    assert jobs_client.post("/jobs", json={"kind": "shading", "params": {}}).status_code == 422
+
+
+def test_cancel_and_unknown_jobs(jobs_client: TestClient):
+    job = jobs_client.post("/jobs", json=LOCATION_JOB).json()
+    assert jobs_client.delete(f"/jobs/{job['id']}").json()["status"] == "cancelled"
+    assert job_service.run_worker(max_jobs=1) == 0
+    assert jobs_client.get("/jobs/unknown").status_code == 404
+    assert jobs_client.delete("/jobs/unknown").status_code == 404
+
+
+def test_events_stream_ends_with_the_finished_job(jobs_client: TestClient):
+    job = jobs_client.post("/jobs", json={"kind": "consumption_manual", "params": {"occupants": 2, "area_m2": 80}}).json()
+    job_service.run_worker(max_jobs=1)
+
+    response = jobs_client.get(f"/jobs/{job['id']}/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block]
+    assert events[-1].startswith("event: status\ndata: ")
+    last = json.loads(events[-1].split("data: ", 1)[1])
+    assert last["status"] == "succeeded" and len(last["result"]["hourly_profile"]) == 8760
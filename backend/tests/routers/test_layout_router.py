@@ -0,0 +1,29 @@
+from fastapi.testclient import TestClient
+
+
+def test_layout_pack(client: TestClient):
+    """POST /layout/pack con un polígono en metros, otro en lat/lon y otro solo con el área."""
+    payload = {
+        "sections": [
+            {"polygon_m": [[0, 0], [10, 0], [10, 5], [0, 5]], "tilt": 0},
+            {"polygon_latlon": [[40.4, -3.7], [40.4, -3.6999], [40.4001, -3.6999], [40.4001, -3.7]], "tilt": 30, "azimuth": 180},
+            {"area": 70.25, "tilt": 30, "azimuth": -10},
+        ],
+        "module_id": "generic_mono_450",
+    }
+    response = client.post("/layout/pack", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["panels"] == sum(s["panels"] for s in data["sections"]) > 0
+    assert data["kwp"] == round(data["panels"] * 0.45, 3)
+    flat, latlon, _ = data["sections"]
+    assert flat["panels"] == 8 and len(flat["centers"]) == 8
+    assert all(40.4 < lat < 40.4001 and -3.7 < lon < -3.6999 for lat, lon in latlon["centers"])
+
+    response = client.post("/layout/pack", json=dict(payload, module_id="nope", include_coordinates=False))
+    assert response.status_code == 400
+
+
+def test_layout_pack_invalid(client: TestClient):
+    response = client.post("/layout/pack", json={"sections": [{"area": 50, "polygon_m": [[0, 0], [1, 0], [1, 1]]}]})
+    assert response.status_code == 422
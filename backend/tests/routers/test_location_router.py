@@ -78,3 +78,121 @@ def test_analyze_location_invalid_types(client: TestClient):
 #     response = client.post("/location/analyze", json=payload)
 #     assert response.status_code == 422
 #     # ... verificar mensaje de error específico ...
+
+
+def test_analyze_location_upstream_error_returns_503(client: TestClient, monkeypatch):
+    """Si Overpass falla, el endpoint responde 503 con el detalle del error."""
+    from app.services import location_service
+
+    def failing_overpass(*args, **kwargs):
+        raise ConnectionError("Overpass timeout")
+
+    monkeypatch.setattr(location_service.overpass_service, "get_building_and_obstacle_data", failing_overpass)
+    response = client.post("/location/analyze", json={"lat": 41.3874, "lng": 2.1686})
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Error contacting Overpass service: Overpass timeout"
+
+
+def test_analyze_location_etag_and_conditional_request(client: TestClient, monkeypatch):
+    """La respuesta lleva ETag y Cache-Control; con If-None-Match se responde 304 sin recalcular."""
+    from app.services import location_service
+
+    location_service.response_cache.clear()
+    runs = []
+    original_pipeline = location_service.run_location_pipeline
+
+    async def counting_pipeline(lat, lng):
+        runs.append((lat, lng))
+        return await original_pipeline(lat, lng)
+
+    monkeypatch.setattr(location_service, "run_location_pipeline", counting_pipeline)
+    payload = {"lat": 37.3891, "lng": -5.9845}
+
+    first = client.post("/location/analyze", json=payload)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')  # ETag fuerte
+    assert first.headers["cache-control"].startswith("private, max-age=")
+
+    not_modified = client.post("/location/analyze", json=payload, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    # Coordenadas que solo difieren por debajo de la resolución de la clave: misma entrada de caché.
+    repeated = client.post("/location/analyze", json={"lat": 37.3891001, "lng": -5.9845}, headers={"If-None-Match": 'W/"otro", ' + etag})
+    assert repeated.status_code == 304
+
+    stale = client.post("/location/analyze", json=payload, headers={"If-None-Match": '"otro-etag"'})
+    assert stale.status_code == 200
+    assert stale.json() == first.json()
+
+    assert len(runs) == 1
+    assert location_service.get_response_cache_stats()["hits"] >= 3
+
+
+def test_portfolio_streams_results_and_resumes(client: TestClient, monkeypatch):
+    """La cartera se analiza por teselas y se devuelve como NDJSON; con 'resume' se omiten las ya hechas."""
+    import json
+    from app.services import portfolio_service
+
+    monkeypatch.setattr(portfolio_service, "PORTFOLIO_PROCESSES", 1)
+    addresses = ("addresses.csv", "id,lat,lng\nA,40.4168,-3.7038\nB,40.4170,-3.7040\nC,xx,-3.7\n", "text/csv")
+
+    response = client.post("/location/portfolio", files={"file": addresses})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    results = {r["id"]: r for r in records if r["type"] == "result"}
+    assert results["A"]["status"] == "ok" and results["A"]["roofAreaTotal"] > 0
+    assert results["C"]["status"] == "error"
+    assert records[-1] == dict(records[-1], type="progress", done=2, total=2)
+
+    partial = "\n".join(line for line in response.text.splitlines() if '"id":"B"' not in line)
+    resumed = client.post("/location/portfolio?format=csv", files={"file": addresses, "resume": ("partial.ndjson", partial)})
+    rows = resumed.text.splitlines()
+    assert resumed.headers["content-type"].startswith("text/csv")
+    assert rows[0] == ",".join(portfolio_service.CSV_COLUMNS)
+    assert [row.split(",")[1] for row in rows[1:]] == ["C", "B"] # Solo la que faltaba (y la inválida)
+
+    assert client.post("/location/portfolio", files={"file": ("a.csv", "x,y\n1,2\n")}).status_code == 400
+
+
+def _sse_events(text: str):
+    """[(evento, datos JSON)] de un cuerpo text/event-stream."""
+    import json
+    events = []
+    for block in text.split("\n\n"):
+        if block.startswith("event: "):
+            name, data = block.split("\n", 1)
+            events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_analyze_stream_emits_each_stage_then_the_result(client: TestClient):
+    from app.services import location_service
+    location_service.response_cache.clear()
+
+    response = client.get("/location/analyze/stream", params={"lat": 39.4699, "lng": -0.3763})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+    assert [name for name, _ in events] == ["building", "roof", "pvgis", "shading", "max_kwp", "result"]
+    stages = dict(events)
+    assert stages["building"]["found"] and len(stages["building"]["geometry"]) == 5
+    assert stages["roof"]["roofAreaTotal"] == stages["result"]["roofAreaTotal"]
+    assert stages["max_kwp"]["maxKwp"] == stages["result"]["maxKwp"]
+    # El resultado final es el mismo cuerpo que /location/analyze, que ahora sale de la caché
+    assert stages["result"] == client.post("/location/analyze", json={"lat": 39.4699, "lng": -0.3763}).json()
+
+    cached = _sse_events(client.get("/location/analyze/stream", params={"lat": 39.4699, "lng": -0.3763}).text)
+    assert [name for name, _ in cached] == ["result"]
+
+
+def test_analyze_stream_reports_upstream_errors_as_event(client: TestClient, monkeypatch):
+    from app.services import location_service
+
+    monkeypatch.setattr(location_service.overpass_service, "get_building_and_obstacle_data", lambda *a, **k: {})
+    events = _sse_events(client.get("/location/analyze/stream", params={"lat": 37.3891, "lng": -5.9845}).text)
+    assert events == [("error", {"status": 503, "detail": "Overpass service unavailable, please retry later."})]
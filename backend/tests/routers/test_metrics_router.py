@@ -0,0 +1,24 @@
+from fastapi.testclient import TestClient
+# El fixture 'client' se inyectará desde conftest.py
+
+
+def test_metrics_endpoint_exposes_route_latency_stages_and_caches(client: TestClient):
+    """Tras unas peticiones, /metrics expone latencias por ruta, etapas del pipeline y cachés."""
+    client.post("/location/analyze", json={"lat": 43.2630, "lng": -2.9350})
+    client.post("/consumption/predict/manual", json={"occupants": 2, "area_m2": 90})
+    client.get("/ruta-inexistente")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    assert 'http_requests_total{method="POST",route="/location/analyze",status="200"}' in text
+    assert 'http_request_duration_seconds_count{method="POST",route="/consumption/predict/manual"}' in text
+    assert 'route="unmatched",status="404"' in text  # Las rutas desconocidas no crean series nuevas
+    for stage in ("overpass", "roof_geometry", "pvgis", "shading", "max_kwp"):
+        assert f'pipeline_stage_duration_seconds_count{{pipeline="location_analysis",stage="{stage}"}}' in text
+    assert 'pipeline="consumption_manual",stage="hourly_profile"' in text
+    assert 'cache_hit_ratio{cache="location_response"}' in text
+    assert 'cache_hits_total{cache="consumption_profile"}' in text
+    assert 'singleflight_joins_total{flight="location_analysis"}' in text
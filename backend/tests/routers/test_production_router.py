@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+
+def test_production_catalog(client: TestClient):
+    response = client.get("/production/catalog")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["default_module"] in [m["id"] for m in data["modules"]]
+    assert all("ac_kw" in i for i in data["inverters"])
+
+
+def test_simulate_production(client: TestClient):
+    """POST /production/simulate devuelve la producción horaria lista para /battery/simulate."""
+    payload = {
+        "lat": 40.4, "lng": -3.7, "kwp": 4.0,
+        "shading_factor_monthly": [0.9] * 12,
+        "roof_area_m2": 60.0,
+    }
+    response = client.post("/production/simulate", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["panels"] > 0 and data["inverter_id"]
+    assert len(data["hourly_kwh"]) == 8760 and len(data["monthly_kwh"]) == 12
+    assert data["annual_ac_kwh"] > 0 and data["shading_loss_kwh"] > 0
+    assert data["max_kwp"] > 0
+
+    response = client.post("/production/simulate", json=dict(payload, include_hourly=False, inverter_id="nope"))
+    assert response.status_code == 400
+
+
+def test_simulate_production_invalid(client: TestClient):
+    response = client.post("/production/simulate", json={"lat": 40.4, "lng": -3.7, "kwp": 4.0, "shading_factor_monthly": [2.0] * 12})
+    assert response.status_code == 422
+    response = client.post("/production/simulate", json={"lat": 40.4, "lng": -3.7, "kwp": 200.0})
+    assert response.status_code == 422
+
+
+def test_simulate_production_large_system(client: TestClient):
+    response = client.post("/production/simulate", json={"lat": 40.4, "lng": -3.7, "kwp": 100.0, "include_hourly": False})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inverters"] == 9 and data["dc_ac_ratio"] <= 1.2
+    # Con inversores pequeños harían falta más de PRODUCTION_MAX_INVERTERS
+    response = client.post("/production/simulate", json={"lat": 40.4, "lng": -3.7, "kwp": 120.0, "inverter_id": "generic_3kw"})
+    assert response.status_code == 400
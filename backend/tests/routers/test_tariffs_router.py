@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+
+
+def test_list_tariffs(client: TestClient):
+    response = client.get("/tariffs")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["default"] == "2.0TD"
+    assert {"2.0TD", "2.0TD_flat"} <= {t["name"] for t in data["tariffs"]}
+
+
+def test_compare_tariffs_with_custom_tariff(client: TestClient):
+    """POST /tariffs/compare devuelve una factura por tarifa, la más barata primero."""
+    payload = {
+        "consumption_kwh": [0.4] * 8760,
+        "production_kwh": [2.0 if 11 <= h % 24 < 15 else 0.0 for h in range(8760)],
+        "tariffs": ["2.0TD", "2.0TD_flat"],
+        "custom_tariffs": [{
+            "name": "cheap", "energy_prices": [0.01], "power_prices": [1.0], "export_price": 0.0,
+            "hours": [[0] * 24] * 3,
+        }],
+    }
+    response = client.post("/tariffs/compare", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert [b["tariff"] for b in data["bills"]][0] == data["cheapest"] == "cheap"
+    assert len(data["bills"]) == 3
+    assert all(b["export_kwh"] > 0 and len(b["monthly_total_eur"]) == 12 for b in data["bills"])
+
+
+def test_compare_tariffs_unknown_tariff(client: TestClient):
+    response = client.post("/tariffs/compare", json={"consumption_kwh": [0.4] * 8760, "tariffs": ["nope"]})
+    assert response.status_code == 400
+    assert "Unknown tariff" in response.json()["detail"]
@@ -0,0 +1,104 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.services import battery_service
+
+
+def _year(days=365):
+    """Producción FV (mediodía) y consumo (mañana y noche) horarios de un año sintético."""
+    hour = np.tile(np.arange(24), days)
+    season = np.repeat(1 + 0.3 * np.cos(np.linspace(0, 2 * np.pi, days)), 24)
+    production = 4.0 * np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None) / season
+    consumption = 0.3 + 0.8 * np.isin(hour, [7, 8, 20, 21, 22]) * season
+    return production, consumption
+
+
+def test_energy_balance_and_limits():
+    """Lo importado + descargado cubre el déficit y lo vertido + cargado el excedente; SoC dentro de límites."""
+    production, consumption = _year()
+    sim = battery_service.simulate_battery(production, consumption, [5.0, 10.0], power_kw=3.0,
+                                           round_trip_efficiency=0.81, min_soc=0.1, include_hourly=True)
+    deficit = np.clip(consumption - production, 0, None).sum()
+    surplus = np.clip(production - consumption, 0, None).sum()
+    for i, r in enumerate(sim.results):
+        assert r.grid_import_kwh + r.discharged_kwh == pytest.approx(deficit, abs=0.05)
+        assert r.grid_export_kwh + r.charged_kwh == pytest.approx(surplus, abs=0.05)
+        # Con un 81 % de ida y vuelta sale como mucho el 81 % de lo cargado (más la carga inicial)
+        assert r.discharged_kwh <= 0.81 * r.charged_kwh + 1e-6
+        assert sim.soc_kwh[i].min() >= 0.1 * r.capacity_kwh - 1e-9
+        assert sim.soc_kwh[i].max() <= r.capacity_kwh + 1e-9
+        assert np.abs(sim.battery_flow_kwh[i]).max() <= 3.0 + 1e-9
+    assert sim.baseline.discharged_kwh == 0 and sim.baseline.grid_import_kwh == pytest.approx(deficit, abs=0.05)
+    assert sim.results[1].autarky_rate > sim.results[0].autarky_rate > sim.baseline.autarky_rate
+    assert sim.results[0].annual_savings_eur > sim.baseline.annual_savings_eur
+
+
+def test_kernels_agree():
+    """El kernel de NumPy (vectorizado entre tamaños) y el escalar (el que compila Numba) despachan igual."""
+    production, consumption = _year(30)
+    net = production - consumption
+    capacity = np.array([2.0, 7.5, 20.0])
+    outputs = []
+    for kernel in (battery_service._dispatch_numpy, battery_service._dispatch_python):
+        soc, flow = np.empty((3, net.size)), np.empty((3, net.size))
+        kernel(net, capacity, capacity / 2, capacity / 2, capacity * 0.1, 0.95, 0.95, soc, flow)
+        outputs.append((soc, flow))
+    np.testing.assert_allclose(outputs[0][0], outputs[1][0])
+    np.testing.assert_allclose(outputs[0][1], outputs[1][1])
+
+
+def test_numba_kernel_matches_numpy(monkeypatch):
+    pytest.importorskip("numba")
+    production, consumption = _year(30)
+    compiled = battery_service.simulate_battery(production, consumption, [4.0, 8.0])
+    battery_service._numba_kernel.cache_clear()
+    monkeypatch.setattr(battery_service, "BATTERY_KERNEL", "numpy")
+    try:
+        fallback = battery_service.simulate_battery(production, consumption, [4.0, 8.0])
+    finally:
+        battery_service._numba_kernel.cache_clear()
+    assert compiled.kernel == "numba" and fallback.kernel == "numpy"
+    assert compiled.results == fallback.results
+
+
+def test_sweep_of_50_sizes_is_fast_and_monotonic():
+    production, consumption = _year()
+    start = time.perf_counter()
+    sim = battery_service.simulate_battery(production, consumption, np.linspace(0.5, 25, 50))
+    assert time.perf_counter() - start < 2.0
+    imports = [r.grid_import_kwh for r in sim.results]
+    assert len(imports) == 50 and imports == sorted(imports, reverse=True)
+    # Una batería que no se amortiza no se recomienda; una barata sí
+    assert battery_service.best_size(sim, cost_eur_per_kwh=100000) is None
+    assert battery_service.best_size(sim, cost_eur_per_kwh=10)["capacity_kwh"] > 0
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"capacities_kwh": []},
+    {"capacities_kwh": [0.0]},
+    {"round_trip_efficiency": 1.5},
+    {"consumption_kwh": np.ones(100)},
+])
+def test_invalid_inputs(kwargs):
+    production, consumption = _year()
+    params = dict(production_kwh=production, consumption_kwh=consumption, capacities_kwh=[5.0])
+    params.update(kwargs)
+    with pytest.raises(ValueError):
+        battery_service.simulate_battery(**params)
+
+
+def test_savings_under_time_of_use_tariff():
+    """Con tarifa, el ahorro es la diferencia de facturas (sin instalación frente a cada tamaño)."""
+    production, consumption = _year()
+    # Instalación pequeña: con mucho excedente la compensación ya anula el término de energía de
+    # cada mes (tope mensual) y la batería no ahorraría nada
+    production = production * 0.25
+    sim = battery_service.simulate_battery(production, consumption, [5.0], tariff="2.0TD")
+    flat = battery_service.simulate_battery(production, consumption, [5.0])
+    assert sim.results[0].grid_import_kwh == flat.results[0].grid_import_kwh
+    assert sim.results[0].annual_savings_eur > sim.baseline.annual_savings_eur > 0
+    assert sim.results[0].annual_savings_eur != flat.results[0].annual_savings_eur
+    with pytest.raises(ValueError, match="Unknown tariff"):
+        battery_service.simulate_battery(production, consumption, [5.0], tariff="nope")
@@ -0,0 +1,159 @@
+import fnmatch
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from app.services import cache_service, overpass_service, pvgis_service
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    """Sustituye la caché global del proceso por una MemoryCache vacía."""
+    cache = cache_service.MemoryCache(max_entries=100)
+    monkeypatch.setattr(cache_service, "_cache", cache)
+    return cache
+
+
+def test_coord_key_quantizes_coordinates():
+    """Coordenadas que difieren por debajo de la resolución comparten clave."""
+    assert cache_service.coord_key(40.4167801, -3.7037902) == cache_service.coord_key(40.416779, -3.703791)
+    assert cache_service.coord_key(40.41678, -3.70379) != cache_service.coord_key(40.41688, -3.70379)
+
+
+def test_memory_cache_lru_eviction_and_ttl():
+    cache = cache_service.MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # 'a' pasa a ser la más reciente
+    cache.set("c", 3)           # expulsa 'b', la menos usada
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.set("expired", 4, ttl_s=-1)
+    assert cache.get("expired") is None
+    assert cache.stats()["hits"] == 3
+
+
+def test_sqlite_cache_is_shared_between_instances_and_evicts(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = cache_service.SQLiteCache(path=path, max_entries=50)
+    reader = cache_service.SQLiteCache(path=path)
+
+    writer.set("pvgis:key", {"outputs": [1, 2, 3]})
+    writer.set("expired", {"x": 1}, ttl_s=-1)
+    assert reader.get("pvgis:key") == {"outputs": [1, 2, 3]}
+    assert reader.get("expired") is None
+
+    for i in range(98):  # La escritura número 100 dispara la pasada de expulsión
+        writer.set(f"k{i}", i)
+    assert writer.stats()["entries"] <= 50
+
+
+def _set_in_child(path):
+    cache_service.SQLiteCache(path=path).set("from-child", {"pid": "child"})
+
+
+def test_sqlite_cache_is_shared_across_processes(tmp_path):
+    """Un valor escrito por otro proceso (como otro worker) es visible en este."""
+    path = str(tmp_path / "cache.db")
+    cache = cache_service.SQLiteCache(path=path)
+    cache.get("warm-up")  # Abre la conexión antes del fork: el hijo debe abrir la suya
+
+    process = multiprocessing.get_context("fork").Process(target=_set_in_child, args=(path,))
+    process.start()
+    process.join(timeout=10)
+
+    assert process.exitcode == 0
+    assert cache.get("from-child") == {"pid": "child"}
+
+
+def test_create_cache_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown CACHE_BACKEND"):
+        cache_service.create_cache("memcached")
+
+
+def test_pvgis_and_overpass_calls_are_cached(memory_cache, monkeypatch):
+    calls = []
+
+    def fake_fetch(*args):
+        calls.append(args)
+        return {"outputs": {"totals": {}}}
+
+    monkeypatch.setattr(pvgis_service, "_fetch_pvgis_data", fake_fetch)
+    pvgis_service.get_pvgis_data(lat=40.4167801, lng=-3.7037902)
+    pvgis_service.get_pvgis_data(lat=40.416779, lng=-3.703791)  # Mismo edificio tras redondear
+    assert len(calls) == 1
+
+    pvgis_service.get_pvgis_data(lat=40.4167801, lng=-3.7037902, peak_power_kwp=5.0)  # Otros parámetros
+    assert len(calls) == 2
+
+    first = overpass_service.get_building_and_obstacle_data(lat=40.0, lng=-3.0)
+    second = overpass_service.get_building_and_obstacle_data(lat=40.0, lng=-3.0)
+    assert first == second
+    assert memory_cache.stats()["hits"] == 2
+
+
+def test_empty_upstream_responses_are_not_cached(memory_cache, monkeypatch):
+    monkeypatch.setattr(pvgis_service, "_fetch_pvgis_terrain_horizon", lambda lat, lng: {})
+    assert pvgis_service.get_pvgis_terrain_horizon(40.0, -3.0) == {}
+    assert memory_cache.stats()["entries"] == 0
+
+
+class _BrokenCache:
+    """Caché cuyo backend falla siempre, como SQLite bloqueado o Redis caído."""
+
+    def get(self, key):
+        raise sqlite3.OperationalError("database is locked")
+
+    def set(self, key, value, ttl_s=None):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_cached_computes_without_storing_when_the_backend_fails(monkeypatch):
+    monkeypatch.setattr(cache_service, "_cache", _BrokenCache())
+    calls = []
+    assert cache_service.cached("clave", lambda: calls.append(1) or {"a": 1}) == {"a": 1}
+    assert cache_service.cached("clave", lambda: calls.append(1) or {"a": 1}) == {"a": 1}
+    assert len(calls) == 2
+
+
+def test_cached_still_computes_when_only_the_write_fails(monkeypatch):
+    cache = cache_service.MemoryCache(max_entries=10)
+    monkeypatch.setattr(cache, "set", _BrokenCache().set)
+    monkeypatch.setattr(cache_service, "_cache", cache)
+    assert cache_service.cached("clave", lambda: [1, 2]) == [1, 2]
+    assert cache.stats()["entries"] == 0
+
+
+class _FakeRedis:
+    """Cliente Redis mínimo en memoria (get/set/delete/scan_iter)."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self.data[key] = value.encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match, count=None):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+
+def test_redis_cache_namespaces_keys_and_clears_only_its_prefix():
+    cache = cache_service.RedisCache.__new__(cache_service.RedisCache)
+    cache.default_ttl_s, cache.prefix, cache.hits, cache.misses = 60, "app:", 0, 0
+    cache._client = _FakeRedis()
+    cache._client.data["otra-app:clave"] = b"1"
+    cache.set("pvgis:40:-3", {"a": 1})
+    assert "app:pvgis:40:-3" in cache._client.data
+    assert cache.get("pvgis:40:-3") == {"a": 1}
+    assert cache.stats()["entries"] == 1
+    cache.clear()
+    assert cache._client.data == {"otra-app:clave": b"1"}
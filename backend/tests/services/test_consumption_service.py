@@ -47,6 +47,106 @@ def test_predict_consumption_manual_with_ev_and_heat_pump():
     assert expected_increase * 0.90 < actual_increase < expected_increase * 1.10
 
 
+def test_predict_consumption_manual_is_deterministic_per_archetype(monkeypatch):
+    """En modo determinista, la misma vivienda da siempre el mismo resultado; otra vivienda, otro jitter."""
+    monkeypatch.setattr(cons_service, "DETERMINISTIC_JITTER", True)
+    input_data = ConsumptionManualInput(occupants=4, area_m2=150, has_ev=True)
+
+    first = cons_service.predict_consumption_manual(input_data)
+    second = cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=4, area_m2=150, has_ev=True, clp="ES0021000000123456ABCD"))
+    other = cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=4, area_m2=151, has_ev=True))
+
+    assert first == second  # El CUPS no forma parte del arquetipo
+    assert first.annual_kwh / (4 * 1200 + 150 * 10 + 2000) != other.annual_kwh / (4 * 1200 + 151 * 10 + 2000)
+    low, high = cons_service.ANNUAL_JITTER_RANGE
+    assert low * 8300 <= first.annual_kwh <= high * 8300
+
+
+def test_archetype_profile_cache_hits_and_is_bounded(monkeypatch):
+    """El perfil normalizado se memoiza por arquetipo en una LRU acotada, con estadísticas."""
+    cons_service._archetype_profile.cache_clear()
+    input_data = ConsumptionManualInput(occupants=2, area_m2=70)
+
+    for _ in range(3):
+        cons_service.predict_consumption_manual(input_data)
+
+    stats = cons_service.get_profile_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert stats["hit_ratio"] == pytest.approx(2 / 3, abs=1e-4)
+    assert stats["max_size"] == cons_service.PROFILE_CACHE_SIZE
+
+    _, shape = cons_service._archetype_profile(2, 70, False, False)
+    assert shape.sum() == pytest.approx(1.0)
+    assert not shape.flags.writeable  # Compartido entre peticiones: no debe poder modificarse
+
+
+def test_predict_consumption_manual_uses_selected_load_profile():
+    """La forma horaria y mensual sale de la curva elegida de la biblioteca; el total anual no cambia."""
+    standard = cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=3, area_m2=90))
+    business = cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=3, area_m2=90, load_profile="3.0TD_business"))
+
+    assert business.annual_kwh == standard.annual_kwh
+    assert business.hourly_profile != standard.hourly_profile
+    assert sum(business.monthly_kwh) == pytest.approx(business.annual_kwh, abs=0.01)
+    assert business.monthly_kwh[6] > business.monthly_kwh[0]  # Curva comercial: pico en verano
+    assert standard.monthly_kwh[0] > standard.monthly_kwh[6]
+
+    # Laborables distintos de fines de semana (2025-01-04 sábado, 2025-01-08 miércoles)
+    hourly = standard.hourly_profile
+    assert hourly[3 * 24 + 8] != hourly[7 * 24 + 8]
+
+    with pytest.raises(ValueError, match="Unknown load profile"):
+        cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=3, area_m2=90, load_profile="nope"))
+
+
+def test_heat_pump_uses_local_temperatures_and_ev_charges_at_night(monkeypatch):
+    """Con ubicación, la bomba de calor sigue las temperaturas de PVGIS; el VE se carga de noche."""
+    cons_service._archetype_profile.cache_clear()
+    warm = {"outputs": {"monthly": {"fixed": [{"month": m, "T2m": t} for m, t in enumerate([13, 14, 16, 17, 19, 22, 25, 26, 25, 22, 18, 15], start=1)]}}}
+    from app.services import pvgis_service
+    monkeypatch.setattr(pvgis_service, "get_pvgis_data", lambda lat, lng: warm)
+
+    reference = cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=2, area_m2=80, has_heat_pump=True))
+    local = cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=2, area_m2=80, has_heat_pump=True, lat=28.1, lng=-15.4))
+    assert local.annual_kwh < reference.annual_kwh  # Clima templado: menos calefacción
+    assert sum(local.hourly_profile) == pytest.approx(local.annual_kwh, abs=0.1)
+
+    ev = cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=2, area_m2=80, has_ev=True))
+    days = [ev.hourly_profile[d * 24:(d + 1) * 24] for d in range(7)]
+    assert all(max(day[19:]) > 2 * max(day[9:17]) for day in days)
+    assert ev.peak_power_kw > cons_service.load_synthesis.EV_CHARGER_KW * 0.9
+
+
+def test_archetype_cache_is_independent_of_the_climate(monkeypatch):
+    """El perfil del arquetipo no depende del clima; la bomba de calor se cachea aparte, con temperaturas redondeadas a 1 °C."""
+    cons_service._archetype_profile.cache_clear()
+    cons_service._heat_pump_load.cache_clear()
+    from app.services import pvgis_service
+    temps = iter([[10.2] * 12, [9.9] * 12, [20.0] * 12])
+    monkeypatch.setattr(pvgis_service, "get_pvgis_data", lambda lat, lng: {"outputs": {"monthly": {"fixed": [
+        {"month": m, "T2m": t} for m, t in enumerate(next(temps), start=1)]}}})
+
+    results = [cons_service.predict_consumption_manual(ConsumptionManualInput(occupants=2, area_m2=80, has_heat_pump=True, lat=40.0 + i, lng=-3.7))
+               for i in range(3)]
+    assert cons_service._archetype_profile.cache_info().currsize == 1
+    assert cons_service._heat_pump_load.cache_info().currsize == 2  # 10,2 y 9,9 °C comparten entrada
+    assert results[0] == results[1] and results[2].annual_kwh < results[0].annual_kwh
+
+
+def test_predict_hourly_profiles_batch_matches_single_predictions():
+    inputs = [
+        ConsumptionManualInput(occupants=1 + i % 5, area_m2=60 + i, has_ev=i % 2 == 0, has_heat_pump=i % 3 == 0,
+                               load_profile="3.0TD_business" if i % 7 == 0 else None)
+        for i in range(200)
+    ]
+    annual_kwh, hourly = cons_service.predict_hourly_profiles(inputs)
+    assert hourly.shape == (200, 8760)
+    for i in (0, 1, 3, 7):
+        single = cons_service.predict_consumption_manual(inputs[i])
+        assert annual_kwh[i] == single.annual_kwh
+        assert hourly[i] == pytest.approx(single.hourly_profile, abs=1e-3)
+
+
 # --- Tests para predict_consumption_csv ---
 
 def _create_mock_csv_file(tmp_path, data_rows: List[List[str]], filename="test.csv", delimiter=','):
@@ -111,6 +211,55 @@ async def test_predict_consumption_csv_invalid_row_count(tmp_path, num_rows):
         await cons_service.predict_consumption_csv(upload_file)
 
 
+@pytest.mark.asyncio
+async def test_predict_consumption_csv_leap_year_with_header(tmp_path):
+    """Un año bisiesto (8784 filas, con cabecera) se acepta: los totales incluyen el 29 de febrero; el perfil horario no."""
+    hourly_data = [["kWh"]] + [["2.0" if 1416 <= i < 1440 else "1.0"] for i in range(8784)]  # 29 de febrero a 2 kWh
+    csv_file_path = _create_mock_csv_file(tmp_path, hourly_data)
+
+    with open(csv_file_path, 'rb') as f:
+        upload_file = UploadFile(filename="leap.csv", file=f, content_type="text/csv")
+        result = await cons_service.predict_consumption_csv(upload_file, year=2024)
+
+    assert result.annual_kwh == 8784 + 24
+    assert result.monthly_kwh[1] == 29 * 24 + 24
+    assert len(result.hourly_profile) == 8760
+    assert max(result.hourly_profile) == 1.0  # Sin el 29 de febrero
+    assert result.peak_power_kw == 2.0
+
+
+@pytest.mark.asyncio
+async def test_predict_consumption_csv_quarter_hourly(tmp_path):
+    """Un archivo cuartohorario (35040 filas) se suma en horas; el pico es la media cuartohoraria más alta."""
+    quarter_data = [["0.25"] for _ in range(35040)]
+    quarter_data[100] = ["1.0"]  # 4 kW durante 15 minutos en la hora 25
+    csv_file_path = _create_mock_csv_file(tmp_path, quarter_data)
+
+    with open(csv_file_path, 'rb') as f:
+        upload_file = UploadFile(filename="cuartohorario.csv", file=f, content_type="text/csv")
+        result = await cons_service.predict_consumption_csv(upload_file)
+
+    assert len(result.hourly_profile) == 8760
+    assert result.annual_kwh == pytest.approx(8760 + 0.75)
+    assert result.peak_power_kw == 4.0
+    assert max(result.hourly_profile) == 1.75
+
+
+@pytest.mark.asyncio
+async def test_predict_consumption_csv_monthly_sums_follow_local_time(tmp_path):
+    """En hora local (marzo con 743 h), abril empieza en la fila 2159."""
+    hourly_data = [[str(i)] for i in range(8760)]
+    csv_file_path = _create_mock_csv_file(tmp_path, hourly_data)
+
+    with open(csv_file_path, 'rb') as f:
+        upload_file = UploadFile(filename="local.csv", file=f, content_type="text/csv")
+        result = await cons_service.predict_consumption_csv(upload_file, year=2025)
+
+    assert result.monthly_kwh[2] == sum(range(1416, 2159))
+    with open(csv_file_path, 'rb') as f, pytest.raises(ValueError, match="2024 has 8784"):
+        await cons_service.predict_consumption_csv(UploadFile(filename="local.csv", file=f), year=2024)
+
+
 @pytest.mark.asyncio
 async def test_predict_consumption_csv_non_numeric_data(tmp_path):
     """Test con CSV que contiene datos no numéricos."""
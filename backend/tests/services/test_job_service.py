@@ -0,0 +1,140 @@
+import time
+
+import pytest
+
+from app.services import job_service
+
+LOCATION = {"lat": 40.416775, "lng": -3.70379}
+MANUAL = {"occupants": 3, "area_m2": 100, "has_ev": False, "has_heat_pump": False, "clp": None}
+
+
+@pytest.fixture
+def jobs_db(memory_db, monkeypatch):
+    """Cola de trabajos sobre la BD temporal de memory_db, sin workers embebidos."""
+    monkeypatch.setattr(job_service, "JOB_WORKERS", 0)
+
+
+def test_jobs_run_by_priority_then_submission_order(jobs_db):
+    low = job_service.submit_job("consumption_manual", MANUAL, priority=0)
+    high = job_service.submit_job("location_analysis", LOCATION, priority=5)
+    low_2 = job_service.submit_job("consumption_manual", MANUAL, priority=0)
+    assert low["status"] == "queued" and low["params"] == MANUAL
+
+    claimed = [job_service.claim_next_job("test")["id"] for _ in range(3)]
+    assert claimed == [high["id"], low["id"], low_2["id"]]
+    assert job_service.claim_next_job("test") is None
+    assert job_service.queue_stats()["running"] == 3
+
+
+def test_worker_runs_jobs_with_the_synchronous_services(jobs_db):
+    location = job_service.submit_job("location_analysis", LOCATION)
+    manual = job_service.submit_job("consumption_manual", MANUAL)
+
+    assert job_service.run_worker(max_jobs=10) == 2
+
+    location = job_service.get_job(location["id"])
+    assert location["status"] == "succeeded" and location["error"] is None
+    assert location["result"]["maxKwp"] > 0 and len(location["result"]["shadingFactorMonthly"]) == 12
+    manual = job_service.get_job(manual["id"])
+    assert len(manual["result"]["hourly_profile"]) == 8760
+    assert manual["expires_at"] == pytest.approx(manual["finished_at"] + job_service.JOB_RESULT_TTL_S)
+
+
+def test_production_layout_and_battery_jobs_match_their_routes(jobs_db, client):
+    production_params = {"lat": 40.416775, "lng": -3.70379, "kwp": 4.0, "include_hourly": False}
+    layout_params = {"sections": [{"area": 60.0, "tilt": 30.0}], "include_coordinates": False}
+    battery_params = {"production_kwh": [1.0] * 8760, "consumption_kwh": [0.5] * 8760, "capacities_kwh": [5.0]}
+    jobs = [job_service.submit_job("production_simulate", production_params),
+            job_service.submit_job("layout_pack", layout_params),
+            job_service.submit_job("battery_simulate", battery_params)]
+
+    assert job_service.run_worker(max_jobs=10) == 3
+
+    results = [job_service.get_job(job["id"]) for job in jobs]
+    assert all(job["status"] == "succeeded" for job in results), [job["error"] for job in results]
+    for job, route, params in zip(results, ("/production/simulate", "/layout/pack", "/battery/simulate"),
+                                  (production_params, layout_params, battery_params)):
+        assert job["result"] == client.post(route, json=params).json()
+
+
+def test_failed_job_stores_the_error(jobs_db, monkeypatch):
+    from app.services import location_service
+
+    async def failing_analysis(lat, lng):
+        raise location_service.UpstreamServiceError("Overpass service unavailable, please retry later.")
+
+    monkeypatch.setattr(location_service, "analyze_location", failing_analysis)
+    job = job_service.submit_job("location_analysis", LOCATION)
+    job_service.run_worker(max_jobs=1)
+
+    job = job_service.get_job(job["id"])
+    assert job["status"] == "failed" and job["result"] is None
+    assert job["error"] == "Overpass service unavailable, please retry later."
+
+
+def test_cancelled_jobs_are_skipped_or_discarded(jobs_db):
+    queued = job_service.submit_job("consumption_manual", MANUAL)
+    assert job_service.cancel_job(queued["id"])["status"] == "cancelled"
+    assert job_service.run_worker(max_jobs=1) == 0 # Nada que ejecutar
+
+    running = job_service.submit_job("consumption_manual", MANUAL)
+    claimed = job_service.claim_next_job("test")
+    job_service.cancel_job(running["id"])
+    job_service.run_job(claimed) # Termina, pero su resultado se descarta
+    assert job_service.get_job(running["id"])["status"] == "cancelled"
+    assert job_service.get_job(running["id"])["result"] is None
+    assert job_service.cancel_job("does-not-exist") is None
+
+
+def test_expired_results_are_hidden_and_purged(jobs_db):
+    job = job_service.submit_job("consumption_manual", MANUAL, result_ttl_s=0.05)
+    job_service.run_worker(max_jobs=1)
+    assert job_service.get_job(job["id"])["status"] == "succeeded"
+    time.sleep(0.1)
+    assert job_service.get_job(job["id"]) is None
+    assert job_service.purge_expired_jobs() == 1
+
+
+def test_stale_running_jobs_are_requeued_then_failed(jobs_db, monkeypatch):
+    """Un trabajo cuyo worker deja de renovar la concesión vuelve a la cola; al agotar los intentos, falla."""
+    monkeypatch.setattr(job_service, "JOB_MAX_ATTEMPTS", 2)
+    job = job_service.submit_job("consumption_manual", MANUAL)
+    claimed = job_service.claim_next_job("dead-worker")
+    assert claimed["attempts"] == 1
+    assert job_service.reap_stale_jobs() == 0 # Concesión vigente
+    assert job_service.heartbeat_job(job["id"], "dead-worker")
+    assert job_service.reap_stale_jobs(lease_s=0) == 1
+    assert job_service.get_job(job["id"])["status"] == "queued"
+    assert not job_service.heartbeat_job(job["id"], "dead-worker")
+
+    reclaimed = job_service.claim_next_job("other-worker")
+    job_service.run_job(claimed) # El worker antiguo termina tarde: su resultado se descarta
+    assert job_service.get_job(job["id"])["status"] == "running"
+    assert job_service.reap_stale_jobs(worker_prefix="other-") == 1 # Segundo intento: falla
+    failed = job_service.get_job(job["id"])
+    assert reclaimed["attempts"] == 2 and failed["status"] == "failed"
+    assert failed["error"] and failed["expires_at"] is not None
+    assert job_service.queue_stats()["running"] == 0
+
+
+def test_queue_stats_ignore_expired_jobs(jobs_db):
+    job_service.submit_job("consumption_manual", MANUAL, result_ttl_s=0.05)
+    job_service.run_worker(max_jobs=1)
+    assert job_service.queue_stats()["succeeded"] == 1
+    time.sleep(0.1)
+    assert job_service.queue_stats()["succeeded"] == 0
+
+
+def test_worker_pool_processes_run_queued_jobs(jobs_db):
+    """Los workers son procesos independientes que leen la cola de la misma base de datos."""
+    jobs = [job_service.submit_job("consumption_manual", dict(MANUAL, occupants=n)) for n in range(1, 4)]
+    pool = job_service.JobWorkerPool(workers=2)
+    pool.start()
+    try:
+        deadline = time.monotonic() + 60 # El arranque (spawn) reimporta la app en cada proceso
+        while time.monotonic() < deadline and job_service.queue_stats()["succeeded"] < 3:
+            time.sleep(0.2)
+    finally:
+        pool.stop()
+    assert [job_service.get_job(j["id"])["status"] for j in jobs] == ["succeeded"] * 3
+    assert pool.alive() == 0
@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.services import layout_service
+
+
+def _rectangle(width, depth):
+    return [[0, 0], [width, 0], [width, depth], [0, depth]]
+
+
+def test_flat_rectangle_respects_setback_and_gaps():
+    """Cubierta plana de 10 x 5 m: filas separadas y ningún módulo dentro del retranqueo."""
+    section = layout_service.pack_section(_rectangle(10, 5), 1.903, 1.134, tilt=0, setback_m=0.5)
+    assert section.panels == 8 and section.rows == 2  # Apaisados, con pasillo de LAYOUT_FLAT_ROW_GAP_M entre filas
+    assert section.centers.shape == (8, 2)
+    half = 1.903 / 2
+    assert section.centers.min() >= 0.5 + 1.134 / 2 - 0.06  # Tolerancia de una celda del raster
+    assert section.centers[:, 0].max() <= 10 - 0.5 - min(half, 1.134 / 2) + 0.06
+    assert section.usable_area_m2 == pytest.approx(9 * 4, rel=0.05)
+    # Sin pasillos caben dos filas en vertical de siete
+    tight = layout_service.pack_section(_rectangle(10, 5), 1.903, 1.134, tilt=0, setback_m=0.5, row_gap_m=0)
+    assert (tight.panels, tight.orientation) == (14, "portrait")
+
+
+def test_orientation_choice_and_tilted_stretch():
+    """En el plano inclinado la pendiente es más larga que su proyección: caben más filas."""
+    auto = layout_service.pack_section(_rectangle(8, 5), 1.903, 1.134, tilt=30, azimuth=180)
+    portrait = layout_service.pack_section(_rectangle(8, 5), 1.903, 1.134, tilt=30, azimuth=180, orientation="portrait")
+    landscape = layout_service.pack_section(_rectangle(8, 5), 1.903, 1.134, tilt=30, azimuth=180, orientation="landscape")
+    assert portrait.orientation == "portrait" and landscape.orientation == "landscape"
+    assert auto.panels == max(portrait.panels, landscape.panels)
+    flat_projection = layout_service.pack_section(_rectangle(8, 5), 1.903, 1.134, tilt=0, row_gap_m=0)
+    assert auto.panels > flat_projection.panels
+    assert auto.usable_area_m2 == pytest.approx(7 * 4 / np.cos(np.radians(30)), rel=0.05)
+    with pytest.raises(ValueError):
+        layout_service.pack_section(_rectangle(8, 5), 1.903, 1.134, orientation="diagonal")
+
+
+def test_latlon_round_trip_and_square_fallback():
+    outline = [(40.4, -3.7), (40.4, -3.6999), (40.4001, -3.6999), (40.4001, -3.7)]
+    polygon, origin = layout_service.to_local_metres(outline)
+    assert np.ptp(polygon[:, 0]) == pytest.approx(8.48, abs=0.05) and np.ptp(polygon[:, 1]) == pytest.approx(11.12, abs=0.05)
+    assert layout_service.from_local_metres(polygon, origin) == pytest.approx(np.array(outline), abs=1e-9)
+    square = layout_service.square_polygon(64.0)
+    assert np.ptp(square, axis=0).tolist() == pytest.approx([8.0, 8.0])
+
+
+def test_layout_roof_sums_sections_and_scales():
+    """Miles de módulos en una nave grande, muy por debajo de un segundo."""
+    start = time.perf_counter()
+    roof = layout_service.layout_roof([
+        {"polygon_m": _rectangle(150, 80), "tilt": 0, "azimuth": 180},
+        {"polygon_m": layout_service.square_polygon(70.25), "tilt": 30, "azimuth": 90},
+    ], module_id="generic_mono_450")
+    elapsed = time.perf_counter() - start
+    assert roof.panels > 3000 and elapsed < 1.0
+    assert roof.panels == sum(s.panels for s in roof.sections)
+    assert roof.kwp == pytest.approx(roof.panels * roof.module_power_w / 1000, abs=1e-3)
+    with pytest.raises(ValueError):
+        layout_service.layout_roof([{"polygon_m": _rectangle(10, 5)}], module_id="nope")
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from app.services import load_synthesis
+
+
+def test_ev_charging_is_a_night_block_at_charger_power():
+    """Cada día se carga a potencia completa desde la hora de inicio; lo que pasa de medianoche sigue al día siguiente."""
+    load = load_synthesis.ev_charging_profiles([2000.0, 3650.0], start_hour=[20, 23], charger_kw=3.7)
+    assert load.shape == (2, 8760)
+    assert load.sum(axis=1) == pytest.approx([2000.0, 3650.0])
+    assert load.max() <= 3.7 + 1e-9
+
+    days = load.reshape(2, 365, 24)
+    assert days[0, :, 8:19].sum() == 0  # Nada de día
+    assert (days[1, 1:, 0] > 0).all()  # Empezando a las 23 h, la carga continúa tras medianoche
+    # Menos energía en fin de semana (2025-01-04 es sábado; 2025-01-08, miércoles)
+    assert days[0, 3].sum() < days[0, 7].sum()
+
+
+def test_ev_charging_rejects_sessions_longer_than_a_day():
+    with pytest.raises(ValueError, match="24 h"):
+        load_synthesis.ev_charging_profiles(40000.0, charger_kw=2.0)
+
+
+def test_heat_pump_follows_temperatures():
+    """La bomba de calor consume en los meses fríos; en un clima sin calefacción ni refrigeración solo queda el ACS."""
+    load = load_synthesis.heat_pump_profiles(3000.0)[0]
+    assert load.sum() == pytest.approx(3000.0)
+    monthly = np.add.reduceat(load, [0, 744, 1416, 2160, 2880, 3624, 4344, 5088, 5832, 6552, 7296, 8016])
+    assert monthly[0] > 4 * monthly[4]  # Enero frente a mayo
+
+    mild = load_synthesis.heat_pump_profiles(1000.0, monthly_t2m=[19.0] * 12)[0]
+    assert mild.sum() == pytest.approx(1000.0)
+    assert np.allclose(mild.reshape(365, 24), mild[:24])  # Solo agua caliente: el mismo día todo el año
+
+    cold = load_synthesis.heat_pump_annual_kwh(3000.0, [0, 1, 4, 7, 11, 15, 18, 18, 14, 10, 4, 1])[0]
+    assert cold > 3000.0
+    assert load_synthesis.heat_pump_annual_kwh(3000.0)[0] == 3000.0
+
+
+def test_synthesize_households_batch_adds_components():
+    base_shape = np.full(8760, 1 / 8760)
+    n = 3000
+    load = load_synthesis.synthesize_households(
+        base_shape, base_kwh=np.full(n, 3000.0), ev_kwh=np.where(np.arange(n) % 2, 2000.0, 0.0),
+        hp_kwh=np.where(np.arange(n) % 3 == 0, 2500.0, 0.0), monthly_t2m=np.tile(load_synthesis.REFERENCE_MONTHLY_T2M, (n, 1)),
+        ev_start_hour=19 + np.arange(n) % 4, dtype=np.float32,
+    )
+    assert load.shape == (n, 8760) and load.dtype == np.float32
+    assert load[:6].sum(axis=1) == pytest.approx([5500.0, 5000.0, 3000.0, 7500.0, 3000.0, 5000.0], rel=1e-5)
+
+
+def test_monthly_temperatures_from_pvgis_response():
+    months = [{"month": m, "T2m": 10 + m / 3} for m in range(1, 13)]
+    assert load_synthesis.monthly_temperatures({"outputs": {"monthly": {"fixed": months}}})[0] == 10.3
+    assert load_synthesis.monthly_temperatures({"outputs": {"monthly": {"fixed": months[:11]}}}) == load_synthesis.REFERENCE_MONTHLY_T2M
+    assert load_synthesis.monthly_temperatures({}) == load_synthesis.REFERENCE_MONTHLY_T2M
+
+
+def test_pvcalc_response_without_t2m_uses_the_climatology():
+    """La respuesta real de PVcalc no trae T2m en outputs.monthly.fixed: se usa la climatología del lugar."""
+    months = [{"month": m, "E_d": 3.0, "E_m": 90.0, "H(i)_d": 4.0, "H(i)_m": 120.0, "SD_m": 10.0} for m in range(1, 13)]
+    oslo = {"inputs": {"location": {"latitude": 59.9, "longitude": 10.7, "elevation": 20.0}}, "outputs": {"monthly": {"fixed": months}}}
+    temps = load_synthesis.monthly_temperatures(oslo)
+    assert len(temps) == 12 and all(np.isfinite(temps))
+    assert max(temps) < max(load_synthesis.REFERENCE_MONTHLY_T2M) and temps.index(min(temps)) == 0
+    sydney = load_synthesis.climatology_temperatures(-33.9, 40.0)
+    assert sydney.index(max(sydney)) in (0, 1)  # Verano austral
+    nan_months = [dict(m, T2m=float("nan")) for m in months]
+    assert load_synthesis.monthly_temperatures(dict(oslo, outputs={"monthly": {"fixed": nan_months}})) == temps
+    # Más frío que el clima de referencia: la bomba de calor consume más
+    assert load_synthesis.heat_pump_annual_kwh(2500.0, temps)[0] > 2500.0
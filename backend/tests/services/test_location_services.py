@@ -160,3 +160,22 @@ def test_estimate_max_kwp():
     area_small = 10.0
     expected_kwp_small = round(area_small / 6.5, 2)
     assert geometry_service.estimate_max_kwp(area_small) == pytest.approx(expected_kwp_small)
+
+
+@pytest.mark.asyncio
+async def test_stream_analysis_sends_roof_before_slow_upstreams_finish(monkeypatch):
+    """Con un PVGIS lento, el área del tejado llega sin esperar a PVGIS ni a las sombras."""
+    import time
+    from app.services import location_service
+
+    def slow_pvgis(*args, **kwargs):
+        time.sleep(0.3)
+        return {}
+
+    monkeypatch.setattr(location_service.pvgis_service, "get_pvgis_data", slow_pvgis)
+    started = time.perf_counter()
+    arrivals = {}
+    async for name, _ in location_service.stream_analysis(36.7213, -4.4214):
+        arrivals[name] = time.perf_counter() - started
+    assert arrivals["roof"] < 0.1
+    assert arrivals["result"] >= 0.3
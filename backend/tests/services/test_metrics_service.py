@@ -0,0 +1,66 @@
+import pytest
+
+from app.services import metrics_service
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    registry = metrics_service.Registry()
+    counter = registry.register(metrics_service.Counter("demo_total", "Demo counter.", ("route",)))
+    histogram = registry.register(metrics_service.Histogram("demo_seconds", "Demo latency.", ("route",), buckets=(0.1, 1.0)))
+
+    counter.inc(route="/a")
+    counter.inc(2, route="/a")
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.1, route="/a")  # El límite superior del bucket es inclusivo (le)
+    histogram.observe(3.0, route="/a")
+
+    text = registry.render()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{route="/a"} 3' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+    assert 'demo_seconds_sum{route="/a"} 3.15' in text
+
+
+def test_labels_are_validated_and_escaped():
+    registry = metrics_service.Registry()
+    counter = registry.register(metrics_service.Counter("escaped_total", "Escaping.", ("path",)))
+    counter.inc(path='a"b\\c')
+    assert 'escaped_total{path="a\\"b\\\\c"} 1' in registry.render()
+
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+    with pytest.raises(ValueError, match="already registered"):
+        registry.register(metrics_service.Counter("escaped_total", "Duplicate."))
+
+
+def test_failing_collector_does_not_break_rendering():
+    registry = metrics_service.Registry()
+
+    def broken():
+        raise RuntimeError("redis down")
+        yield  # pragma: no cover
+
+    def working():
+        yield "demo_gauge", "gauge", "Demo gauge.", [({"cache": "x"}, 0.5)]
+
+    registry.register_collector(broken)
+    registry.register_collector(working)
+    assert 'demo_gauge{cache="x"} 0.5' in registry.render()
+
+
+def test_instrument_upstream_counts_outcomes():
+    calls = iter([{"ok": 1}, {}])
+
+    @metrics_service.instrument_upstream("test_upstream")
+    def fetch():
+        return next(calls)
+
+    ok_before = metrics_service.UPSTREAM_REQUESTS.value(service="test_upstream", outcome="ok")
+    fetch()
+    fetch()
+    assert metrics_service.UPSTREAM_REQUESTS.value(service="test_upstream", outcome="ok") == ok_before + 1
+    assert metrics_service.UPSTREAM_REQUESTS.value(service="test_upstream", outcome="error") >= 1
+    assert metrics_service.UPSTREAM_DURATION.count(service="test_upstream") >= 2
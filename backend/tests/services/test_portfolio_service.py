@@ -0,0 +1,126 @@
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services import cache_service, overpass_service, portfolio_service, pvgis_service
+
+
+@pytest.fixture
+def portfolio(monkeypatch):
+    """Caché vacía y geometría en proceso (sin pool de procesos), contando las llamadas a los upstreams."""
+    monkeypatch.setattr(cache_service, "_cache", cache_service.MemoryCache(max_entries=100))
+    monkeypatch.setattr(portfolio_service, "PORTFOLIO_PROCESSES", 1)
+    calls = {"overpass": 0, "pvgis": 0}
+    fetch_area, fetch_pvgis = overpass_service._fetch_area_data, pvgis_service._fetch_pvgis_data
+
+    def counting_area(*args):
+        calls["overpass"] += 1
+        return fetch_area(*args)
+
+    def counting_pvgis(*args):
+        calls["pvgis"] += 1
+        return fetch_pvgis(*args)
+
+    monkeypatch.setattr(overpass_service, "_fetch_area_data", counting_area)
+    monkeypatch.setattr(pvgis_service, "_fetch_pvgis_data", counting_pvgis)
+    return calls
+
+
+def test_read_points_detects_separator_and_reports_invalid_rows():
+    points, invalid = portfolio_service.read_points("ID;Latitud;Longitud\nA;40,4168;-3,7038\nB;91;0\n\nC;40.1;-3.1\n")
+    assert points == [portfolio_service.PortfolioPoint(1, "A", 40.4168, -3.7038), portfolio_service.PortfolioPoint(4, "C", 40.1, -3.1)]
+    assert [(r["row"], r["id"], r["status"]) for r in invalid] == [(2, "B", "error")]
+
+    points, _ = portfolio_service.read_points("lat,lng\n40.4,-3.7\n")
+    assert points[0].key == "row:1"
+    with pytest.raises(ValueError, match="header row"):
+        portfolio_service.read_points("40.4,-3.7\n")
+
+
+def test_elements_near_puts_the_closest_building_first():
+    here = overpass_service._mock_data(40.0, -3.0)["elements"]
+    neighbour = overpass_service._mock_data(40.0002, -3.0)["elements"] # ~22 m al norte
+    far_away = overpass_service._mock_data(40.01, -3.0)["elements"]   # ~1,1 km
+
+    near = portfolio_service.elements_near(neighbour + far_away + here, 40.0, -3.0)
+    assert near[0]["geometry"] == here[0]["geometry"] # El edificio de la dirección, no el del vecino
+    assert len(near) == 6 # Los elementos lejanos no cuentan como obstáculos
+
+
+def test_analyze_portfolio_shares_upstream_fetches_per_tile(portfolio):
+    # 20 direcciones en 2 teselas (mismo barrio) + 1 lejana
+    content = "id,lat,lng\n" + "".join(f"P{i},{40.4001 + (i % 10) * 0.0003},{-3.7001 - (i // 10) * 0.005}\n" for i in range(20))
+    content += "far,41.39,2.17\n"
+    points, _ = portfolio_service.read_points(content)
+
+    records = list(portfolio_service.analyze_portfolio(points))
+    results = [r for r in records if r["type"] == "result"]
+    progress = [r for r in records if r["type"] == "progress"]
+
+    assert sorted(r["id"] for r in results) == sorted(p.id for p in points)
+    assert all(r["status"] == "ok" and r["maxKwp"] > 0 and r["optimalTilt"] > 0 for r in results)
+    assert portfolio == {"overpass": 3, "pvgis": 3} # Una llamada de cada por tesela, no por dirección
+    assert (progress[-1]["done"], progress[-1]["total"], progress[-1]["tiles"]) == (21, 21, 3)
+
+
+def test_resumed_run_skips_completed_addresses(portfolio):
+    points, _ = portfolio_service.read_points("id,lat,lng\nA,40.40,-3.70\nB,40.41,-3.71\nC,40.42,-3.72\n")
+    first_run = list(portfolio_service.to_ndjson(r for r in portfolio_service.analyze_portfolio(points[:2])))
+    a_result = next(line.decode() for line in first_run if line.startswith(b'{"type":"result","row":1,'))
+    interrupted = [a_result, '{"type":"result","row":2,"id":"B","sta'] # Cortado a mitad de B
+
+    skip = portfolio_service.completed_keys(interrupted)
+    results = [r for r in portfolio_service.analyze_portfolio(points, skip=skip) if r["type"] == "result"]
+    assert skip == {"A"}
+    assert {r["id"] for r in results} == {"B", "C"}
+
+    csv_output = [chunk.decode() for chunk in portfolio_service.to_csv(portfolio_service.analyze_portfolio(points))]
+    assert csv_output[0].startswith("row,id,lat,lng,status")
+    assert portfolio_service.completed_keys("".join(csv_output).splitlines()) == {"A", "B", "C"}
+
+
+def test_trim_incomplete_tail_keeps_whole_records(tmp_path):
+    output = tmp_path / "resultados.ndjson"
+    output.write_bytes(b'{"type":"result","row":1,"status":"ok"}\n{"type":"result","row":2,"sta')
+    assert portfolio_service.trim_incomplete_tail(str(output)) == len(b'{"type":"result","row":2,"sta')
+    assert output.read_bytes() == b'{"type":"result","row":1,"status":"ok"}\n'
+    assert portfolio_service.trim_incomplete_tail(str(output)) == 0
+    output.write_bytes(b'{"type":"res')
+    portfolio_service.trim_incomplete_tail(str(output))
+    assert output.read_bytes() == b""
+
+
+def test_broken_process_pool_is_replaced(portfolio, monkeypatch):
+    """Si muere un proceso del pool, sus teselas fallan y las siguientes llamadas usan un pool nuevo."""
+    class BrokenPool(Executor):
+        def submit(self, *args):
+            future = Future()
+            future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly."))
+            return future
+
+    class InlinePool(Executor):
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+    broken = BrokenPool()
+    monkeypatch.setattr(portfolio_service, "PORTFOLIO_PROCESSES", 2)
+    monkeypatch.setattr(portfolio_service, "_process_pool", broken)
+    monkeypatch.setattr(portfolio_service, "ProcessPoolExecutor", lambda *args, **kwargs: InlinePool())
+    points, _ = portfolio_service.read_points("lat,lng\n40.40,-3.70\n")
+    results = [r for r in portfolio_service.analyze_portfolio(points) if r["type"] == "result"]
+    assert results[0]["status"] == "error" and "terminated" in results[0]["error"]
+    assert portfolio_service._process_pool is not broken
+    results = [r for r in portfolio_service.analyze_portfolio(points) if r["type"] == "result"]
+    assert results[0]["status"] == "ok"
+    portfolio_service.shutdown_process_pool()
+
+
+def test_unavailable_overpass_fails_only_its_tile(portfolio, monkeypatch):
+    monkeypatch.setattr(overpass_service, "_fetch_area_data", lambda points, bbox: {} if points[0][0] > 41 else overpass_service._mock_data(*points[0]))
+    points, _ = portfolio_service.read_points("lat,lng\n40.40,-3.70\n41.39,2.17\n")
+    results = {r["row"]: r for r in portfolio_service.analyze_portfolio(points) if r["type"] == "result"}
+    assert results[1]["status"] == "ok"
+    assert results[2]["status"] == "error" and "Overpass" in results[2]["error"]
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from app.services import geometry_service, hardware_catalog, production_service, pvgis_service, time_index
+
+
+@pytest.fixture(scope="module")
+def pvgis_data():
+    return pvgis_service.get_pvgis_data(40.4, -3.7)
+
+
+def test_poa_irradiance_matches_monthly_totals():
+    monthly = [80, 95, 145, 165, 190, 195, 200, 185, 150, 125, 90, 75]
+    poa = production_service.poa_irradiance(monthly, 40.4, 30, 180)
+    index = time_index.get_time_index(time_index.TYPICAL_YEAR)
+    assert poa.shape == (8760,)
+    assert time_index.monthly_sums(poa, index) / 1000 == pytest.approx(monthly)
+    assert poa[index.hour == 2].max() == 0  # De noche no hay irradiancia
+    # Medido en el plano sur, un plano orientado al este recibe menos en el año
+    east = production_service.poa_irradiance(monthly, 40.4, 30, 90, reference_plane=(30, 180))
+    assert east.sum() < poa.sum()
+
+
+def test_clipping_temperature_and_shading_are_vectorized_over_systems():
+    """Tres sistemas a la vez: con más ratio DC/AC aparece recorte; la sombra y el calor restan energía."""
+    poa = np.tile(np.r_[np.zeros(8), np.full(8, 900.0), np.zeros(8)], 365)
+    result = production_service.simulate_production(poa, 35.0, dc_kwp=[4.0, 4.0, 6.0], ac_kw=[5.0, 5.0, 3.0],
+                                                    shading=[1.0] * 12, dc_losses=0.0)
+    assert result.hourly_ac_kwh.shape == (3, 8760)
+    assert result.clipping_loss_kwh[0] == 0 and result.clipping_loss_kwh[2] > 0
+    assert result.hourly_ac_kwh[2].max() == pytest.approx(3.0)
+    assert result.temperature_loss_kwh[0] > 0  # Células a ~70 °C
+    shaded = production_service.simulate_production(poa, 35.0, 4.0, 5.0, shading=np.full(8760, 0.5), dc_losses=0.0)
+    assert shaded.shading_loss_kwh[0] == pytest.approx(4.0 * 0.9 * 8 * 365 * 0.5)
+    assert shaded.ac_kwh[0] == pytest.approx(result.ac_kwh[0] / 2)
+    with pytest.raises(ValueError):
+        production_service.simulate_production(poa, 20.0, 4.0, 5.0, shading=[1.5] * 12)
+
+
+def test_simulate_system_with_catalog_hardware(pvgis_data):
+    system = production_service.simulate_system(pvgis_data, 40.4, 4.0)
+    module = hardware_catalog.get_catalog().module(hardware_catalog.DEFAULT_MODULE)
+    assert system.panels == round(4000 / module["power_w"])
+    assert system.dc_kwp / system.ac_kw <= production_service.PRODUCTION_TARGET_DC_AC_RATIO
+    assert 1000 < system.specific_yield_kwh_kwp < 1700
+    assert sum(system.monthly_kwh) == pytest.approx(system.annual_ac_kwh, abs=1)
+    assert system.hourly_kwh.shape == (8760,)
+    # Un inversor pequeño recorta y una sombra resta producción
+    clipped = production_service.simulate_system(pvgis_data, 40.4, 4.5, inverter_id="generic_3kw")
+    assert clipped.inverters == 1 and clipped.clipping_loss_kwh > 0 and clipped.dc_ac_ratio == 1.5
+    shaded = production_service.simulate_system(pvgis_data, 40.4, 4.0, shading=[0.8] * 12)
+    assert shaded.annual_ac_kwh < system.annual_ac_kwh and shaded.shading_loss_kwh > 0
+    with pytest.raises(ValueError, match="Unknown module"):
+        production_service.simulate_system(pvgis_data, 40.4, 4.0, module_id="nope")
+
+
+def test_large_system_uses_parallel_inverters(pvgis_data):
+    """Por encima del inversor más grande se ponen varios en paralelo: sin recortes absurdos."""
+    system = production_service.simulate_system(pvgis_data, 40.4, 50.0)
+    assert system.inverter_id == "generic_10kw_3ph" and system.inverters == 5
+    assert system.ac_kw == 50.0 and system.dc_ac_ratio <= production_service.PRODUCTION_TARGET_DC_AC_RATIO
+    assert system.clipping_loss_kwh < 0.01 * system.annual_ac_kwh
+    assert 1000 < system.specific_yield_kwh_kwp < 1700
+    # Un inversor elegido a mano también se multiplica hasta su entrada DC máxima
+    fixed = production_service.simulate_system(pvgis_data, 40.4, 50.0, inverter_id="generic_5kw")
+    assert fixed.inverters == 7 and fixed.ac_kw == 35.0
+    with pytest.raises(ValueError, match="inverters are supported"):
+        production_service.simulate_system(pvgis_data, 40.4, 200.0)
+
+
+def test_catalog_is_structured_and_extensible(tmp_path):
+    catalog = hardware_catalog.get_catalog()
+    assert catalog.modules.dtype.names[:3] == ("id", "description", "power_w")
+    assert list(catalog.inverters["ac_kw"]) == sorted(catalog.inverters["ac_kw"])
+    assert not catalog.inverters.flags.writeable
+    index, count = catalog.select_inverters([3.5, 6.0, 100.0], 1.2)
+    assert catalog.inverters["id"][index].tolist() == ["generic_3kw", "generic_5kw", "generic_10kw_3ph"]
+    assert count.tolist() == [1, 1, 9]  # 100 kWp: 9 x 10 kW para el ratio 1,2 (y 9 x 15 kW de entrada DC)
+    # 10 kWp con ratio 2,0: 5 kW de AC bastan, pero el primero que admite 10 kW de DC es el de 8 kW (no 2 x 5 kW)
+    index, count = catalog.select_inverters(10.0, 2.0)
+    assert catalog.inverters["id"][index] == "generic_8kw_3ph" and count == 1
+
+    csv_path = tmp_path / "catalog.csv"
+    csv_path.write_text(
+        "kind,id,power_w,length_m,width_m,gamma_pmax,noct_c,price_eur\n"
+        "module,custom_500,500,2.0,1.1,-0.003,44,120\n"
+    )
+    extended = hardware_catalog.build_catalog(hardware_catalog.read_catalog_csv(str(csv_path)))
+    assert extended.module("custom_500")["power_w"] == 500
+    assert len(extended.inverters) == len(catalog.inverters)
+
+
+def test_max_kwp_depends_on_module():
+    assert geometry_service.estimate_max_kwp(65.0) == 10.0  # 6,5 m²/kWp por defecto
+    big = production_service.max_kwp_for_module(100.0, "generic_mono_450")
+    small = production_service.max_kwp_for_module(100.0, "generic_poly_330")
+    assert big > small > 0
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services import profile_library
+
+
+def test_builtin_curves_are_normalized_and_follow_the_calendar():
+    """Cada curva suma 1; los festivos nacionales y los domingos usan la forma de festivo."""
+    spec = profile_library.BUILTIN_PROFILES[0]
+    curve = profile_library.build_curve(spec, year=2025)
+    assert curve.shape == (8760,)
+    assert curve.sum() == pytest.approx(1.0)
+
+    # Energía de cada mes = su fracción anual
+    monthly = np.add.reduceat(curve, np.concatenate(([0], np.cumsum(profile_library.DAYS_IN_MONTH[:-1]) * 24)))
+    assert monthly == pytest.approx(np.asarray(spec.monthly_fractions) / sum(spec.monthly_fractions))
+
+    # 2025-01-01 (festivo) y 2025-01-05 (domingo) tienen la misma forma; 2025-01-02 (jueves), otra
+    days = curve.reshape(365, 24)
+    holiday, sunday, thursday = (days[d] / days[d].sum() for d in (0, 4, 1))
+    assert holiday == pytest.approx(sunday)
+    assert np.abs(thursday - sunday).max() > 0.005
+
+
+def test_leap_reference_year_is_rejected():
+    with pytest.raises(ValueError, match="leap"):
+        profile_library.build_curve(profile_library.BUILTIN_PROFILES[0], year=2024)
+
+
+def test_library_is_built_on_first_load_and_memory_mapped(tmp_path):
+    path = str(tmp_path / "profiles" / "load_profiles.npy")
+    library = profile_library.load_library(path)
+
+    assert library.names == [spec.name for spec in profile_library.BUILTIN_PROFILES]
+    assert isinstance(library.matrix, np.memmap)
+    assert library.matrix.dtype == np.float32
+    curve = library.curve("2.0TD")
+    assert not curve.flags.writeable
+    assert np.shares_memory(curve, library.matrix)  # Selección por índice, sin copia
+    assert library.monthly_fractions("3.0TD_business").sum() == pytest.approx(1.0, abs=1e-5)
+    with pytest.raises(ValueError, match="Unknown load profile"):
+        library.curve("6.1TD")
+
+
+def test_unwritable_library_path_falls_back_to_memory(tmp_path):
+    """Si no se puede escribir la biblioteca, las curvas integradas se sirven desde memoria."""
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    library = profile_library.load_library(str(blocker / "load_profiles.npy"))
+    assert library.names == [spec.name for spec in profile_library.BUILTIN_PROFILES]
+    assert not library.curve("2.0TD").flags.writeable
+    assert not (tmp_path / "not_a_dir").is_dir()
+
+
+def test_default_library_lives_outside_the_source_tree():
+    source_root = os.path.abspath(os.path.join(os.path.dirname(profile_library.__file__), "..", ".."))
+    assert not os.path.abspath(profile_library.PROFILE_LIBRARY_PATH).startswith(source_root + os.sep)
+
+
+def test_library_with_imported_csv_curves(tmp_path):
+    """Las curvas importadas (p. ej. coeficientes REE: ';' y coma decimal) se normalizan y se añaden a las integradas."""
+    csv_path = tmp_path / "ree.csv"
+    hours = np.arange(8760)
+    rows = ["Mes;Dia;Hora;P2.0TD"] + [f"1;1;{h % 24 + 1};{0.0001 + (h % 24) * 1e-5:.6f}".replace(".", ",") for h in hours]
+    csv_path.write_text("\n".join(rows), encoding="utf-8")
+
+    curves = profile_library.read_curves_csv(str(csv_path))
+    assert list(curves) == ["P2.0TD"]
+
+    path = str(tmp_path / "lib.npy")
+    profile_library.build_library(path, curves=curves, descriptions={"P2.0TD": "REE"})
+    library = profile_library.load_library(path)
+    assert library.names[-1] == "P2.0TD"
+    assert library.curve("P2.0TD").sum() == pytest.approx(1.0, abs=1e-5)
+    assert library.describe()[-1] == {"name": "P2.0TD", "description": "REE"}
+
+
+def test_read_curves_csv_rejects_wrong_length(tmp_path):
+    csv_path = tmp_path / "short.csv"
+    csv_path.write_text("perfil\n" + "\n".join(["0.5"] * 100), encoding="utf-8")
+    with pytest.raises(ValueError, match="8760"):
+        profile_library.read_curves_csv(str(csv_path))
@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from app.services import profiling_service
+
+
+def _busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampling_profiler_records_collapsed_stacks():
+    profiler = profiling_service.SamplingProfiler(interval_s=0.001).start()
+    _busy_wait(0.1)
+    collapsed = profiler.stop().decode("utf-8")
+
+    assert profiler.samples > 0
+    lines = collapsed.splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)  # "frame;frame;... count"
+    assert any("_busy_wait (test_profiling_service.py" in line and line.startswith("MainThread;") for line in lines)
+
+
+def test_parse_profile_mode():
+    assert profiling_service.parse_profile_mode(None) is None
+    assert profiling_service.parse_profile_mode("0") is None
+    assert profiling_service.parse_profile_mode("1") == "sample"
+    assert profiling_service.parse_profile_mode("cProfile") == "cprofile"
+    with pytest.raises(ValueError):
+        profiling_service.parse_profile_mode("perf")
+
+
+def test_stored_profiles_are_pruned(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling_service, "PROFILING_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling_service, "PROFILING_MAX_STORED", 2)
+    ids = [profiling_service.new_profile_id() for _ in range(3)]
+    for profile_id in ids:
+        profiling_service.save_profile(profile_id, "sample", b"main;f 1\n", {"path": "/x"})
+        time.sleep(0.01)
+
+    assert [p["id"] for p in profiling_service.list_profiles()] == ids[:0:-1]
+    assert profiling_service.get_profile(ids[0]) is None
+    assert profiling_service.get_profile(ids[2])[1] == b"main;f 1\n"
+    assert len(list(tmp_path.iterdir())) == 4
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import location_service
+from app.services.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight("test")
+    executions = 0
+
+    async def work():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    results = await asyncio.gather(*(flight.do("same-key", work) for _ in range(10)))
+    other = await flight.do("other-key", work)
+
+    assert executions == 2
+    assert all(r is results[0] for r in results)  # Todos reciben el mismo resultado compartido
+    assert other == {"value": 42}
+    stats = flight.stats()
+    assert (stats["executions"], stats["joins"], stats["in_flight"]) == (2, 9, 0)
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_and_key_is_released():
+    flight = SingleFlight("test-errors")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def ok():
+        return "recovered"
+
+    assert await flight.do("k", ok) == "recovered"  # Tras el fallo, la siguiente llamada vuelve a ejecutar
+    assert flight.stats()["executions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_work():
+    flight = SingleFlight("test-cancel")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.ensure_future(flight.do("k", slow))
+    second = asyncio.ensure_future(flight.do("k", slow))
+    await asyncio.sleep(0)
+    first.cancel()  # p. ej. el cliente que inició la petición se desconecta
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_location_analysis_coalesces_requests_for_the_same_building(monkeypatch):
+    """Peticiones simultáneas para el mismo edificio (coordenadas casi iguales) ejecutan una sola consulta a Overpass."""
+    calls = []
+    lock = threading.Lock()
+    original = location_service.overpass_service.get_building_and_obstacle_data
+
+    def slow_overpass(lat, lng, **kwargs):
+        with lock:
+            calls.append((lat, lng))
+        time.sleep(0.05)
+        return original(lat, lng, **kwargs)
+
+    monkeypatch.setattr(location_service.overpass_service, "get_building_and_obstacle_data", slow_overpass)
+    joins_before = location_service.analysis_flight.joins
+
+    results = await asyncio.gather(*(
+        location_service.analyze_location(lat=40.4167751 + i * 1e-7, lng=-3.7037902) for i in range(20)
+    ))
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert location_service.analysis_flight.joins - joins_before == 19
+    assert location_service.get_coalescing_stats()["location_analysis"]["in_flight"] == 0
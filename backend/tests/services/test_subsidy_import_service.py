@@ -0,0 +1,97 @@
+import csv
+import json
+import pytest
+
+from backend.app.services import subsidy_import_service as import_service
+from backend.app.services import subsidy_service as sub_service
+
+# El fixture 'memory_db' viene de conftest.py y aísla la base de datos de cada test.
+
+
+def _sample_records():
+    return [
+        {"name": "Ayuda Nacional", "region_code": "ES", "type": "amount_per_kwp", "value": 300.0,
+         "max_amount_eur": 3000.0, "start_date": "2024-01-01", "end_date": "2024-12-31"},
+        {"name": "Ayuda Municipal", "region_code": "ES-MD-001", "type": "fixed_amount", "value": 500.0},
+    ]
+
+
+def test_import_subsidies_is_idempotent(memory_db):
+    """Importar dos veces el mismo lote no duplica filas ni produce cambios."""
+    first = import_service.import_subsidies(_sample_records())
+    assert (first.inserted, first.updated, first.unchanged) == (2, 0, 0)
+
+    second = import_service.import_subsidies(_sample_records())
+    assert (second.inserted, second.updated, second.unchanged) == (0, 0, 2)
+
+    assert len(sub_service.get_all_subsidies()) == 2
+
+
+def test_import_subsidies_upserts_on_natural_key(memory_db):
+    """Un cambio en una regla existente (misma name, region_code, start_date) actualiza la fila."""
+    import_service.import_subsidies(_sample_records())
+
+    records = _sample_records()
+    records[0]["value"] = 350.0
+    # Misma subvención pero con otra fecha de inicio: es una regla distinta.
+    records.append(dict(records[1], start_date="2025-01-01"))
+    report = import_service.import_subsidies(records)
+
+    assert (report.inserted, report.updated, report.unchanged) == (1, 1, 1)
+    subsidies = {(s.name, s.start_date): s for s in sub_service.get_all_subsidies()}
+    assert len(subsidies) == 3
+    assert subsidies[("Ayuda Nacional", "2024-01-01")].value == 350.0
+
+
+def test_import_subsidies_dry_run_and_invalid_records(memory_db):
+    """dry_run no escribe nada; los registros inválidos se cuentan y se informan sin abortar el lote."""
+    records = _sample_records() + [{"name": "Sin tipo", "region_code": "ES", "value": 1.0}]
+
+    report = import_service.import_subsidies(records, dry_run=True)
+
+    assert report.dry_run is True
+    assert report.inserted == 2
+    assert report.invalid == 1
+    assert len(report.errors) == 1 and "Registro 3" in report.errors[0]
+    assert sub_service.get_all_subsidies() == []
+
+
+def test_import_subsidies_deactivate_missing(memory_db):
+    """Con deactivate_missing, las reglas que ya no están en el origen se marcan como inactivas."""
+    import_service.import_subsidies(_sample_records())
+
+    report = import_service.import_subsidies(_sample_records()[:1], deactivate_missing=True)
+
+    assert report.deactivated == 1
+    active_names = {s.name for s in sub_service.get_all_subsidies(active_only=True)}
+    assert active_names == {"Ayuda Nacional"}
+
+
+def test_import_subsidies_from_csv_and_jsonl_files(memory_db, tmp_path):
+    """Se pueden leer reglas de CSV (celdas vacías = valor por defecto) y JSON Lines."""
+    csv_path = tmp_path / "ayudas.csv"
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["name", "region_code", "type", "value", "max_amount_eur", "is_active"])
+        writer.writeheader()
+        writer.writerow({"name": "CSV 1", "region_code": "ES-CT", "type": "fixed_amount", "value": "250", "max_amount_eur": "", "is_active": "1"})
+        writer.writerow({"name": "CSV 2", "region_code": "ES-CT", "type": "percentage_cost", "value": "0.1", "max_amount_eur": "900", "is_active": "0"})
+
+    jsonl_path = tmp_path / "ayudas.jsonl"
+    jsonl_path.write_text("\n".join(json.dumps(r) for r in _sample_records()) + "\n")
+
+    report = import_service.import_subsidies_from_files([str(csv_path), str(jsonl_path)])
+
+    assert report.total_records == 4
+    assert report.inserted == 4
+    by_name = {s.name: s for s in sub_service.get_all_subsidies()}
+    assert by_name["CSV 1"].max_amount_eur is None
+    assert by_name["CSV 1"].min_kwp_required == 0.0
+    assert by_name["CSV 2"].is_active is False
+
+
+def test_iter_subsidy_records_unsupported_format(tmp_path):
+    """Un formato desconocido lanza ValueError."""
+    path = tmp_path / "ayudas.xlsx"
+    path.write_text("")
+    with pytest.raises(ValueError, match="Formato de archivo no soportado"):
+        list(import_service.iter_subsidy_records(str(path)))
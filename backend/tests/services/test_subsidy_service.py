@@ -150,3 +150,67 @@ def test_calculate_subsidy_min_kwp_not_met(test_subsidy_service):
     # system_kwp (3.0) cumple con min_kwp_required (3.0)
     calculated_ok = test_subsidy_service.calculate_subsidy_amount(subsidy_obj, 3.0, 4000.0)
     assert calculated_ok == 100.0
+
+
+def _make_subsidy(subsidy_id: int, **overrides) -> Subsidy:
+    """Helper para construir una subvención en memoria (sin pasar por la BD)."""
+    data = dict(id=subsidy_id, name=f"Batch-{subsidy_id}", region_code="ES", type="fixed_amount", value=100.0, is_active=True)
+    data.update(overrides)
+    return Subsidy(**data)
+
+
+def test_calculate_subsidy_amounts_batch_matches_scalar():
+    """La versión vectorizada debe coincidir con calculate_subsidy_amount para cada par sistema x subvención."""
+    subsidies = [
+        _make_subsidy(1, type="percentage_cost", value=0.20, max_amount_eur=1000.0),
+        _make_subsidy(2, type="percentage_cost", value=0.20, max_kwp_eligible=10.0),
+        _make_subsidy(3, type="fixed_amount", value=700.0, max_amount_eur=600.0),
+        _make_subsidy(4, type="amount_per_kwp", value=100.0, max_kwp_eligible=10.0, min_kwp_required=3.0),
+        _make_subsidy(5, type="amount_per_kwp", value=150.0, is_active=False),
+    ]
+    system_kwp = [0.0, 2.0, 3.0, 5.0, 10.0, 15.0]
+    costs = [0.0, 3000.0, 4000.0, 6000.0, 12000.0, 20000.0]
+
+    amounts, totals = sub_service.calculate_subsidy_amounts_batch(subsidies, system_kwp, costs)
+
+    assert amounts.shape == (len(system_kwp), len(subsidies))
+    for i, (kwp, cost) in enumerate(zip(system_kwp, costs)):
+        for j, subsidy in enumerate(subsidies):
+            assert amounts[i, j] == pytest.approx(sub_service.calculate_subsidy_amount(subsidy, kwp, cost))
+        assert totals[i] == pytest.approx(min(amounts[i].sum(), cost))
+
+
+def test_calculate_subsidy_amounts_batch_stacking_capped_at_cost():
+    """El total apilado de varias ayudas no puede superar el coste de la inversión."""
+    subsidies = [
+        _make_subsidy(1, type="fixed_amount", value=800.0),
+        _make_subsidy(2, type="percentage_cost", value=0.5),
+    ]
+    amounts, totals = sub_service.calculate_subsidy_amounts_batch(subsidies, [1.0, 5.0], 1000.0)
+
+    assert amounts.tolist() == [[800.0, 500.0], [800.0, 500.0]]
+    assert totals.tolist() == [1000.0, 1000.0]
+
+
+def test_calculate_subsidy_amounts_batch_empty_rules_and_shape_errors():
+    """Sin reglas devuelve una matriz vacía; longitudes incompatibles lanzan ValueError."""
+    amounts, totals = sub_service.calculate_subsidy_amounts_batch([], [1.0, 2.0, 3.0], 5000.0)
+    assert amounts.shape == (3, 0)
+    assert totals.tolist() == [0.0, 0.0, 0.0]
+
+    with pytest.raises(ValueError):
+        sub_service.calculate_subsidy_amounts_batch([_make_subsidy(1)], [1.0, 2.0, 3.0], [1000.0, 2000.0])
+
+
+def test_calculate_subsidy_amounts_batch_zero_kwp_and_unknown_type():
+    """kWp = 0 sin límite de kWp no produce NaN ni avisos; un tipo desconocido da 0, como la versión escalar."""
+    import warnings
+
+    unknown = Subsidy.construct(**dict(_make_subsidy(2).dict(), type="per_battery_kwh"))
+    subsidies = [_make_subsidy(1, type="percentage_cost", value=0.2), unknown]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        amounts, totals = sub_service.calculate_subsidy_amounts_batch(subsidies, [0.0, 3.0], [0.0, 3000.0])
+    assert amounts.tolist() == [[0.0, 0.0], [600.0, 0.0]]
+    assert totals.tolist() == [0.0, 600.0]
+    assert sub_service.calculate_subsidy_amount(unknown, 3.0, 3000.0) == 0.0
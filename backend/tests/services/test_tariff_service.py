@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.services import tariff_service, time_index
+
+
+def test_2_0td_periods_follow_schedule_weekends_and_holidays():
+    """Punta 10-14 y 18-22 en laborables; valle todo el día en fines de semana y festivos nacionales."""
+    periods = tariff_service.compile_periods(tariff_service.BUILTIN_TARIFFS["2.0TD"], 2025)
+    index = time_index.get_time_index(2025)
+    assert periods.shape == (8760,) and not periods.flags.writeable
+    thursday = periods[index.day == 1]  # 2 de enero de 2025
+    assert list(thursday[[0, 8, 10, 14, 18, 22]]) == [2, 1, 0, 1, 0, 1]
+    assert set(periods[index.day == 0]) == {2}  # Año Nuevo
+    assert set(periods[index.day == 4]) == {2}  # Domingo
+    assert tariff_service.compile_periods(tariff_service.BUILTIN_TARIFFS["2.0TD"], 2025) is periods  # Cacheado
+
+
+def test_bill_components_and_taxes():
+    bill, = tariff_service.compare_tariffs(np.full(8760, 0.5), tariffs=["2.0TD_flat"], contracted_power_kw=[4.6])
+    tariff = tariff_service.BUILTIN_TARIFFS["2.0TD_flat"]
+    assert bill.energy_kwh == [4380.0]
+    assert bill.energy_eur == pytest.approx(4380 * tariff.energy_prices[0], abs=0.01)
+    assert bill.power_eur == pytest.approx(4.6 * sum(tariff.power_prices), abs=0.01)
+    subtotal = bill.energy_eur + bill.power_eur
+    expected = (subtotal * (1 + tariff_service.TARIFF_ELECTRICITY_TAX) + bill.meter_rental_eur) * (1 + tariff_service.TARIFF_VAT)
+    assert bill.total_eur == pytest.approx(expected, abs=0.05)
+    assert sum(bill.monthly_total_eur) == pytest.approx(bill.total_eur, abs=0.05)
+
+
+def test_compensation_is_capped_by_monthly_energy_term():
+    """Un gran excedente no hace negativa la factura: la compensación no supera el término de energía del mes."""
+    bill, = tariff_service.compare_tariffs(np.full(8760, 0.1), np.full(8760, 5.0), tariffs=["2.0TD"])
+    assert bill.compensation_eur == pytest.approx(bill.energy_eur, abs=0.01)
+    assert bill.total_eur > 0
+
+
+def test_many_series_and_tariffs_in_one_pass():
+    rng = np.random.default_rng(0)
+    imports, exports = rng.random((20, 8760)), rng.random((20, 8760))
+    names = list(tariff_service.BUILTIN_TARIFFS)
+    totals = tariff_service.annual_totals(imports, exports, names)
+    assert totals.shape == (20, len(names))
+    single = tariff_service.compare_tariffs(imports[7], exports[7], names)
+    assert totals[7] == pytest.approx([b.total_eur for b in single], abs=0.01)
+
+
+def test_leap_year_and_invalid_tariffs():
+    bill, = tariff_service.compare_tariffs(np.full(8784, 0.5), tariffs=["2.0TD_flat"])
+    assert bill.energy_kwh == [4392.0]
+    with pytest.raises(ValueError, match="Unknown tariff"):
+        tariff_service.compare_tariffs(np.ones(8760), tariffs=["nope"])
+    bad = tariff_service.Tariff("bad", (0.1,), (30.0,), 0.0, ((1,) * 24,) * 3)
+    with pytest.raises(ValueError):
+        tariff_service.compare_tariffs(np.ones(8760), tariffs=[bad])
+    with pytest.raises(ValueError):
+        tariff_service.compare_tariffs(np.ones(8760), tariffs=["2.0TD"], contracted_power_kw=[4.6, 4.6, 4.6])
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from app.services import time_index
+
+
+def test_local_time_index_has_dst_days_and_shifted_month_starts():
+    """En hora local el día del cambio de marzo tiene 23 h y el de octubre 25; abril empieza una hora antes."""
+    index = time_index.get_time_index(2025, "Europe/Madrid")
+    assert index.hours == 8760
+    hours_per_day = np.bincount(index.day)
+    assert hours_per_day[88] == 23 and hours_per_day[298] == 25  # 30 de marzo y 26 de octubre
+    assert list(index.hour[index.day == 88][:4]) == [0, 1, 3, 4]
+    assert index.month_starts[3] == 2159
+    assert not index.month.flags.writeable
+
+
+def test_typical_year_grid_and_leap_year():
+    index = time_index.get_time_index(2024)
+    assert index.hours == 8784
+    assert list(index.month_starts[:3]) == [0, 744, 1440]
+    assert time_index.to_typical_year(np.arange(8784), index).shape == (8760,)
+    assert time_index.get_time_index(2024) is index  # Cacheado por año y zona horaria
+
+
+def test_holidays_weekdays_and_day_types():
+    index = time_index.get_time_index(2025)
+    day_type = index.day_type[index.day_starts]
+    assert index.weekday[0] == 2  # 2025-01-01 fue miércoles
+    assert day_type[0] == 2  # Año Nuevo
+    assert day_type[107] == 2  # Viernes Santo (18 de abril de 2025)
+    assert day_type[3] == 1 and day_type[4] == 2 and day_type[6] == 0  # Sábado, domingo, lunes
+
+
+def test_grouped_sums_and_length_validation():
+    index = time_index.index_for_hours(8760, timezone=None)
+    values = np.ones((3, 8760))
+    assert time_index.monthly_sums(values, index)[:, 1].tolist() == [672.0] * 3
+    assert time_index.daily_sums(values[0], index).shape == (365,)
+    assert time_index.index_for_hours(8784).year == time_index.LEAP_YEAR
+    with pytest.raises(ValueError, match="8784"):
+        time_index.index_for_hours(8761)
+    with pytest.raises(ValueError, match="2023 has 8760"):
+        time_index.index_for_hours(8784, year=2023)
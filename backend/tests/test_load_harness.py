@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import overpass_service, pvgis_service, upstream_guard, upstream_http
+from scripts import load_test, stub_upstreams
+
+# Arnés de pruebas de carga: servidor local que imita PVGIS/Overpass (scripts/stub_upstreams.py),
+# modo UPSTREAM_LIVE de los servicios contra él y generador de carga (scripts/load_test.py).
+
+
+@pytest.fixture
+def stub_server():
+    server = stub_upstreams.make_server(stub_upstreams.StubConfig(latency_ms=0, jitter_ms=0, overpass_elements=25, seed=1), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def live_upstreams(monkeypatch, stub_server):
+    monkeypatch.setattr(upstream_http, "UPSTREAM_LIVE", True)
+    monkeypatch.setattr(pvgis_service, "PVGIS_API_URL", f"{stub_server.base_url}/api/v5_2/PVcalc")
+    monkeypatch.setattr(pvgis_service, "PVGIS_API_HORIZON_URL", f"{stub_server.base_url}/api/v5_2/SHcalc")
+    monkeypatch.setattr(overpass_service, "OVERPASS_API_URL", f"{stub_server.base_url}/api/interpreter")
+    upstream_guard.reset_guards() # Guardas (y últimas respuestas buenas) nuevas en cada test
+    yield stub_server
+    upstream_guard.reset_guards()
+
+
+def test_live_mode_queries_stub_upstreams(live_upstreams):
+    """Con UPSTREAM_LIVE los servicios hacen peticiones HTTP reales y reciben la estructura de las APIs."""
+    pvcalc = pvgis_service._fetch_pvgis_data(40.4, -3.7, 1.0, 14.0, True, True)
+    assert pvcalc["inputs"]["mounting_system"]["fixed"]["slope"]["value"] > 0
+    assert len(pvcalc["outputs"]["monthly"]["fixed"]) == 12
+
+    horizon = pvgis_service._fetch_pvgis_terrain_horizon(40.4, -3.7)
+    assert len(horizon["outputs"]["horizon_profile"]) == 49 # 360 / 7.5 + 1
+
+    overpass = overpass_service._fetch_building_and_obstacle_data(40.4, -3.7, 30, 150)
+    assert len(overpass["elements"]) == 25
+    # La consulta Overpass QL llega al stub, que centra la geometría en sus coordenadas
+    assert overpass["elements"][0]["geometry"][0]["lat"] == pytest.approx(40.4, abs=1e-3)
+
+    assert live_upstreams.stats()["requests"] == {"PVcalc": 1, "SHcalc": 1, "interpreter": 1}
+
+
+def test_live_mode_upstream_errors_return_empty(live_upstreams):
+    """Los errores HTTP simulados (429/503/504) se convierten en {}, que nunca se cachea."""
+    live_upstreams.config.error_rate = 1.0
+    assert pvgis_service._fetch_pvgis_data(40.4, -3.7, 1.0, 14.0, True, True) == {}
+    assert overpass_service._fetch_building_and_obstacle_data(40.4, -3.7, 30, 150) == {}
+    assert live_upstreams.stats()["errors"] == {"PVcalc": 1, "interpreter": 1}
+
+
+def test_stub_seriescalc_payload_size():
+    one_year = stub_upstreams.seriescalc_payload(40.4, -3.7, 2020, 2020)
+    assert len(one_year["outputs"]["hourly"]) == 8784 # 2020 es bisiesto
+    assert one_year["outputs"]["hourly"][0]["time"] == "20200101:0010"
+
+
+def test_load_test_summary_percentiles():
+    latencies = [i / 1000 for i in range(1, 101)] # 1..100 ms
+    summary = load_test.summarize(latencies, Counter({200: 98, 503: 1, "ConnectTimeout": 1}), elapsed_s=2.0, concurrency=4)
+    assert summary["requests"] == 100
+    assert summary["errors"] == 2
+    assert summary["throughput_rps"] == 50.0
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"], summary["max_ms"]) == (50.0, 95.0, 99.0, 100.0)
+
+
+def test_run_load_test_against_app():
+    """El generador funciona de extremo a extremo (aquí contra la app ASGI en proceso)."""
+    results = asyncio.run(load_test.run_load_test(
+        "http://loadtest", "manual", [1, 4], duration_s=0.3, warmup_s=0, transport=httpx.ASGITransport(app=app)))
+    assert [r["concurrency"] for r in results] == [1, 4]
+    assert all(r["requests"] > 0 and r["errors"] == 0 and r["statuses"] == {"200": r["requests"]} for r in results)
+
+
+# Control de admisión (app/services/upstream_guard.py) contra el stub.
+
+def test_upstream_rate_limit_holds_throughput_at_the_ceiling(live_upstreams, monkeypatch):
+    """Con 110 llamadas concurrentes y un límite de 100/s (ráfaga 10), todas se atienden a ~100/s."""
+    monkeypatch.setattr(upstream_guard, "UPSTREAM_RATE_LIMITS", "127.0.0.1=100:10")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda i: pvgis_service._fetch_pvgis_terrain_horizon(40.0 + i / 1000, -3.7), range(110)))
+    elapsed = time.perf_counter() - start
+
+    assert all(result for result in results) # Ninguna descartada: la cola absorbe la ráfaga
+    assert live_upstreams.stats()["requests"] == {"SHcalc": 110}
+    # 10 de ráfaga + 100 a 100/s: ~1 s. Sin límite, el stub las atiende en unas decenas de ms.
+    assert 0.95 <= elapsed < 2.0
+    stats = upstream_guard.get_guard(live_upstreams.base_url).stats()
+    assert stats["admitted"] == 110 and stats["queue_depth"] == 0
+    assert stats["shed"] == {"queue_full": 0, "deadline": 0, "circuit_open": 0}
+
+
+def test_upstream_guard_sheds_when_queue_is_full_or_deadline_too_far():
+    guard = upstream_guard.UpstreamGuard("upstream.test", rate_per_s=2, burst=1, max_queue=1, queue_timeout_s=0.3)
+    guard.acquire() # Usa la ráfaga
+    with pytest.raises(upstream_guard.UpstreamUnavailableError) as excinfo:
+        guard.acquire() # Su turno llegaría en 0,5 s > 0,3 s: se descarta sin esperar
+    assert excinfo.value.reason == "deadline"
+
+    waiter = threading.Thread(target=guard.acquire, kwargs={"timeout_s": 5})
+    waiter.start()
+    while guard.queue_depth == 0:
+        time.sleep(0.001)
+    with pytest.raises(upstream_guard.UpstreamUnavailableError) as excinfo:
+        guard.acquire(timeout_s=5) # La cola (1 plaza) está ocupada
+    assert excinfo.value.reason == "queue_full"
+    waiter.join()
+    assert guard.stats()["shed"] == {"queue_full": 1, "deadline": 1, "circuit_open": 0}
+    assert guard.stats()["admitted"] == 2
+
+
+def test_upstream_circuit_breaker_serves_last_good_answer(live_upstreams, monkeypatch):
+    """Tras N fallos seguidos el circuito se abre: no se llama al upstream y se sirve la última respuesta buena."""
+    monkeypatch.setattr(upstream_guard, "UPSTREAM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(upstream_guard, "UPSTREAM_BREAKER_COOLDOWN_S", 60)
+    good = overpass_service._fetch_building_and_obstacle_data(40.4, -3.7, 30, 150)
+    assert good["elements"]
+
+    live_upstreams.config.error_rate = 1.0
+    for _ in range(4):
+        assert overpass_service._fetch_building_and_obstacle_data(40.4, -3.7, 30, 150) == good
+    # Una llamada sin respuesta previa no tiene a qué recurrir
+    assert overpass_service._fetch_building_and_obstacle_data(41.0, -3.7, 30, 150) == {}
+
+    assert live_upstreams.stats()["requests"] == {"interpreter": 3} # 1 buena + 2 fallos; luego circuito abierto
+    stats = upstream_guard.get_guard(live_upstreams.base_url).stats()
+    assert stats["circuit_state"] == "open" and stats["circuit_opened"] == 1
+    assert stats["shed"]["circuit_open"] == 3
+    assert stats["fallbacks"] == {"stale": 4, "empty": 1}
+
+    metrics = TestClient(app).get("/metrics").text
+    assert 'upstream_shed_total{host="127.0.0.1",reason="circuit_open"} 3' in metrics
+    assert 'upstream_fallback_total{host="127.0.0.1",kind="stale"} 4' in metrics
+
+
+def test_upstream_half_open_probe_is_settled_on_every_path(monkeypatch):
+    """Un cuerpo que no es JSON cuenta como respuesta (cierra el circuito), y un error antes de enviar libera la prueba."""
+    import requests
+
+    url = "http://upstream.test/api"
+    upstream_guard.reset_guards()
+    breaker = upstream_guard.get_guard(url).breaker
+    breaker.state, breaker.consecutive_failures = upstream_guard.HALF_OPEN, 3
+
+    class _Session:
+        def request(self, method, url, **kwargs):
+            response = requests.Response()
+            response.status_code, response._content = 200, b"<html>no es JSON</html>"
+            return response
+
+    monkeypatch.setattr(upstream_http, "_get_session", lambda: _Session())
+    assert upstream_http.request_json("GET", url) == {}
+    assert breaker.state == upstream_guard.CLOSED and breaker.consecutive_failures == 0
+
+    breaker.state = upstream_guard.HALF_OPEN
+    monkeypatch.setattr(upstream_http, "_get_session", lambda: None) # Error inesperado antes de enviar la llamada
+    with pytest.raises(AttributeError):
+        upstream_http.request_json("GET", url)
+    assert breaker.allow() # La siguiente llamada puede hacer de prueba
+    upstream_guard.reset_guards()
+
+
+def test_location_analysis_returns_503_without_overpass_data(live_upstreams):
+    """Si Overpass no responde y no hay respuesta previa, el análisis devuelve 503 (que no se cachea)."""
+    live_upstreams.config.error_rate = 1.0
+    response = TestClient(app).post("/location/analyze", json={"lat": 43.2627, "lng": -2.9253})
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Overpass service unavailable, please retry later."
@@ -0,0 +1,49 @@
+import os
+import re
+import subprocess
+import sys
+
+# Regresión de arranque en frío: cada worker nuevo paga la importación de app.main antes
+# de atender su primera petición, así que no debe arrastrar dependencias pesadas.
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Módulos que solo necesitan algunas rutas y deben importarse de forma perezosa.
+HEAVY_MODULES = {"pandas", "numpy", "requests"}
+
+# Presupuesto (ms) para la importación acumulada de app.main medida con -X importtime.
+# Se puede ajustar en máquinas de CI lentas con STARTUP_IMPORT_BUDGET_MS.
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _importtime(module: str):
+    """Ejecuta `python -X importtime -c 'import <module>'` en un proceso limpio y devuelve {módulo: acumulado_us}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative
+
+
+def test_app_main_does_not_import_heavy_dependencies():
+    """app.main no debe importar pandas/numpy/requests: se cargan bajo demanda en los servicios que los usan."""
+    imported = _importtime("app.main")
+    assert "app.main" in imported
+    top_level_packages = {name.split(".")[0] for name in imported}
+    assert not (HEAVY_MODULES & top_level_packages), f"Importados en el arranque: {sorted(HEAVY_MODULES & top_level_packages)}"
+
+
+def test_app_main_cold_import_within_budget():
+    """La importación en frío de app.main no debe crecer por encima del presupuesto."""
+    imported = _importtime("app.main")
+    cold_import_ms = imported["app.main"] / 1000
+    assert cold_import_ms < STARTUP_IMPORT_BUDGET_MS, (
+        f"Importar app.main tardó {cold_import_ms:.0f} ms (presupuesto {STARTUP_IMPORT_BUDGET_MS:.0f} ms)"
+    )